@@ -5,6 +5,7 @@ by chemists.
 
 from . import _msys, version
 import numpy
+import os
 import sys
 import tempfile
 
@@ -13,7 +14,7 @@ from ._msys import RadiusForElement, MassForElement, ElementForAbbreviation
 from ._msys import GuessAtomicNumber, AbbreviationForElement
 from ._msys import ElectronegativityForElement
 from ._msys import PeriodForElement, GroupForElement
-from ._msys import HydrogenBond, FetchPDB
+from ._msys import HydrogenBond, FetchPDB, CompiledSelection
 from ._msys import BadId
 from .atomsel import Atomsel
 from . import molfile
@@ -1156,29 +1157,93 @@ class System(object):
 
     @property
     def positions(self):
-        """ Nx3 list of lists of positions of all atoms """
+        """ Nx3 array of positions of all atoms; a copy.
+
+        Assigning a C-contiguous float64 array which owns its data, such
+        as a freshly read frame, hands it to the system without copying
+        it; the array is made read-only, since it now holds the
+        positions of the system.  Other arrays are converted to such an
+        array first.
+        """
         return self._ptr.getPositions()
 
     @positions.setter
     def positions(self, pos):
         self._ptr.setPositions(pos)
 
-    def getPositions(self):
-        """ get copy of positions as Nx3 array """
+    def getPositions(self, copy=True):
+        """ get copy of positions as Nx3 array
+
+        If copy is False, return a writable view of the positions held by
+        the system instead, so that reading and assigning through it
+        touches the atoms directly.  The system must have no deleted
+        atoms, and no atoms may be added while the view is alive.
+
+        The view is strided over the atom records rather than
+        contiguous.  While it is alive, assigning to the positions
+        property copies into the atom records instead of handing the
+        array to the system.
+        """
+        if not copy:
+            return self._ptr.positionsView()
         return self._ptr.getPositions()
 
     def setPositions(self, pos):
-        """ set positions from Nx3 array """
+        """ set positions from Nx3 array, as for the positions property """
         self._ptr.setPositions(pos)
 
-    def getVelocities(self):
-        """ get copy of velocities as N3x array """
+    def getVelocities(self, copy=True):
+        """ get copy of velocities as N3x array
+
+        If copy is False, return a writable view, as for getPositions.
+        """
+        if not copy:
+            return self._ptr.velocitiesView()
         return self._ptr.getVelocities()
 
     def setVelocities(self, vel):
-        """ set velocities from Nx3 array """
+        """ set velocities from Nx3 array, as for the positions property """
         self._ptr.setVelocities(vel)
 
+    def getAtomField(self, name, ids=None):
+        """ values of an atom attribute or property as an array
+
+        name may be one of x, y, z, vx, vy, vz, mass, charge,
+        atomic_number, formal_charge, fragid, residue (the id of the
+        parent residue) or name, or the name of an atom property.  Values
+        are returned for the atoms with the given ids, or for all atoms
+        in id order.  Strings are returned as a fixed-width unicode array.
+        """
+        return self._ptr.getAtomField(name, ids)
+
+    def setAtomField(self, name, vals, ids=None):
+        """ set an atom attribute or property from an array
+
+        Takes the same names as getAtomField, except fragid and residue.
+        vals must have one entry for each atom in ids, or for all atoms,
+        or be a single value to be given to every one of them.
+        """
+        self._ptr.setAtomField(name, vals, ids)
+
+    def getResidueField(self, name, ids=None):
+        """ values of resid, name, insertion or chain (the id of the
+        parent chain) for the residues with the given ids, or all
+        residues, as an array """
+        return self._ptr.getResidueField(name, ids)
+
+    def setResidueField(self, name, vals, ids=None):
+        """ set resid, name or insertion of residues from an array """
+        self._ptr.setResidueField(name, vals, ids)
+
+    def getBondField(self, name, ids=None):
+        """ values of i, j, order, aromatic, stereo or a bond property for
+        the bonds with the given ids, or all bonds, as an array """
+        return self._ptr.getBondField(name, ids)
+
+    def setBondField(self, name, vals, ids=None):
+        """ set order, aromatic, stereo or a bond property from an array """
+        self._ptr.setBondField(name, vals, ids)
+
     def setCell(self, cell):
         """ set unit cell from from 3x3 array """
         for i in range(3):
@@ -1226,6 +1291,17 @@ class System(object):
         """ list of bonded atoms for each atom in the System """
         return self._ptr.topology()
 
+    def adjacency(self):
+        """ bonded atoms of every atom, in compressed sparse row form.
+
+        Returns read-only arrays (offsets, neighbors, bond_ids); the atoms
+        bonded to atom i are neighbors[offsets[i]:offsets[i+1]], joined to
+        it by the bonds with the same slice of bond_ids.  offsets has one
+        more entry than the largest atom id.  The arrays are a snapshot,
+        and are not updated when bonds are later added or removed.
+        """
+        return self._ptr.adjacency()
+
     ###
     ### operations on term tables
     ###
@@ -1362,6 +1438,23 @@ class System(object):
         """
         return self._ptr.selectAsArray(seltext, None, None)
 
+    def compileSelection(self, seltext):
+        """Parse a VMD atom selection once, returning a CompiledSelection
+        which can be evaluated many times with selectIds(pos=None, box=None)
+        or selectArr(pos=None, box=None).
+
+        Parts of the selection which depend on neither positions nor
+        velocities are evaluated once and cached, so that repeated
+        evaluation with new positions redoes only the within, nearest
+        and x, y, z subexpressions.  The cache is discarded whenever
+        atoms, bonds, residues, chains or atom properties of the system
+        are added or removed, or atom, residue and chain attributes are
+        set.  Call invalidate() on the CompiledSelection after modifying
+        the system in any other way, e.g. through a tool which edits
+        bond orders or residue types directly.
+        """
+        return self._ptr.compileSelection(seltext)
+
     def selectChain(self, name=None, segid=None):
         """Returns a single Chain with the matching name and/or segid,
         or raises an exception if no single such chain is present.
@@ -1711,6 +1804,64 @@ def CreateSystem():
     return System(_msys.SystemPtr.create())
 
 
+def SystemFromArrays(
+    atomic_number,
+    name=None,
+    resname=None,
+    resid=None,
+    chain=None,
+    segid=None,
+    insertion=None,
+    ct=None,
+    pos=None,
+    vel=None,
+    mass=None,
+    charge=None,
+    formal_charge=None,
+    bonds=None,
+    atom_props=None,
+):
+    """Create a System from per-atom arrays in a single call.
+
+    Args:
+        atomic_number (array[int]): one entry per atom
+        name, resname, chain, segid, insertion (list[str] or str): per-atom
+            strings, or a single string for every atom
+        resid (array[int]): residue numbers
+        ct (array[int]): ct of each atom
+        pos, vel (array[float]): Nx3 positions and velocities
+        mass, charge (array[float]): per-atom masses and partial charges
+        formal_charge (array[int]): per-atom formal charges
+        bonds (tuple): arrays (i, j) or (i, j, order) of bonded atom indices
+        atom_props (dict): extra atom properties; the type of each is taken
+            from its values
+
+    Returns:
+        System: atoms are grouped into residues, chains and cts in the same
+        way as SystemImporter.addAtom, and have ids 0 to N-1.
+
+    Attributes not given keep the defaults of System.addAtom.
+    """
+    ptr = _msys.SystemFromArrays(
+        atomic_number,
+        name,
+        resname,
+        resid,
+        chain,
+        segid,
+        insertion,
+        ct,
+        pos,
+        vel,
+        mass,
+        charge,
+        formal_charge,
+        bonds,
+        dict(atom_props or {}),
+    )
+    return System(ptr)
+
+
 def _convert_ids(hs, klass=Atom):
     if not hs:
         return None, []
@@ -1731,7 +1882,30 @@ def CreateParamTable():
     return ParamTable(_msys.ParamTablePtr.create())
 
 
-def LoadDMS(path=None, structure_only=False, buffer=None):
+def _dms_import_options(
+    structure_only, without_tables, tables, atom_props, lazy_tables
+):
+    opts = _msys.DMSImportOptions()
+    opts.structure_only = structure_only
+    opts.without_tables = without_tables
+    if tables is not None:
+        opts.select_tables = True
+        opts.tables = set(tables)
+    if atom_props is not None:
+        opts.select_atom_props = True
+        opts.atom_props = set(atom_props)
+    opts.lazy_tables = bool(lazy_tables)
+    return opts
+
+
+def LoadDMS(
+    path=None,
+    structure_only=False,
+    buffer=None,
+    tables=None,
+    atom_props=None,
+    lazy_tables=False,
+):
     """Load the DMS file at the given path and return a System containing it.
     If structure_only is True, only Atoms, Bonds, Residues and Chains will
     be loaded, along with the GlobalCell, and no pseudos (atoms with atomic
@@ -1739,6 +1913,16 @@ def LoadDMS(path=None, structure_only=False, buffer=None):
 
     If the buffer argument is provided, it is expected to hold the contents
     of a DMS file, and the path argument will be ignored.
+
+    When loading from a path, the remaining arguments select what is read:
+
+        tables: if not None, names of the term tables to read; others are
+            skipped unless lazy_tables is True.
+        atom_props: if not None, names of the extra particle columns to
+            read as atom properties.
+        lazy_tables (bool): read term tables not listed in tables (all of
+            them, if tables is None) only when first accessed with
+            System.table().  They are listed in table_names right away.
     """
     if buffer is None and path is None:
         raise ValueError("Must provide either path or buffer")
@@ -1746,13 +1930,23 @@ def LoadDMS(path=None, structure_only=False, buffer=None):
         raise ValueError("Must provide either path or buffer")
 
     if path is not None:
-        ptr = _msys.ImportDMS(path, structure_only)
+        if tables is None and atom_props is None and not lazy_tables:
+            ptr = _msys.ImportDMS(path, structure_only)
+        else:
+            opts = _dms_import_options(
+                structure_only, structure_only, tables, atom_props, lazy_tables
+            )
+            ptr = _msys.ImportDMSWithOptions(path, opts)
     else:
+        if tables is not None or atom_props is not None or lazy_tables:
+            raise ValueError("tables, atom_props and lazy_tables require a path")
         ptr = _msys.ImportDMSFromBuffer(buffer, structure_only)
     return System(ptr)
 
 
-def LoadMAE(path=None, ignore_unrecognized=False, buffer=None, structure_only=False):
+def LoadMAE(
+    path=None, ignore_unrecognized=False, buffer=None, structure_only=False, threads=1
+):
     """load the MAE file at the given path and return a System containing it.
     Forcefield tables will be created that attempt to match as closely as
     possible the force terms in the MAE file; numerical differences are bound
@@ -1766,7 +1960,12 @@ def LoadMAE(path=None, ignore_unrecognized=False, buffer=None, structure_only=Fa
     are recognized as being gzip-compressed, they will be decompressed on
     the fly.
 
-    If structure_only is True, no forcefield components will be loaded."""
+    If structure_only is True, no forcefield components will be loaded.
+
+    If threads is not 1, the ct blocks in the file at path are parsed and
+    converted on up to that many threads (0 for one per core), and merged
+    in file order; the result is the same as with threads=1.  This helps
+    with files holding many cts, such as FEP setups."""
 
     if buffer is None and path is None:
         raise ValueError("Must provide either path or buffer")
@@ -1775,7 +1974,11 @@ def LoadMAE(path=None, ignore_unrecognized=False, buffer=None, structure_only=Fa
     ignore_unrecognized = bool(ignore_unrecognized)
     structure_only = bool(structure_only)
 
-    if path is not None:
+    if path is not None and threads != 1:
+        ptr = _msys.ImportMAEParallel(
+            path, threads, ignore_unrecognized, structure_only
+        )
+    elif path is not None:
         ptr = _msys.ImportMAE(path, ignore_unrecognized, structure_only)
     else:
         ptr = _msys.ImportMAEFromBuffer(buffer, ignore_unrecognized, structure_only)
@@ -1817,7 +2020,16 @@ def LoadXYZ(path):
     return System(_msys.ImportXYZ(path))
 
 
-def Load(path, structure_only=False, without_tables=None):
+def Load(
+    path,
+    structure_only=False,
+    without_tables=None,
+    tables=None,
+    atom_props=None,
+    lazy_tables=False,
+    cache_dir=None,
+    cache_size=None,
+):
     """Infer the file type of path and load the file.
 
     Args:
@@ -1825,6 +2037,16 @@ def Load(path, structure_only=False, without_tables=None):
               an Anton jobid (require 'yas' garden module)
         structure_only (bool): Omit force tables and pseudo atoms
         without_tables (bool): Omit force tables.
+        tables (list): DMS only: names of the term tables to read.
+        atom_props (list): DMS only: extra particle columns to read.
+        lazy_tables (bool): DMS only: read unselected term tables when
+              they are first accessed; see LoadDMS.
+        cache_dir (str): directory of a cache of loaded systems; defaults
+              to $MSYS_LOAD_CACHE.  A system loaded from an unchanged file
+              with the same options is read back from the cache.  Not
+              used with tables, atom_props or lazy_tables.
+        cache_size (int): bound on the size of the cache in bytes;
+              defaults to $MSYS_LOAD_CACHE_SIZE, or 4GB.
 
     Returns:
         new System
@@ -1853,7 +2075,29 @@ def Load(path, structure_only=False, without_tables=None):
             input_ark = json.loads(input_ark)
         path = str(input_ark["boot"]["file"])
 
-    ptr = _msys.Load(path, structure_only, without_tables)
+    if cache_dir is None:
+        cache_dir = os.environ.get("MSYS_LOAD_CACHE")
+
+    if tables is None and atom_props is None and not lazy_tables:
+        if cache_dir:
+            if cache_size is None:
+                cache_size = os.environ.get(
+                    "MSYS_LOAD_CACHE_SIZE", _msys.DefaultLoadCacheSize
+                )
+            ptr = _msys.LoadCached(
+                path, str(cache_dir), structure_only, without_tables, int(cache_size)
+            )
+        else:
+            ptr = _msys.Load(path, structure_only, without_tables)
+    elif _msys.GuessFileFormat(path) == "DMS":
+        opts = _dms_import_options(
+            structure_only, without_tables, tables, atom_props, lazy_tables
+        )
+        ptr = _msys.ImportDMSWithOptions(path, opts)
+    else:
+        raise ValueError(
+            "tables, atom_props and lazy_tables are supported only for DMS files"
+        )
     if not ptr:
         raise ValueError("Could not guess file type of '%s'" % path)
     if jobid is not None:
@@ -1862,7 +2106,13 @@ def Load(path, structure_only=False, without_tables=None):
 
 
 class IndexedFileLoader(object):
-    """Supports random access to multi-structure files"""
+    """Supports random access to multi-structure files.
+
+    SDF, MAE, MOL2 and multi-model PDB files are supported, either plain
+    or gzipped.  For gzipped files, decompression checkpoints are saved
+    next to the index file with suffix .gzi, so that reading an entry
+    decompresses only a few megabytes of the file.
+    """
 
     def __init__(self, path, idx_path=None):
         """Open an indexed file loader, creating an index file if needed.
@@ -2185,6 +2435,45 @@ def LoadMany(path, structure_only=False, error_writer=sys.stderr):
         yield System(mol)
 
 
+def LoadManyParallel(
+    path,
+    workers=0,
+    ordered=True,
+    structure_only=False,
+    error_writer=sys.stderr,
+    with_index=False,
+):
+    """Iterate over structures in a file like LoadMany, parsing them on
+    a pool of native threads.
+
+    for mol in LoadManyParallel('library.sdf', workers=8): ...
+
+    SDF and MOL2 files are split on record boundaries and parsed by
+    workers threads (0 for one per core); other formats are read
+    sequentially.  If ordered is False, structures are yielded as
+    soon as they have been parsed rather than in file order.
+
+    As with LoadMany, None is yielded for structures which could not be
+    parsed, and the error is written to error_writer if it is not None.
+    If with_index is True, (index, mol) pairs are yielded, where index is
+    the zero-based position of the structure in the file.
+    """
+    it = _msys.ParallelLoadIterator.create(
+        str(path), int(workers), bool(ordered), bool(structure_only)
+    )
+    while True:
+        result = it.next()
+        if result is None:
+            break
+        i, mol, err = result
+        if mol is None:
+            if error_writer:
+                error_writer.write("Error reading structure %d: %s\n" % (i, err))
+        else:
+            mol = System(mol)
+        yield (i, mol) if with_index else mol
+
+
 def Save(mol, path, append=False, structure_only=False):
     """Save the given system to path, using a file format guessed from the
     path name.  Not all formats support both append and structure_only options;
@@ -2248,6 +2537,35 @@ def SaveDMS(system, path, structure_only=False, unbuffered=False):
     _msys.ExportDMS(system._ptr, path, prov, flags)
 
 
+def ReadDMSCoordinates(path):
+    """Read only the coordinates from the DMS file at path.
+
+    Returns:
+        positions (N,3), velocities (N,3) and global cell (3,3) as numpy
+        arrays, with particles in the order in which LoadDMS reads them.
+    """
+    return _msys.ReadDMSCoordinates(str(path))
+
+
+def UpdateDMSCoordinates(path, positions, velocities=None, cell=None):
+    """Overwrite the coordinates in an existing DMS file at path, leaving
+    the rest of the file untouched.  This is much faster than saving the
+    whole System when only the coordinates have changed.
+
+    Args:
+        path (str): uncompressed DMS file
+        positions: (N,3) array for the N particles in the file, or None
+        velocities: (N,3) array, or None to leave velocities alone
+        cell: (3,3) global cell, or None to leave it alone
+    """
+    n = 0
+    for arr in positions, velocities:
+        if arr is not None:
+            n = len(arr)
+            break
+    _msys.UpdateDMSCoordinates(str(path), n, positions, velocities, cell)
+
+
 def FormatDMS(system):
     """ Return the DMS form of the system as bytes """
     return _msys.FormatDMS(system._ptr)
@@ -2794,6 +3112,17 @@ class SpatialHash(object):
         """
         self._hash.voxelize(float(radius))
 
+    def update(self, pos, box=None):
+        """Replace the hashed positions with the rows of pos corresponding
+        to the ids given in the constructor, e.g. the next frame of a
+        trajectory.  If box is provided, it replaces the periodic cell;
+        otherwise the current cell is kept.  If the hash has already been
+        voxelized, only particles which moved to a different voxel are
+        rebinned, so queries with reuse_voxels=True remain valid and
+        are much cheaper than constructing a new SpatialHash each frame.
+        """
+        self._hash.update(pos, box)
+
     def findWithin(self, radius, pos, ids=None, reuse_voxels=False):
         """Find particles from pos which are within the given radius
         of some particle in the spatial hash (i.e. provided in the
@@ -2818,7 +3147,7 @@ class SpatialHash(object):
             ids = numpy.arange(len(pos), dtype="uint32")
         return self._hash.findNearest(k, pos, ids)
 
-    def findContacts(self, radius, pos, ids=None, reuse_voxels=False):
+    def findContacts(self, radius, pos, ids=None, reuse_voxels=False, threads=0):
         """Find pairs of particles within radius of each other.
 
         Args:
@@ -2827,6 +3156,7 @@ class SpatialHash(object):
             ids (array[uint]): particle indices
             reuse_voxels (bool): assume voxelize(R>=radius) has already been called
             ignore_excluded (bool): exclude atom pairs in the exclusion table.
+            threads (int): number of threads to search with; 0 for one per core.
 
         Returns:
            i, j, dists (tuple): Mx1 arrays of ids and distances.
@@ -2840,11 +3170,97 @@ class SpatialHash(object):
         the positions passsed to findContacts should correspond to the
         same atom indices as the positions passed to the SpatialHash
         constructor.
+
+        The query points are split across threads, and the output is
+        the same, in the same order, for any number of threads.
         """
-        return self._hash.findContacts(radius, pos, ids, reuse_voxels)
+        return self._hash.findContacts(radius, pos, ids, reuse_voxels, threads)
+
+    def findPairlist(self, radius, excl, reuse_voxels=False, threads=0):
+        return self._hash.findPairlist(radius, excl, reuse_voxels, threads)
 
-    def findPairlist(self, radius, excl, reuse_voxels=False):
-        return self._hash.findPairlist(radius, excl, reuse_voxels)
+
+class NeighborList(object):
+    """NeighborList finds pairs of particles within a cutoff of each
+    other over many frames, reusing a cached list of pairs within
+    cutoff + skin until some particle has moved more than skin/2 from
+    its position when the list was built, or the box changes.
+
+    Example:
+
+        nlist = msys.NeighborList(mol, cutoff=4.0, skin=1.0)
+        for frame in frames:
+            i, j, dist = nlist.find(frame.pos, frame.box)
+    """
+
+    def __init__(self, system_or_pos, cutoff, skin=1.0, box=None, exclusions=None):
+        """Construct from a System or an Nx3 array of positions.
+
+        Args:
+            system_or_pos (System or array): particles to search
+            cutoff (float): contact distance
+            skin (float): extra distance for the cached pair list
+            box (array): 3x3 periodic cell, defaulting to the cell of
+                system_or_pos if it is a System with a nonzero cell;
+                None for no periodicity.
+            exclusions: SpatialHash.Exclusions or list of (i, j) pairs to
+                exclude.  If system_or_pos is a System, defaults to its
+                bonds, as in System.findContactIds.
+        """
+        if isinstance(system_or_pos, System):
+            mol = system_or_pos
+            if mol.natoms != mol._ptr.maxAtomId():
+                raise ValueError("NeighborList requires a System with no deleted atoms")
+            pos = mol.getPositions()
+            if box is None and mol.cell.any():
+                box = mol.getCell()
+            if exclusions is None:
+                exclusions = [(b.first.id, b.second.id) for b in mol.bonds]
+        else:
+            pos = numpy.asarray(system_or_pos)
+        if not isinstance(exclusions, SpatialHash.Exclusions):
+            excl = SpatialHash.Exclusions()
+            for i, j in exclusions or ():
+                excl.add(int(i), int(j))
+            exclusions = excl
+        self._nlist = _msys.NeighborList(
+            len(pos), float(cutoff), float(skin), exclusions
+        )
+        self._pos = pos
+        self._box = box
+
+    @property
+    def cutoff(self):
+        """contact distance"""
+        return self._nlist.cutoff
+
+    @property
+    def skin(self):
+        """extra distance for the cached pair list"""
+        return self._nlist.skin
+
+    @property
+    def nbuilds(self):
+        """number of times the cached pair list has been built"""
+        return self._nlist.nbuilds
+
+    def find(self, pos=None, box=None):
+        """Find pairs of particles within cutoff of each other.
+
+        Args:
+            pos (array): Nx3 positions; defaults to the positions given
+                in the constructor.
+            box (array): 3x3 periodic cell; defaults to the most recently
+                supplied box.
+
+        Returns:
+            i, j, dists (tuple): arrays of ids with i < j and distances.
+        """
+        if pos is None:
+            pos = self._pos
+        if box is not None:
+            self._box = box
+        return self._nlist.find(pos, self._box)
 
 
 HydrogenBond.__repr__ = lambda self: "<Hbond %s %s %s>" % (
@@ -2910,6 +3326,15 @@ class HydrogenBondFinder(object):
         self.acceptors = numpy.array(acceptors, dtype=numpy.uint32)
         self.hydrogens_for_donor = dh
 
+        # the hydrogens of donors[i] are
+        # hydrogens[hydrogen_offsets[i]:hydrogen_offsets[i+1]]
+        self.hydrogens = numpy.array(
+            [h for hlist in dh.values() for h in hlist], dtype=numpy.uint32
+        )
+        self.hydrogen_offsets = numpy.cumsum(
+            [0] + [len(hlist) for hlist in dh.values()], dtype=numpy.uint32
+        )
+
     def find(self, pos=None):
         """Find hydrogen bonds for the given positions, defaulting to the
         current positions of the input system."""
@@ -2938,6 +3363,32 @@ class HydrogenBondFinder(object):
 
         return results
 
+    def findArray(self, pos=None, threads=0):
+        """Find hydrogen bonds in one or more frames, returning a structured
+        array instead of a list of HydrogenBond objects.
+
+        Args:
+            pos (array): positions with shape (N,3) or (F,N,3), float32 or
+                float64, defaulting to the current positions of the system.
+            threads (int): number of threads used to process frames; 0 for
+                one per core.
+
+        Returns:
+            array: one record per hbond with fields frame, donor, acceptor,
+            hydrogen, r, p and energy.  Records for each frame are in the
+            same order as the hbonds returned by find(), and frames appear
+            in order.
+        """
+        return self.system._ptr.findHydrogenBonds(
+            self.cutoff,
+            self.donors,
+            self.hydrogen_offsets,
+            self.hydrogens,
+            self.acceptors,
+            pos,
+            threads,
+        )
+
 
 class SystemImporter:
     """Maps atoms to residues, chains and cts"""
@@ -26,11 +26,11 @@ namespace desres { namespace msys {
         Residue(SystemPtr m, Id i) : Handle{m,i} {}
         residue_t& data() { return mol->residue(id); }
         const char* name() { return data().name.c_str(); }
-        void setName(std::string const& s) { data().name=s; }
+        void setName(std::string const& s) { data().name=s; mol->touchTopology(); }
         const char* insertion() { return data().insertion.c_str(); }
-        void setInsertion(std::string const& s) { data().insertion=s; }
+        void setInsertion(std::string const& s) { data().insertion=s; mol->touchTopology(); }
         int resid() { return data().resid; }
-        void setResid(int i) { data().resid=i; }
+        void setResid(int i) { data().resid=i; mol->touchTopology(); }
         void remove() { mol->delResidue(id); }
         Id addAtom() { return mol->addAtom(id); }
         IdList atoms() { return mol->atomsForResidue(id); }
@@ -43,9 +43,9 @@ namespace desres { namespace msys {
         Chain(SystemPtr m, Id i) : Handle{m,i} {}
         chain_t& data() { return mol->chain(id); }
         const char* name() { return data().name.c_str(); }
-        void setName(std::string const& s) { data().name=s; }
+        void setName(std::string const& s) { data().name=s; mol->touchTopology(); }
         const char* segid() { return data().segid.c_str(); }
-        void setSegid(std::string const& s) { data().segid=s; }
+        void setSegid(std::string const& s) { data().segid=s; mol->touchTopology(); }
         Id ctId() { return data().ct; }
         void setCtId(Id ct) { mol->setCt(id, ct); }
         IdList residues() { return mol->residuesForChain(id); }
@@ -103,7 +103,8 @@ namespace desres { namespace msys {
                     PyErr_Format(PyExc_KeyError, "No such atom property '%s", key.data());
                     throw error_already_set();
                 }
-                to_value_ref(val, b.mol->atomPropValue(b.id,col)); },
+                to_value_ref(val, b.mol->atomPropValue(b.id,col));
+                b.mol->touchTopology(); },
                 arg("key"), arg("val"), "set Atom property")
         .def_property("x", [](Atom& a) { return a.mol->atom(a.id).x; },
                 [](Atom& a, double val) { a.mol->atom(a.id).x = val; },
@@ -124,19 +125,19 @@ namespace desres { namespace msys {
                 [](Atom& a, double val) { a.mol->atom(a.id).vz = val; },
                 "z component of velocity")
         .def_property("mass", [](Atom& a) { return a.mol->atom(a.id).mass; },
-                [](Atom& a, double val) { a.mol->atom(a.id).mass = val; },
+                [](Atom& a, double val) { a.mol->atom(a.id).mass = val; a.mol->touchTopology(); },
                 "mass")
         .def_property("charge", [](Atom& a) { return a.mol->atom(a.id).charge; },
-                [](Atom& a, double val) { a.mol->atom(a.id).charge= val; },
+                [](Atom& a, double val) { a.mol->atom(a.id).charge= val; a.mol->touchTopology(); },
                 "charge")
         .def_property("atomic_number", [](Atom& a) { return a.mol->atom(a.id).atomic_number; },
-                [](Atom& a, int val) { a.mol->atom(a.id).atomic_number = val; },
+                [](Atom& a, int val) { a.mol->atom(a.id).atomic_number = val; a.mol->touchTopology(); },
                 "atomic number")
         .def_property("formal_charge", [](Atom& a) { return a.mol->atom(a.id).formal_charge; },
-                [](Atom& a, int val) { a.mol->atom(a.id).formal_charge = val; },
+                [](Atom& a, int val) { a.mol->atom(a.id).formal_charge = val; a.mol->touchTopology(); },
                 "formal charge")
         .def_property("name", [](Atom& a) { return str(a.mol->atom(a.id).name); },
-                [](Atom& a, std::string const& val) { a.mol->atom(a.id).name = val; },
+                [](Atom& a, std::string const& val) { a.mol->atom(a.id).name = val; a.mol->touchTopology(); },
                 "name")
         .def_property_readonly("fragid", [](Atom& a) { return a.mol->atom(a.id).fragid; },
                 "fragment id")
@@ -1,5 +1,6 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
+#include <pybind11/numpy.h>
 
 #include "schema.hxx"
 #include "mae.hxx"
@@ -29,6 +30,45 @@ namespace {
         return FormatDMS(mol, Provenance());
     }
 
+    typedef array_t<double, array::c_style | array::forcecast> dblarray;
+
+    tuple read_dms_coordinates(std::string const& path) {
+        DMSCoordinates c;
+        {
+            gil_scoped_release release;
+            c = ReadDMSCoordinates(path);
+        }
+        size_t n = c.pos.size()/3;
+        dblarray pos({n, size_t(3)}), vel({n, size_t(3)}), cell({3, 3});
+        std::copy(c.pos.begin(), c.pos.end(), pos.mutable_data());
+        std::copy(c.vel.begin(), c.vel.end(), vel.mutable_data());
+        std::copy(c.cell, c.cell+9, cell.mutable_data());
+        return pybind11::make_tuple(pos, vel, cell);
+    }
+
+    void update_dms_coordinates(std::string const& path, size_t natoms,
+                                object posobj, object velobj,
+                                object cellobj) {
+        /* None leaves the corresponding values alone */
+        dblarray arrs[3];
+        const double* ptrs[3] = {nullptr, nullptr, nullptr};
+        const size_t sizes[3] = {3*natoms, 3*natoms, 9};
+        const char* names[3] = {"positions", "velocities", "cell"};
+        object objs[3] = {posobj, velobj, cellobj};
+        for (int i=0; i<3; i++) {
+            if (objs[i].is_none()) continue;
+            arrs[i] = objs[i].cast<dblarray>();
+            if (size_t(arrs[i].size())!=sizes[i]) {
+                PyErr_Format(PyExc_ValueError, "Expected %zu values for %s, got %zd",
+                        sizes[i], names[i], arrs[i].size());
+                throw error_already_set();
+            }
+            ptrs[i] = arrs[i].data();
+        }
+        gil_scoped_release release;
+        UpdateDMSCoordinates(path, natoms, ptrs[0], ptrs[1], ptrs[2]);
+    }
+
     SystemPtr import_mae_from_buffer(buffer buf, bool ignore_unrecognized,
                                                  bool structure_only) {
 
@@ -58,6 +98,13 @@ namespace {
                          bool structure_only) {
         return ImportMAE(path, ignore_unrecognized, structure_only);
     }
+    SystemPtr import_mae_parallel(const std::string& path, unsigned nthreads,
+                                  bool ignore_unrecognized,
+                                  bool structure_only) {
+        gil_scoped_release release;
+        return ImportMAEParallel(path, nthreads, ignore_unrecognized,
+                                 structure_only);
+    }
     SystemPtr import_prmtop(const std::string& path, bool structure_only) {
         return ImportPrmTop(path, structure_only);
     }
@@ -133,6 +180,20 @@ namespace desres { namespace msys {
             .def("next", [](LoadIterator& li) { return li.next(); })
             ;
 
+        class_<ParallelLoadIterator, ParallelLoadIteratorPtr>(m, "ParallelLoadIterator")
+            .def_static("create", [](std::string const& path, unsigned nthreads, bool ordered, bool structure_only) { return ParallelLoadIterator::create(path, nthreads, ordered, structure_only); })
+            .def("next", [](ParallelLoadIterator& pli) -> object {
+                LoadResult r;
+                bool more;
+                {
+                    gil_scoped_release release;
+                    more = pli.next(r);
+                }
+                if (!more) return none();
+                return pybind11::make_tuple(r.index, r.mol, r.error);
+            })
+            ;
+
         class_<IndexedFileLoader, std::shared_ptr<IndexedFileLoader>>(m, "IndexedFileLoader")
             .def_static("create", &IndexedFileLoader::create)
             .def("path", [](IndexedFileLoader& self) { return self.path(); })
@@ -140,11 +201,27 @@ namespace desres { namespace msys {
             .def("at", [](IndexedFileLoader& self, size_t entry) { return self.at(entry); })
             ;
 
+        class_<DMSImportOptions>(m, "DMSImportOptions")
+            .def(init<>())
+            .def_readwrite("structure_only",    &DMSImportOptions::structure_only)
+            .def_readwrite("without_tables",    &DMSImportOptions::without_tables)
+            .def_readwrite("select_tables",     &DMSImportOptions::select_tables)
+            .def_readwrite("tables",            &DMSImportOptions::tables)
+            .def_readwrite("lazy_tables",       &DMSImportOptions::lazy_tables)
+            .def_readwrite("select_atom_props", &DMSImportOptions::select_atom_props)
+            .def_readwrite("atom_props",        &DMSImportOptions::atom_props)
+            ;
+
         m.def("ImportDMS", import_dms);
+        m.def("ImportDMSWithOptions", [](std::string const& path, DMSImportOptions const& opts) { return ImportDMS(path, opts); });
+        m.def("GuessFileFormat", [](std::string const& path) { return FileFormatAsString(GuessFileFormat(path)); });
         m.def("ImportDMSFromBuffer", import_dms_from_buffer);
         m.def("ExportDMS", ExportDMS);
         m.def("FormatDMS", format_dms);
+        m.def("ReadDMSCoordinates", read_dms_coordinates);
+        m.def("UpdateDMSCoordinates", update_dms_coordinates);
         m.def("ImportMAE", import_mae);
+        m.def("ImportMAEParallel", import_mae_parallel);
         m.def("ImportMAEFromBuffer", import_mae_from_buffer);
         m.def("ExportMAE", ExportMAE);
         m.def("ExportMAEContents", ExportMAEContents);
@@ -160,6 +237,8 @@ namespace desres { namespace msys {
         m.def("ExportMOL2", ExportMol2);
         m.def("ImportXYZ", ImportXYZ);
         m.def("Load", load);
+        m.def("LoadCached", LoadCached);
+        m.attr("DefaultLoadCacheSize") = DefaultLoadCacheSize;
         m.def("Save", save);
         m.def("FromSmilesString", FromSmilesString);
         m.def("ParseSDF", SdfTextIterator);
@@ -10,6 +10,12 @@ Iterating through the frames in a file::
     for frame in molfile.dtr.read('/path/to/foo.dtr').frames():
         function( frame.pos, frame.vel, frame.time, frame.box )
 
+Read positions of a subset of atoms from many frames into one array::
+
+    r = molfile.dtr.read('/path/to/foo.dtr')
+    d = r.read_frames(slice(0, None, 10), atoms=ligand_ids)
+    d['pos']    # shape (nframes, len(ligand_ids), 3)
+
 Random access to frames (only dtr files support this currently)::
 
     f27 = molfile.dtr.read('/path/to/foo.dtr').frame(27) # 0-based index
@@ -57,6 +63,24 @@ Read the raw fields from a frameset (dtr)::
         ## use data in keyvals
 
 
+Read positions without copying them out of the frame files::
+
+    dtr = molfile.DtrReader('input.dtr')    # also works for stk
+    dtr.mmap_cache_size = 64                # frame files kept mapped
+    for i in range(dtr.nframes):
+        f = dtr.mapped_frame(i)
+        ## f['pos'], f['box'] are read-only views of the mapped file
+
+
+Scan a frameset with reads issued ahead of time on a thread pool::
+
+    dtr = molfile.DtrReader('input.dtr')    # also works for stk
+    it = molfile.PrefetchIterator(dtr, depth=16, threads=4)
+    for frame in it:
+        function(frame.pos, frame.box)
+    print(it.stats)     # bytes, bytes_per_second, stall, ...
+
+
 Write raw fields to a frameset (dtr)::
 
     dtr = molfile.DtrWriter('output.dtr', natoms=natoms)
@@ -8,6 +8,7 @@
 #include <msys/molfile/findframe.hxx>
 #include <msys/molfile/dtrplugin.hxx>
 #include <msys/molfile/dtrframe.hxx>
+#include <msys/molfile/prefetch.hxx>
 
 using namespace desres::molfile;
 using namespace pybind11;
@@ -331,6 +332,133 @@ namespace {
         return cast(frame);
     }
 
+    const char * mapped_frame_doc =
+        "mapped_frame(index) -> dict\n"
+        "Read frame directly from a memory mapped frame file.\n"
+        "Returns a dict with 'time', and 'pos', 'vel' and 'box' if present\n"
+        "in the frame as (natoms,3), (natoms,3) and (3,3) arrays.  Fields\n"
+        "stored uncompressed in native byte order are read-only views of\n"
+        "the mapped file and keep it mapped for as long as they are alive;\n"
+        "other fields are copied.  Velocities stored as MOMENTUM are not\n"
+        "provided.\n";
+
+    // (nd)-dimensional float array with the given shape and strides over
+    // the data of key, viewing the mapping if possible, else a copy.
+    object mapped_field(dtr::Key const& key, int nd, npy_intp* dims,
+                        npy_intp* strides, FrameFileMapping const& mapping,
+                        object const& base) {
+        int type = key.type==dtr::Key::TYPE_FLOAT32 ? NPY_FLOAT32 :
+                   key.type==dtr::Key::TYPE_FLOAT64 ? NPY_FLOAT64 :
+                   -1;
+        if (type<0) {
+            PyErr_Format(PyExc_ValueError, "Unsupported type %s for mapped field",
+                    dtr::Key::type_name(key.type));
+            throw error_already_set();
+        }
+        npy_intp elsize = key.get_element_size();
+        npy_intp count = key.count;
+        for (int i=0; i<nd; i++) strides[i] *= elsize;
+
+        const char* ptr = static_cast<const char*>(key.data);
+        bool viewable = !key.swap
+                     && ptr >= mapping.data()
+                     && ptr + count*elsize <= mapping.data() + mapping.size()
+                     && (uintptr_t)ptr % elsize == 0;
+        object owner = base;
+        if (!viewable) {
+            owner = reinterpret_steal<object>(PyArray_SimpleNew(1, &count, type));
+            if (!owner) throw error_already_set();
+            void* data = PyArray_DATA((PyArrayObject*)owner.ptr());
+            if (type==NPY_FLOAT32) key.get(static_cast<float*>(data));
+            else                   key.get(static_cast<double*>(data));
+            ptr = static_cast<const char*>(data);
+        }
+        PyObject* arr = PyArray_New(&PyArray_Type, nd, dims, type, strides,
+                                    const_cast<char*>(ptr), 0, 0, NULL);
+        if (!arr) throw error_already_set();
+        Py_INCREF(owner.ptr());
+        if (PyArray_SetBaseObject((PyArrayObject*)arr, owner.ptr())) {
+            Py_DECREF(arr);
+            throw error_already_set();
+        }
+        return reinterpret_steal<object>(arr);
+    }
+
+    dict mapped_frame(FrameSetReader& self, Py_ssize_t index) {
+        Py_ssize_t local_index = index;
+        const DtrReader *comp = self.component(local_index);
+        if (!comp) {
+            PyErr_SetString(PyExc_IndexError, "index out of bounds");
+            throw error_already_set();
+        }
+        FrameFileMappingPtr mapping;
+        void* allocated = nullptr;
+        dtr::KeyMap keymap;
+        bool failed = false;
+        std::string what;
+        {
+            gil_scoped_release release;
+            try {
+                keymap = self.mapped_frame(index, &mapping, &allocated);
+            }
+            catch (std::exception& e) {
+                failed = true;
+                what = e.what();
+            }
+        }
+        if (failed) {
+            free(allocated);
+            PyErr_Format(PyExc_IOError, "Error reading frame: global index %ld dtr path %s local index %ld frame file %s\n%s",
+                    index, comp->path().c_str(),
+                    local_index, comp->framefile(local_index).c_str(),
+                    what.c_str());
+            throw error_already_set();
+        }
+        std::shared_ptr<void> dtor(allocated, free);
+        capsule base(new FrameFileMappingPtr(mapping), [](void* p) {
+                delete static_cast<FrameFileMappingPtr*>(p); });
+
+        dict d;
+        d["time"] = jiffies_to_ps(comp->keys[local_index].jiffies());
+        npy_intp natoms = comp->natoms();
+        auto find = [&keymap](std::initializer_list<const char*> names) {
+            for (auto name : names) {
+                auto it = keymap.find(name);
+                if (it!=keymap.end()) return it;
+            }
+            return keymap.end();
+        };
+        auto pos = find({"POSITION", "POSN"});
+        auto vel = find({"VELOCITY"});
+        for (auto it : {pos, vel}) {
+            if (it==keymap.end()) continue;
+            if (it->second.count != (uint64_t)(3*natoms)) {
+                PyErr_Format(PyExc_ValueError, "Expected %ld elements in %s; got %ld",
+                        3*natoms, it->first.c_str(), (long)it->second.count);
+                throw error_already_set();
+            }
+            npy_intp dims[2] = {natoms, 3};
+            npy_intp strides[2] = {3, 1};
+            d[it==pos ? "pos" : "vel"] = mapped_field(
+                    it->second, 2, dims, strides, *mapping, base);
+        }
+        auto box = find({"UNITCELL", "HOME_BOX"});
+        if (box!=keymap.end() && box->second.count==9) {
+            // box vectors are stored as columns on disk
+            npy_intp dims[2] = {3, 3};
+            npy_intp strides[2] = {1, 3};
+            d["box"] = mapped_field(box->second, 2, dims, strides, *mapping, base);
+        }
+        return d;
+    }
+
+    size_t get_mmap_cache_size(FrameSetReader const& self) {
+        return self.mapping_cache().capacity();
+    }
+    void set_mmap_cache_size(FrameSetReader& self, size_t n) {
+        self.mapping_cache().set_capacity(n);
+    }
+
     const char reload_doc[] =
         "reload() -> number of timekeys reloaded -- reload frames in the dtr/stk";
     int reload(FrameSetReader& self) {
@@ -415,6 +543,77 @@ namespace {
         return d;
     }
 
+
+    const char prefetch_doc[] =
+        "PrefetchIterator(reader, frames=None, depth=8, threads=4)\n"
+        "Iterate over frames of a DtrReader, reading up to depth frames ahead\n"
+        "on a pool of native threads.  frames is a slice or a sequence of\n"
+        "frame indices, defaulting to all frames; frames are yielded in that\n"
+        "order.  The stats property reports throughput and the time spent\n"
+        "waiting for frames, which can be used to tune depth and threads.\n";
+
+    FramePrefetcher* prefetcher_new(FrameSetReader const& reader,
+            object frames, unsigned depth, unsigned threads) {
+        ssize_t nframes = reader.size();
+        std::vector<ssize_t> indices;
+        if (frames.is_none()) {
+            for (ssize_t i=0; i<nframes; i++) indices.push_back(i);
+        } else if (isinstance<slice>(frames)) {
+            size_t start, stop, step, n;
+            if (!reinterpret_borrow<slice>(frames).compute(
+                        nframes, &start, &stop, &step, &n)) {
+                throw error_already_set();
+            }
+            for (size_t i=0; i<n; i++) indices.push_back(start+i*step);
+        } else {
+            indices = frames.cast<std::vector<ssize_t> >();
+            for (auto& i : indices) {
+                if (i<0) i += nframes;
+                if (i<0 || i>=nframes) {
+                    PyErr_Format(PyExc_IndexError, "Frame index %ld out of range", i);
+                    throw error_already_set();
+                }
+            }
+        }
+        if (depth<1 || threads<1) {
+            PyErr_Format(PyExc_ValueError, "depth and threads must be positive");
+            throw error_already_set();
+        }
+        return new FramePrefetcher(reader, indices, depth, threads);
+    }
+
+    object prefetcher_next(FramePrefetcher& self) {
+        Frame* frame = nullptr;
+        bool failed = false;
+        std::string what;
+        {
+            gil_scoped_release release;
+            try {
+                frame = self.next();
+            }
+            catch (std::exception& e) {
+                failed = true;
+                what = e.what();
+            }
+        }
+        if (failed) {
+            PyErr_Format(PyExc_IOError, "Error reading frame: %s", what.c_str());
+            throw error_already_set();
+        }
+        if (!frame) throw stop_iteration();
+        return cast(frame, return_value_policy::take_ownership);
+    }
+
+    dict prefetcher_stats(FramePrefetcher const& self) {
+        auto s = self.stats();
+        dict d;
+        d["frames"] = s.frames;
+        d["bytes"] = s.bytes;
+        d["elapsed"] = s.elapsed;
+        d["stall"] = s.stall;
+        d["bytes_per_second"] = s.elapsed > 0 ? s.bytes / s.elapsed : 0.0;
+        return d;
+    }
 }
 
 PYBIND11_MODULE(_molfile, m) {
@@ -508,10 +707,23 @@ PYBIND11_MODULE(_molfile, m) {
                ,arg("bytes")=none()
                ,arg("keyvals")=none())
         .def("keyvals", wrap_keyvals, keyvals_doc)
+        .def("mapped_frame", mapped_frame, mapped_frame_doc, arg("index"))
+        .def_property("mmap_cache_size", get_mmap_cache_size, set_mmap_cache_size,
+                "maximum number of frame file mappings kept open")
         .def("reload", reload, reload_doc)
         .def("times", get_times)
         ;
 
+    class_<FramePrefetcher>(m, "PrefetchIterator", prefetch_doc)
+        .def(init(&prefetcher_new), keep_alive<1,2>(),
+                arg("reader"), arg("frames")=none(),
+                arg("depth")=8, arg("threads")=4)
+        .def("__iter__", [](object self) { return self; })
+        .def("__next__", prefetcher_next)
+        .def("__len__", &FramePrefetcher::remaining)
+        .def_property_readonly("stats", prefetcher_stats)
+        ;
+
     m.def("dtr_frame_from_bytes", py_frame_from_bytes);
     m.def("dtr_frame_as_bytes", py_frame_as_bytes,
             arg("keyvals"), arg("use_padding")=false, arg("precision")=0.0);
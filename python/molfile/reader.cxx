@@ -1,5 +1,6 @@
 #include "molfilemodule.hxx"
 #include <msys/molfile/findframe.hxx>
+#include <pybind11/stl.h>
 #include <vector>
 #include <stdexcept>
 #include <numpy/arrayobject.h>
@@ -143,6 +144,113 @@ namespace {
         r.read_grid(n, (float *)PyArray_DATA(arr));
     }
 
+    std::vector<ssize_t> frame_indices(const Reader& self, object frames) {
+        const ssize_t nframes = self.nframes();
+        std::vector<ssize_t> indices;
+        if (PySlice_Check(frames.ptr())) {
+            Py_ssize_t start, stop, step;
+            if (PySlice_Unpack(frames.ptr(), &start, &stop, &step)) {
+                throw error_already_set();
+            }
+            if (nframes>=0) {
+                Py_ssize_t n = PySlice_AdjustIndices(nframes, &start, &stop, step);
+                for (Py_ssize_t i=0; i<n; i++) indices.push_back(start+i*step);
+            } else {
+                if (start<0 || stop<0 || stop==PY_SSIZE_T_MAX || step<0) {
+                    PyErr_Format(PyExc_ValueError,
+                            "Number of frames is unknown; slice must have nonnegative start and stop and positive step");
+                    throw error_already_set();
+                }
+                for (Py_ssize_t i=start; i<stop; i+=step) indices.push_back(i);
+            }
+        } else {
+            indices = frames.cast<std::vector<ssize_t> >();
+            for (auto& i : indices) {
+                if (i<0 && nframes>=0) i += nframes;
+                if (i<0 || (nframes>=0 && i>=nframes)) {
+                    PyErr_Format(PyExc_IndexError, "Frame index %ld out of range", i);
+                    throw error_already_set();
+                }
+            }
+        }
+        return indices;
+    }
+
+    const char read_frames_doc[] =
+        "read_frames(frames, atoms=None, fields=('pos','box','time')) -> dict\n"
+        "Read many frames at once into contiguous arrays.\n"
+        "frames is a slice or a sequence of frame indices; atoms, if given,\n"
+        "selects the atoms to gather.  Returns a dict mapping each requested\n"
+        "field to an array: 'pos' and 'vel' of shape (nframes, natoms, 3),\n"
+        "'box' of shape (nframes, 3, 3) and 'time' of shape (nframes,).\n"
+        "For plugins without random access, frame indices must be increasing,\n"
+        "and the arrays are truncated if the end of the file is reached.\n";
+
+    dict reader_read_frames(const Reader& self, object frames, object atoms,
+                            std::vector<std::string> const& fields) {
+        std::vector<ssize_t> indices = frame_indices(self, frames);
+        std::vector<unsigned> ids;
+        if (!atoms.is_none()) ids = atoms.cast<std::vector<unsigned> >();
+        for (auto id : ids) {
+            if (id >= self.natoms()) {
+                PyErr_Format(PyExc_ValueError, "Index %u is out of range", id);
+                throw error_already_set();
+            }
+        }
+        const Py_ssize_t nf = indices.size();
+        const Py_ssize_t na = atoms.is_none() ? self.natoms() : ids.size();
+        const DataType type = self.double_precision() ? DOUBLE : FLOAT;
+
+        dict result;
+        void* pos = NULL;
+        void* vel = NULL;
+        double* box = NULL;
+        double* times = NULL;
+        for (auto const& field : fields) {
+            Py_ssize_t dims[3] = {nf, na, 3};
+            PyObject* arr = NULL;
+            if (field=="pos") {
+                arr = backed_vector(3, dims, type, NULL, NULL);
+                if (arr) pos = array_data(arr);
+            } else if (field=="vel") {
+                if (!self.has_velocities()) {
+                    PyErr_Format(PyExc_ValueError, "This reader doesn't read velocities");
+                    throw error_already_set();
+                }
+                arr = backed_vector(3, dims, type, NULL, NULL);
+                if (arr) vel = array_data(arr);
+            } else if (field=="box") {
+                dims[1] = 3;
+                arr = backed_vector(3, dims, DOUBLE, NULL, NULL);
+                if (arr) box = (double *)array_data(arr);
+            } else if (field=="time") {
+                arr = backed_vector(1, dims, DOUBLE, NULL, NULL);
+                if (arr) times = (double *)array_data(arr);
+            } else {
+                PyErr_Format(PyExc_ValueError, "Unsupported field '%s'", field.c_str());
+                throw error_already_set();
+            }
+            if (!arr) throw error_already_set();
+            result[field.c_str()] = reinterpret_steal<object>(arr);
+        }
+
+        ssize_t nread;
+        {
+            gil_scoped_release release;
+            nread = type==DOUBLE
+                ? self.read_frames(indices, ids, (double *)pos, (double *)vel, box, times)
+                : self.read_frames(indices, ids, (float *)pos, (float *)vel, box, times);
+        }
+        if (nread < nf) {
+            dict truncated;
+            for (auto item : result) {
+                truncated[item.first] = item.second[slice(0, nread, 1)];
+            }
+            return truncated;
+        }
+        return result;
+    }
+
     Frame* reader_next(Reader& r) {
         Frame* f;
         Py_BEGIN_ALLOW_THREADS
@@ -165,6 +273,9 @@ void desres::molfile::export_reader(module m) {
         .def_property_readonly("times", reader_times, "all times for frames in trajectory")
         .def("reopen", &Reader::reopen, "reopen file for reading")
         .def("frame", &Reader::frame)
+        .def("read_frames", reader_read_frames, read_frames_doc,
+                arg("frames"), arg("atoms")=none(),
+                arg("fields")=std::vector<std::string>{"pos", "box", "time"})
         .def("next", reader_next, "Return the next frame")
         .def("skip", &Reader::skip, "Skip the next frame")
         .def("at_time_near", &wrap<&Reader::at_time_near>, arg("time"))
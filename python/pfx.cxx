@@ -89,10 +89,15 @@ static void pfx_dealloc(PyObject *obj) {
 }
 
 PyDoc_STRVAR(apply_doc,
-"apply(pos, box, vel=None) -- perform wrapping and alignment.\n"
+"apply(pos, box, vel=None, threads=0) -- perform wrapping and alignment.\n"
 "\n"
 "box and pos are NumPy arrays with shape (3,3) and (natoms,3),\n"
 "respectively, and will be modified in place.\n"
+"\n"
+"To process many frames in one call, pass pos with shape\n"
+"(nframes,natoms,3), box with shape (nframes,3,3), and vel, if given,\n"
+"with shape (nframes,natoms,3).  Frames are processed in parallel\n"
+"using the given number of threads, or one per core if threads is 0.\n"
 );
 
 static PyObject* py_apply(PyObject* pySelf, PyObject* args, PyObject* kwds) {
@@ -100,50 +105,61 @@ static PyObject* py_apply(PyObject* pySelf, PyObject* args, PyObject* kwds) {
     PyObject *boxarr=NULL, *posarr=NULL, *velarr=NULL;
     PyObject *result = NULL;
     double* box=NULL;
+    unsigned threads=0;
+    int nd;
+    npy_intp nframes=1;
     pfx_t* pfx = ((PfxObject *)pySelf)->pfx;
-    static char *kwlist[] = { (char *)"pos", (char *)"box", (char *)"vel", 0 };
+    static char *kwlist[] = { (char *)"pos", (char *)"box", (char *)"vel",
+                              (char *)"threads", 0 };
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O|O", kwlist,
-                &PyArray_Type, &posobj, &boxobj, &velobj))
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O|OI", kwlist,
+                &PyArray_Type, &posobj, &boxobj, &velobj, &threads))
         return NULL;
 
-    /* box is either None or a 3x3 NumPy array, parsed as double */
+    /* pos is nx3 or fxnx3 NumPyArray.  Check the type later */
+    posarr = PyArray_FromAny(posobj, NULL, 2, 3, NPY_INOUT_ARRAY, NULL);
+    if (!posarr) return NULL;
+    nd = PyArray_NDIM(posarr);
+    if (nd==3) nframes = PyArray_DIM(posarr,0);
+    if (PyArray_DIM(posarr,nd-2)!=pfx->size() ||
+        PyArray_DIM(posarr,nd-1)!=3) {
+        PyErr_Format(PyExc_ValueError, "pos must be %ux3, got %ldx%ld",
+                pfx->size(), PyArray_DIM(posarr,nd-2), PyArray_DIM(posarr,nd-1));
+        goto error;
+    }
+
+    /* box is either None or a 3x3 (fx3x3 for multiple frames) NumPy array,
+     * parsed as double */
     if (boxobj != Py_None) {
         boxarr = PyArray_FromAny(
                 boxobj,
                 PyArray_DescrFromType(NPY_DOUBLE), 
-                2, 2, NPY_INOUT_ARRAY | NPY_FORCECAST, NULL);
-        if (!boxarr) return NULL;
-        if (PyArray_DIM(boxarr,0)!=3 ||
-            PyArray_DIM(boxarr,1)!=3) {
-            PyErr_Format(PyExc_ValueError, "box must be 3x3, got %ldx%ld",
+                nd, nd, NPY_INOUT_ARRAY | NPY_FORCECAST, NULL);
+        if (!boxarr) goto error;
+        if ((nd==3 && PyArray_DIM(boxarr,0)!=nframes) ||
+            PyArray_DIM(boxarr,nd-2)!=3 ||
+            PyArray_DIM(boxarr,nd-1)!=3) {
+            if (nd==3) {
+                PyErr_Format(PyExc_ValueError, "box must be %ldx3x3, got %ldx%ldx%ld",
+                        nframes, PyArray_DIM(boxarr,0),
+                        PyArray_DIM(boxarr,1), PyArray_DIM(boxarr,2));
+            } else {
+                PyErr_Format(PyExc_ValueError, "box must be 3x3, got %ldx%ld",
                         PyArray_DIM(boxarr,0), PyArray_DIM(boxarr,1));
+            }
             goto error;
         }
         box = (double*)PyArray_DATA(boxarr);
     }
 
-    /* pos is nx3 NumPyArray.  Check the type later */
-    posarr = PyArray_FromAny(posobj, NULL, 2, 2, NPY_INOUT_ARRAY, NULL);
-    if (!posarr) {
-        Py_XDECREF(boxarr);
-        return NULL;
-    }
-    if (PyArray_DIM(posarr,0)!=pfx->size() ||
-        PyArray_DIM(posarr,1)!=3) {
-        PyErr_Format(PyExc_ValueError, "pos must be %ux3, got %ldx%ld",
-                pfx->size(), PyArray_DIM(posobj,0), PyArray_DIM(posobj,1));
-        goto error;
-    }
-
-    /* vel is either None or an nx3 NumPy array */
+    /* vel is either None or a NumPy array shaped like pos */
     if (velobj != Py_None) {
-        velarr = PyArray_FromAny(velobj, NULL, 2, 2, NPY_INOUT_ARRAY, NULL);
+        velarr = PyArray_FromAny(velobj, NULL, nd, nd, NPY_INOUT_ARRAY, NULL);
         if (!velarr) goto error;
-        if (PyArray_DIM(velarr,0)!=pfx->size() ||
-            PyArray_DIM(velarr,1)!=3) {
-            PyErr_Format(PyExc_ValueError, "vel must be %ux3, got %ldx%ld",
-                    pfx->size(), PyArray_DIM(velarr,0), PyArray_DIM(velarr,1));
+        if ((nd==3 && PyArray_DIM(velarr,0)!=nframes) ||
+            PyArray_DIM(velarr,nd-2)!=pfx->size() ||
+            PyArray_DIM(velarr,nd-1)!=3) {
+            PyErr_Format(PyExc_ValueError, "vel must have the same shape as pos");
             goto error;
         }
         if (PyArray_TYPE(velarr) != PyArray_TYPE(posarr)) {
@@ -158,7 +174,8 @@ static PyObject* py_apply(PyObject* pySelf, PyObject* args, PyObject* kwds) {
             float* pos = (float*)PyArray_DATA(posarr);
             float* vel = velarr ? (float*)PyArray_DATA(velarr) : NULL;
             Py_BEGIN_ALLOW_THREADS
-            pfx->apply(pos, box, vel);
+            if (nd==3) pfx->apply(nframes, pos, box, vel, threads);
+            else       pfx->apply(pos, box, vel);
             Py_END_ALLOW_THREADS
         }
         break;
@@ -167,7 +184,8 @@ static PyObject* py_apply(PyObject* pySelf, PyObject* args, PyObject* kwds) {
             double* pos = (double*)PyArray_DATA(posarr);
             double* vel = velarr ? (double*)PyArray_DATA(velarr) : NULL;
             Py_BEGIN_ALLOW_THREADS
-            pfx->apply(pos, box, vel);
+            if (nd==3) pfx->apply(nframes, pos, box, vel, threads);
+            else       pfx->apply(pos, box, vel);
             Py_END_ALLOW_THREADS
         }
         break;
@@ -523,6 +541,193 @@ handle wrap_aligned_rmsd(args _args, kwargs kwds) {
     return obj;
 }
 
+/* Convert frames to a contiguous float32 or float64 array with 2 or 3
+ * dimensions, keeping float64 input as is and casting anything else to
+ * float32.  Return NULL with an exception set on failure. */
+static PyObject* extract_frames(PyObject* obj, int mindim) {
+    int type = NPY_FLOAT32;
+    if (PyArray_Check(obj) && PyArray_TYPE((PyArrayObject *)obj)==NPY_FLOAT64) {
+        type = NPY_FLOAT64;
+    }
+    PyObject* arr = PyArray_FromAny(
+            obj,
+            PyArray_DescrFromType(type),
+            mindim, 3,
+            NPY_C_CONTIGUOUS | NPY_ALIGNED | NPY_FORCECAST,
+            NULL);
+    if (!arr) return NULL;
+    int nd = PyArray_NDIM(arr);
+    if (PyArray_DIM(arr,nd-1)!=3 || PyArray_DIM(arr,nd-2)==0) {
+        PyErr_Format(PyExc_ValueError, "Require nx3 positions with n>0");
+        Py_DECREF(arr);
+        return NULL;
+    }
+    return arr;
+}
+
+static PyObject* extract_weights(PyObject* obj, int type, npy_intp n) {
+    PyObject* arr = PyArray_FromAny(
+            obj,
+            PyArray_DescrFromType(type),
+            1,1,
+            NPY_C_CONTIGUOUS | NPY_ALIGNED | NPY_FORCECAST,
+            NULL);
+    if (!arr) return NULL;
+    if (PyArray_DIM(arr,0)!=n) {
+        PyErr_Format(PyExc_ValueError, 
+                "Require weights of length %ld, got %ld", 
+                n, PyArray_DIM(arr,0));
+        Py_DECREF(arr);
+        return NULL;
+    }
+    return arr;
+}
+
+template <typename scalar>
+static void batch_rmsd(PyObject* Rarr, PyObject* Farr, PyObject* Warr,
+                       double* rmsd, double* mats, unsigned threads) {
+    unsigned n = PyArray_DIM(Farr,1);
+    unsigned nframes = PyArray_DIM(Farr,0);
+    const scalar* ref = (const scalar *)PyArray_DATA(Rarr);
+    const scalar* frames = (const scalar *)PyArray_DATA(Farr);
+    const scalar* wts = Warr ? (const scalar *)PyArray_DATA(Warr) : NULL;
+    Py_BEGIN_ALLOW_THREADS
+    desres::msys::pfx::batch_aligned_rmsd(n, ref, nframes, frames,
+                                          rmsd, mats, wts, threads);
+    Py_END_ALLOW_THREADS
+}
+
+PyDoc_STRVAR(batch_aligned_rmsd_doc,
+"batch_aligned_rmsd(ref, frames, weights=None, rotations=False, threads=0) -> rmsd[, mats]\n\n"
+"Compute the rmsd between ref, with shape (natoms,3), and each frame in\n"
+"frames, with shape (nframes,natoms,3), after centering each on its\n"
+"(optionally weighted) centroid and superposing the frame onto ref.\n"
+"float64 frames are processed in double precision; anything else is\n"
+"processed as float32.  Return an array of nframes rmsd values, and, if\n"
+"rotations is True, also an (nframes,3,3) array of matrices aligning\n"
+"each centered frame onto the centered ref, as in aligned_rmsd.\n"
+"Frames are processed in parallel using the given number of threads,\n"
+"or one per core if threads is 0.\n"
+);
+
+static
+handle wrap_batch_aligned_rmsd(args _args, kwargs kwds) {
+    static char *kwlist[] = {(char *)"ref", (char *)"frames", 
+        (char *)"weights", (char *)"rotations", (char *)"threads", 0};
+    PyObject *Robj, *Fobj, *Wobj=Py_None;
+    PyObject *Rarr=NULL, *Farr=NULL, *Warr=NULL, *Darr=NULL, *Marr=NULL;
+    PyObject *result=NULL;
+    int rotations = 0;
+    unsigned threads = 0;
+    if (!PyArg_ParseTupleAndKeywords(_args.ptr(), kwds.ptr(), "OO|OpI",
+                kwlist, &Robj, &Fobj, &Wobj, &rotations, &threads))
+        throw error_already_set();
+    if (!(Farr = extract_frames(Fobj, 3))) throw error_already_set();
+    int type = PyArray_TYPE(Farr);
+    npy_intp nframes = PyArray_DIM(Farr,0);
+    npy_intp n = PyArray_DIM(Farr,1);
+    if (!(Rarr = PyArray_FromAny(
+                    Robj,
+                    PyArray_DescrFromType(type),
+                    2,2,
+                    NPY_C_CONTIGUOUS | NPY_ALIGNED | NPY_FORCECAST,
+                    NULL)))
+        goto error;
+    if (PyArray_DIM(Rarr,0)!=n || PyArray_DIM(Rarr,1)!=3) {
+        PyErr_Format(PyExc_ValueError, "Require ref with shape %ldx3, got %ldx%ld",
+                n, PyArray_DIM(Rarr,0), PyArray_DIM(Rarr,1));
+        goto error;
+    }
+    if (Wobj!=Py_None && !(Warr = extract_weights(Wobj, type, n)))
+        goto error;
+
+    {
+        npy_intp ddims[1] = {nframes};
+        npy_intp mdims[3] = {nframes,3,3};
+        if (!(Darr = PyArray_SimpleNew(1,ddims,NPY_FLOAT64))) goto error;
+        if (rotations && !(Marr = PyArray_SimpleNew(3,mdims,NPY_FLOAT64)))
+            goto error;
+        double* rmsd = (double *)PyArray_DATA(Darr);
+        double* mats = Marr ? (double *)PyArray_DATA(Marr) : NULL;
+        if (type==NPY_FLOAT64) {
+            batch_rmsd<double>(Rarr, Farr, Warr, rmsd, mats, threads);
+        } else {
+            batch_rmsd<float>(Rarr, Farr, Warr, rmsd, mats, threads);
+        }
+    }
+    if (Marr) {
+        result = Py_BuildValue("(O,O)", Darr, Marr);
+    } else {
+        result = Darr;
+        Py_INCREF(result);
+    }
+
+error:
+    Py_XDECREF(Rarr);
+    Py_XDECREF(Farr);
+    Py_XDECREF(Warr);
+    Py_XDECREF(Darr);
+    Py_XDECREF(Marr);
+    if (!result) throw error_already_set();
+    return result;
+}
+
+template <typename scalar>
+static void pairwise_rmsd(PyObject* Farr, PyObject* Warr, float* result,
+                          unsigned threads) {
+    unsigned n = PyArray_DIM(Farr,1);
+    unsigned nframes = PyArray_DIM(Farr,0);
+    const scalar* frames = (const scalar *)PyArray_DATA(Farr);
+    const scalar* wts = Warr ? (const scalar *)PyArray_DATA(Warr) : NULL;
+    Py_BEGIN_ALLOW_THREADS
+    desres::msys::pfx::pairwise_aligned_rmsd(n, nframes, frames,
+                                             result, wts, threads);
+    Py_END_ALLOW_THREADS
+}
+
+PyDoc_STRVAR(pairwise_aligned_rmsd_doc,
+"pairwise_aligned_rmsd(frames, weights=None, threads=0) -> matrix\n\n"
+"Compute the aligned rmsd between every pair of frames in frames, with\n"
+"shape (nframes,natoms,3), centering positions as in batch_aligned_rmsd.\n"
+"Return a symmetric (nframes,nframes) float32 matrix.\n"
+);
+
+static
+handle wrap_pairwise_aligned_rmsd(args _args, kwargs kwds) {
+    static char *kwlist[] = {(char *)"frames", (char *)"weights", 
+        (char *)"threads", 0};
+    PyObject *Fobj, *Wobj=Py_None;
+    PyObject *Farr=NULL, *Warr=NULL, *result=NULL;
+    unsigned threads = 0;
+    if (!PyArg_ParseTupleAndKeywords(_args.ptr(), kwds.ptr(), "O|OI",
+                kwlist, &Fobj, &Wobj, &threads))
+        throw error_already_set();
+    if (!(Farr = extract_frames(Fobj, 3))) throw error_already_set();
+    int type = PyArray_TYPE(Farr);
+    npy_intp nframes = PyArray_DIM(Farr,0);
+    npy_intp n = PyArray_DIM(Farr,1);
+    if (Wobj!=Py_None && !(Warr = extract_weights(Wobj, type, n)))
+        goto error;
+
+    {
+        npy_intp dims[2] = {nframes, nframes};
+        result = PyArray_SimpleNew(2,dims,NPY_FLOAT32);
+        if (!result) goto error;
+        float* mat = (float *)PyArray_DATA(result);
+        if (type==NPY_FLOAT64) {
+            pairwise_rmsd<double>(Farr, Warr, mat, threads);
+        } else {
+            pairwise_rmsd<float>(Farr, Warr, mat, threads);
+        }
+    }
+
+error:
+    Py_XDECREF(Farr);
+    Py_XDECREF(Warr);
+    if (!result) throw error_already_set();
+    return result;
+}
+
 PyDoc_STRVAR(module_doc,
 "A high level interface for wrapping, centering, and alignment.\n"
 "\n"
@@ -552,6 +757,8 @@ PYBIND11_MODULE(pfx, m) {
     m.def("svd_3x3", wrap_svd, svd_doc);
     m.def("inverse_3x3", wrap_inverse, inverse_doc);
     m.def("aligned_rmsd", wrap_aligned_rmsd, aligned_rmsd_doc);
+    m.def("batch_aligned_rmsd", wrap_batch_aligned_rmsd, batch_aligned_rmsd_doc);
+    m.def("pairwise_aligned_rmsd", wrap_pairwise_aligned_rmsd, pairwise_aligned_rmsd_doc);
     m.attr("__doc__") = module_doc;
 }
 
@@ -2,6 +2,9 @@
 #include <pybind11/numpy.h>
 
 #include "spatial_hash.hxx"
+#include "neighbor_list.hxx"
+#include "parallel.hxx"
+#include <numeric>
 
 using namespace pybind11;
 using namespace desres::msys;
@@ -57,11 +60,45 @@ static object hash_find_nearest(SpatialHash& hash,
     return hash_find(hash, k, pos, ids, &SpatialHash::findNearest);
 }
 
+/* Run find(begin, end, result) over chunks of [0,n) on up to threads
+ * threads, and return i, j, and distance arrays holding the results of
+ * each chunk in order, so that the output is the same for any number
+ * of threads. */
+template <typename Func>
+static object find_parallel(size_t n, unsigned threads, Func find) {
+    std::vector<SpatialHash::contact_array_t> results(resolve_threads(threads));
+    {
+        gil_scoped_release release;
+        parallel_for(n, threads, [&](size_t b, size_t e, unsigned k) {
+            find(b, e, &results[k]);
+        });
+    }
+
+    uint64_t dim = 0;
+    for (auto& c : results) dim += c.count;
+    auto iarr = ids_t(dim);
+    auto jarr = ids_t(dim);
+    auto darr = pos_t(dim);
+    auto iptr = iarr.mutable_data();
+    auto jptr = jarr.mutable_data();
+    auto dptr = darr.mutable_data();
+    for (auto& c : results) {
+        memcpy(iptr, c.i, c.count*sizeof(*c.i));
+        memcpy(jptr, c.j, c.count*sizeof(*c.j));
+        std::transform(c.d2, c.d2+c.count, dptr, [](float x) {return std::sqrt(x);});
+        iptr += c.count;
+        jptr += c.count;
+        dptr += c.count;
+    }
+    return make_tuple(iarr, jarr, darr);
+}
+
 static object hash_find_contacts(SpatialHash& hash,
                                     float r,
                                     pos_t posarr,
                                     object idsobj,
-                                    bool reuse_voxels) {
+                                    bool reuse_voxels,
+                                    unsigned threads) {
 
     if (posarr.ndim() != 2 || posarr.shape(1) != 3) {
         throw std::invalid_argument("expected Nx3 array for pos");
@@ -83,25 +120,21 @@ static object hash_find_contacts(SpatialHash& hash,
         npos = n;
     }
 
-    SpatialHash::contact_array_t contacts;
-
-    if (reuse_voxels) {
-        // drop the GIL here?
-        hash.findContactsReuseVoxels(r, pos, npos, ids, &contacts);
-    } else {
-        hash.findContacts(r, pos, npos, ids, &contacts);
+    // chunks of the query need explicit ids
+    IdList all;
+    if (!ids && threads!=1) {
+        all.resize(npos);
+        std::iota(all.begin(), all.end(), 0);
+        ids = all.data();
     }
 
-    auto dim = contacts.count;
-    std::for_each(contacts.d2, contacts.d2+dim, [](float& x) {x=std::sqrt(x);});
-
-    auto iarr = ids_t(dim);
-    auto jarr = ids_t(dim);
-    auto darr = pos_t(dim);
-    memcpy(iarr.mutable_data(), contacts.i, dim*sizeof(*contacts.i));
-    memcpy(jarr.mutable_data(), contacts.j, dim*sizeof(*contacts.j));
-    memcpy(darr.mutable_data(), contacts.d2,dim*sizeof(*contacts.d2));
-    return make_tuple(iarr, jarr, darr);
+    if (!reuse_voxels) {
+        hash.voxelize(r);
+    }
+    return find_parallel(npos, threads, [&](size_t b, size_t e,
+                                            SpatialHash::contact_array_t* c) {
+        hash.findContactsReuseVoxels(r, pos, e-b, ids ? ids+b : ids, c);
+    });
 }
 
 namespace {
@@ -125,23 +158,46 @@ namespace {
 static object hash_find_pairlist(SpatialHash& hash,
                                  float r,
                                  Exclusions const& excl,
-                                 bool reuse_voxels) {
+                                 bool reuse_voxels,
+                                 unsigned threads) {
 
-    SpatialHash::contact_array_t contacts;
     if (!reuse_voxels) {
         hash.voxelize(r);
     }
-    hash.findPairlistReuseVoxels(r, excl, &contacts);
+    return find_parallel(hash.size(), threads, [&](size_t b, size_t e,
+                                                   SpatialHash::contact_array_t* c) {
+        hash.findPairlistReuseVoxels(r, excl, c, b, e);
+    });
+}
 
-    ssize_t dim = contacts.count;
-    std::for_each(contacts.d2, contacts.d2+dim, [](float& x) {x=std::sqrt(x);});
+typedef NeighborListT<float, Exclusions> NeighborList;
 
+static object neighbor_list_find(NeighborList& nlist, pos_t posarr, object boxobj) {
+    if (posarr.ndim() != 2 || posarr.shape(1) != 3 ||
+        posarr.shape(0) != nlist.natoms()) {
+        PyErr_Format(PyExc_ValueError, "expected %ux3 array for pos", nlist.natoms());
+        throw error_already_set();
+    }
+    auto boxarr = box_t::ensure(boxobj);
+    auto box = boxobj.is_none() ? nullptr : boxarr.data();
+    if (box && (boxarr.ndim() != 2 || boxarr.shape(0)!=3 || boxarr.shape(1) != 3)) {
+        throw std::invalid_argument("expected 3x3 array or none for box");
+    }
+    auto pos = posarr.data();
+    SpatialHash::contact_array_t contacts;
+    {
+        gil_scoped_release release;
+        nlist.update(pos, box);
+        nlist.find(pos, &contacts);
+    }
+    ssize_t dim = contacts.count;
     auto iarr = ids_t(dim);
     auto jarr = ids_t(dim);
     auto darr = pos_t(dim);
     memcpy(iarr.mutable_data(), contacts.i, dim*sizeof(*contacts.i));
     memcpy(jarr.mutable_data(), contacts.j, dim*sizeof(*contacts.j));
-    memcpy(darr.mutable_data(), contacts.d2,dim*sizeof(*contacts.d2));
+    std::transform(contacts.d2, contacts.d2+dim, darr.mutable_data(),
+                   [](float x) {return std::sqrt(x);});
     return make_tuple(iarr, jarr, darr);
 }
 
@@ -166,6 +222,21 @@ namespace desres { namespace msys {
                 return new SpatialHash(posarr.data(), idsarr.shape(0), idsarr.data(), box);
                 }), arg("pos"), arg("ids"), arg("box")=none())
             .def("voxelize", &SpatialHash::voxelize, return_value_policy::reference)
+            .def("update", [](SpatialHash& hash, pos_t posarr, object boxobj) -> SpatialHash& {
+                if (posarr.ndim() != 2 || posarr.shape(1) != 3) {
+                    throw std::invalid_argument("expected Nx3 array for pos");
+                }
+                if (hash.max_id() >= posarr.shape(0)) {
+                    PyErr_Format(PyExc_ValueError, "index out of bounds: %d", hash.max_id());
+                    throw error_already_set();
+                }
+                auto boxarr = box_t::ensure(boxobj);
+                auto box = boxobj.is_none() ? nullptr : boxarr.data();
+                if (box && (boxarr.ndim() != 2 || boxarr.shape(0)!=3 || boxarr.shape(1) != 3)) {
+                    throw std::invalid_argument("expected 3x3 array or none for box");
+                }
+                return hash.update(posarr.data(), box);
+                }, arg("pos"), arg("box")=none(), return_value_policy::reference)
             .def("findWithin", hash_find_within,
                      arg("r"), 
                      arg("pos"), 
@@ -179,11 +250,29 @@ namespace desres { namespace msys {
                      arg("r"),
                      arg("pos"),
                      arg("ids")=none(),
-                     arg("reuse_voxels")=false)
+                     arg("reuse_voxels")=false,
+                     arg("threads")=0)
             .def("findPairlist", hash_find_pairlist,
                      arg("r"),
                      arg("excl"),
-                     arg("reuse_voxels")=false)
+                     arg("reuse_voxels")=false,
+                     arg("threads")=0)
+            ;
+
+        class_<NeighborList>(m, "NeighborList")
+            .def(init<unsigned, float, float, Exclusions const&>(),
+                     arg("natoms"),
+                     arg("cutoff"),
+                     arg("skin"),
+                     arg("excl")=Exclusions())
+            .def("find", neighbor_list_find,
+                     arg("pos"),
+                     arg("box")=none())
+            .def_property_readonly("natoms", &NeighborList::natoms)
+            .def_property_readonly("cutoff", &NeighborList::cutoff)
+            .def_property_readonly("skin", &NeighborList::skin)
+            .def_property_readonly("nbuilds", &NeighborList::nbuilds)
+            .def_property_readonly("ncached", &NeighborList::ncached)
             ;
     }
 }}
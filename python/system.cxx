@@ -59,6 +59,430 @@ namespace {
         return array_t<double>({3,3}, sys->global_cell[0], sysobj);
     }
 
+    /* Writable (natoms,3) view of the given coordinate triple of each
+     * atom, with the atom records themselves as storage.  The atoms are
+     * held in place until the view is garbage collected. */
+    array atom_coord_view(SystemPtr sys, Float atom_t::*first) {
+        if (sys->maxAtomId() != sys->atomCount()) {
+            PyErr_Format(PyExc_ValueError, "System has deleted atoms");
+            throw error_already_set();
+        }
+        if (!sys->atomCount()) {
+            size_t dims[] = {0, 3};
+            return array_t<double>(dims);
+        }
+        /* take the hold only once the capsule owns the job of
+         * releasing it */
+        std::unique_ptr<SystemPtr> holder(new SystemPtr(sys));
+        capsule base(holder.get(), [](void* p) {
+            SystemPtr* holder = static_cast<SystemPtr*>(p);
+            (*holder)->releaseAtoms();
+            delete holder;
+        });
+        holder.release();
+        sys->holdAtoms();
+        std::vector<ssize_t> shape {ssize_t(sys->atomCount()), 3};
+        std::vector<ssize_t> strides {sizeof(atom_t), sizeof(Float)};
+        return array_t<double>(shape, strides,
+                               &(sys->atomFAST(0).*first), base);
+    }
+
+    /* Per-atom inputs to SystemFromArrays.  A missing array is returned
+     * empty; otherwise it must have one row per atom. */
+    template <typename T>
+    array_t<T> atom_array(object obj, ssize_t natoms, const char* what,
+                          ssize_t width=0) {
+        typedef array_t<T, array::c_style | array::forcecast> array_type;
+        if (obj.is_none()) return array_t<T>(0);
+        array_type arr = array_type::ensure(obj);
+        if (!arr) throw error_already_set();
+        bool ok = width ? arr.ndim()==2 && arr.shape(1)==width
+                        : arr.ndim()==1;
+        if (!ok || arr.shape(0)!=natoms) {
+            PyErr_Format(PyExc_ValueError,
+                    "%s must have shape (%zd%s)", what, natoms,
+                    width ? ", 3" : ",");
+            throw error_already_set();
+        }
+        return arr;
+    }
+
+    /* strings may also be given as a single value for every atom */
+    std::vector<std::string> atom_strings(object obj, size_t natoms,
+                                          const char* what) {
+        if (obj.is_none()) return {""};
+        if (isinstance<str>(obj) || isinstance<bytes>(obj)) {
+            return {obj.cast<std::string>()};
+        }
+        auto v = obj.cast<std::vector<std::string> >();
+        if (v.size()!=natoms) {
+            PyErr_Format(PyExc_ValueError,
+                    "Supplied %zu values for %s, but there are %zu atoms",
+                    v.size(), what, natoms);
+            throw error_already_set();
+        }
+        return v;
+    }
+
+    SystemPtr system_from_arrays(object anumobj, object nameobj,
+                                 object resnameobj, object residobj,
+                                 object chainobj, object segidobj,
+                                 object insertionobj, object ctobj,
+                                 object posobj, object velobj,
+                                 object massobj, object chargeobj,
+                                 object fchargeobj, object bondsobj,
+                                 dict props) {
+        auto anum = array_t<int, array::c_style | array::forcecast>::ensure(anumobj);
+        if (!anum) throw error_already_set();
+        if (anum.ndim()!=1) {
+            PyErr_Format(PyExc_ValueError, "atomic_number must be 1-d");
+            throw error_already_set();
+        }
+        const ssize_t n = anum.shape(0);
+        auto name = atom_strings(nameobj, n, "name");
+        auto resname = atom_strings(resnameobj, n, "resname");
+        auto chain = atom_strings(chainobj, n, "chain");
+        auto segid = atom_strings(segidobj, n, "segid");
+        auto insertion = atom_strings(insertionobj, n, "insertion");
+        auto resid = atom_array<int>(residobj, n, "resid");
+        auto ct = atom_array<unsigned>(ctobj, n, "ct");
+        auto pos = atom_array<double>(posobj, n, "pos", 3);
+        auto vel = atom_array<double>(velobj, n, "vel", 3);
+        auto mass = atom_array<double>(massobj, n, "mass");
+        auto charge = atom_array<double>(chargeobj, n, "charge");
+        auto fcharge = atom_array<int>(fchargeobj, n, "formal_charge");
+
+        SystemPtr mol = System::create();
+        SystemImporter imp(mol);
+        {
+            gil_scoped_release release;
+            for (ssize_t i=0; i<n; i++) {
+                auto pick = [i](std::vector<std::string> const& v) -> std::string const& {
+                    return v[v.size()==1 ? 0 : i];
+                };
+                Id id = imp.addAtom(pick(chain), pick(segid),
+                                    resid.size() ? resid.data()[i] : 0,
+                                    pick(resname), pick(name), pick(insertion),
+                                    ct.size() ? ct.data()[i] : 0);
+                atom_t& atm = mol->atomFAST(id);
+                atm.atomic_number = anum.data()[i];
+                if (pos.size()) {
+                    atm.x = pos.data()[3*i];
+                    atm.y = pos.data()[3*i+1];
+                    atm.z = pos.data()[3*i+2];
+                }
+                if (vel.size()) {
+                    atm.vx = vel.data()[3*i];
+                    atm.vy = vel.data()[3*i+1];
+                    atm.vz = vel.data()[3*i+2];
+                }
+                if (mass.size()) atm.mass = mass.data()[i];
+                if (charge.size()) atm.charge = charge.data()[i];
+                if (fcharge.size()) atm.formal_charge = fcharge.data()[i];
+            }
+        }
+
+        if (!bondsobj.is_none()) {
+            auto cols = bondsobj.cast<std::vector<object> >();
+            if (cols.size()!=2 && cols.size()!=3) {
+                PyErr_Format(PyExc_ValueError,
+                        "bonds must be (i, j) or (i, j, order)");
+                throw error_already_set();
+            }
+            ssize_t nb = len(cols[0]);
+            auto bi = atom_array<unsigned>(cols[0], nb, "bond i");
+            auto bj = atom_array<unsigned>(cols[1], nb, "bond j");
+            auto order = cols.size()==3 ? atom_array<int>(cols[2], nb, "bond order")
+                                        : array_t<int>(0);
+            for (ssize_t k=0; k<nb; k++) {
+                Id b = mol->addBond(bi.data()[k], bj.data()[k]);
+                if (order.size()) mol->bondFAST(b).order = order.data()[k];
+            }
+        }
+
+        for (auto item : props) {
+            auto prop = item.first.cast<std::string>();
+            auto vals = reinterpret_borrow<object>(item.second);
+            array arr = array::ensure(vals);
+            char kind = arr ? arr.dtype().kind() : 'O';
+            if (!arr) PyErr_Clear();
+            if (kind=='i' || kind=='u' || kind=='b') {
+                auto v = atom_array<int64_t>(vals, n, prop.data());
+                Id col = mol->addAtomProp(prop, IntType);
+                for (ssize_t i=0; i<n; i++) {
+                    mol->atomPropValue(i, col).fromInt(v.data()[i]);
+                }
+            } else if (kind=='f') {
+                auto v = atom_array<double>(vals, n, prop.data());
+                Id col = mol->addAtomProp(prop, FloatType);
+                for (ssize_t i=0; i<n; i++) {
+                    mol->atomPropValue(i, col).fromFloat(v.data()[i]);
+                }
+            } else {
+                auto v = atom_strings(vals, n, prop.data());
+                Id col = mol->addAtomProp(prop, StringType);
+                for (ssize_t i=0; i<n; i++) {
+                    mol->atomPropValue(i, col).fromString(v[v.size()==1 ? 0 : i]);
+                }
+            }
+        }
+        return mol;
+    }
+
+    /* Columnar access to the fields of atoms, residues and bonds.  Each
+     * getter reads one field from the elements with the given ids, or all
+     * of them, into a numpy array, and each setter does the reverse.
+     * Strings are returned as fixed-width numpy unicode arrays. */
+
+    typedef bool (System::*HasFunc)(Id) const;
+    typedef IdList (System::*IdsFunc)() const;
+
+    IdList field_ids(System const& sys, object idobj, IdsFunc all,
+                     HasFunc has) {
+        if (idobj.is_none()) return (sys.*all)();
+        auto idarr = array_t<unsigned, array::c_style | array::forcecast>::ensure(idobj);
+        if (!idarr) throw error_already_set();
+        IdList ids(idarr.data(), idarr.data()+idarr.size());
+        for (Id id : ids) {
+            if (!(sys.*has)(id)) {
+                PyErr_Format(PyExc_ValueError, "Invalid id %u", id);
+                throw error_already_set();
+            }
+        }
+        return ids;
+    }
+
+    template <typename T, typename F>
+    array_t<T> get_numbers(IdList const& ids, F get) {
+        array_t<T> arr(ids.size());
+        T* ptr = arr.mutable_data();
+        for (size_t i=0; i<ids.size(); i++) ptr[i] = get(ids[i]);
+        return arr;
+    }
+
+    template <typename T, typename F>
+    void set_numbers(IdList const& ids, object obj, F set) {
+        auto arr = array_t<T, array::c_style | array::forcecast>::ensure(obj);
+        if (!arr) throw error_already_set();
+        if (arr.ndim()==0) {
+            T v = *arr.data();
+            for (Id id : ids) set(id, v);
+            return;
+        }
+        if (arr.ndim()!=1 || size_t(arr.shape(0))!=ids.size()) {
+            PyErr_Format(PyExc_ValueError,
+                    "Supplied %zd values for %zu elements",
+                    arr.size(), ids.size());
+            throw error_already_set();
+        }
+        T const* ptr = arr.data();
+        for (size_t i=0; i<ids.size(); i++) set(ids[i], ptr[i]);
+    }
+
+    /* get(i) returns the i'th of n strings */
+    template <typename F>
+    array get_strings(size_t n, F get) {
+        size_t width = 1;
+        for (size_t i=0; i<n; i++) width = std::max(width, strlen(get(i)));
+        array arr(dtype("<U" + std::to_string(width)), n);
+        uint32_t* out = static_cast<uint32_t*>(arr.mutable_data());
+        memset(out, 0, n*width*sizeof(*out));
+        for (size_t i=0; i<n; i++, out+=width) {
+            const char* str = get(i);
+            size_t len = strlen(str);
+            if (std::all_of(str, str+len, [](char c) { return !(c & 0x80); })) {
+                std::copy(str, str+len, out);
+                continue;
+            }
+            /* utf-8 decodes to no more code points than it has bytes */
+            auto u = reinterpret_steal<object>(
+                    PyUnicode_DecodeUTF8(str, len, "replace"));
+            if (!u || !PyUnicode_AsUCS4(u.ptr(), (Py_UCS4*)out, width, 0)) {
+                throw error_already_set();
+            }
+        }
+        return arr;
+    }
+
+    template <typename F>
+    void set_strings(IdList const& ids, object obj, F set) {
+        if (isinstance<str>(obj)) {
+            std::string v = obj.cast<std::string>();
+            for (Id id : ids) set(id, v);
+            return;
+        }
+        auto v = obj.cast<std::vector<std::string> >();
+        if (v.size()!=ids.size()) {
+            PyErr_Format(PyExc_ValueError,
+                    "Supplied %zu values for %zu elements",
+                    v.size(), ids.size());
+            throw error_already_set();
+        }
+        for (size_t i=0; i<ids.size(); i++) set(ids[i], v[i]);
+    }
+
+    /* custom atom or bond properties, stored in a ParamTable by id */
+    object get_prop_column(ParamTablePtr props, Id col, IdList const& ids) {
+        switch (props->propType(col)) {
+            case IntType: return get_numbers<int64_t>(ids, [&](Id id) {
+                    return props->value(id, col).asInt(); });
+            case FloatType: return get_numbers<double>(ids, [&](Id id) {
+                    return props->value(id, col).asFloat(); });
+            default: {
+                std::vector<String> vals(ids.size());
+                for (size_t i=0; i<ids.size(); i++) {
+                    vals[i] = props->value(ids[i], col).asString();
+                }
+                return get_strings(vals.size(), [&](size_t i) {
+                        return vals[i].c_str(); });
+            }
+        }
+    }
+
+    void set_prop_column(ParamTablePtr props, Id col, IdList const& ids,
+                         object obj) {
+        switch (props->propType(col)) {
+            case IntType: set_numbers<int64_t>(ids, obj, [&](Id id, int64_t v) {
+                    props->value(id, col).fromInt(v); }); break;
+            case FloatType: set_numbers<double>(ids, obj, [&](Id id, double v) {
+                    props->value(id, col).fromFloat(v); }); break;
+            default: set_strings(ids, obj, [&](Id id, String const& v) {
+                    props->value(id, col).fromString(v); });
+        }
+    }
+
+    [[noreturn]] void no_such_field(const char* kind, String const& name) {
+        PyErr_Format(PyExc_KeyError, "No such %s field '%s'", kind, name.data());
+        throw error_already_set();
+    }
+
+    typedef std::map<String, Float atom_t::*> AtomFloatFields;
+    typedef std::map<String, int8_t atom_t::*> AtomIntFields;
+
+    AtomFloatFields const atom_float_fields {
+        {"x", &atom_t::x}, {"y", &atom_t::y}, {"z", &atom_t::z},
+        {"vx", &atom_t::vx}, {"vy", &atom_t::vy}, {"vz", &atom_t::vz},
+        {"mass", &atom_t::mass}, {"charge", &atom_t::charge}
+    };
+    AtomIntFields const atom_int_fields {
+        {"atomic_number", &atom_t::atomic_number},
+        {"formal_charge", &atom_t::formal_charge}
+    };
+
+    object get_atom_field(System& sys, String const& name, object idobj) {
+        IdList ids = field_ids(sys, idobj, &System::atoms, &System::hasAtom);
+        auto f = atom_float_fields.find(name);
+        if (f!=atom_float_fields.end()) {
+            auto field = f->second;
+            return get_numbers<double>(ids, [&](Id id) {
+                    return sys.atomFAST(id).*field; });
+        }
+        auto g = atom_int_fields.find(name);
+        if (g!=atom_int_fields.end()) {
+            auto field = g->second;
+            return get_numbers<int>(ids, [&](Id id) {
+                    return sys.atomFAST(id).*field; });
+        }
+        if (name=="fragid") return get_numbers<unsigned>(ids, [&](Id id) {
+                return sys.atomFAST(id).fragid; });
+        if (name=="residue") return get_numbers<unsigned>(ids, [&](Id id) {
+                return sys.atomFAST(id).residue; });
+        if (name=="name") return get_strings(ids.size(), [&](size_t i) {
+                return sys.atomFAST(ids[i]).name.c_str(); });
+        Id col = sys.atomPropIndex(name);
+        if (bad(col)) no_such_field("atom", name);
+        return get_prop_column(sys.atomProps(), col, ids);
+    }
+
+    void set_atom_field(System& sys, String const& name, object vals,
+                        object idobj) {
+        IdList ids = field_ids(sys, idobj, &System::atoms, &System::hasAtom);
+        auto f = atom_float_fields.find(name);
+        auto g = atom_int_fields.find(name);
+        if (f!=atom_float_fields.end()) {
+            auto field = f->second;
+            set_numbers<double>(ids, vals, [&](Id id, double v) {
+                    sys.atomFAST(id).*field = v; });
+            /* positions and velocities aren't part of the topology */
+            if (field==&atom_t::mass || field==&atom_t::charge) {
+                sys.touchTopology();
+            }
+            return;
+        }
+        if (g!=atom_int_fields.end()) {
+            auto field = g->second;
+            set_numbers<int>(ids, vals, [&](Id id, int v) {
+                    sys.atomFAST(id).*field = v; });
+        } else if (name=="name") {
+            set_strings(ids, vals, [&](Id id, String const& v) {
+                    sys.atomFAST(id).name = v; });
+        } else {
+            Id col = sys.atomPropIndex(name);
+            if (bad(col)) no_such_field("atom", name);
+            set_prop_column(sys.atomProps(), col, ids, vals);
+        }
+        sys.touchTopology();
+    }
+
+    object get_residue_field(System& sys, String const& name, object idobj) {
+        IdList ids = field_ids(sys, idobj, &System::residues, &System::hasResidue);
+        if (name=="resid") return get_numbers<int>(ids, [&](Id id) {
+                return sys.residueFAST(id).resid; });
+        if (name=="chain") return get_numbers<unsigned>(ids, [&](Id id) {
+                return sys.residueFAST(id).chain; });
+        if (name=="name") return get_strings(ids.size(), [&](size_t i) {
+                return sys.residueFAST(ids[i]).name.c_str(); });
+        if (name=="insertion") return get_strings(ids.size(), [&](size_t i) {
+                return sys.residueFAST(ids[i]).insertion.c_str(); });
+        no_such_field("residue", name);
+    }
+
+    void set_residue_field(System& sys, String const& name, object vals,
+                           object idobj) {
+        IdList ids = field_ids(sys, idobj, &System::residues, &System::hasResidue);
+        if (name=="resid") set_numbers<int>(ids, vals, [&](Id id, int v) {
+                sys.residueFAST(id).resid = v; });
+        else if (name=="name") set_strings(ids, vals, [&](Id id, String const& v) {
+                sys.residueFAST(id).name = v; });
+        else if (name=="insertion") set_strings(ids, vals, [&](Id id, String const& v) {
+                sys.residueFAST(id).insertion = v; });
+        else no_such_field("residue", name);
+        sys.touchTopology();
+    }
+
+    object get_bond_field(System& sys, String const& name, object idobj) {
+        IdList ids = field_ids(sys, idobj, &System::bonds, &System::hasBond);
+        if (name=="i") return get_numbers<unsigned>(ids, [&](Id id) {
+                return sys.bondFAST(id).i; });
+        if (name=="j") return get_numbers<unsigned>(ids, [&](Id id) {
+                return sys.bondFAST(id).j; });
+        if (name=="order") return get_numbers<int>(ids, [&](Id id) {
+                return sys.bondFAST(id).order; });
+        if (name=="aromatic") return get_numbers<int>(ids, [&](Id id) {
+                return sys.bondFAST(id).aromatic; });
+        if (name=="stereo") return get_numbers<int>(ids, [&](Id id) {
+                return sys.bondFAST(id).stereo; });
+        Id col = sys.bondPropIndex(name);
+        if (bad(col)) no_such_field("bond", name);
+        return get_prop_column(sys.bondProps(), col, ids);
+    }
+
+    void set_bond_field(System& sys, String const& name, object vals,
+                        object idobj) {
+        IdList ids = field_ids(sys, idobj, &System::bonds, &System::hasBond);
+        if (name=="order") set_numbers<int>(ids, vals, [&](Id id, int v) {
+                sys.bondFAST(id).order = v; });
+        else if (name=="aromatic") set_numbers<int>(ids, vals, [&](Id id, int v) {
+                sys.bondFAST(id).aromatic = v; });
+        else if (name=="stereo") set_numbers<int>(ids, vals, [&](Id id, int v) {
+                sys.bondFAST(id).stereo = v; });
+        else {
+            Id col = sys.bondPropIndex(name);
+            if (bad(col)) no_such_field("bond", name);
+            set_prop_column(sys.bondProps(), col, ids, vals);
+        }
+    }
+
     void getpos3(object x, double *a) {
         auto arr = PyArray_FromAny(
                 x.ptr(),
@@ -219,13 +643,115 @@ namespace {
         return result;
     }
 
+    struct BondExclude {
+        System const& mol;
+        bool operator()(Id i, Id j) const {
+            return !bad(mol.findBond(i,j));
+        }
+    };
+
+    IdList ids_from_array(object obj) {
+        auto arr = array_t<unsigned>::ensure(obj);
+        if (!arr) throw error_already_set();
+        return IdList(arr.data(), arr.data()+arr.size());
+    }
+
+    template <typename Float>
+    std::vector<hbond_t> find_hbonds(System const& sys, double cutoff,
+                    array_t<Float, array::c_style | array::forcecast> arr,
+                    IdList const& donors, IdList const& hoff,
+                    IdList const& hyds, IdList const& acceptors,
+                    unsigned threads) {
+        const Id natoms = sys.atomCount();
+        Id nframes = 1;
+        if (arr.ndim()==3) {
+            nframes = arr.shape(0);
+        } else if (arr.ndim()!=2) {
+            PyErr_Format(PyExc_ValueError,
+                    "Expected pos with shape (N,3) or (F,N,3)");
+            throw error_already_set();
+        }
+        if (arr.shape(arr.ndim()-2)!=natoms || arr.shape(arr.ndim()-1)!=3) {
+            PyErr_Format(PyExc_ValueError,
+                    "Expected %u positions for each frame", natoms);
+            throw error_already_set();
+        }
+        const Float* pos = arr.data();
+        gil_scoped_release release;
+        return FindHydrogenBonds<Float>(cutoff, nframes, natoms, pos,
+                donors, hoff, hyds, acceptors, BondExclude{sys}, threads);
+    }
+
+    array sys_find_hbonds(System const& sys, double cutoff,
+                          object donobj, object hoffobj, object hydobj,
+                          object accobj, object posobj, unsigned threads) {
+        if (sys.maxAtomId() != sys.atomCount()) {
+            PyErr_Format(PyExc_ValueError, "System has deleted atoms");
+            throw error_already_set();
+        }
+        IdList donors = ids_from_array(donobj);
+        IdList hoff = ids_from_array(hoffobj);
+        IdList hyds = ids_from_array(hydobj);
+        IdList acceptors = ids_from_array(accobj);
+
+        std::vector<hbond_t> result;
+        if (posobj.is_none()) {
+            size_t dims[] = {sys.atomCount(), 3};
+            array_t<double> arr(dims);
+            sys.getPositions(arr.mutable_data());
+            result = find_hbonds<double>(sys, cutoff, arr,
+                    donors, hoff, hyds, acceptors, threads);
+        } else {
+            auto arr = array::ensure(posobj);
+            if (!arr) throw error_already_set();
+            if (arr.dtype().is(dtype::of<float>())) {
+                result = find_hbonds<float>(sys, cutoff, arr,
+                        donors, hoff, hyds, acceptors, threads);
+            } else {
+                result = find_hbonds<double>(sys, cutoff, arr,
+                        donors, hoff, hyds, acceptors, threads);
+            }
+        }
+        return array_t<hbond_t>(result.size(), result.data());
+    }
+
+
+    typedef array_t<double, array::c_style | array::forcecast> coord_array;
+
+    /* Set the positions or velocities of sys from arr, which it refers
+     * to rather than copies if arr owns its data.  An attached arr is
+     * made read-only, since writes through it would no longer reach the
+     * system once the block is synced. */
+    void set_coords(System& sys, coord_array arr, bool velocities) {
+        if (!arr.owndata()) {
+            if (velocities) {
+                sys.setVelocities(arr.data());
+            } else {
+                sys.setPositions(arr.data());
+            }
+            return;
+        }
+        std::shared_ptr<const void> owner(new object(arr), [](const void* p) {
+            gil_scoped_acquire gil;
+            delete static_cast<const object*>(p);
+        });
+        bool attached = velocities ? sys.attachVelocities(arr.data(), owner)
+                                   : sys.attachPositions(arr.data(), owner);
+        if (attached && arr.writeable()) {
+            arr.attr("flags").attr("writeable") = false;
+        }
+    }
 
     array sys_getpos(System const& sys, object idobj) {
         array_t<double> arr;
         if (idobj.is_none()) {
             size_t dims[] = {sys.atomCount(), 3};
             arr = array_t<double>(dims);
-            sys.getPositions(arr.mutable_data());
+            if (auto block = sys.positionBlock()) {
+                memcpy(arr.mutable_data(), block, arr.nbytes());
+            } else {
+                sys.getPositions(arr.mutable_data());
+            }
         } else {
             auto idarr = array_t<unsigned>::ensure(idobj);
             if (!idarr) throw error_already_set();
@@ -254,7 +780,11 @@ namespace {
         if (idobj.is_none()) {
             size_t dims[] = {sys.atomCount(), 3};
             arr = array_t<double>(dims);
-            sys.getVelocities(arr.mutable_data());
+            if (auto block = sys.velocityBlock()) {
+                memcpy(arr.mutable_data(), block, arr.nbytes());
+            } else {
+                sys.getVelocities(arr.mutable_data());
+            }
         } else {
             auto idarr = array_t<unsigned>::ensure(idobj);
             if (!idarr) throw error_already_set();
@@ -278,7 +808,7 @@ namespace {
         return arr;
     }
 
-    void sys_setpos(System& sys, array_t<double> arr, object idobj) {
+    void sys_setpos(System& sys, coord_array arr, object idobj) {
         if (arr.ndim()!=2 || arr.shape(1)!=3) {
             PyErr_Format(PyExc_ValueError, 
                     "Supplied %ld-d positions, expected 3-d", 
@@ -295,7 +825,7 @@ namespace {
                         n, sys.atomCount());
                 throw error_already_set();
             }
-            sys.setPositions(pos);
+            set_coords(sys, arr, false);
         } else {
             auto idarr = array_t<unsigned>::ensure(idobj);
             if (!idarr) throw error_already_set();
@@ -322,7 +852,7 @@ namespace {
         }
     }
 
-    void sys_setvel(System& sys, array_t<double> arr, object idobj) {
+    void sys_setvel(System& sys, coord_array arr, object idobj) {
         if (arr.ndim()!=2 || arr.shape(1)!=3) {
             PyErr_Format(PyExc_ValueError, 
                     "Supplied %ld-d velocities, expected 3-d", 
@@ -339,7 +869,7 @@ namespace {
                         n, sys.atomCount());
                 throw error_already_set();
             }
-            sys.setVelocities(pos);
+            set_coords(sys, arr, true);
         } else {
             auto idarr = array_t<unsigned>::ensure(idobj);
             if (!idarr) throw error_already_set();
@@ -366,41 +896,58 @@ namespace {
         }
     }
 
-    IdList wrap_atomselect(SystemPtr mol, std::string const& sel,
-                           object posobj, object boxobj) {
+    /* positions and box for atom selections, converted and checked */
+    struct SelectionCoords {
         array_t<float> posarr;
         array_t<double> boxarr;
         const float* pos = NULL;
         const double* box = NULL;
-        if (!posobj.is_none()) {
-            posarr = array_t<float>::ensure(posobj);
-            if (!posarr) throw error_already_set();
-            if (posarr.ndim()!=2 || posarr.shape(0)!=mol->atomCount() || posarr.shape(1)!=3) {
-                PyErr_Format(PyExc_ValueError, "pos has wrong shape");
-                throw error_already_set();
+
+        SelectionCoords(SystemPtr mol, object posobj, object boxobj) {
+            if (!posobj.is_none()) {
+                posarr = array_t<float>::ensure(posobj);
+                if (!posarr) throw error_already_set();
+                if (posarr.ndim()!=2 || posarr.shape(0)!=mol->atomCount() || posarr.shape(1)!=3) {
+                    PyErr_Format(PyExc_ValueError, "pos has wrong shape");
+                    throw error_already_set();
+                }
+                pos = posarr.data();
             }
-            pos = posarr.data();
-        }
-        if (!boxobj.is_none()) {
-            boxarr = array_t<double>::ensure(boxobj);
-            if (!boxarr) throw error_already_set();
-            if (boxarr.ndim()!=2 || boxarr.shape(0)!=3 || boxarr.shape(1)!=3) {
-                PyErr_Format(PyExc_ValueError, "box has wrong shape");
-                throw error_already_set();
+            if (!boxobj.is_none()) {
+                boxarr = array_t<double>::ensure(boxobj);
+                if (!boxarr) throw error_already_set();
+                if (boxarr.ndim()!=2 || boxarr.shape(0)!=3 || boxarr.shape(1)!=3) {
+                    PyErr_Format(PyExc_ValueError, "box has wrong shape");
+                    throw error_already_set();
+                }
+                box = boxarr.data();
             }
-            box = boxarr.data();
         }
-        return Atomselect(mol, sel, pos, box);
+    };
+
+    IdList wrap_atomselect(SystemPtr mol, std::string const& sel,
+                           object posobj, object boxobj) {
+        SelectionCoords c(mol, posobj, boxobj);
+        return Atomselect(mol, sel, c.pos, c.box);
     }
 
-    object array_Atomselect(SystemPtr mol, std::string const& sel,
-                               object pos, object box) {
-        auto ids = wrap_atomselect(mol,sel, pos, box);
+    IdList compiled_select(CompiledSelection& sel, object posobj,
+                                                   object boxobj) {
+        SelectionCoords c(sel.system(), posobj, boxobj);
+        return sel.select(c.pos, c.box);
+    }
+
+    array_t<unsigned> ids_to_array(IdList const& ids) {
         auto arr = array_t<unsigned>(ids.size());
         memcpy(arr.mutable_data(), ids.data(), ids.size()*sizeof(ids[0]));
         return arr;
     }
 
+    object array_Atomselect(SystemPtr mol, std::string const& sel,
+                               object pos, object box) {
+        return ids_to_array(wrap_atomselect(mol,sel, pos, box));
+    }
+
     array_t<double> get_vec3d(object obj) {
         if (obj.is_none()) return obj;
         auto arr = array_t<double>::ensure(obj);
@@ -436,6 +983,21 @@ namespace {
 
     pfx::Graph* sys_topology(SystemPtr mol) { return new pfx::Graph(mol); }
 
+    /* read-only arrays over the adjacency snapshot, which they keep alive */
+    tuple sys_adjacency(SystemPtr mol) {
+        AdjacencyPtr adj = mol->adjacency();
+        capsule base(new AdjacencyPtr(adj), [](void* p) {
+            delete static_cast<AdjacencyPtr*>(p);
+        });
+        auto view = [&](IdList const& ids) {
+            array_t<unsigned> arr(ids.size(), ids.data(), base);
+            PyArray_CLEARFLAGS((PyArrayObject*)arr.ptr(), NPY_ARRAY_WRITEABLE);
+            return arr;
+        };
+        return make_tuple(view(adj->offsets), view(adj->neighbors),
+                          view(adj->bond_ids));
+    }
+
     TermTablePtr wrap_system_add_table(SystemPtr mol, std::string const& name, Id natoms, object obj) {
         ParamTablePtr params;
         if (!obj.is_none()) params = obj.cast<ParamTablePtr>();
@@ -473,6 +1035,9 @@ namespace {
 namespace desres { namespace msys { 
 
     void export_system(module m) {
+
+        PYBIND11_NUMPY_DTYPE(hbond_t, frame, donor, acceptor, hydrogen,
+                                      r, p, energy);
         _import_array();
         if (PyErr_Occurred()) throw error_already_set();
 
@@ -612,6 +1177,7 @@ namespace desres { namespace msys {
             .def("delTable",    &System::delTable)
             .def("removeTable", &System::removeTable)
             .def("renameTable", &System::renameTable)
+            .def("isLazyTable", &System::isLazyTable)
 
             /* atom props */
             .def("setResidue",  &System::setResidue)
@@ -653,6 +1219,8 @@ namespace desres { namespace msys {
             /* atom selection */
             .def("selectAsList", wrap_atomselect, arg("sel"), arg("pos")=none(), arg("box")=none())
             .def("selectAsArray", array_Atomselect, arg("sel"), arg("pos")=none(), arg("box")=none())
+            .def("compileSelection", [](SystemPtr mol, std::string const& sel) {
+                    return CompiledSelection(mol, sel); }, arg("sel"))
 
             /* append */
             .def("append", AppendSystem)
@@ -662,16 +1230,31 @@ namespace desres { namespace msys {
             .def("orderedIds",    &System::orderedIds)
             .def("updateFragids", update_fragids)
             .def("findBond",    &System::findBond)
+            .def("topologyVersion", &System::topologyVersion)
+            .def("touchTopology", &System::touchTopology)
             .def("provenance",      sys_provenance)
             .def("setProvenance", sys_set_provenance)
             .def("coalesceTables",    &System::coalesceTables)
             .def("translate",       sys_translate)
             .def("findContactIds",  sys_find_contact_ids)
+            .def("findHydrogenBonds", sys_find_hbonds,
+                    arg("cutoff"), arg("donors"), arg("hoff"),
+                    arg("hydrogens"), arg("acceptors"),
+                    arg("pos")=none(), arg("threads")=0)
             .def("topology",        sys_topology)
+            .def("adjacency",       sys_adjacency)
             .def("getPositions", sys_getpos, arg("ids")=none())
             .def("setPositions",    sys_setpos, arg("pos"), arg("ids")=none())
             .def("getVelocities", sys_getvel, arg("ids")=none())
             .def("setVelocities",    sys_setvel, arg("vel"), arg("ids")=none())
+            .def("positionsView", [](SystemPtr sys) { return atom_coord_view(sys, &atom_t::x); })
+            .def("velocitiesView", [](SystemPtr sys) { return atom_coord_view(sys, &atom_t::vx); })
+            .def("getAtomField", get_atom_field, arg("name"), arg("ids")=none())
+            .def("setAtomField", set_atom_field, arg("name"), arg("vals"), arg("ids")=none())
+            .def("getResidueField", get_residue_field, arg("name"), arg("ids")=none())
+            .def("setResidueField", set_residue_field, arg("name"), arg("vals"), arg("ids")=none())
+            .def("getBondField", get_bond_field, arg("name"), arg("ids")=none())
+            .def("setBondField", set_bond_field, arg("name"), arg("vals"), arg("ids")=none())
 
             /* PyCapsule conversion */
             .def_static("asCapsule", [](SystemPtr ptr) -> handle { return python::system_as_capsule(ptr); })
@@ -679,6 +1262,11 @@ namespace desres { namespace msys {
             .def("addProvenance", &System::addProvenance)
             ;
     m.def("HashSystem", HashSystem);
+    m.def("SystemFromArrays", system_from_arrays,
+            arg("atomic_number"), arg("name"), arg("resname"), arg("resid"),
+            arg("chain"), arg("segid"), arg("insertion"), arg("ct"),
+            arg("pos"), arg("vel"), arg("mass"), arg("charge"),
+            arg("formal_charge"), arg("bonds"), arg("atom_props"));
 
     class_<SystemImporter>(m, "SystemImporter")
         .def(init<SystemPtr>())
@@ -688,6 +1276,22 @@ namespace desres { namespace msys {
         ;
 
 
+    class_<CompiledSelection>(m, "CompiledSelection")
+        .def_property_readonly("selection", &CompiledSelection::selection,
+                "selection text")
+        .def_property_readonly("dynamic", &CompiledSelection::dynamic,
+                "does the selection depend on positions or velocities?")
+        .def("selectIds", compiled_select,
+                arg("pos")=none(), arg("box")=none(),
+                "ids of selected atoms, using the given or current positions and box")
+        .def("selectArr", [](CompiledSelection& sel, object pos, object box) {
+                return ids_to_array(compiled_select(sel, pos, box)); },
+                arg("pos")=none(), arg("box")=none(),
+                "ids of selected atoms as a numpy array of type uint32")
+        .def("invalidate", &CompiledSelection::invalidate,
+                "discard cached results, after modifying the system in place")
+        ;
+
     class_<HydrogenBond>(m, "HydrogenBond", dynamic_attr())
         .def(init(&init_hbond), 
                     arg("d"),
@@ -572,18 +572,21 @@ desres::msys::GetSSSR(SystemPtr mol, IdList const& atoms,
         if (mol->atom(atoms[i]).atomic_number >= 1)
             atom_idx_map[atoms[i]] = i;
     }
+    AdjacencyPtr adj = mol->adjacency();
     GraphRepr graph;
     graph.v_to_e.resize(atoms.size(), std::vector<int>());
     for (unsigned i = 0; i < atoms.size(); ++i) {
         /* If i is a pseudo atom or metal, graph.v_to_e[i] remains empty. These graph
          * vertex indices are ignored by get_biconnected_components. */
         if (!keep(mol->atom(atoms[i]))) continue;
-        IdList bonded = mol->filteredBondedAtoms(atoms[i],keep);
-        for (unsigned j = 0; j < bonded.size(); ++j) {
-            if (atoms[i] < bonded[j] && atom_idx_map[bonded[j]] != -1) {
-                graph.edges.push_back(Edge(i, atom_idx_map[bonded[j]]));
+        for (Id const* j = adj->neighborsBegin(atoms[i]),
+                     * e = adj->neighborsEnd(atoms[i]); j != e; ++j) {
+            Id other = *j;
+            if (atoms[i] < other && atom_idx_map[other] != -1
+                                 && keep(mol->atomFAST(other))) {
+                graph.edges.push_back(Edge(i, atom_idx_map[other]));
                 graph.v_to_e[i].push_back(graph.edges.size()-1);
-                graph.v_to_e[atom_idx_map[bonded[j]]].push_back(
+                graph.v_to_e[atom_idx_map[other]].push_back(
                         graph.edges.size()-1);
             }
         }
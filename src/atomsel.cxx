@@ -20,4 +20,54 @@ namespace desres { namespace msys {
         return s.ids();
     }
 
+    struct CompiledSelection::Impl {
+        SystemPtr mol;
+        std::string txt;
+        uint64_t version = 0;
+        std::unique_ptr<atomsel::Query> q;
+
+        void compile() {
+            q.reset(new atomsel::Query);
+            q->mol = mol.get();
+            q->parse(txt);
+            q->compile();
+            version = mol->topologyVersion();
+        }
+    };
+
+    CompiledSelection::CompiledSelection(SystemPtr sys, const std::string& sel)
+    : _impl(new Impl) {
+        _impl->mol = sys;
+        _impl->txt = sel;
+        _impl->compile();
+    }
+
+    SystemPtr CompiledSelection::system() const {
+        return _impl->mol;
+    }
+
+    std::string const& CompiledSelection::selection() const {
+        return _impl->txt;
+    }
+
+    bool CompiledSelection::dynamic() const {
+        return _impl->q->pred && _impl->q->pred->dynamic();
+    }
+
+    IdList CompiledSelection::select(const float* pos, const double* cell) {
+        if (_impl->version != _impl->mol->topologyVersion()) {
+            _impl->compile();
+        }
+        atomsel::Query& q = *_impl->q;
+        q.pos = pos;
+        q.cell = cell;
+        auto s = atomsel::full_selection(q.mol);
+        q.pred->eval(s);
+        return s.ids();
+    }
+
+    void CompiledSelection::invalidate() {
+        _impl->compile();
+    }
+
 }}
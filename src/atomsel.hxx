@@ -12,6 +12,32 @@ namespace desres { namespace msys {
     IdList Atomselect(SystemPtr sys, const std::string& sel,
                       const float* pos, const double* cell);
 
+    /* A parsed selection which can be evaluated repeatedly.  The parts
+     * of the selection which depend on neither positions nor velocities
+     * are evaluated once and cached; within, nearest, and x, y, z, vx,
+     * vy, vz subexpressions are evaluated on every call.  The selection
+     * is parsed again if the topology version of the system changes. */
+    class CompiledSelection {
+        struct Impl;
+        std::shared_ptr<Impl> _impl;
+
+    public:
+        CompiledSelection(SystemPtr sys, const std::string& sel);
+
+        SystemPtr system() const;
+        std::string const& selection() const;
+
+        /* true if the selection depends on positions or velocities */
+        bool dynamic() const;
+
+        /* evaluate using the given positions and cell, or those of the
+         * system if NULL. */
+        IdList select(const float* pos=nullptr, const double* cell=nullptr);
+
+        /* discard cached results */
+        void invalidate();
+    };
+
 }}
 
 #endif
@@ -873,22 +873,22 @@ static void yy_reduce(
         break;
       case 9: /* selection ::= WITHIN num OF selection */
 #line 61 "atomsel.y"
-{yygotominor.yy16=new WithinPredicate(query->mol, query->pos, NULL, yymsp[-2].minor.yy76, false, false, yymsp[0].minor.yy16); }
+{yygotominor.yy16=new WithinPredicate(query, yymsp[-2].minor.yy76, false, false, yymsp[0].minor.yy16); }
 #line 878 "atomsel.c"
         break;
       case 10: /* selection ::= EXWITHIN num OF selection */
 #line 62 "atomsel.y"
-{yygotominor.yy16=new WithinPredicate(query->mol, query->pos, NULL, yymsp[-2].minor.yy76,  true, false, yymsp[0].minor.yy16); }
+{yygotominor.yy16=new WithinPredicate(query, yymsp[-2].minor.yy76,  true, false, yymsp[0].minor.yy16); }
 #line 883 "atomsel.c"
         break;
       case 11: /* selection ::= PBWITHIN num OF selection */
 #line 63 "atomsel.y"
-{yygotominor.yy16=new WithinPredicate(query->mol, query->pos, query->cell, yymsp[-2].minor.yy76, false,  true, yymsp[0].minor.yy16); }
+{yygotominor.yy16=new WithinPredicate(query, yymsp[-2].minor.yy76, false,  true, yymsp[0].minor.yy16); }
 #line 888 "atomsel.c"
         break;
       case 12: /* selection ::= NEAREST INT TO selection */
 #line 64 "atomsel.y"
-{yygotominor.yy16=new KNearestPredicate(query->mol,query->pos, NULL, yymsp[-2].minor.yy0.ival, false, yymsp[0].minor.yy16); }
+{yygotominor.yy16=new KNearestPredicate(query, yymsp[-2].minor.yy0.ival, false, yymsp[0].minor.yy16); }
 #line 893 "atomsel.c"
         break;
       case 13: /* selection ::= WITHINBONDS INT OF selection */
@@ -898,7 +898,7 @@ static void yy_reduce(
         break;
       case 14: /* selection ::= PBNEAREST INT TO selection */
 #line 66 "atomsel.y"
-{yygotominor.yy16=new KNearestPredicate(query->mol,query->pos,query->cell, yymsp[-2].minor.yy0.ival,  true, yymsp[0].minor.yy16); }
+{yygotominor.yy16=new KNearestPredicate(query, yymsp[-2].minor.yy0.ival,  true, yymsp[0].minor.yy16); }
 #line 903 "atomsel.c"
         break;
       case 15: /* selection ::= SAME KEY AS selection */
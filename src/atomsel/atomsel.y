@@ -49,7 +49,7 @@ using namespace desres::msys::atomsel;
 input ::= selection(s). { query->pred.reset(s); }
 input ::= .
 
-    //WithinPredicate( System* e, const float* pos, const double* cell, float r, bool excl, bool per, Predicate* s )
+    //WithinPredicate( Query* q, float r, bool excl, bool per, Predicate* s )
 
 selection(S) ::= VAL(V).          { S=new BoolPredicate(query->mol,V.str());  }
 selection(S) ::= KEY(V) list(v).  { S=new KeyPredicate(query,V.str(),v); }
@@ -58,12 +58,12 @@ selection(S) ::= selection(a) OR selection(b).  {S=new OrPredicate(a,b); }
 selection(S) ::= LPAREN selection(s) RPAREN.    {S=s; }
 selection(S) ::= MACRO.                         {S=query->pred.release(); }
 selection(S) ::= NOT selection(s).              {S=new NotPredicate(s); }
-selection(S) ::= WITHIN num(n) OF selection(s).   {S=new WithinPredicate(query->mol, query->pos, NULL, n, false, false, s); }
-selection(S) ::= EXWITHIN num(n) OF selection(s). {S=new WithinPredicate(query->mol, query->pos, NULL, n,  true, false, s); }
-selection(S) ::= PBWITHIN num(n) OF selection(s). {S=new WithinPredicate(query->mol, query->pos, query->cell, n, false,  true, s); }
-selection(S) ::= NEAREST INT(v) TO selection(s).   {S=new KNearestPredicate(query->mol,query->pos, NULL, v.ival, false, s); }
+selection(S) ::= WITHIN num(n) OF selection(s).   {S=new WithinPredicate(query, n, false, false, s); }
+selection(S) ::= EXWITHIN num(n) OF selection(s). {S=new WithinPredicate(query, n,  true, false, s); }
+selection(S) ::= PBWITHIN num(n) OF selection(s). {S=new WithinPredicate(query, n, false,  true, s); }
+selection(S) ::= NEAREST INT(v) TO selection(s).   {S=new KNearestPredicate(query, v.ival, false, s); }
 selection(S) ::= WITHINBONDS INT(v) OF selection(s).   {S=new WithinBondsPredicate(query->mol,v.ival, s); }
-selection(S) ::= PBNEAREST INT(v) TO selection(s). {S=new KNearestPredicate(query->mol,query->pos,query->cell, v.ival,  true, s); }
+selection(S) ::= PBNEAREST INT(v) TO selection(s). {S=new KNearestPredicate(query, v.ival,  true, s); }
 selection(S) ::= SAME KEY(v) AS selection(s).   {S=new SamePredicate(query,v.str(),s); }
 selection(S) ::= expr(a) CMP(c) expr(b).      {S=new CmpPredicate(c.ival,a,b);}
 
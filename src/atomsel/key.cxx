@@ -336,6 +336,23 @@ bool desres::msys::atomsel::is_keyword(std::string const& name, System* mol) {
         ;
 }
 
+bool desres::msys::atomsel::is_dynamic_keyword(std::string const& name) {
+    return name=="x" || name=="y" || name=="z"
+        || name=="vx" || name=="vy" || name=="vz";
+}
+
+bool KeyPredicate::dynamic() const {
+    return is_dynamic_keyword(name);
+}
+
+bool KeyExpr::dynamic() const {
+    return is_dynamic_keyword(name);
+}
+
+bool SamePredicate::dynamic() const {
+    return is_dynamic_keyword(name) || sub->dynamic();
+}
+
 static Getter lookup(std::string const& name, Query* q) {
     auto iter = map.find(name);
     if (iter!=map.end()) {
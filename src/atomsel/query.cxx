@@ -50,3 +50,19 @@ void Query::parse(std::string const& sel) {
     } while (tokenId>0);
 }
 
+void CachedPredicate::eval(Selection& s) {
+    if (!result) {
+        result.reset(new Selection(full_selection(mol)));
+        sub->eval(*result);
+    }
+    s.intersect(*result);
+}
+
+void desres::msys::atomsel::cache_predicate(std::unique_ptr<Predicate>& p,
+                                            System* mol) {
+    if (p->dynamic()) {
+        p->cache(mol);
+    } else {
+        p.reset(new CachedPredicate(mol, p.release()));
+    }
+}
@@ -58,6 +58,29 @@ struct Valist {
 struct Predicate {
     virtual ~Predicate() = default;
     virtual void eval(Selection& s) = 0;
+
+    /* true if the result depends on positions or velocities */
+    virtual bool dynamic() const { return false; }
+
+    /* replace static subpredicates with cached ones */
+    virtual void cache(System* mol) {}
+};
+
+/* If p is static, replace it with a CachedPredicate; otherwise cache
+ * its static subpredicates. */
+void cache_predicate(std::unique_ptr<Predicate>& p, System* mol);
+
+/* Evaluates a static predicate once over all atoms, then intersects
+ * with the cached result.  Valid because every static predicate acts
+ * on each atom independently of the others in the input selection. */
+class CachedPredicate : public Predicate {
+    System* mol;
+    std::unique_ptr<Predicate> sub;
+    std::unique_ptr<Selection> result;
+
+public:
+    CachedPredicate(System* m, Predicate* s) : mol(m), sub(s) {}
+    void eval(Selection& s);
 };
 
 struct BoolPredicate : Predicate {
@@ -77,6 +100,7 @@ struct KeyPredicate : Predicate {
     KeyPredicate(Query* q, std::string&& s, Valist* v)
     : q(q), name(s), va(v) {}
     virtual void eval(Selection& s);
+    virtual bool dynamic() const;
 };
 
 struct AndPredicate : Predicate {
@@ -86,6 +110,11 @@ struct AndPredicate : Predicate {
         lhs->eval(s);
         rhs->eval(s);
     }
+    virtual bool dynamic() const { return lhs->dynamic() || rhs->dynamic(); }
+    virtual void cache(System* mol) {
+        cache_predicate(lhs, mol);
+        cache_predicate(rhs, mol);
+    }
 };
 struct OrPredicate : Predicate {
     std::unique_ptr<Predicate> lhs, rhs;
@@ -96,6 +125,11 @@ struct OrPredicate : Predicate {
         rhs->eval(s2);
         s.add(s2);
     }
+    virtual bool dynamic() const { return lhs->dynamic() || rhs->dynamic(); }
+    virtual void cache(System* mol) {
+        cache_predicate(lhs, mol);
+        cache_predicate(rhs, mol);
+    }
 };
 struct NotPredicate : Predicate {
     std::unique_ptr<Predicate> sub;
@@ -105,21 +139,23 @@ struct NotPredicate : Predicate {
         sub->eval(s2);
         s.subtract(s2);
     }
+    virtual bool dynamic() const { return sub->dynamic(); }
+    virtual void cache(System* mol) { cache_predicate(sub, mol); }
 };
 class WithinPredicate : public Predicate {
-    System* sys;
-    const float* pos;
-    const double* cell;
+    Query* q;
     const float rad;
     std::unique_ptr<Predicate> sub;
     const bool exclude;
     const bool periodic;
 
 public:
-    WithinPredicate( System* e, const float* pos, const double* cell, float r, bool excl, bool per, Predicate* s )
-    : sys(e), pos(pos), cell(cell), rad(r), sub(s), exclude(excl), periodic(per) {}
+    WithinPredicate( Query* q, float r, bool excl, bool per, Predicate* s )
+    : q(q), rad(r), sub(s), exclude(excl), periodic(per) {}
 
   void eval( Selection& s );
+  bool dynamic() const { return true; }
+  void cache(System* mol) { cache_predicate(sub, mol); }
 };
 
 class WithinBondsPredicate : public Predicate {
@@ -132,20 +168,22 @@ public:
     : sys(e), N(n), sub(s) {}
 
   void eval( Selection& s );
+  bool dynamic() const { return sub->dynamic(); }
+  void cache(System* mol) { cache_predicate(sub, mol); }
 };
 class KNearestPredicate : public Predicate {
-  System* _sys;
-  const float* pos;
-  const double* cell;
+  Query* q;
   const unsigned _N;
   const bool periodic;
   std::unique_ptr<Predicate> _sub;
 
 public:
-  KNearestPredicate(System* sys, const float* pos, const double* cell, unsigned k, bool per, Predicate* sub)
-  : _sys(sys), pos(pos), cell(cell), _N(k), periodic(per), _sub(sub) {}
+  KNearestPredicate(Query* q, unsigned k, bool per, Predicate* sub)
+  : q(q), _N(k), periodic(per), _sub(sub) {}
 
   void eval(Selection& s);
+  bool dynamic() const { return true; }
+  void cache(System* mol) { cache_predicate(_sub, mol); }
 };
 
 struct SamePredicate : Predicate {
@@ -157,11 +195,16 @@ struct SamePredicate : Predicate {
     : q(q), name(name), sub(p) {}
 
     void eval( Selection& s );
+    bool dynamic() const;
+    void cache(System* mol) { cache_predicate(sub, mol); }
 };
 
 struct Expression {
     virtual ~Expression() = default;
     virtual void eval(Selection const& s, std::vector<double>& v) = 0;
+
+    /* true if the result depends on positions or velocities */
+    virtual bool dynamic() const { return false; }
 };
 
 struct LitExpr : Expression {
@@ -177,6 +220,7 @@ struct KeyExpr : Expression {
     std::string name;
     KeyExpr(Query* q, std::string&& s) : q(q), name(s) {}
     void eval(Selection const& s, std::vector<double>& v);
+    bool dynamic() const;
 };
 
 struct FuncExpr : Expression {
@@ -185,12 +229,14 @@ struct FuncExpr : Expression {
     FuncExpr(double (*f)(double), Expression* e)
     : func(f), sub(e) {}
     void eval(Selection const& s, std::vector<double>& v);
+    bool dynamic() const { return sub->dynamic(); }
 };
 
 struct NegExpr : Expression {
     std::unique_ptr<Expression> sub;
     NegExpr(Expression* e) : sub(e) {}
     void eval(Selection const& s, std::vector<double>& v);
+    bool dynamic() const { return sub->dynamic(); }
 };
 
 struct BinExpr : Expression {
@@ -201,6 +247,7 @@ struct BinExpr : Expression {
     BinExpr(int op, Expression* L, Expression* R)
     : op(op), lhs(L), rhs(R) {}
     void eval(Selection const& s, std::vector<double>& v);
+    bool dynamic() const { return lhs->dynamic() || rhs->dynamic(); }
 };
 
 struct CmpPredicate : Predicate {
@@ -211,6 +258,7 @@ struct CmpPredicate : Predicate {
     : cmp(c), lhs(L), rhs(R) {}
 
     void eval( Selection& s );
+    bool dynamic() const { return lhs->dynamic() || rhs->dynamic(); }
 };
 
 struct Query {
@@ -221,10 +269,16 @@ struct Query {
     std::unique_ptr<Predicate> pred;
 
     void parse(std::string const& selection);
+
+    /* cache the static parts of the parsed selection */
+    void compile() { if (pred) cache_predicate(pred, mol); }
 };
 
 bool is_keyword(std::string const& name, System* mol);
 
+/* true if the keyword reads positions or velocities */
+bool is_dynamic_keyword(std::string const& name);
+
 
 Selection full_selection(System* sys);
 
@@ -7,10 +7,31 @@ using namespace desres::msys;
 using namespace desres::msys::atomsel;
 
 namespace {
+    /* positions for the query, or the current positions of the system
+     * copied into coords if the query has none */
+    const float* query_positions(Query* q, std::vector<float>& coords) {
+        if (q->pos) return q->pos;
+        System* sys = q->mol;
+        coords.resize(3*sys->maxAtomId());
+        for (auto id : sys->atoms()) {
+            atom_t const& atm = sys->atomFAST(id);
+            coords[3*id  ] = atm.x;
+            coords[3*id+1] = atm.y;
+            coords[3*id+2] = atm.z;
+        }
+        return &coords[0];
+    }
+
+    /* cell for the query: NULL if not periodic, otherwise the query's
+     * cell or the global cell of the system */
+    const double* query_cell(Query* q, bool periodic) {
+        if (!periodic) return nullptr;
+        return q->cell ? q->cell : q->mol->global_cell[0];
+    }
 }
 
 void WithinPredicate::eval( Selection& S ) {
-    Selection subsel = full_selection(sys);
+    Selection subsel = full_selection(q->mol);
     sub->eval(subsel);
     if (exclude) S.subtract(subsel);
 
@@ -20,19 +41,8 @@ void WithinPredicate::eval( Selection& S ) {
     }
 
     std::vector<float> coords;
-    if (!pos) {
-        coords.resize(3*sys->maxAtomId());
-        for (auto id : sys->atoms()) {
-            atom_t const& atm = sys->atomFAST(id);
-            coords[3*id  ] = atm.x;
-            coords[3*id+1] = atm.y;
-            coords[3*id+2] = atm.z;
-        }
-        pos = &coords[0];
-    }
-    if (periodic && !cell) {
-        cell = sys->global_cell[0];
-    }
+    const float* pos = query_positions(q, coords);
+    const double* cell = query_cell(q, periodic);
     IdList subsel_ids = subsel.ids();
     IdList S_ids = S.ids();
 
@@ -69,24 +79,13 @@ void WithinBondsPredicate::eval( Selection& S ) {
 
 void KNearestPredicate::eval( Selection& S ) {
 
-    Selection subsel = full_selection(_sys);
+    Selection subsel = full_selection(q->mol);
     _sub->eval(subsel);
     S.subtract(subsel);
 
     std::vector<float> coords;
-    if (!pos) {
-        coords.resize(3*_sys->maxAtomId());
-        for (auto id : _sys->atoms()) {
-            atom_t const& atm = _sys->atomFAST(id);
-            coords[3*id  ] = atm.x;
-            coords[3*id+1] = atm.y;
-            coords[3*id+2] = atm.z;
-        }
-        pos = &coords[0];
-    }
-    if (periodic && !cell) {
-        cell = _sys->global_cell[0];
-    }
+    const float* pos = query_positions(q, coords);
+    const double* cell = query_cell(q, periodic);
     IdList subsel_ids = subsel.ids();
     IdList S_ids = S.ids();
 
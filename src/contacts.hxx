@@ -41,7 +41,7 @@ namespace desres { namespace msys {
 
     }
 
-    void details::voxel::find_neighbors(
+    inline void details::voxel::find_neighbors(
             voxel* mesh, int nx, int ny, int nz) {
         for (int zi=0; zi<nz; zi++) {
             for (int yi=0; yi<ny; yi++) {
@@ -27,6 +27,31 @@ namespace desres { namespace msys {
         return ImportDMS(path, structure_only, structure_only);
     }
 
+    // Finer control over which parts of a DMS file are read.
+    struct DMSImportOptions {
+        bool structure_only = false;
+        bool without_tables = false;
+
+        // If select_tables is true, only the term tables named in tables
+        // are read; the rest are skipped, or deferred if lazy_tables is
+        // true.  Names are those of the tables in the System, e.g.
+        // "stretch_harm", "nonbonded" or "exclusion".
+        bool select_tables = false;
+        std::set<String> tables;
+
+        // Defer reading term tables (those not selected, if select_tables
+        // is true) until they are first fetched with System::table().
+        // The file contents stay in memory until then.
+        bool lazy_tables = false;
+
+        // If select_atom_props is true, only the extra particle columns
+        // named in atom_props become atom properties.
+        bool select_atom_props = false;
+        std::set<String> atom_props;
+    };
+
+    SystemPtr ImportDMS(const std::string& path, DMSImportOptions const& opts);
+
 
     SystemPtr ImportDMSFromBytes( const char* bytes, int64_t len,
                                   bool structure_only, bool without_tables);
@@ -38,6 +63,25 @@ namespace desres { namespace msys {
     }
 
 
+    // Positions and velocities of the particles in a DMS file, in the order
+    // ImportDMS reads them, along with the global cell.
+    struct DMSCoordinates {
+        std::vector<double> pos;    // 3 per particle
+        std::vector<double> vel;    // 3 per particle
+        double cell[9] = {0};
+    };
+
+    // Read only the coordinates from a DMS file.
+    DMSCoordinates ReadDMSCoordinates(std::string const& path);
+
+    // Overwrite the positions, velocities and global cell of the natoms
+    // particles in an existing DMS file, in a single transaction, without
+    // rewriting anything else.  Any of pos, vel or cell may be NULL to
+    // leave those values alone.
+    void UpdateDMSCoordinates(std::string const& path, size_t natoms,
+                              const double* pos, const double* vel,
+                              const double* cell);
+
     struct DMSExport {
         enum Flags { Default            = 0 
                    , Append             = 1 << 0
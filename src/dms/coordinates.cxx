@@ -0,0 +1,174 @@
+#include "dms.hxx"
+#include "../dms.hxx"
+#include "../gzindex.hxx"
+#include <sqlite3.h>
+#include <string.h>
+#include <unistd.h>
+
+using namespace desres::msys;
+
+namespace {
+
+    /* sqlite handle on an existing DMS file, opened for update */
+    struct update_db {
+        std::string path;
+        std::unique_ptr<sqlite3, int(*)(sqlite3*)> handle{nullptr, sqlite3_close};
+        sqlite3* db = nullptr;
+
+        explicit update_db(std::string const& _path) : path(_path) {
+            if (::access(path.data(), W_OK)) {
+                MSYS_FAIL("Cannot update DMS file at '" << path << "': "
+                        << strerror(errno));
+            }
+            if (IsGzipFile(path)) {
+                MSYS_FAIL("Cannot update compressed DMS file at '" << path
+                        << "'");
+            }
+            int rc = sqlite3_open_v2(path.data(), &db, SQLITE_OPEN_READWRITE,
+                                     NULL);
+            handle.reset(db);
+            if (rc!=SQLITE_OK) fail("opening");
+            exec("pragma locking_mode=EXCLUSIVE");
+            /* keep the modified pages in memory until commit rather than
+             * spilling them to the file mid-transaction */
+            exec("pragma cache_size=-1048576");
+        }
+
+        [[noreturn]] void fail(const char* what) const {
+            MSYS_FAIL("Error " << what << " DMS file at '" << path << "': "
+                    << (db ? sqlite3_errmsg(db) : "out of memory"));
+        }
+
+        void exec(const char* sql) {
+            if (sqlite3_exec(db, sql, NULL, NULL, NULL)!=SQLITE_OK) {
+                fail("updating");
+            }
+        }
+
+        std::shared_ptr<sqlite3_stmt> prepare(std::string const& sql) {
+            sqlite3_stmt* stmt;
+            if (sqlite3_prepare_v2(db, sql.data(), -1, &stmt, NULL)) {
+                fail("updating");
+            }
+            return std::shared_ptr<sqlite3_stmt>(stmt, sqlite3_finalize);
+        }
+
+        /* rowids of the given table, in the order ImportDMS reads them.
+         * Without the order by, sqlite may answer from an index on the
+         * table and return the rowids in index order instead. */
+        std::vector<sqlite3_int64> rowids(const char* table) {
+            std::vector<sqlite3_int64> ids;
+            auto stmt = prepare(std::string("select rowid from ") + table
+                                 + " order by rowid");
+            int rc;
+            while ((rc=sqlite3_step(stmt.get()))==SQLITE_ROW) {
+                ids.push_back(sqlite3_column_int64(stmt.get(), 0));
+            }
+            if (rc!=SQLITE_DONE) fail("reading");
+            return ids;
+        }
+
+        /* update rows with ncols values per row taken from each of the
+         * non-NULL arrays in data, which are assigned to setcols */
+        void update(const char* table, std::string const& setcols,
+                    std::vector<sqlite3_int64> const& ids,
+                    std::vector<const double*> const& data, int ncols) {
+            auto stmt = prepare(std::string("update ") + table + " set "
+                    + setcols + " where rowid=?");
+            sqlite3_stmt* s = stmt.get();
+            const int nvals = ncols*data.size();
+            for (size_t i=0, n=ids.size(); i<n; i++) {
+                int col = 0;
+                for (const double* d : data) {
+                    for (int j=0; j<ncols; j++) {
+                        sqlite3_bind_double(s, ++col, d[ncols*i+j]);
+                    }
+                }
+                sqlite3_bind_int64(s, nvals+1, ids[i]);
+                if (sqlite3_step(s)!=SQLITE_DONE) fail("updating");
+                sqlite3_reset(s);
+            }
+        }
+    };
+}
+
+DMSCoordinates desres::msys::ReadDMSCoordinates(std::string const& path) {
+    DMSCoordinates coords;
+    try {
+        Sqlite dms = Sqlite::read(path);
+        Reader r = dms.fetch("particle", false);
+        if (!r.size()) MSYS_FAIL("Missing particle table");
+        int cols[6];
+        const char* names[6] = {"x", "y", "z", "vx", "vy", "vz"};
+        for (int i=0; i<6; i++) cols[i] = r.column(names[i]);
+        size_t n = dms.size("particle");
+        coords.pos.reserve(3*n);
+        coords.vel.reserve(3*n);
+        for (; r; r.next()) {
+            for (int i=0; i<3; i++) {
+                coords.pos.push_back(r.get_flt(cols[i]));
+            }
+            for (int i=3; i<6; i++) {
+                coords.vel.push_back(cols[i]<0 ? 0.0 : r.get_flt(cols[i]));
+            }
+        }
+        r = dms.fetch("global_cell");
+        if (r) {
+            int col[3] = {r.column("x"), r.column("y"), r.column("z")};
+            for (int i=0; i<3 && r; i++, r.next()) {
+                for (int j=0; j<3; j++) {
+                    coords.cell[3*i+j] = r.get_flt(col[j]);
+                }
+            }
+        }
+    }
+    catch (std::exception& e) {
+        MSYS_FAIL("Error reading coordinates from dms file at '" << path
+                << "': " << e.what());
+    }
+    return coords;
+}
+
+void desres::msys::UpdateDMSCoordinates(std::string const& path,
+                                        size_t natoms,
+                                        const double* pos,
+                                        const double* vel,
+                                        const double* cell) {
+    update_db db(path);
+    db.exec("begin");
+    try {
+        if (pos || vel) {
+            auto ids = db.rowids("particle");
+            if (ids.size()!=natoms) {
+                MSYS_FAIL("DMS file at '" << path << "' has " << ids.size()
+                        << " particles, but coordinates for " << natoms
+                        << " were given");
+            }
+            /* one pass over the table for both positions and velocities */
+            std::string setcols;
+            std::vector<const double*> data;
+            if (pos) {
+                setcols += "x=?,y=?,z=?";
+                data.push_back(pos);
+            }
+            if (vel) {
+                setcols += pos ? ",vx=?,vy=?,vz=?" : "vx=?,vy=?,vz=?";
+                data.push_back(vel);
+            }
+            db.update("particle", setcols, ids, data, 3);
+        }
+        if (cell) {
+            auto cellids = db.rowids("global_cell");
+            if (cellids.size()!=3) {
+                MSYS_FAIL("DMS file at '" << path << "' has "
+                        << cellids.size() << " rows in global_cell; expected 3");
+            }
+            db.update("global_cell", "x=?,y=?,z=?", cellids, {cell}, 3);
+        }
+    }
+    catch (std::exception&) {
+        sqlite3_exec(db.db, "rollback", NULL, NULL, NULL);
+        throw;
+    }
+    db.exec("commit");
+}
@@ -1,6 +1,6 @@
 #include "dms.hxx"
-#include "../istream.hxx"
 #include <sqlite3.h>
+#include <zlib.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
@@ -11,9 +11,12 @@
 #include <fstream>
 #include <cerrno>
 #include <iomanip>
+#include <algorithm>
+#include <climits>
 #include <unistd.h>
 
 #include <sys/stat.h>
+#include <sys/mman.h>
 #include <fcntl.h>
 
 using namespace desres::msys;
@@ -24,6 +27,7 @@ namespace {
         sqlite3_int64 size;
         sqlite3_int64 capacity;
         char * path;
+        bool mapped;    /* contents is a read-only mapping of the file */
 
         void write() const {
             if (!path) return;
@@ -60,7 +64,11 @@ namespace {
     int dms_xClose(sqlite3_file *file) {
         dms_file* dms = static_cast<dms_file*>(file);
         if (dms->contents) {
-            free(dms->contents);
+            if (dms->mapped) {
+                munmap(dms->contents, dms->size);
+            } else {
+                free(dms->contents);
+            }
             dms->contents = NULL;
         }
         if (dms->path) {
@@ -88,6 +96,16 @@ namespace {
     int dms_xWrite(sqlite3_file*file, const void*pBuf, int iAmt, sqlite3_int64 offset) {
         dms_file *dms = (dms_file *)file;
         sqlite3_int64 last=offset+iAmt;
+        if (dms->mapped) {
+            /* make a private copy before modifying a mapped file */
+            char* buf = (char *)malloc(dms->size);
+            if (!buf) return SQLITE_NOMEM;
+            memcpy(buf, dms->contents, dms->size);
+            munmap(dms->contents, dms->size);
+            dms->contents = buf;
+            dms->capacity = dms->size;
+            dms->mapped = false;
+        }
         if (dms->capacity < last) {
             dms->capacity = last * 1.5;
             dms->contents = (char *)realloc(dms->contents, dms->capacity);
@@ -137,31 +155,88 @@ namespace {
         dms_xDeviceCharacteristics //int (*xDeviceCharacteristics)(sqlite3_file*);
     };
 
-    /* if buf looks like gzipped data, decompress it, and update *sz.  
-     * Return buf, which may now point to new space. */
-    char* maybe_decompress(char* buf, sqlite3_int64 *sz) {
-        if (*sz<2) return buf;
-        /* check for gzip magic number */
-        unsigned char s0 = buf[0];
-        unsigned char s1 = buf[1];
-        if (s0==0x1f && s1==0x8b) {
-            std::istringstream file;
-            //this ought to work but doesn't, at least on MacOS.
-            //file.rdbuf()->pubsetbuf(buf, *sz);
-            file.str(std::string(buf, buf+*sz));    // extra copy :(
-            std::unique_ptr<istream> in(istream::wrap(file));
-            char tmp[16384];
-            std::vector<char> contents;
+    bool is_gzip(const void* buf, sqlite3_int64 sz) {
+        const unsigned char* s = (const unsigned char *)buf;
+        return sz>=2 && s[0]==0x1f && s[1]==0x8b;
+    }
+
+    /* The last four bytes of a gzip file hold the uncompressed size of
+     * its last member, modulo 2^32.  That's exact for the files we write,
+     * and otherwise just a starting point for the output buffer. */
+    sqlite3_int64 gzip_size_hint(const unsigned char* trailer) {
+        return  (sqlite3_int64)trailer[0]
+             | ((sqlite3_int64)trailer[1] <<  8)
+             | ((sqlite3_int64)trailer[2] << 16)
+             | ((sqlite3_int64)trailer[3] << 24);
+    }
+
+    /* Decompress gzip data directly into a single malloc'd buffer, which
+     * is returned with its size in *sz.  read(buf, n) supplies up to n
+     * bytes of compressed input and returns 0 at the end of the input.
+     * Concatenated gzip members are decompressed in sequence. */
+    template <typename Reader>
+    char* gunzip(Reader read, sqlite3_int64 hint, sqlite3_int64* sz) {
+        z_stream strm;
+        memset(&strm, 0, sizeof(strm));
+        if (inflateInit2(&strm, 16+MAX_WBITS)!=Z_OK) {
+            MSYS_FAIL("Failed initializing zlib stream");
+        }
+        sqlite3_int64 capacity = std::max(hint, (sqlite3_int64)16384);
+        sqlite3_int64 size = 0;
+        char* out = (char *)malloc(capacity);
+        unsigned char in[65536];
+        bool ended = false;
+        try {
+            if (!out) {
+                MSYS_FAIL("Failed to allocate buffer of size " << capacity
+                        << " for decompressed DMS contents");
+            }
             for (;;) {
-                auto rc = in->read(tmp, sizeof(tmp));
-                if (rc<=0) break;
-                contents.insert(contents.end(), tmp, tmp+rc);
+                if (!strm.avail_in) {
+                    strm.avail_in = read(in, sizeof(in));
+                    strm.next_in = in;
+                    if (!strm.avail_in) break;
+                }
+                if (ended) {
+                    /* another gzip member follows */
+                    inflateReset(&strm);
+                    ended = false;
+                }
+                if (size==capacity) {
+                    capacity *= 2;
+                    char* tmp = (char *)realloc(out, capacity);
+                    if (!tmp) {
+                        MSYS_FAIL("Failed to allocate buffer of size "
+                                << capacity << " for decompressed DMS contents");
+                    }
+                    out = tmp;
+                }
+                uInt avail = std::min(capacity-size, (sqlite3_int64)UINT_MAX);
+                strm.next_out = (unsigned char *)out + size;
+                strm.avail_out = avail;
+                int rc = inflate(&strm, Z_NO_FLUSH);
+                size += avail - strm.avail_out;
+                if (rc==Z_STREAM_END) {
+                    ended = true;
+                } else if (rc!=Z_OK && rc!=Z_BUF_ERROR) {
+                    MSYS_FAIL("Reading zlib stream failed with rc " << rc
+                            << ": " << (strm.msg ? strm.msg : ""));
+                }
             }
-            *sz = contents.size();
-            buf = (char *)realloc(buf, contents.size());
-            memcpy(buf, contents.data(), contents.size());
+            if (!ended) MSYS_FAIL("Unexpected end of gzipped DMS contents");
         }
-        return buf;
+        catch (std::exception&) {
+            inflateEnd(&strm);
+            free(out);
+            throw;
+        }
+        inflateEnd(&strm);
+        if (size>0 && size<capacity) {
+            char* tmp = (char *)realloc(out, size);
+            if (tmp) out = tmp;
+        }
+        *sz = size;
+        return out;
     }
 
     struct dms_vfs : sqlite3_vfs {
@@ -182,6 +257,7 @@ namespace {
             dms_file *dms = (dms_file *)file;
             dms->pMethods = &iomethods;
             dms->path = NULL;
+            dms->mapped = false;
             if (flags & SQLITE_OPEN_CREATE) {
                 dms->contents = NULL;
                 dms->size = 0;
@@ -254,43 +330,66 @@ Sqlite Sqlite::read(std::string const& path, bool unbuffered) {
         MSYS_FAIL("Getting size of DMS file at '" << path << "': " << strerror(_errno));
     }
 
-    ssize_t tmpsize = statbuf->st_size;
-    if (tmpsize==0) {
+    sqlite3_int64 filesize = statbuf->st_size;
+    if (filesize==0) {
         close(fd);
         MSYS_FAIL("DMS file at '" << path << "' has zero size");
     }
-    char* tmpbuf = (char *)malloc(tmpsize);
-    if (!tmpbuf) {
-        close(fd);
-        MSYS_FAIL("Failed to allocate read buffer for DMS file at '" << path
-           << "' of size " << tmpsize);
-    }
-    ssize_t sz = tmpsize;
-    char* ptr = tmpbuf;
-    while (sz) {
-        errno = 0;
-        ssize_t rc = ::read(fd, ptr, sz);
-        if (rc<0 || (rc==0 && errno!=0)) {
-            std::string errmsg = strerror(errno);
+
+    /* Uncompressed files are mapped rather than read.  Gzipped files
+     * are decompressed as they are read into a buffer sized from the
+     * gzip trailer. */
+    char* contents = NULL;
+    sqlite3_int64 size = filesize;
+    bool mapped = false;
+    unsigned char magic[2];
+    if (pread(fd, magic, 2, 0)==2 && is_gzip(magic, 2)) {
+        sqlite3_int64 hint = 0;
+        unsigned char trailer[4];
+        if (filesize>=18 && pread(fd, trailer, 4, filesize-4)==4) {
+            hint = gzip_size_hint(trailer);
+        }
+        auto reader = [&](unsigned char* buf, size_t n) -> size_t {
+            for (;;) {
+                ssize_t rc = ::read(fd, buf, n);
+                if (rc>=0) return rc;
+                if (errno!=EINTR) {
+                    MSYS_FAIL("Error reading DMS contents at " << path
+                            << ": " << strerror(errno));
+                }
+            }
+        };
+        try {
+            contents = gunzip(reader, hint, &size);
+        }
+        catch (std::exception&) {
             close(fd);
-            free(tmpbuf);
-            MSYS_FAIL("Error reading DMS contents at " << path 
-                    << ": " << errmsg);
+            throw;
         }
-        sz -= rc;
-        ptr += rc;
+    } else {
+        void* ptr = mmap(NULL, filesize, PROT_READ, MAP_PRIVATE, fd, 0);
+        if (ptr==MAP_FAILED) {
+            int _errno = errno;
+            close(fd);
+            MSYS_FAIL("Mapping DMS file at '" << path << "': "
+                    << strerror(_errno));
+        }
+        contents = (char *)ptr;
+        mapped = true;
     }
     close(fd);
     int rc = sqlite3_open_v2( "::dms::", &db, SQLITE_OPEN_READONLY, 
             vfs->zName);
     if (rc!=SQLITE_OK) {
-        free(tmpbuf);
+        if (mapped) munmap(contents, size);
+        else free(contents);
         MSYS_FAIL(sqlite3_errmsg(db));
     }
     dms_file* dms;
     sqlite3_file_control(db, "main", SQLITE_FCNTL_FILE_POINTER, &dms);
-    dms->size = tmpsize;
-    dms->contents = maybe_decompress(tmpbuf, &dms->size);
+    dms->size = size;
+    dms->contents = contents;
+    dms->mapped = mapped;
     return std::shared_ptr<sqlite3>(db, sqlite3_close);
 }
 
@@ -298,10 +397,24 @@ Sqlite Sqlite::read_bytes(const void* bytes, int64_t len ) {
     sqlite3* db;
     sqlite3_vfs_register(vfs, 0);
 
-    ssize_t tmpsize = len;
-    char* tmpbuf = (char *)malloc(len);
-    if (!tmpbuf) MSYS_FAIL("Failed to allocate read buffer for DMS file of size " << len);
-    memcpy(tmpbuf, bytes, len);
+    sqlite3_int64 tmpsize = len;
+    char* tmpbuf;
+    if (is_gzip(bytes, len)) {
+        const unsigned char* ptr = (const unsigned char *)bytes;
+        const unsigned char* end = ptr + len;
+        sqlite3_int64 hint = len>=18 ? gzip_size_hint(end-4) : 0;
+        auto reader = [&](unsigned char* buf, size_t n) -> size_t {
+            n = std::min(n, (size_t)(end-ptr));
+            memcpy(buf, ptr, n);
+            ptr += n;
+            return n;
+        };
+        tmpbuf = gunzip(reader, hint, &tmpsize);
+    } else {
+        tmpbuf = (char *)malloc(len);
+        if (!tmpbuf) MSYS_FAIL("Failed to allocate read buffer for DMS file of size " << len);
+        memcpy(tmpbuf, bytes, len);
+    }
     int rc = sqlite3_open_v2( "::dms::", &db, SQLITE_OPEN_READONLY, 
             vfs->zName);
     if (rc!=SQLITE_OK) {
@@ -311,7 +424,7 @@ Sqlite Sqlite::read_bytes(const void* bytes, int64_t len ) {
     dms_file* dms;
     sqlite3_file_control(db, "main", SQLITE_FCNTL_FILE_POINTER, &dms);
     dms->size = tmpsize;
-    dms->contents = maybe_decompress(tmpbuf, &dms->size);
+    dms->contents = tmpbuf;
     return std::shared_ptr<sqlite3>(db, sqlite3_close);
 }
 
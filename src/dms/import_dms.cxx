@@ -209,7 +209,34 @@ static void read_table( Sqlite dms,
     }
 }
 
-static void read_metatables(Sqlite dms, System& sys, KnownSet& known) {
+/* Read the term tables with the given names now, defer them until they
+ * are fetched, or skip them, according to opts. */
+static void load_tables(System& sys, DMSImportOptions const& opts,
+                        std::vector<String> const& names,
+                        std::function<void(System&)> loader) {
+    bool selected = !opts.lazy_tables;
+    if (opts.select_tables) {
+        selected = false;
+        for (auto const& name : names) {
+            if (opts.tables.count(name)) selected = true;
+        }
+    }
+    if (selected) {
+        loader(sys);
+    } else if (opts.lazy_tables) {
+        sys.addLazyTables(names, std::move(loader));
+    }
+}
+
+/* mark the dms tables read by read_table as known without reading them */
+static void skip_table(Sqlite dms, const std::string& table, KnownSet& known) {
+    known.insert(table + "_term");
+    known.insert(table + "_param");
+    if (!dms.has(table + "_term")) known.insert(table);
+}
+
+static void read_metatables(Sqlite dms, System& sys, KnownSet& known,
+                            DMSImportOptions const& opts) {
     static const char * categories[] = { 
         "bond", "constraint", "virtual", "polar" 
     };
@@ -222,7 +249,12 @@ static void read_metatables(Sqlite dms, System& sys, KnownSet& known) {
             int col=r.column("name");
             for (; r; r.next()) {
                 std::string table = r.get_str(col);
-                read_table( dms, sys, category, table, known );
+                skip_table(dms, table, known);
+                load_tables(sys, opts, {table},
+                        [dms, category, table](System& sys) {
+                    KnownSet known;
+                    read_table( dms, sys, category, table, known );
+                });
             }
         }
     }
@@ -234,7 +266,12 @@ static void read_metatables(Sqlite dms, System& sys, KnownSet& known) {
         int col=r.column("name");
         for (; r; r.next()) {
             std::string table = r.get_str(col);
-            read_table( dms, sys, category, table, known );
+            skip_table(dms, table, known);
+            load_tables(sys, opts, {table},
+                    [dms, category, table](System& sys) {
+                KnownSet known;
+                read_table( dms, sys, category, table, known );
+            });
         }
     }
 }
@@ -275,7 +312,7 @@ read_nonbonded( Sqlite dms, System& sys,
         int P0 = r.column("p0");
         int TYPEA = r.column("nbtypeA");
         int TYPEB = r.column("nbtypeB");
-        /* chargeA gets treated specially: it overrides particle.charge */
+        /* chargeA is applied by read_alchemical_charges */
         int CHARGEA = r.column("chargeA");
 
         if (P0<0 || TYPEA<0 || TYPEB<0) {
@@ -304,12 +341,6 @@ read_nonbonded( Sqlite dms, System& sys,
             Id paramB = r.get_int(TYPEB);
             Id term = alc->addTerm(atoms, idmap.at(paramB));
 
-            /* override charge */
-            if (CHARGEA>=0) {
-                atom_t& atm = sys.atom(atoms[0]);
-                atm.charge = r.get_flt(CHARGEA);
-            }
-
             /* add the rest as term properties */
             for (Id i=0; i<termprops.size(); i++) {
                 read(r, termprops[i], alc->termPropValue(term, i));
@@ -318,6 +349,24 @@ read_nonbonded( Sqlite dms, System& sys,
     }
 }
 
+/* chargeA in the alchemical_particle table overrides particle.charge.
+ * This is applied even when the nonbonded tables are deferred. */
+static void read_alchemical_charges(Sqlite dms, System& sys) {
+    Reader r = dms.fetch("alchemical_particle");
+    if (!r.size()) return;
+    int P0 = r.column("p0");
+    int CHARGEA = r.column("chargeA");
+    if (P0<0) throw std::runtime_error("malformed alchemical_particle table");
+    if (CHARGEA<0) return;
+    for (; r; r.next()) {
+        int p0 = r.get_int(P0);
+        if (!sys.hasAtom(p0)) {
+            MSYS_FAIL("alchemical_particle table has bad p0 '" << p0 << "'");
+        }
+        sys.atom(p0).charge = r.get_flt(CHARGEA);
+    }
+}
+
 static void 
 read_combined( Sqlite dms, System& sys, KnownSet& known ) {
 
@@ -575,8 +624,7 @@ static void check_dms_version(Sqlite dms, KnownSet& known) {
     }
 }
 
-static SystemPtr import_dms( Sqlite dms, bool structure_only, 
-                                         bool without_tables ) {
+static SystemPtr import_dms( Sqlite dms, DMSImportOptions const& opts ) {
 
     SystemPtr h = System::create();
     System& sys = *h;
@@ -644,6 +692,9 @@ static SystemPtr import_dms( Sqlite dms, bool structure_only,
     ExtraMap extra;
     for (int i=0, n=r.size(); i<n; i++) {
         if (handled.count(i)) continue;
+        if (opts.select_atom_props && !opts.atom_props.count(r.name(i))) {
+            continue;
+        }
         extra[i]=r.type(i);
         sys.addAtomProp(r.name(i), extra[i]);
     }
@@ -718,16 +769,43 @@ static SystemPtr import_dms( Sqlite dms, bool structure_only,
     read_cell(dms, sys, known);
     read_provenance(dms, sys, known);
 
-    if (!without_tables) {
-        read_metatables(dms, sys, known);
-        read_nonbonded(dms, sys, nbtypes, known);
-        read_combined(dms, sys, known);
-        read_exclusions(dms, sys, known);
+    if (!opts.without_tables) {
+        read_metatables(dms, sys, known, opts);
+
+        known.insert("nonbonded_param");
+        known.insert("alchemical_particle");
+        known.insert("nonbonded_combined_param");
+        if (dms.fetch("nonbonded_param")) {
+            std::vector<String> names(1, "nonbonded");
+            if (dms.fetch("alchemical_particle").size()) {
+                names.push_back("alchemical_nonbonded");
+                read_alchemical_charges(dms, sys);
+            }
+            load_tables(sys, opts, names, [dms, nbtypes](System& sys) {
+                KnownSet known;
+                read_nonbonded(dms, sys, nbtypes, known);
+                read_combined(dms, sys, known);
+            });
+        } else {
+            /* fails if there are combined params */
+            read_combined(dms, sys, known);
+        }
+
+        known.insert("exclusion");
+        known.insert("exclusion_term");
+        known.insert("exclusion_param");
+        if (dms.fetch("exclusion")) {
+            load_tables(sys, opts, {"exclusion"}, [dms](System& sys) {
+                KnownSet known;
+                read_exclusions(dms, sys, known);
+            });
+        }
+
         read_nbinfo(dms, sys, known);
         read_extra(dms, sys, known);
     }
 
-    if (structure_only) {
+    if (opts.structure_only) {
         // clone the non-pseudos if any pseudos were loaded.
         IdList ids;
         const Id n=sys.maxAtomId();
@@ -747,6 +825,14 @@ static SystemPtr import_dms( Sqlite dms, bool structure_only,
     return h;
 }
 
+static DMSImportOptions import_options(bool structure_only,
+                                       bool without_tables) {
+    DMSImportOptions opts;
+    opts.structure_only = structure_only;
+    opts.without_tables = without_tables;
+    return opts;
+}
+
 namespace {
 
     class iterator : public LoadIterator {
@@ -835,7 +921,7 @@ SystemPtr iterator::next() {
     SystemPtr mol;
     try {
         Sqlite dms = Sqlite::read_bytes(ptr, dbsize);
-        mol = import_dms(dms, structure_only, without_tables);
+        mol = import_dms(dms, import_options(structure_only, without_tables));
     }
     catch (std::exception& e) {
         munmap(ptr, dbsize);
@@ -854,10 +940,15 @@ SystemPtr iterator::next() {
 SystemPtr desres::msys::ImportDMS(const std::string& path, 
                                   bool structure_only,
                                   bool without_tables) {
+    return ImportDMS(path, import_options(structure_only, without_tables));
+}
+
+SystemPtr desres::msys::ImportDMS(const std::string& path,
+                                  DMSImportOptions const& opts) {
     SystemPtr sys;
     try {
         Sqlite dms = Sqlite::read(path);
-        sys = import_dms(dms, structure_only, without_tables);
+        sys = import_dms(dms, opts);
     }
     catch (std::exception& e) {
         std::stringstream ss;
@@ -874,7 +965,7 @@ SystemPtr desres::msys::ImportDMSFromBytes( const char* bytes, int64_t len,
     SystemPtr sys;
     try {
         Sqlite dms = Sqlite::read_bytes(bytes, len);
-        sys = import_dms(dms, structure_only, without_tables);
+        sys = import_dms(dms, import_options(structure_only, without_tables));
     }
     catch (std::exception& e) {
         std::stringstream ss;
@@ -890,7 +981,7 @@ SystemPtr desres::msys::sqlite::ImportDMS(sqlite3* db,
                                   bool structure_only,
                                   bool without_tables) {
     Sqlite dms(std::shared_ptr<sqlite3>(db,no_close));
-    return import_dms(dms, structure_only, without_tables);
+    return import_dms(dms, import_options(structure_only, without_tables));
 }
 
 LoadIteratorPtr desres::msys::DMSIterator(std::string const& path,
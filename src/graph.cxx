@@ -15,13 +15,14 @@ std::string Graph::hash(SystemPtr sys, IdList const& atoms){
     std::vector<Id> countmap(max_atomic_number,0);
     int biggest=0;
     Id bcount=0;
+    AdjacencyPtr adj = sys->adjacency();
     for (Id id : atoms){
         int anum=sys->atom(id).atomic_number;
         if (anum < 1) continue;
         ++countmap.at(anum);
-        const IdList& bonded = sys->bondedAtoms(id);
-        for (unsigned i = 0; i < bonded.size(); ++i) {
-            if (sys->atom(bonded[i]).atomic_number != 0)
+        for (Id const* j=adj->neighborsBegin(id), *e=adj->neighborsEnd(id);
+             j!=e; ++j) {
+            if (sys->atomFAST(*j).atomic_number != 0)
                 ++bcount;
         }
         if (anum>biggest) biggest=anum;
@@ -57,6 +58,7 @@ Graph::Graph(SystemPtr sys, const IdList& atoms, const IdList& colors) {
     }
 
     _sys = sys;
+    AdjacencyPtr adj = sys->adjacency();
     attrHash hash_to_idx;
     countMap count_to_idx;
     msys::MultiIdList freq_partition;
@@ -74,7 +76,7 @@ Graph::Graph(SystemPtr sys, const IdList& atoms, const IdList& colors) {
         }
         if (color<1) continue;
         colormap[id] = color;
-        std::pair<Id,Id> key(color, sys->bondCountForAtom(id));
+        std::pair<Id,Id> key(color, adj->degree(id));
         attrHash::iterator ihash=hash_to_idx.lower_bound(key);
         if (ihash==hash_to_idx.end() || hash_to_idx.key_comp()(key, ihash->first) ){
            ihash=hash_to_idx.insert(ihash, attrHash::value_type(key, freq_partition.size()));
@@ -99,7 +101,7 @@ Graph::Graph(SystemPtr sys, const IdList& atoms, const IdList& colors) {
             _nodes.push_back(Node());
             Node& node = _nodes.back();
             node.nnbr = prefix_deg;
-            prefix_deg += sys->bondCountForAtom(id);
+            prefix_deg += adj->degree(id);
         }
     }
     _nbrs.resize(prefix_deg);
@@ -114,8 +116,9 @@ Graph::Graph(SystemPtr sys, const IdList& atoms, const IdList& colors) {
             node.nbr = &_nbrs[node.nnbr];
             node.nnbr = 0;
             int degree = 0;
-            IdList const& bonded = sys->bondedAtoms(id);
-            for (Id other : bonded) {
+            for (Id const* j=adj->neighborsBegin(id),
+                          *e=adj->neighborsEnd(id); j!=e; ++j) {
+                Id other = *j;
                 if (colormap.find(other) != colormap.end()) {
                     if (colormap[other] == 0) continue;
                 }
@@ -0,0 +1,282 @@
+#include "gzindex.hxx"
+#include <zlib.h>
+#include <stdio.h>
+#include <string.h>
+#include <errno.h>
+#include <algorithm>
+
+using namespace desres::msys;
+
+namespace {
+
+    const size_t WINSIZE = 32768;
+    const size_t CHUNK = 16384;
+    const char MAGIC[8] = {'M','S','Y','S','G','Z','I',1};
+
+    std::shared_ptr<FILE> open_file(std::string const& path, const char* mode) {
+        FILE* fp = fopen(path.data(), mode);
+        if (!fp) MSYS_FAIL("Could not open " << path << ": " << strerror(errno));
+        return std::shared_ptr<FILE>(fp, fclose);
+    }
+
+    /* inflate state which is released on scope exit */
+    struct inflater {
+        z_stream strm;
+        explicit inflater(int window_bits) {
+            memset(&strm, 0, sizeof(strm));
+            if (inflateInit2(&strm, window_bits)!=Z_OK) {
+                MSYS_FAIL("Failed initializing zlib stream");
+            }
+        }
+        ~inflater() { inflateEnd(&strm); }
+    };
+
+    std::string compress_window(const unsigned char* window) {
+        uLongf len = compressBound(WINSIZE);
+        std::string buf(len, '\0');
+        if (compress((Bytef*)&buf[0], &len, window, WINSIZE)!=Z_OK) {
+            MSYS_FAIL("Failed compressing gzip index window");
+        }
+        buf.resize(len);
+        return buf;
+    }
+
+    void uncompress_window(std::string const& buf, unsigned char* window) {
+        uLongf len = WINSIZE;
+        if (uncompress(window, &len, (const Bytef*)buf.data(), buf.size())!=Z_OK
+                || len!=WINSIZE) {
+            MSYS_FAIL("Corrupt window in gzip index");
+        }
+    }
+
+    template <typename T>
+    void write_value(FILE* fp, T const& v) {
+        if (fwrite(&v, sizeof(v), 1, fp)!=1) {
+            MSYS_FAIL("Writing gzip index: " << strerror(errno));
+        }
+    }
+
+    template <typename T>
+    void read_value(FILE* fp, T& v) {
+        if (fread(&v, sizeof(v), 1, fp)!=1) {
+            MSYS_FAIL("Reading gzip index: unexpected end of file");
+        }
+    }
+}
+
+namespace desres { namespace msys {
+
+    bool IsGzipFile(std::string const& path) {
+        auto fp = open_file(path, "rb");
+        unsigned char buf[2];
+        return fread(buf, 1, 2, fp.get())==2 && buf[0]==0x1f && buf[1]==0x8b;
+    }
+
+    GzipIndexPtr GzipIndex::build(std::string const& path, size_t span) {
+        auto fp = open_file(path, "rb");
+        GzipIndexPtr index(new GzipIndex);
+        std::vector<point_t>& points = index->_points;
+
+        unsigned char input[CHUNK];
+        unsigned char window[WINSIZE] = {0};
+        inflater z(47);     /* gzip or zlib header, 32k window */
+        z_stream& strm = z.strm;
+        strm.avail_out = 0;
+
+        uint64_t totin = 0, totout = 0, last = 0;
+        bool eof = false;
+        bool ended = false; /* at the end of a gzip member */
+
+        for (;;) {
+            if (strm.avail_in==0 && !eof) {
+                size_t n = fread(input, 1, CHUNK, fp.get());
+                if (ferror(fp.get())) {
+                    MSYS_FAIL("Reading " << path << ": " << strerror(errno));
+                }
+                eof = n==0;
+                strm.avail_in = n;
+                strm.next_in = input;
+            }
+            if (ended) {
+                if (strm.avail_in==0) break;
+                /* another member follows; it can be decompressed
+                 * without a window */
+                if (points.empty() || totout - last > span) {
+                    points.push_back({totout, totin, -1, std::string()});
+                    last = totout;
+                }
+                ended = false;
+            }
+            if (strm.avail_out==0) {
+                strm.avail_out = WINSIZE;
+                strm.next_out = window;
+            }
+
+            totin += strm.avail_in;
+            totout += strm.avail_out;
+            int rc = inflate(&strm, Z_BLOCK);
+            totin -= strm.avail_in;
+            totout -= strm.avail_out;
+
+            if (rc==Z_STREAM_END) {
+                if (inflateReset(&strm)!=Z_OK) {
+                    MSYS_FAIL("Failed resetting zlib stream");
+                }
+                ended = true;
+                continue;
+            }
+            if (rc==Z_BUF_ERROR && eof) {
+                MSYS_FAIL("Reading " << path << ": unexpected end of gzip file");
+            }
+            if (rc!=Z_OK && rc!=Z_BUF_ERROR) {
+                MSYS_FAIL("Reading " << path << ": zlib error " << rc
+                        << (strm.msg ? std::string(": ")+strm.msg : ""));
+            }
+
+            /* at the end of a deflate block which isn't the last one in
+             * its member, checkpoint if we've gone far enough */
+            if ((strm.data_type & 128) && !(strm.data_type & 64) &&
+                (totout==0 || totout - last > span)) {
+                /* the window is circular; the oldest output begins at
+                 * the next position to be written */
+                unsigned char linear[WINSIZE];
+                size_t left = strm.avail_out;
+                memcpy(linear, window + WINSIZE - left, left);
+                memcpy(linear + left, window, WINSIZE - left);
+                points.push_back({totout, totin, strm.data_type & 7,
+                                  compress_window(linear)});
+                last = totout;
+            }
+        }
+        index->_size = totout;
+        index->_csize = totin;
+        return index;
+    }
+
+    void GzipIndex::save(std::string const& gzi_path) const {
+        auto fp = open_file(gzi_path, "wb");
+        if (fwrite(MAGIC, sizeof(MAGIC), 1, fp.get())!=1) {
+            MSYS_FAIL("Writing gzip index: " << strerror(errno));
+        }
+        write_value(fp.get(), uint64_t(_points.size()));
+        write_value(fp.get(), _size);
+        write_value(fp.get(), _csize);
+        for (auto const& p : _points) {
+            write_value(fp.get(), p.out);
+            write_value(fp.get(), p.in);
+            write_value(fp.get(), p.bits);
+            write_value(fp.get(), uint32_t(p.window.size()));
+            if (!p.window.empty() &&
+                fwrite(p.window.data(), p.window.size(), 1, fp.get())!=1) {
+                MSYS_FAIL("Writing gzip index: " << strerror(errno));
+            }
+        }
+    }
+
+    GzipIndexPtr GzipIndex::load(std::string const& gzi_path) {
+        auto fp = open_file(gzi_path, "rb");
+        char magic[sizeof(MAGIC)];
+        if (fread(magic, sizeof(magic), 1, fp.get())!=1 ||
+            memcmp(magic, MAGIC, sizeof(MAGIC))) {
+            MSYS_FAIL(gzi_path << " is not a gzip index");
+        }
+        GzipIndexPtr index(new GzipIndex);
+        uint64_t n;
+        read_value(fp.get(), n);
+        read_value(fp.get(), index->_size);
+        read_value(fp.get(), index->_csize);
+        index->_points.resize(n);
+        for (auto& p : index->_points) {
+            uint32_t len;
+            read_value(fp.get(), p.out);
+            read_value(fp.get(), p.in);
+            read_value(fp.get(), p.bits);
+            read_value(fp.get(), len);
+            p.window.resize(len);
+            if (len && fread(&p.window[0], len, 1, fp.get())!=1) {
+                MSYS_FAIL("Reading gzip index: unexpected end of file");
+            }
+        }
+        return index;
+    }
+
+    size_t GzipIndex::read(std::string const& path, uint64_t offset,
+                           char* buf, size_t len) const {
+        if (offset>=_size || len==0) return 0;
+        len = std::min<uint64_t>(len, _size - offset);
+
+        /* last checkpoint at or before offset */
+        point_t start = {0, 0, -1, std::string()};
+        auto iter = std::upper_bound(_points.begin(), _points.end(), offset,
+                [](uint64_t off, point_t const& p) { return off < p.out; });
+        if (iter!=_points.begin()) start = *(iter-1);
+
+        auto fp = open_file(path, "rb");
+        if (fseeko(fp.get(), start.in - (start.bits>0 ? 1 : 0), SEEK_SET)) {
+            MSYS_FAIL("Seeking in " << path << ": " << strerror(errno));
+        }
+        bool raw = start.bits>=0;
+        inflater z(raw ? -15 : 47);
+        z_stream& strm = z.strm;
+        if (raw) {
+            if (start.bits) {
+                int c = getc(fp.get());
+                if (c==EOF) MSYS_FAIL("Reading " << path << ": unexpected end of file");
+                inflatePrime(&strm, start.bits, c >> (8 - start.bits));
+            }
+            unsigned char window[WINSIZE];
+            uncompress_window(start.window, window);
+            inflateSetDictionary(&strm, window, WINSIZE);
+        }
+
+        unsigned char input[CHUNK];
+        auto fill = [&]() {
+            if (strm.avail_in) return true;
+            strm.avail_in = fread(input, 1, CHUNK, fp.get());
+            strm.next_in = input;
+            if (ferror(fp.get())) {
+                MSYS_FAIL("Reading " << path << ": " << strerror(errno));
+            }
+            return strm.avail_in>0;
+        };
+
+        /* decompress n bytes into out; returns the number produced */
+        auto produce = [&](unsigned char* out, size_t n) -> size_t {
+            strm.next_out = out;
+            strm.avail_out = n;
+            while (strm.avail_out) {
+                if (!fill()) break;
+                int rc = inflate(&strm, Z_NO_FLUSH);
+                if (rc==Z_STREAM_END) {
+                    if (raw) {
+                        /* skip the member's crc and length */
+                        for (int k=0; k<8; k++) {
+                            if (!fill()) break;
+                            ++strm.next_in;
+                            --strm.avail_in;
+                        }
+                        raw = false;
+                    }
+                    if (inflateReset2(&strm, 47)!=Z_OK) {
+                        MSYS_FAIL("Failed resetting zlib stream");
+                    }
+                    continue;
+                }
+                if (rc!=Z_OK && rc!=Z_BUF_ERROR) {
+                    MSYS_FAIL("Reading " << path << ": zlib error " << rc
+                            << (strm.msg ? std::string(": ")+strm.msg : ""));
+                }
+            }
+            return n - strm.avail_out;
+        };
+
+        unsigned char discard[WINSIZE];
+        for (uint64_t skip = offset - start.out; skip;) {
+            size_t n = std::min<uint64_t>(skip, WINSIZE);
+            if (produce(discard, n)!=n) return 0;
+            skip -= n;
+        }
+        return produce((unsigned char*)buf, len);
+    }
+
+}}
@@ -0,0 +1,63 @@
+#ifndef desres_msys_gzindex_hxx
+#define desres_msys_gzindex_hxx
+
+#include "types.hxx"
+#include <memory>
+
+namespace desres { namespace msys {
+
+    class GzipIndex;
+    typedef std::shared_ptr<GzipIndex> GzipIndexPtr;
+
+    /* Random access into gzip files.  While scanning the file once,
+     * the decompressor state is checkpointed at deflate block boundaries
+     * roughly every span bytes of uncompressed output: the position in
+     * the compressed file, and the 32k window of preceding output needed
+     * to resume decompression there.  A read at any offset then starts
+     * from the nearest preceding checkpoint, so it decompresses at most
+     * about span extra bytes.  Files made of several concatenated gzip
+     * members are supported. */
+    class GzipIndex {
+        struct point_t {
+            uint64_t out;       /* offset in uncompressed data */
+            uint64_t in;        /* offset in compressed file */
+            int32_t bits;       /* bits of in-1 belonging to the block;
+                                   -1 for the start of a gzip member */
+            std::string window; /* deflate-compressed 32k window */
+        };
+        std::vector<point_t> _points;
+        uint64_t _size = 0;     /* uncompressed size */
+        uint64_t _csize = 0;    /* compressed size */
+
+    public:
+        /* Scan the gzip file at path, adding a checkpoint every span
+         * bytes of uncompressed output. */
+        static GzipIndexPtr build(std::string const& path,
+                                  size_t span = 1<<22);
+
+        /* Read an index written by save() */
+        static GzipIndexPtr load(std::string const& gzi_path);
+        void save(std::string const& gzi_path) const;
+
+        /* size of the uncompressed contents */
+        uint64_t size() const { return _size; }
+
+        /* size of the gzip file which was indexed */
+        uint64_t compressedSize() const { return _csize; }
+
+        /* number of checkpoints */
+        size_t npoints() const { return _points.size(); }
+
+        /* Read up to len bytes of uncompressed data at offset from the
+         * indexed gzip file at path into buf.  Returns the number of
+         * bytes read, which is less than len only at end of file. */
+        size_t read(std::string const& path, uint64_t offset,
+                    char* buf, size_t len) const;
+    };
+
+    /* true if the file at path starts with the gzip magic number */
+    bool IsGzipFile(std::string const& path);
+
+}}
+
+#endif
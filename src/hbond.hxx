@@ -2,6 +2,9 @@
 #define desres_msys_hbond_hxx
 
 #include "geom.hxx"
+#include "contacts.hxx"
+#include "parallel.hxx"
+#include <vector>
 
 namespace desres { namespace msys { 
 
@@ -77,6 +80,126 @@ namespace desres { namespace msys {
             return Er * Ep * Et;
         }
     };
+
+    /* A hydrogen bond found by FindHydrogenBonds */
+    struct hbond_t {
+        Id frame;
+        Id donor;
+        Id acceptor;
+        Id hydrogen;
+        double r;       /* donor-acceptor distance */
+        double p;       /* donor-hydrogen-acceptor angle */
+        double energy;  /* HydrogenBond::energy() */
+    };
+
+    namespace details {
+        template <typename Float, typename Exclude>
+        struct hbond_output {
+            const Float* pos;
+            Id frame;
+            std::vector<int> const& index;  /* donor id -> donor index */
+            const Id* hoff;
+            const Id* hyds;
+            Exclude const& excl;
+            std::vector<hbond_t>* result;
+
+            bool exclude(Id d, Id a) const { return excl(d,a); }
+
+            void operator()(Id d, Id a, Float) const {
+                const Float* ap = pos+3*a;
+                const int di = index[d];
+                Id hyd = BadId;
+                Float hmin = 0;
+                for (Id k=hoff[di], e=hoff[di+1]; k<e; k++) {
+                    const Id h = hyds[k];
+                    const Float* hp = pos+3*h;
+                    Float dx = hp[0]-ap[0];
+                    Float dy = hp[1]-ap[1];
+                    Float dz = hp[2]-ap[2];
+                    Float h2 = dx*dx + dy*dy + dz*dz;
+                    if (bad(hyd) || h2<hmin || (h2==hmin && h<hyd)) {
+                        hyd = h;
+                        hmin = h2;
+                    }
+                }
+                double dpos[3], apos[3], hpos[3];
+                std::copy(pos+3*d, pos+3*d+3, dpos);
+                std::copy(ap, ap+3, apos);
+                std::copy(pos+3*hyd, pos+3*hyd+3, hpos);
+                HydrogenBond hb(dpos, apos, hpos);
+                hbond_t rec = { frame, d, a, hyd, hb.r, hb.p, hb.energy() };
+                result->push_back(rec);
+            }
+        };
+    }
+
+    /* Find candidate hydrogen bonds in each of nframes frames of natoms
+     * positions, with the same donor-acceptor pairs as find_contacts
+     * with the given cutoff.  donors[i] has hydrogens hyds[hoff[i]] up to
+     * hyds[hoff[i+1]], and at least one of them; the one closest to the
+     * acceptor is used.  Pairs for which exclude(donor, acceptor) is true
+     * are skipped.  Frames are processed using up to nthreads threads
+     * (0 for one per hardware thread), and results are returned in
+     * frame order. */
+    template <typename Float, typename Exclude>
+    std::vector<hbond_t> FindHydrogenBonds(Float cutoff,
+                                           Id nframes, Id natoms,
+                                           const Float* pos,
+                                           IdList const& donors,
+                                           IdList const& hoff,
+                                           IdList const& hyds,
+                                           IdList const& acceptors,
+                                           Exclude const& exclude,
+                                           unsigned nthreads=1) {
+        if (hoff.size() != donors.size()+1) {
+            MSYS_FAIL("Expected " << donors.size()+1 << " hydrogen offsets, got " << hoff.size());
+        }
+        std::vector<int> index(natoms, -1);
+        for (Id i=0, n=donors.size(); i<n; i++) {
+            Id d = donors[i];
+            if (d>=natoms) MSYS_FAIL("Invalid donor id " << d);
+            if (hoff[i]>=hoff[i+1] || hoff[i+1]>hyds.size()) {
+                MSYS_FAIL("Invalid hydrogens for donor " << d);
+            }
+            index[d] = i;
+        }
+        for (Id h : hyds) {
+            if (h>=natoms) MSYS_FAIL("Invalid hydrogen id " << h);
+        }
+        for (Id a : acceptors) {
+            if (a>=natoms) MSYS_FAIL("Invalid acceptor id " << a);
+        }
+
+        nthreads = std::min<unsigned>(resolve_threads(nthreads),
+                                      std::max<Id>(nframes, 1));
+        std::vector<std::vector<hbond_t> > chunks(nthreads);
+        parallel_for(nframes, nthreads,
+                [&](size_t begin, size_t end, unsigned k) {
+            for (size_t f=begin; f<end; f++) {
+                const Float* fpos = pos + 3*size_t(natoms)*f;
+                details::hbond_output<Float,Exclude> out = {
+                    fpos, Id(f), index, hoff.data(), hyds.data(),
+                    exclude, &chunks[k] };
+                find_contacts(cutoff, fpos,
+                              donors.begin(), donors.end(),
+                              acceptors.begin(), acceptors.end(),
+                              out);
+            }
+        });
+
+        std::vector<hbond_t> result;
+        if (chunks.size()==1) {
+            result.swap(chunks[0]);
+        } else {
+            size_t total = 0;
+            for (auto const& c : chunks) total += c.size();
+            result.reserve(total);
+            for (auto const& c : chunks) {
+                result.insert(result.end(), c.begin(), c.end());
+            }
+        }
+        return result;
+    }
 }}
 
 #endif
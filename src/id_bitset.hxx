@@ -0,0 +1,86 @@
+#ifndef desres_msys_id_bitset_hxx
+#define desres_msys_id_bitset_hxx
+
+#include "types.hxx"
+#include <vector>
+#include <stdint.h>
+#ifdef _MSC_VER
+#include <intrin.h>
+#endif
+
+namespace desres { namespace msys {
+
+    /* A set of ids stored as one bit per id, for tracking the deleted
+     * elements of a System.  Ids past the last one inserted are never
+     * in the set, so nextAbsent() always finds an answer. */
+    class IdBitset {
+        std::vector<uint64_t> _words;
+        Id _count;
+
+        static unsigned lowest_bit(uint64_t w) {
+#ifdef _MSC_VER
+            unsigned long i;
+            _BitScanForward64(&i, w);
+            return i;
+#else
+            return __builtin_ctzll(w);
+#endif
+        }
+
+    public:
+        IdBitset() : _count() {}
+
+        /* number of ids in the set */
+        Id size() const { return _count; }
+        bool empty() const { return _count==0; }
+
+        bool count(Id id) const {
+            size_t w = id/64;
+            return w<_words.size() && ((_words[w] >> (id%64)) & 1);
+        }
+
+        /* add id; return true if it was not already present */
+        bool insert(Id id) {
+            size_t w = id/64;
+            if (w>=_words.size()) _words.resize(w+1);
+            uint64_t bit = uint64_t(1) << (id%64);
+            if (_words[w] & bit) return false;
+            _words[w] |= bit;
+            ++_count;
+            return true;
+        }
+
+        void clear() {
+            _words.clear();
+            _count = 0;
+        }
+
+        /* smallest id >= id which is not in the set */
+        Id nextAbsent(Id id) const {
+            size_t w = id/64;
+            if (w>=_words.size()) return id;
+            /* treat bits below id as present */
+            uint64_t free = ~_words[w] & (~uint64_t(0) << (id%64));
+            while (!free) {
+                if (++w==_words.size()) return w*64;
+                free = ~_words[w];
+            }
+            return w*64 + lowest_bit(free);
+        }
+
+        /* ids in the set, in increasing order */
+        IdList ids() const {
+            IdList v;
+            v.reserve(_count);
+            for (size_t w=0; w<_words.size(); w++) {
+                for (uint64_t bits=_words[w]; bits; bits &= bits-1) {
+                    v.push_back(w*64 + lowest_bit(bits));
+                }
+            }
+            return v;
+        }
+    };
+
+}}
+
+#endif
@@ -10,8 +10,15 @@
 #include "sdf.hxx"
 #endif
 #include "json.hxx"
+#include "msysb.hxx"
+#include "line_reader.hxx"
+#include "gzindex.hxx"
 
 #include <sys/stat.h>
+#ifndef _MSC_VER
+#include <fcntl.h>
+#include <unistd.h>
+#endif
 
 using namespace desres::msys;
 
@@ -48,7 +55,8 @@ namespace {
 #endif
         "WEBPDB",
         "PSF",
-        "JSON"
+        "JSON",
+        "MSYSB"
     };
 
     class DefaultIterator : public LoadIterator {
@@ -65,6 +73,212 @@ namespace {
             return ptr;
         }
     };
+
+#ifndef _MSC_VER
+    // Index files for formats other than SDF share the layout of the SDF
+    // index: a version byte, seven unused bytes, the number of entries,
+    // then the offset of the end of each entry in the uncompressed file.
+    // Entry i spans the bytes between the ends of entries i-1 and i.
+
+    std::vector<size_t> mol2_offsets(std::string const& path) {
+        LineReader in(path);
+        std::vector<size_t> offsets;
+        std::string line;
+        bool started = false;
+        for (;;) {
+            size_t offset = in.tell();
+            line.clear();
+            if (!in.getline(line)) break;
+            if (!line.compare(0, 17, "@<TRIPOS>MOLECULE")) {
+                if (started) offsets.push_back(offset);
+                started = true;
+            }
+        }
+        if (started) offsets.push_back(in.tell());
+        return offsets;
+    }
+
+    // Entries end with $$$$ lines.  Used for gzipped files, for which the
+    // offsets reported by the SDF parser aren't available.
+    std::vector<size_t> sdf_offsets(std::string const& path) {
+        LineReader in(path);
+        std::vector<size_t> offsets;
+        std::string entry;
+        for (;;) {
+            size_t line = entry.size();
+            if (!in.getline(entry)) break;
+            if (!entry.compare(line, 4, "$$$$")) {
+                offsets.push_back(in.tell());
+                entry.clear();
+            }
+        }
+        // keep a final entry missing its terminator if it parses
+        if (entry.find_first_not_of(" \t\r\n")!=std::string::npos &&
+            SdfTextIterator(entry)->next()) {
+            offsets.push_back(in.tell());
+        }
+        return offsets;
+    }
+
+    // Entries end with END or ENDMDL records, and the first one without
+    // any atoms ends the file, as in PDBIterator.
+    std::vector<size_t> pdb_offsets(std::string const& path) {
+        LineReader in(path);
+        std::vector<size_t> offsets;
+        std::string line;
+        size_t natoms = 0;
+        for (;;) {
+            line.clear();
+            if (!in.getline(line)) break;
+            if (!line.compare(0, 5, "ATOM ") || !line.compare(0, 6, "HETATM")) {
+                ++natoms;
+            } else if (!line.compare(0, 3, "END")) {
+                if (!natoms) return offsets;
+                offsets.push_back(in.tell());
+                natoms = 0;
+            }
+        }
+        if (natoms) offsets.push_back(in.tell());
+        return offsets;
+    }
+
+    void write_index(std::string const& idx_path,
+                     std::vector<size_t> const& offsets) {
+        FILE* fp = fopen(idx_path.data(), "wb");
+        if (!fp) MSYS_FAIL(idx_path << ": " << strerror(errno));
+        char header[16] = {0};
+        header[0] = 0x01;
+        ((size_t*)header)[1] = offsets.size();
+        auto n = offsets.size();
+        if (fwrite(header, 1, sizeof(header), fp) != sizeof(header) ||
+            fwrite(offsets.data(), sizeof(offsets[0]), n, fp) != n) {
+            std::string err = strerror(errno);
+            fclose(fp);
+            unlink(idx_path.data());
+            MSYS_FAIL(idx_path << ": failed to write complete index: " << err);
+        }
+        fclose(fp);
+    }
+
+    class IndexedTextLoader : public IndexedFileLoader {
+        const FileFormat _format;
+        const std::string _path;
+        int idx_fd = -1;
+        int data_fd = -1;   // -1 for gzipped files
+        size_t _size = 0;
+        GzipIndexPtr _gzi;  // checkpoints for gzipped files, if indexed
+
+        std::string read_range(size_t begin, size_t end) const {
+            std::string buf(end-begin, '\0');
+            if (data_fd>=0) {
+                ssize_t rc = pread(data_fd, &buf[0], buf.size(), begin);
+                if (rc!=(ssize_t)buf.size()) {
+                    MSYS_FAIL("Reading " << _path << ": " << strerror(errno));
+                }
+                return buf;
+            }
+            if (_gzi) {
+                if (_gzi->read(_path, begin, &buf[0], buf.size())!=buf.size()) {
+                    MSYS_FAIL("Reading " << _path << ": unexpected end of file");
+                }
+                return buf;
+            }
+            gzFile gz = gzopen(_path.data(), "rb");
+            if (!gz) MSYS_FAIL("Opening " << _path << ": " << strerror(errno));
+            std::shared_ptr<void> closer(gz, gzclose);
+            if (gzseek(gz, begin, SEEK_SET)<0 ||
+                gzread(gz, &buf[0], buf.size())!=(int)buf.size()) {
+                int errnum;
+                MSYS_FAIL("Reading " << _path << ": " << gzerror(gz, &errnum));
+            }
+            return buf;
+        }
+
+    public:
+        IndexedTextLoader(FileFormat format, std::string const& path,
+                          std::string const& idx_path,
+                          std::string const& gzi_path)
+        : _format(format), _path(path) {
+            idx_fd = ::open(idx_path.data(), O_RDONLY);
+            if (idx_fd<0) MSYS_FAIL(idx_path << ": " << strerror(errno));
+            unsigned char header[16];
+            if (::read(idx_fd, header, sizeof(header)) != sizeof(header)) {
+                close(idx_fd);
+                MSYS_FAIL("Parsing idx file header: " << strerror(errno));
+            }
+            if (header[0] != 0x01) {
+                close(idx_fd);
+                MSYS_FAIL("Bad version in header: got " << int(header[0]) << " want " << 0x01);
+            }
+            _size = ((size_t *)header)[1];
+
+            int fd = ::open(path.data(), O_RDONLY);
+            if (fd<0) {
+                close(idx_fd);
+                MSYS_FAIL("Opening " << path << ": " << strerror(errno));
+            }
+            unsigned char magic[2];
+            if (::read(fd, magic, 2)==2 && magic[0]==0x1f && magic[1]==0x8b) {
+                struct stat st;
+                fstat(fd, &st);
+                close(fd);
+                if (::access(gzi_path.data(), R_OK)==0) {
+                    try {
+                        _gzi = GzipIndex::load(gzi_path);
+                    } catch (std::exception& e) {
+                        close(idx_fd);
+                        throw;
+                    }
+                    if (_gzi->compressedSize() != uint64_t(st.st_size)) {
+                        close(idx_fd);
+                        MSYS_FAIL("Gzip index " << gzi_path << " is out of date with " << path);
+                    }
+                }
+            } else {
+                data_fd = fd;
+            }
+        }
+
+        ~IndexedTextLoader() {
+            if (data_fd>=0) close(data_fd);
+            if (idx_fd>=0) close(idx_fd);
+        }
+
+        std::string const& path() const { return _path; }
+        size_t size() const { return _size; }
+
+        SystemPtr at(size_t i) const {
+            if (i>=_size) MSYS_FAIL("Invalid index " << i << " >= " << _size);
+            size_t range[2] = {0, 0};
+            if (i==0) {
+                if (pread(idx_fd, &range[1], 8, 16)!=8) {
+                    MSYS_FAIL("Reading index entry 0: " << strerror(errno));
+                }
+            } else {
+                if (pread(idx_fd, range, 16, 8+8*i)!=16) {
+                    MSYS_FAIL("Reading index entry " << i << ": " << strerror(errno));
+                }
+            }
+            std::string text = read_range(range[0], range[1]);
+
+            LoadIteratorPtr iter;
+            switch (_format) {
+                case SdfFileFormat: iter = SdfTextIterator(text); break;
+                case MaeFileFormat: iter = MaeTextIterator(text); break;
+                case Mol2FileFormat: iter = Mol2TextIterator(text); break;
+                default: iter = PDBTextIterator(text); break;
+            }
+            SystemPtr mol = iter->next();
+            if (!mol) MSYS_FAIL("No structure found for entry " << i << " of " << _path);
+            // offsets reported by the parser are relative to the entry
+            if (mol->ct(0).has("msys_file_offset")) {
+                auto ref = mol->ct(0).value("msys_file_offset");
+                ref.fromInt(ref.asInt() + Int(range[0]));
+            }
+            return mol;
+        }
+    };
+#endif
 }
 
 namespace desres { namespace msys {
@@ -84,6 +298,7 @@ namespace desres { namespace msys {
 #endif
         const char* PSF[] = {"psf", 0};
         const char* JSON[] = {"json", 0};
+        const char* MSYSB[] = {"msysb", 0};
 
         if (match(path, DMS)) return DmsFileFormat;
         if (match(path, MAE)) return MaeFileFormat;
@@ -96,6 +311,7 @@ namespace desres { namespace msys {
 #endif
         if (match(path, PSF)) return PsfFileFormat;
         if (match(path, JSON)) return JsonFileFormat;
+        if (match(path,MSYSB)) return MsysbFileFormat;
         if (match_web(path))  return WebPdbFileFormat;
         return UnrecognizedFileFormat;
     }
@@ -150,6 +366,9 @@ namespace desres { namespace msys {
             case JsonFileFormat:
                 m=ImportJson(path);
                 break;
+            case MsysbFileFormat:
+                m=ImportMsysb(path, structure_only, without_tables);
+                break;
             default:
                 ;
         }
@@ -247,6 +466,14 @@ namespace desres { namespace msys {
             case PsfFileFormat:
                 ExportPSF(mol, path);
                 break;
+            case MsysbFileFormat:
+                if (flags & SaveOptions::Append) {
+                    MSYS_FAIL("MSYSB export does not support append");
+                }
+                ExportMsysb(mol, path, prov,
+                    (flags & SaveOptions::StructureOnly ? MsysbExport::StructureOnly : 0)
+                    );
+                break;
             default:
                 MSYS_FAIL("No support for saving file '" << path << "' of type "
                         << FileFormatAsString(format));
@@ -268,14 +495,31 @@ namespace desres { namespace msys {
         return path + ".idx";
     }
 
+    // checkpoints for gzipped files go next to the index: $path.gzi for
+    // the default index path $path.idx.
+    static std::string gzi_path(std::string const& idx) {
+        auto n = idx.size();
+        if (n>4 && idx.compare(n-4, 4, ".idx")==0) {
+            return idx.substr(0, n-4) + ".gzi";
+        }
+        return idx + ".gzi";
+    }
+
     std::shared_ptr<IndexedFileLoader> 
     IndexedFileLoader::open(std::string const& path,
                             std::string const& idx_path) {
         auto idx = idx_path.empty() ? default_idx_path(path) : idx_path;
 #ifndef _MSC_VER
-        switch (GuessFileFormat(path)) {
+        auto format = GuessFileFormat(path);
+        switch (format) {
             case SdfFileFormat:
-                return OpenIndexedSdf(path, idx);
+                if (!IsGzipFile(path)) return OpenIndexedSdf(path, idx);
+                // fall through
+            case MaeFileFormat:
+            case Mol2FileFormat:
+            case PdbFileFormat:
+                return std::make_shared<IndexedTextLoader>(
+                        format, path, idx, gzi_path(idx));
             default:;
         };
 #endif
@@ -291,10 +535,28 @@ namespace desres { namespace msys {
                 MSYS_FAIL("Unable to determine format of " << path);
 #ifndef _MSC_VER
             case SdfFileFormat:
-                CreateIndexedSdf(path, idx);
+                if (IsGzipFile(path)) {
+                    write_index(idx, sdf_offsets(path));
+                } else {
+                    CreateIndexedSdf(path, idx);
+                }
+                break;
+            case MaeFileFormat:
+                write_index(idx, MaeEntryOffsets(path));
+                break;
+            case Mol2FileFormat:
+                write_index(idx, mol2_offsets(path));
+                break;
+            case PdbFileFormat:
+                write_index(idx, pdb_offsets(path));
 #endif
                 break;
         };
+#ifndef _MSC_VER
+        if (IsGzipFile(path)) {
+            GzipIndex::build(path)->save(gzi_path(idx));
+        }
+#endif
     }
 
     std::shared_ptr<IndexedFileLoader>
@@ -305,6 +567,12 @@ namespace desres { namespace msys {
         if (stat(idx.data(), &stbuf)<0) {
             index(path, idx);
         }
+#ifndef _MSC_VER
+        // indexes made before gzip checkpoints were supported lack them
+        else if (stat(gzi_path(idx).data(), &stbuf)<0 && IsGzipFile(path)) {
+            GzipIndex::build(path)->save(gzi_path(idx));
+        }
+#endif
         return open(path, idx);
     }
 
@@ -17,7 +17,8 @@ namespace desres { namespace msys {
         SdfFileFormat          = 7,
         WebPdbFileFormat       = 8,
         PsfFileFormat          = 9,
-        JsonFileFormat         = 10
+        JsonFileFormat         = 10,
+        MsysbFileFormat        = 11
     };
 
     /* Guess file format for the given path.  Returns UnrecognizedFileFormat
@@ -63,6 +64,25 @@ namespace desres { namespace msys {
     }
 
 
+    /* Default size bound for LoadCached */
+    const uint64_t DefaultLoadCacheSize = uint64_t(4) << 30;
+
+    /* Load through an on-disk cache of msysb snapshots in cache_dir, which
+     * is created if it doesn't exist.  Entries are keyed by the real path,
+     * size and modification time of the file, the load options and the
+     * msys version, so a changed file is loaded afresh.  Entries are
+     * written to a temporary file and renamed into place, so concurrent
+     * loads of the same file are safe.  After a new entry is added, the
+     * least recently used entries are removed until the cache holds at
+     * most max_bytes; other files in cache_dir are left alone.  Paths
+     * which are not local files, and failures to read or write the
+     * cache, fall back to Load().  */
+    SystemPtr LoadCached(std::string const& path,
+                         std::string const& cache_dir,
+                         bool structure_only = false,
+                         bool without_tables = false,
+                         uint64_t max_bytes = DefaultLoadCacheSize);
+
     /* Interface class to iterate over structures */
     class LoadIterator;
     typedef std::shared_ptr<LoadIterator> LoadIteratorPtr;
@@ -87,7 +107,44 @@ namespace desres { namespace msys {
         virtual SystemPtr next() = 0;
     };
 
-    // IndexedFileLoader provides random access to multi-structure files.
+    /* One structure from a ParallelLoadIterator */
+    struct LoadResult {
+        size_t index = 0;       /* zero-based position in the file */
+        SystemPtr mol;          /* NULL if the structure failed to parse */
+        std::string error;      /* the parse error, if any */
+    };
+
+    /* Iterate over structures in a multi-structure file using a pool of
+     * threads.  SDF and MOL2 files are split on record boundaries by a
+     * reader thread, and the records are parsed in batches by nthreads
+     * workers (0 for one per hardware thread).  Other formats are read
+     * sequentially.  If ordered is false, structures are returned in the
+     * order in which their batch finished parsing.  Errors in individual
+     * records are returned in LoadResult::error so that iteration can
+     * continue; errors reading the file itself are thrown by next(). */
+    class ParallelLoadIterator;
+    typedef std::shared_ptr<ParallelLoadIterator> ParallelLoadIteratorPtr;
+
+    class ParallelLoadIterator {
+    public:
+        virtual ~ParallelLoadIterator() {}
+
+        static ParallelLoadIteratorPtr create(
+                std::string const& path,
+                unsigned nthreads = 0,
+                bool ordered = true,
+                bool structure_only = false,
+                FileFormat* opt_format = NULL);
+
+        /* Store the next structure in result.  Returns false when
+         * there are no more structures. */
+        virtual bool next(LoadResult& result) = 0;
+    };
+
+    // IndexedFileLoader provides random access to multi-structure files:
+    // SDF, MAE, MOL2, and multi-model PDB.  For gzipped files, a
+    // GzipIndex is saved next to the index file (with suffix .gzi) so that
+    // entries can be read without decompressing from the start of the file.
     class IndexedFileLoader {
     public:
         virtual ~IndexedFileLoader() {}
@@ -0,0 +1,328 @@
+#include "io.hxx"
+#ifndef _MSC_VER
+#include "sdf.hxx"
+#endif
+#include "mol2.hxx"
+#include "parallel.hxx"
+#include "line_reader.hxx"
+
+#include <condition_variable>
+#include <deque>
+#include <map>
+#include <mutex>
+#include <thread>
+
+using namespace desres::msys;
+
+namespace {
+
+    /* batches are cut after this many records or bytes of text */
+    const size_t BATCH_RECORDS = 32;
+    const size_t BATCH_BYTES = 1<<18;
+
+    /* Splits a file into the text of its records without parsing them */
+    class record_reader {
+        LineReader in;
+        FileFormat format;
+        std::string lookahead;      /* start of the next mol2 record */
+        size_t lookahead_offset = 0;
+
+        static bool is_mol2_start(std::string const& line) {
+            return !line.compare(0, 17, "@<TRIPOS>MOLECULE");
+        }
+
+#ifndef _MSC_VER
+        bool next_sdf(std::string& text, size_t& offset) {
+            size_t start = text.size();
+            offset = in.tell();
+            for (;;) {
+                size_t line = text.size();
+                if (!in.getline(text)) break;
+                if (!text.compare(line, 4, "$$$$")) return true;
+            }
+            /* keep a trailing record missing its terminator */
+            if (text.find_first_not_of(" \t\r\n", start)!=std::string::npos) {
+                return true;
+            }
+            text.resize(start);
+            return false;
+        }
+#endif
+
+        bool next_mol2(std::string& text, size_t& offset) {
+            /* skip anything preceding the first MOLECULE record */
+            while (lookahead.empty()) {
+                lookahead_offset = in.tell();
+                if (!in.getline(lookahead)) return false;
+                if (!is_mol2_start(lookahead)) lookahead.clear();
+            }
+            offset = lookahead_offset;
+            text += lookahead;
+            lookahead.clear();
+            for (;;) {
+                size_t line_offset = in.tell();
+                if (!in.getline(lookahead)) break;
+                if (is_mol2_start(lookahead)) {
+                    lookahead_offset = line_offset;
+                    break;
+                }
+                text += lookahead;
+                lookahead.clear();
+            }
+            return true;
+        }
+
+    public:
+        record_reader(std::string const& path, FileFormat fmt)
+        : in(path), format(fmt) {}
+
+        /* Append the text of the next record to text, and store its
+         * offset in the file.  Returns false at end of file. */
+        bool next(std::string& text, size_t& offset) {
+#ifndef _MSC_VER
+            if (format==SdfFileFormat) return next_sdf(text, offset);
+#endif
+            return next_mol2(text, offset);
+        }
+    };
+
+    struct batch_t {
+        size_t number = 0;              /* position among batches */
+        size_t first = 0;               /* index of first record */
+        std::string text;               /* text of all records */
+        std::vector<size_t> starts;     /* record start in text, plus end */
+        std::vector<size_t> offsets;    /* record offsets in the file */
+        std::vector<LoadResult> results;
+
+        size_t size() const { return offsets.size(); }
+    };
+
+    /* Returns NULL if the record holds no structure, e.g. trailing text
+     * after the last SDF entry. */
+    SystemPtr parse_record(FileFormat format, std::string const& text,
+                           size_t offset) {
+#ifndef _MSC_VER
+        if (format==SdfFileFormat) {
+            return SdfTextIterator(text)->next();
+        }
+#endif
+        SystemPtr mol = Mol2TextIterator(text)->next();
+        if (mol) {
+            /* report the offset in the file, not in the record */
+            mol->ct(0).value("msys_file_offset") = Int(offset);
+        }
+        return mol;
+    }
+
+    class parallel_iterator : public ParallelLoadIterator {
+        record_reader _reader;
+        const FileFormat _format;
+        const bool _ordered;
+        const size_t _maxpending;
+
+        std::mutex _mtx;
+        std::condition_variable _cv;
+        std::deque<std::shared_ptr<batch_t> > _todo;
+        std::map<size_t, std::shared_ptr<batch_t> > _done;
+        size_t _nbatches = 0;       /* batches produced */
+        size_t _ndelivered = 0;     /* batches handed to next() */
+        bool _eof = false;
+        bool _stop = false;
+        std::exception_ptr _error;
+        std::vector<std::thread> _threads;
+
+        /* batch currently being returned by next() */
+        std::shared_ptr<batch_t> _current;
+        size_t _pos = 0;
+
+        void produce() {
+            size_t nrecords = 0;
+            try {
+                for (bool eof=false; !eof;) {
+                    auto batch = std::make_shared<batch_t>();
+                    batch->first = nrecords;
+                    while (batch->size() < BATCH_RECORDS &&
+                           batch->text.size() < BATCH_BYTES) {
+                        size_t start = batch->text.size(), offset;
+                        if (!_reader.next(batch->text, offset)) {
+                            eof = true;
+                            break;
+                        }
+                        batch->starts.push_back(start);
+                        batch->offsets.push_back(offset);
+                    }
+                    batch->starts.push_back(batch->text.size());
+                    nrecords += batch->size();
+
+                    std::unique_lock<std::mutex> lock(_mtx);
+                    _cv.wait(lock, [this] {
+                        return _stop || _nbatches - _ndelivered < _maxpending;
+                    });
+                    if (_stop) return;
+                    if (batch->size()) {
+                        batch->number = _nbatches++;
+                        _todo.push_back(batch);
+                    }
+                    _eof = eof;
+                    _cv.notify_all();
+                }
+            } catch (...) {
+                std::lock_guard<std::mutex> lock(_mtx);
+                _error = std::current_exception();
+                _eof = true;
+                _cv.notify_all();
+            }
+        }
+
+        void parse(batch_t& batch) {
+            batch.results.resize(batch.size());
+            for (size_t i=0, n=batch.size(); i<n; i++) {
+                LoadResult& result = batch.results[i];
+                result.index = batch.first + i;
+                std::string text(batch.text, batch.starts[i],
+                                 batch.starts[i+1] - batch.starts[i]);
+                try {
+                    result.mol = parse_record(_format, text, batch.offsets[i]);
+                } catch (std::exception& e) {
+                    result.error = e.what();
+                }
+            }
+            /* release the text as soon as it's no longer needed */
+            std::string().swap(batch.text);
+        }
+
+        void work() {
+            for (;;) {
+                std::shared_ptr<batch_t> batch;
+                {
+                    std::unique_lock<std::mutex> lock(_mtx);
+                    _cv.wait(lock, [this] {
+                        return _stop || _eof || !_todo.empty();
+                    });
+                    if (_stop || _todo.empty()) return;
+                    batch = _todo.front();
+                    _todo.pop_front();
+                }
+                parse(*batch);
+                std::lock_guard<std::mutex> lock(_mtx);
+                _done[batch->number] = batch;
+                _cv.notify_all();
+            }
+        }
+
+        /* Is a parsed batch ready to be delivered?  Caller holds _mtx. */
+        bool ready() const {
+            return _ordered ? _done.count(_ndelivered)!=0 : !_done.empty();
+        }
+
+    public:
+        parallel_iterator(std::string const& path, FileFormat format,
+                          unsigned nthreads, bool ordered)
+        : _reader(path, format), _format(format), _ordered(ordered),
+          _maxpending(4*resolve_threads(nthreads)) {
+            nthreads = resolve_threads(nthreads);
+            try {
+                _threads.emplace_back(&parallel_iterator::produce, this);
+                for (unsigned i=0; i<nthreads; i++) {
+                    _threads.emplace_back(&parallel_iterator::work, this);
+                }
+            } catch (...) {
+                shutdown();
+                throw;
+            }
+        }
+
+        ~parallel_iterator() {
+            shutdown();
+        }
+
+        void shutdown() {
+            {
+                std::lock_guard<std::mutex> lock(_mtx);
+                _stop = true;
+                _cv.notify_all();
+            }
+            for (auto& t : _threads) t.join();
+            _threads.clear();
+        }
+
+        bool next(LoadResult& result) {
+            for (;;) {
+                while (_current && _pos < _current->results.size()) {
+                    result = std::move(_current->results[_pos++]);
+                    if (result.mol || !result.error.empty()) return true;
+                }
+                _current.reset();
+
+                std::unique_lock<std::mutex> lock(_mtx);
+                _cv.wait(lock, [this] {
+                    return ready() || (_eof && _ndelivered==_nbatches);
+                });
+                if (!ready()) {
+                    /* everything parsed has been delivered */
+                    if (_error) {
+                        std::exception_ptr err;
+                        std::swap(err, _error);
+                        std::rethrow_exception(err);
+                    }
+                    return false;
+                }
+                auto iter = _ordered ? _done.find(_ndelivered) : _done.begin();
+                _current = iter->second;
+                _pos = 0;
+                _done.erase(iter);
+                ++_ndelivered;
+                _cv.notify_all();
+            }
+        }
+    };
+
+    /* Formats without a record splitter are read by a LoadIterator. */
+    class sequential_iterator : public ParallelLoadIterator {
+        LoadIteratorPtr _iter;
+        size_t _index = 0;
+
+    public:
+        explicit sequential_iterator(LoadIteratorPtr iter) : _iter(iter) {}
+
+        bool next(LoadResult& result) {
+            result = LoadResult();
+            result.index = _index++;
+            try {
+                result.mol = _iter->next();
+            } catch (std::exception& e) {
+                result.error = e.what();
+                return true;
+            }
+            return result.mol!=nullptr;
+        }
+    };
+}
+
+namespace desres { namespace msys {
+
+    ParallelLoadIteratorPtr ParallelLoadIterator::create(
+            std::string const& path,
+            unsigned nthreads,
+            bool ordered,
+            bool structure_only,
+            FileFormat* opt_format) {
+
+        FileFormat format = opt_format ? *opt_format : UnrecognizedFileFormat;
+        if (!format) format=GuessFileFormat(path);
+        if (opt_format) *opt_format = format;
+        switch (format) {
+#ifndef _MSC_VER
+            case SdfFileFormat:
+#endif
+            case Mol2FileFormat:
+                return ParallelLoadIteratorPtr(
+                        new parallel_iterator(path, format, nthreads, ordered));
+            default:
+                return ParallelLoadIteratorPtr(
+                        new sequential_iterator(LoadIterator::create(
+                                path, &format, structure_only, structure_only)));
+        }
+    }
+
+}}
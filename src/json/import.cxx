@@ -1,13 +1,12 @@
 #include "../json.hxx"
 #include "../analyze.hxx"
-#include <sys/stat.h>
-#include <fcntl.h>
-#include <unistd.h>
+#include <stdio.h>
+#include <errno.h>
 
 #if defined __has_include
-#  if __has_include (<rapidjson/document.h>)
-#    include <rapidjson/document.h>
+#  if __has_include (<rapidjson/reader.h>)
 #    include <rapidjson/reader.h>
+#    include <rapidjson/filereadstream.h>
 #    include <rapidjson/error/en.h>
 #    define MSYS_WITH_RAPID_JSON
 using namespace rapidjson;
@@ -25,48 +24,189 @@ using msys::Id;
 
 #if defined(MSYS_WITH_RAPID_JSON)
 
-static std::shared_ptr<char> slurp(const char* path) {
-
-    int fd=open(path, O_RDONLY);
-    if (fd<0) {
-        MSYS_FAIL("Reading file at '" << path << "': " << strerror(errno));
-    }
-    struct stat statbuf[1];
-    if (fstat(fd, statbuf)!=0) {
-        int _errno = errno;
-        ::close(fd);
-        MSYS_FAIL("Getting size of file at '" << path << "': " << strerror(_errno));
-    }
-
-    ssize_t tmpsize = statbuf->st_size;
-    if (tmpsize==0) {
-        close(fd);
-        MSYS_FAIL("file at '" << path << "' has zero size");
-    }
-    char* tmpbuf = (char *)malloc(tmpsize+1);
-    if (!tmpbuf) {
-        close(fd);
-        MSYS_FAIL("Failed to allocate read buffer for file at '" << path
-           << "' of size " << tmpsize);
-    }
-    ssize_t sz = tmpsize;
-    char* ptr = tmpbuf;
-    while (sz) {
-        errno = 0;
-        ssize_t rc = ::read(fd, ptr, sz);
-        if (rc<0 || (rc==0 && errno!=0)) {
-            std::string errmsg = strerror(errno);
-            close(fd);
-            free(tmpbuf);
-            MSYS_FAIL("Error reading file contents at " << path 
-                    << ": " << errmsg);
-        }
-        sz -= rc;
-        ptr += rc;
-    }
-    *ptr++ = '\0';
-    close(fd);
-    return std::shared_ptr<char>(tmpbuf, free);
+namespace {
+
+    /* A parsed JSON value.  Arrays keep their elements in typed vectors,
+     * so that the large particle, bond and term arrays cost 8 bytes per
+     * number rather than a full DOM value each.  Arrays in msys json files
+     * hold only numbers, only strings, or only objects. */
+    struct Node {
+        enum Kind { Null, Number, String, Array, Object };
+        Kind kind = Null;
+        double number = 0;
+        std::string string;
+
+        std::vector<double> numbers;
+        std::vector<std::string> strings;
+        std::vector<Node> items;
+        std::vector<std::pair<std::string, Node> > members;
+
+        bool IsArray() const { return kind==Array; }
+
+        /* number of elements of an array */
+        size_t Size() const {
+            return numbers.size() + strings.size() + items.size();
+        }
+
+        bool Empty() const { return kind==Object ? members.empty() : !Size(); }
+
+        Node* find(const char* key) {
+            for (auto& m : members) {
+                if (m.first==key) return &m.second;
+            }
+            return nullptr;
+        }
+        Node const* find(const char* key) const {
+            return const_cast<Node*>(this)->find(key);
+        }
+
+        /* free the contents of a member once it has been read */
+        void release(const char* key) {
+            Node* node = find(key);
+            if (node) *node = Node();
+        }
+
+        Node const& operator[](const char* key) const {
+            Node const* node = find(key);
+            if (!node) MSYS_FAIL("Missing required key '" << key << "'");
+            return *node;
+        }
+
+        double GetDouble(size_t i) const {
+            if (i>=numbers.size()) {
+                MSYS_FAIL("Expected a number at position " << i << " of an array of " << Size());
+            }
+            return numbers[i];
+        }
+        int64_t GetInt(size_t i) const { return int64_t(GetDouble(i)); }
+
+        int64_t GetInt() const {
+            if (kind!=Number) MSYS_FAIL("Expected a number");
+            return int64_t(number);
+        }
+        const char* GetString() const {
+            if (kind!=String) MSYS_FAIL("Expected a string");
+            return string.c_str();
+        }
+    };
+
+    /* Builds a Node from rapidjson SAX events as the input is read. */
+    class TreeBuilder : public BaseReaderHandler<UTF8<>, TreeBuilder> {
+        std::vector<Node*> _stack;
+        std::string _key;
+        std::string _error;
+
+        /* the node for a new member or element of the current container */
+        Node* add(Node::Kind kind) {
+            Node* node = &root;
+            if (!_stack.empty()) {
+                Node* top = _stack.back();
+                if (top->kind==Node::Object) {
+                    top->members.emplace_back(_key, Node());
+                    node = &top->members.back().second;
+                } else if (!top->numbers.empty() || !top->strings.empty()) {
+                    _error = "arrays of numbers or strings may not contain arrays or objects";
+                    return nullptr;
+                } else {
+                    top->items.emplace_back();
+                    node = &top->items.back();
+                }
+            }
+            node->kind = kind;
+            return node;
+        }
+
+        bool scalar(double v) {
+            if (!_stack.empty() && _stack.back()->kind==Node::Array) {
+                Node* top = _stack.back();
+                if (!top->strings.empty() || !top->items.empty()) {
+                    _error = "arrays may not mix numbers with other values";
+                    return false;
+                }
+                top->numbers.push_back(v);
+                return true;
+            }
+            Node* node = add(Node::Number);
+            if (node) node->number = v;
+            return node;
+        }
+
+    public:
+        Node root;
+
+        std::string const& error() const { return _error; }
+
+        bool Null() {
+            if (!_stack.empty() && _stack.back()->kind==Node::Array) {
+                _error = "arrays may not contain null";
+                return false;
+            }
+            return add(Node::Null);
+        }
+        bool Bool(bool b)       { return scalar(b); }
+        bool Int(int i)         { return scalar(i); }
+        bool Uint(unsigned i)   { return scalar(i); }
+        bool Int64(int64_t i)   { return scalar(i); }
+        bool Uint64(uint64_t i) { return scalar(i); }
+        bool Double(double d)   { return scalar(d); }
+
+        bool String(const char* s, SizeType len, bool) {
+            if (!_stack.empty() && _stack.back()->kind==Node::Array) {
+                Node* top = _stack.back();
+                if (!top->numbers.empty() || !top->items.empty()) {
+                    _error = "arrays may not mix strings with other values";
+                    return false;
+                }
+                top->strings.emplace_back(s, len);
+                return true;
+            }
+            Node* node = add(Node::String);
+            if (node) node->string.assign(s, len);
+            return node;
+        }
+
+        bool Key(const char* s, SizeType len, bool) {
+            _key.assign(s, len);
+            return true;
+        }
+
+        bool StartObject() {
+            Node* node = add(Node::Object);
+            if (node) _stack.push_back(node);
+            return node;
+        }
+        bool EndObject(SizeType) {
+            _stack.pop_back();
+            return true;
+        }
+
+        bool StartArray() {
+            Node* node = add(Node::Array);
+            if (node) _stack.push_back(node);
+            return node;
+        }
+        bool EndArray(SizeType) {
+            _stack.pop_back();
+            return true;
+        }
+    };
+
+    template <typename Stream>
+    Node parse_tree(Stream& stream) {
+        TreeBuilder builder;
+        Reader reader;
+        ParseResult ok = reader.Parse<kParseFullPrecisionFlag>(stream, builder);
+        if (!ok) {
+            MSYS_FAIL("Failed to parse JSON at " << ok.Offset() << ":"
+                    << (builder.error().empty()
+                        ? GetParseError_En(ok.Code())
+                        : builder.error().c_str()));
+        }
+        if (builder.root.kind!=Node::Object) {
+            MSYS_FAIL("Expected a JSON object");
+        }
+        return std::move(builder.root);
+    }
 }
 
 template<typename T>
@@ -86,69 +226,69 @@ void check_size(const char *fname, T const &a1, const char *name1, S s) {
 #define CHECK_SIZES(a1, name1, a2, name2) check_sizes(__FUNCTION__, a1, name1, a2, name2)
 #define CHECK_SIZE(a1, name1, s) check_size(__FUNCTION__, a1, name1, s)
 
-static const char* get_name(Value const& names, int64_t nameid) {
-    if (!names.IsArray()) {
+static const char* get_name(Node const* names, int64_t nameid) {
+    if (!names || !names->IsArray()) {
         if (nameid != 0) {
             MSYS_FAIL("Unable to translate non-zero nameid to string without 'names' array");
         }
         return "";
     }
-    return names[nameid].GetString();
+    if (nameid < 0 || size_t(nameid) >= names->strings.size()) {
+        MSYS_FAIL("nameid " << nameid << " out of range of 'names' array of size " << names->strings.size());
+    }
+    return names->strings[nameid].c_str();
 }
 
-static void read_chains(Document const& d, SystemPtr mol) {
-    auto o = d.GetObject();
-    auto const& m = o.FindMember("chains");
-    if (m == o.MemberEnd() || m->value.ObjectEmpty()) {
+static void read_chains(Node const& d, SystemPtr mol) {
+    auto const* chains = d.find("chains");
+    if (!chains || chains->Empty()) {
         mol->addChain();
         return;
     }
-    auto& chains = m->value;
 
     // required fields
-    auto& name = chains["name"];
+    auto& name = (*chains)["name"];
 
     // optional fields
-    auto const& segid = chains.FindMember("segid");
-    if (segid != chains.MemberEnd()) CHECK_SIZES(name, "name", segid->value, "segid");
+    auto const* segid = chains->find("segid");
+    if (segid) CHECK_SIZES(name, "name", *segid, "segid");
 
-    auto& names = d["names"];
+    auto const* names = d.find("names");
     for (Id i=0, n=name.Size(); i<n; i++) {
         auto& chn = mol->chainFAST(mol->addChain());
-        chn.name = get_name(names, name[i].GetInt());
-        if (segid != chains.MemberEnd()) {
-            chn.segid = get_name(names, segid->value[i].GetInt());
+        chn.name = get_name(names, name.GetInt(i));
+        if (segid) {
+            chn.segid = get_name(names, segid->GetInt(i));
         }
     }
 }
 
-static void read_residues(Document const& d, SystemPtr mol) {
-    auto const &m = d.FindMember("residues");
-    if (m == d.MemberEnd() || m->value.ObjectEmpty()) {
+static void read_residues(Node const& d, SystemPtr mol) {
+    auto const* residues = d.find("residues");
+    if (!residues || residues->Empty()) {
         mol->addResidue(0);
         return;
     }
-    auto& residues = m->value;
 
     // required fields
-    auto& chain = residues["chain"];
-    auto& resid = residues["resid"];
+    auto& chain = (*residues)["chain"];
+    auto& resid = (*residues)["resid"];
     CHECK_SIZES(chain, "chain", resid, "resid");
-    auto& name = residues["name"];
+    auto& name = (*residues)["name"];
     CHECK_SIZES(chain, "chain", resid, "name");
 
     // optional fields
-    auto const& insertion = residues.FindMember("insertion");
-    if (insertion != residues.MemberEnd()) CHECK_SIZES(chain, "chain", insertion->value, "insertion");
+    auto const* insertion = residues->find("insertion");
+    if (insertion) CHECK_SIZES(chain, "chain", *insertion, "insertion");
 
-    auto& names = d["names"];
+    auto const* names = d.find("names");
     for (Id i=0, n=chain.Size(); i<n; i++) {
-        auto& res = mol->residueFAST(mol->addResidue(chain[i].GetInt()));
-        res.name = get_name(names, name[i].GetInt());
-        res.resid = resid[i].GetInt();
+        auto& res = mol->residueFAST(mol->addResidue(chain.GetInt(i)));
+        res.name = get_name(names, name.GetInt(i));
+        res.resid = resid.GetInt(i);
 
-        if (insertion != residues.MemberEnd()) {
-            res.insertion = get_name(names, insertion->value[i].GetInt());
+        if (insertion) {
+            res.insertion = get_name(names, insertion->GetInt(i));
         }
     }
 }
@@ -163,167 +303,166 @@ static msys::ValueType parse_type(const char *s) {
     }
 }
 
-static void read_tags(Value const& tags, ParamTablePtr params, Value const& names) {
+static void read_tags(Node const& tags, ParamTablePtr params, Node const* names) {
     using msys::IntType;
     using msys::FloatType;
     using msys::StringType;
-    for (auto& m : tags.GetObject()) {
-        auto type = parse_type(m.value["t"].GetString());
-        Id propid = params->addProp(m.name.GetString(), type);
-        Value const& ids = m.value["i"];
-        Value const& vals = m.value["v"];
+    for (auto& m : tags.members) {
+        auto type = parse_type(m.second["t"].GetString());
+        Id propid = params->addProp(m.first, type);
+        Node const& ids = m.second["i"];
+        Node const& vals = m.second["v"];
         CHECK_SIZES(ids, "i", vals, "v");
         for (Id i=0, n=ids.Size(); i<n; i++) {
-            Id id = ids[i].GetInt();
+            Id id = ids.GetInt(i);
             while (params->paramCount() < id) params->addParam();
             auto ref = params->value(id, propid);
             switch (type) {
                 case IntType: 
-                    ref = vals[i].GetInt();
+                    ref = vals.GetInt(i);
                     break;
                 case FloatType:
-                    ref = vals[i].GetDouble();
+                    ref = vals.GetDouble(i);
                     break;
                 case StringType:
-                    ref = get_name(names, vals[i].GetInt());
+                    ref = get_name(names, vals.GetInt(i));
                     break;
             }
         }
     }
 }
 
-static void read_cell(Document const& d, SystemPtr mol) {
-    auto const &m = d.FindMember("cell");
-    if (m == d.MemberEnd() || m->value.Empty()) {
+static void read_cell(Node const& d, SystemPtr mol) {
+    auto const* cell = d.find("cell");
+    if (!cell || cell->Empty()) {
         return;
     }
-    auto& cell = m->value;
 
     double* dst = mol->global_cell[0];
     for (int i=0; i<9; i++) {
-        dst[i] = cell[i].GetDouble();
+        dst[i] = cell->GetDouble(i);
     }
 }
 
-static void read_particles(Document const& d, SystemPtr mol) {
-    auto const &names = d.FindMember("names");
+static void read_particles(Node const& d, SystemPtr mol) {
+    auto const* names = d.find("names");
 
     auto& particles = d["i"];
     Id natoms = msys::BadId;
 
     // optional fields
-    auto const& anum = particles.FindMember("atomic_number");
-    if (anum != particles.MemberEnd()) {
-        natoms = anum->value.Size();
+    auto const* anum = particles.find("atomic_number");
+    if (anum) {
+        natoms = anum->Size();
     }
 
-    auto const& name = particles.FindMember("name");
-    if (name != particles.MemberEnd()) {
-        if (natoms == msys::BadId) natoms = name->value.Size();
-        CHECK_SIZE(name->value, "name", natoms);
+    auto const* name = particles.find("name");
+    if (name) {
+        if (natoms == msys::BadId) natoms = name->Size();
+        CHECK_SIZE(*name, "name", natoms);
     }
 
-    auto const& fc = particles.FindMember("formal_charge");
-    if (fc != particles.MemberEnd()) {
-        if (natoms == msys::BadId) natoms = fc->value.Size();
-        CHECK_SIZE(fc->value, "formal_charge", natoms);
+    auto const* fc = particles.find("formal_charge");
+    if (fc) {
+        if (natoms == msys::BadId) natoms = fc->Size();
+        CHECK_SIZE(*fc, "formal_charge", natoms);
     }
 
-    auto const& pos = particles.FindMember("position");
-    if (pos != particles.MemberEnd()) {
-        if (natoms == msys::BadId) natoms = pos->value.Size() / 3;
-        CHECK_SIZE(pos->value, "position", natoms * 3);
+    auto const* pos = particles.find("position");
+    if (pos) {
+        if (natoms == msys::BadId) natoms = pos->Size() / 3;
+        CHECK_SIZE(*pos, "position", natoms * 3);
     }
 
-    auto const& vel = particles.FindMember("velocity");
-    if (vel != particles.MemberEnd()) {
-        if (natoms == msys::BadId) natoms = vel->value.Size() / 3;
-        CHECK_SIZE(vel->value, "velocity", natoms * 3);
+    auto const* vel = particles.find("velocity");
+    if (vel) {
+        if (natoms == msys::BadId) natoms = vel->Size() / 3;
+        CHECK_SIZE(*vel, "velocity", natoms * 3);
     }
 
-    auto const& residue = particles.FindMember("residue");
-    if (residue != particles.MemberEnd()) {
-        if (natoms == msys::BadId) natoms = residue->value.Size();
-        CHECK_SIZE(residue->value, "residue", natoms);
+    auto const* residue = particles.find("residue");
+    if (residue) {
+        if (natoms == msys::BadId) natoms = residue->Size();
+        CHECK_SIZE(*residue, "residue", natoms);
     }
 
-    auto const& mass = particles.FindMember("m");
-    if (mass != particles.MemberEnd()) {
-        if (natoms == msys::BadId) natoms = mass->value.Size();
-        CHECK_SIZE(mass->value, "m", natoms);
+    auto const* mass = particles.find("m");
+    if (mass) {
+        if (natoms == msys::BadId) natoms = mass->Size();
+        CHECK_SIZE(*mass, "m", natoms);
     }
 
-    auto const& charge = particles.FindMember("c");
-    if (charge != particles.MemberEnd()) {
-        if (natoms == msys::BadId) natoms = charge->value.Size();
-        CHECK_SIZE(charge->value, "c", natoms);
+    auto const* charge = particles.find("c");
+    if (charge) {
+        if (natoms == msys::BadId) natoms = charge->Size();
+        CHECK_SIZE(*charge, "c", natoms);
     }
 
     if (natoms == msys::BadId)
         MSYS_FAIL("Unable to find any atoms in the particles object!");
 
     for (Id i=0; i<natoms; i++) {
-        Id res = residue != particles.MemberEnd() ? residue->value[i].GetInt() : 0;
+        Id res = residue ? residue->GetInt(i) : 0;
         auto& atm = mol->atomFAST(mol->addAtom(res));
-        if (name != particles.MemberEnd()) {
-            atm.name = get_name(names->value, name->value[i].GetInt());
+        if (name) {
+            atm.name = get_name(names, name->GetInt(i));
         }
 
-        if (pos != particles.MemberEnd()) {
-            atm.x = pos->value[3*i  ].GetDouble();
-            atm.y = pos->value[3*i+1].GetDouble();
-            atm.z = pos->value[3*i+2].GetDouble();
+        if (pos) {
+            atm.x = pos->GetDouble(3*i  );
+            atm.y = pos->GetDouble(3*i+1);
+            atm.z = pos->GetDouble(3*i+2);
         }
-        if (vel != particles.MemberEnd()) {
-            atm.vx = vel->value[3*i  ].GetDouble();
-            atm.vy = vel->value[3*i+1].GetDouble();
-            atm.vz = vel->value[3*i+2].GetDouble();
+        if (vel) {
+            atm.vx = vel->GetDouble(3*i  );
+            atm.vy = vel->GetDouble(3*i+1);
+            atm.vz = vel->GetDouble(3*i+2);
         }
 
-        if (anum != particles.MemberEnd()) atm.atomic_number = anum->value[i].GetInt();
-        if (fc != particles.MemberEnd()) atm.formal_charge = fc->value[i].GetInt();
-        if (mass != particles.MemberEnd()) atm.mass = mass->value[i].GetDouble();
-        if (charge != particles.MemberEnd()) atm.charge = charge->value[i].GetDouble();
+        if (anum) atm.atomic_number = anum->GetInt(i);
+        if (fc) atm.formal_charge = fc->GetInt(i);
+        if (mass) atm.mass = mass->GetDouble(i);
+        if (charge) atm.charge = charge->GetDouble(i);
     }
-    auto const& tags = particles.FindMember("tags");
-    if (tags != particles.MemberEnd()) {
-        read_tags(tags->value, mol->atomProps(), names->value);
+    auto const* tags = particles.find("tags");
+    if (tags) {
+        read_tags(*tags, mol->atomProps(), names);
     }
 
 }
 
-static void read_bonds(Document const& d, SystemPtr mol) {
+static void read_bonds(Node const& d, SystemPtr mol) {
     auto& bonds = d["b"];
     auto& p = bonds["i"];
     Id nbonds = p.Size() / 2;
 
-    auto const& order = bonds.FindMember("order");
-    if (order != bonds.MemberEnd()) CHECK_SIZE(order->value, "order", nbonds);
+    auto const* order = bonds.find("order");
+    if (order) CHECK_SIZE(*order, "order", nbonds);
     
     for (Id i=0, n=nbonds; i<n; i++) {
         auto& bond = mol->bondFAST(mol->addBond(
-            p[2*i].GetInt(),
-            p[2*i+1].GetInt()));
+            p.GetInt(2*i),
+            p.GetInt(2*i+1)));
 
-        if (order != bonds.MemberEnd()) {
-            bond.order = order->value[i].GetInt();
+        if (order) {
+            bond.order = order->GetInt(i);
         }
     }
 }
 
-static void read_params(Value const& val, Value const& names, ParamTablePtr params, const std::string &name) {
+static void read_params(Node const& val, Node const* names, ParamTablePtr params, const std::string &name) {
     Id nparams = msys::BadId;
 
     // search for the number of parameters
-    auto const& count = val.FindMember("c");
-    if (count != val.MemberEnd()) {
-        nparams = count->value.GetInt();
+    auto const* count = val.find("c");
+    if (count) {
+        nparams = count->GetInt();
     } else {
-        for (auto const& m : val["p"].GetObject()) {
-            auto const& valm = m.value.FindMember("v");
-            if (valm == m.value.MemberEnd()) continue; // no vals, skip along
+        for (auto const& m : val["p"].members) {
+            auto const* valm = m.second.find("v");
+            if (!valm) continue; // no vals, skip along
 
-            nparams = m.value["v"].GetArray().Size(); // use the first one we find
+            nparams = valm->Size(); // use the first one we find
             break;
         }
     }
@@ -334,13 +473,13 @@ static void read_params(Value const& val, Value const& names, ParamTablePtr para
     for (Id i=0; i<nparams; i++)  params->addParam();
 
     // now populate them with the appropriate values
-    for (auto const& m : val["p"].GetObject()) {
-        auto type = parse_type(m.value["t"].GetString());
+    for (auto const& m : val["p"].members) {
+        auto type = parse_type(m.second["t"].GetString());
 
-        Id j=params->addProp(m.name.GetString(), type);
+        Id j=params->addProp(m.first, type);
 
-        auto const& valm = m.value.FindMember("v");
-        if (valm == m.value.MemberEnd()) {
+        auto const* valm = m.second.find("v");
+        if (!valm) {
             switch (type) {
                 case msys::IntType:
                     for (Id i=0; i<nparams; i++) {
@@ -359,22 +498,22 @@ static void read_params(Value const& val, Value const& names, ParamTablePtr para
                     break;
             }
         } else {
-            auto vals = m.value["v"].GetArray();
+            auto const& vals = *valm;
             CHECK_SIZE(vals, "v", nparams);
             switch (type) {
                 case msys::IntType:
                     for (Id i=0; i<nparams; i++) {
-                        params->value(i,j) = vals[i].GetInt();
+                        params->value(i,j) = vals.GetInt(i);
                     }
                     break;
                 case msys::FloatType:
                     for (Id i=0; i<nparams; i++) {
-                        params->value(i,j) = vals[i].GetDouble();
+                        params->value(i,j) = vals.GetDouble(i);
                     }
                     break;
                 case msys::StringType:
                     for (Id i=0; i<nparams; i++) {
-                        params->value(i,j) = get_name(names, vals[i].GetInt());
+                        params->value(i,j) = get_name(names, vals.GetInt(i));
                     }
                     break;
             }
@@ -382,39 +521,39 @@ static void read_params(Value const& val, Value const& names, ParamTablePtr para
     }
 }
 
-static void read_aux(Document const& d, SystemPtr mol) {
-    auto const& tables = d.FindMember("aux");
-    if (tables == d.MemberEnd()) return;
-    auto& names = d["names"];
-    for (auto& m : tables->value.GetObject()) {
+static void read_aux(Node const& d, SystemPtr mol) {
+    auto const* tables = d.find("aux");
+    if (!tables) return;
+    auto const* names = d.find("names");
+    for (auto& m : tables->members) {
         auto params = ParamTable::create();
-        read_params(m.value, names, params, "aux params");
-        mol->addAuxTable(m.name.GetString(), params);
+        read_params(m.second, names, params, "aux params");
+        mol->addAuxTable(m.first, params);
     }
 }
 
-static void read_tables(Document const& d, SystemPtr mol) {
-    auto const& names = d.FindMember("names");
-    auto const& tables = d.FindMember("t");
-    if (tables == d.MemberEnd()) return;
-    for (auto& m : tables->value.GetObject()) {
-        auto table = mol->addTable(m.name.GetString(), m.value["n"].GetInt());
-        auto attrs = m.value.FindMember("a");
-        if (attrs != m.value.MemberEnd()) {
-            auto const& category = attrs->value.FindMember("c");
-            if (category != attrs->value.MemberEnd()) {
-                table->category = msys::parse(category->value.GetString());
+static void read_tables(Node& d, SystemPtr mol) {
+    auto const* names = d.find("names");
+    auto* tables = d.find("t");
+    if (!tables) return;
+    for (auto& m : tables->members) {
+        auto table = mol->addTable(m.first, m.second["n"].GetInt());
+        auto const* attrs = m.second.find("a");
+        if (attrs) {
+            auto const* category = attrs->find("c");
+            if (category) {
+                table->category = msys::parse(category->GetString());
             }
             if (table->name() == "nonbonded") {
-                auto const& rule = attrs->value.FindMember("vdw_rule");
-                if (rule != attrs->value.MemberEnd()) {
-                    mol->nonbonded_info.vdw_rule = rule->value.GetString();
+                auto const* rule = attrs->find("vdw_rule");
+                if (rule) {
+                    mol->nonbonded_info.vdw_rule = rule->GetString();
                     mol->nonbonded_info.vdw_funct = "vdw_12_6";
                 }
             }
         }
-        read_params(m.value["p"], names->value, table->params(), table->name());
-        auto& terms = m.value["t"];
+        read_params(m.second["p"], names, table->params(), table->name());
+        auto& terms = m.second["t"];
 
         auto& particles = terms["i"];
         auto& params = terms["p"];
@@ -424,25 +563,26 @@ static void read_tables(Document const& d, SystemPtr mol) {
         Id particle_index = 0;
         for (Id i=0, n=params.Size(); i<n; i++) {
             for (Id j=0, m=table->atomCount(); j<m; j++) {
-                atoms[j] = particles[particle_index++].GetInt();
+                atoms[j] = particles.GetInt(particle_index++);
             }
-            table->addTerm(atoms, params[i].GetInt());
+            table->addTerm(atoms, params.GetInt(i));
         }
 
-        auto const &tags = m.value.FindMember("tags");
-        if (tags != m.value.MemberEnd()) {
-            read_tags(tags->value, table->props(), names->value);
+        auto const* tags = m.second.find("tags");
+        if (tags) {
+            read_tags(*tags, table->props(), names);
         }
+        m.second = Node();
     }
 }
 
-static void read_cts(Document const& d, SystemPtr mol) {
-    auto const& cts = d.FindMember("c");
-    if (cts == d.MemberEnd()) return;
+static void read_cts(Node const& d, SystemPtr mol) {
+    auto const* cts = d.find("c");
+    if (!cts) return;
 
     Id ctid = 0;
-    for (auto& ct : cts->value.GetArray()) {
-        if (!ct.IsObject()) MSYS_FAIL("Object not found in ct array!");
+    for (auto& ct : cts->items) {
+        if (ct.kind != Node::Object) MSYS_FAIL("Object not found in ct array!");
 
         if (ctid != 0) {
             Id newctid = mol->addCt();
@@ -451,23 +591,23 @@ static void read_cts(Document const& d, SystemPtr mol) {
         auto &newct = mol->ct(ctid);
 
         // ct name
-        auto const &name = ct.FindMember("n");
-        if (name != ct.MemberEnd()) newct.setName(name->value.GetString());
+        auto const* name = ct.find("n");
+        if (name) newct.setName(name->GetString());
            
         // ct key-values
-        auto const &kv = ct.FindMember("k");
-        if (kv != ct.MemberEnd()) {
-            for (auto& m : kv->value.GetObject()) {
-                Id id = newct.add(m.name.GetString(), msys::ValueType::StringType);
-                newct.value(id) = m.value.GetString();
+        auto const* kv = ct.find("k");
+        if (kv) {
+            for (auto& m : kv->members) {
+                Id id = newct.add(m.first, msys::ValueType::StringType);
+                newct.value(id) = m.second.GetString();
             }
         }
 
         // chain ct associations
-        auto const &chains = ct.FindMember("c");
-        if (chains != ct.MemberEnd()) {
-            for (auto &chain_id : chains->value.GetArray()) {
-                mol->setChain(chain_id.GetInt(), ctid);
+        auto const* chains = ct.find("c");
+        if (chains) {
+            for (Id i=0, n=chains->Size(); i<n; i++) {
+                mol->setChain(chains->GetInt(i), ctid);
             }
         }
 
@@ -475,13 +615,19 @@ static void read_cts(Document const& d, SystemPtr mol) {
     }
 }
 
-static SystemPtr import_json(Document const& d) {
+/* sections of d are released as they are read, so that the System and
+ * the parsed document don't both hold everything at once. */
+static SystemPtr import_json(Node& d) {
     auto mol = System::create();
     read_chains(d, mol);
     read_residues(d, mol);
+    d.release("chains");
+    d.release("residues");
     read_particles(d, mol);
+    d.release("i");
     read_cell(d, mol);
     read_bonds(d, mol);
+    d.release("b");
     read_tables(d, mol);
     read_aux(d, mol);
     read_cts(d, mol);
@@ -492,26 +638,25 @@ static SystemPtr import_json(Document const& d) {
 namespace desres { namespace msys {
 
     SystemPtr ImportJson(std::string const& path) {
-        Document d;
-        auto json = slurp(path.data());
-        ParseResult ok = d.Parse<kParseFullPrecisionFlag>(json.get());
-        if (!ok) {
-            MSYS_FAIL("Failed to parse JSON at " << ok.Offset() << ":" << GetParseError_En(ok.Code()));
-            return nullptr;
+        FILE* fp = fopen(path.data(), "rb");
+        if (!fp) {
+            MSYS_FAIL("Reading file at '" << path << "': " << strerror(errno));
+        }
+        std::shared_ptr<FILE> closer(fp, fclose);
+        char buf[65536];
+        FileReadStream stream(fp, buf, sizeof(buf));
+        Node d = parse_tree(stream);
+        if (ferror(fp)) {
+            MSYS_FAIL("Error reading file contents at " << path
+                    << ": " << strerror(errno));
         }
-        SystemPtr mol = import_json(d);
-        return mol;
+        return import_json(d);
     }
 
     SystemPtr ParseJson(const char* text) {
-        Document d;
-        ParseResult ok = d.Parse<kParseFullPrecisionFlag>(text);
-        if (!ok) {
-            MSYS_FAIL("Failed to parse JSON at " << ok.Offset() << ":" << GetParseError_En(ok.Code()));
-            return nullptr;
-        }
-        SystemPtr mol = import_json(d);
-        return mol;
+        StringStream stream(text);
+        Node d = parse_tree(stream);
+        return import_json(d);
     }
 
 }}
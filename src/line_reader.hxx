@@ -0,0 +1,67 @@
+#ifndef desres_msys_line_reader_hxx
+#define desres_msys_line_reader_hxx
+
+#include "types.hxx"
+#include <zlib.h>
+#include <string.h>
+#include <errno.h>
+#include <vector>
+
+namespace desres { namespace msys {
+
+    /* Reads lines from a plain or gzipped file, keeping track of the
+     * offset of each line in the uncompressed contents. */
+    class LineReader {
+        gzFile fp;
+        std::string _path;
+        std::vector<char> buf;
+        size_t pos = 0;
+        size_t end = 0;
+        size_t _tell = 0;
+
+    public:
+        explicit LineReader(std::string const& path)
+        : _path(path), buf(1<<16) {
+            fp = gzopen(path.data(), "rb");
+            if (!fp) MSYS_FAIL("Could not open " << path << ": " << strerror(errno));
+            gzbuffer(fp, 1<<17);
+        }
+        ~LineReader() {
+            gzclose(fp);
+        }
+        LineReader(LineReader const&) = delete;
+        LineReader& operator=(LineReader const&) = delete;
+
+        /* offset in the (uncompressed) file of the next line */
+        size_t tell() const { return _tell; }
+
+        /* Append the next line, including its newline, to s.  Returns
+         * false if there was nothing left to read. */
+        bool getline(std::string& s) {
+            bool got = false;
+            for (;;) {
+                if (pos==end) {
+                    int rc = gzread(fp, buf.data(), buf.size());
+                    if (rc<0) {
+                        int errnum;
+                        MSYS_FAIL("Reading " << _path << ": " << gzerror(fp, &errnum));
+                    }
+                    if (rc==0) return got;
+                    pos = 0;
+                    end = rc;
+                }
+                const char* p = buf.data() + pos;
+                const char* nl = (const char*)memchr(p, '\n', end-pos);
+                size_t n = nl ? nl-p+1 : end-pos;
+                s.append(p, n);
+                pos += n;
+                _tell += n;
+                got = true;
+                if (nl) return true;
+            }
+        }
+    };
+
+}}
+
+#endif
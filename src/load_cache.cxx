@@ -0,0 +1,204 @@
+#include "io.hxx"
+#include "msysb.hxx"
+#include "MsysThreeRoe.hpp"
+#include <sstream>
+#include <algorithm>
+#include <ctype.h>
+#include <errno.h>
+#include <stdlib.h>
+#include <string.h>
+#ifndef _MSC_VER
+#include <dirent.h>
+#include <sys/stat.h>
+#include <sys/time.h>
+#include <time.h>
+#include <unistd.h>
+#endif
+
+using namespace desres::msys;
+
+#ifndef _MSC_VER
+namespace {
+
+    const char SUFFIX[] = ".msysb";
+
+    /* temporary files left behind by writers which died */
+    const time_t STALE_TMP_SECONDS = 24*3600;
+
+    bool ends_with(std::string const& s, const char* end) {
+        size_t n = strlen(end);
+        return s.size()>n && !s.compare(s.size()-n, n, end);
+    }
+
+    /* length of the hex digests used as keys */
+    const size_t KEY_SIZE = 32;
+
+    /* does name start with a cache key?  Only entries and temporary
+     * files named after keys are ever removed from the directory, so
+     * that other files kept there are left alone. */
+    bool starts_with_key(std::string const& name, size_t start) {
+        return name.size()>=start+KEY_SIZE &&
+            std::all_of(name.begin()+start, name.begin()+start+KEY_SIZE,
+                        [](char c) { return isxdigit((unsigned char)c) &&
+                                            !isupper((unsigned char)c); });
+    }
+
+    /* <key>.msysb */
+    bool is_entry(std::string const& name) {
+        return name.size()==KEY_SIZE+strlen(SUFFIX) &&
+               starts_with_key(name, 0) && ends_with(name, SUFFIX);
+    }
+
+    /* .<key>.XXXXXX, from write_entry */
+    bool is_tmp_entry(std::string const& name) {
+        return name.size()==KEY_SIZE+8 && name[0]=='.' &&
+               starts_with_key(name, 1) && name[KEY_SIZE+1]=='.';
+    }
+
+    std::string cache_key(std::string const& real, struct stat const& st,
+                          bool structure_only, bool without_tables) {
+        std::ostringstream ss;
+        ss << msys_version() << '\n' << real << '\n'
+           << st.st_dev << ' ' << st.st_ino << ' ' << st.st_size << ' '
+           << st.st_mtime << ' '
+#ifdef __APPLE__
+           << st.st_mtimespec.tv_nsec
+#else
+           << st.st_mtim.tv_nsec
+#endif
+           << ' ' << structure_only << without_tables;
+        return ThreeRoe(ss.str()).hexdigest();
+    }
+
+    void make_dir(std::string const& dir) {
+        if (mkdir(dir.data(), 0777) && errno!=EEXIST) {
+            MSYS_FAIL("Could not create cache directory " << dir << ": "
+                    << strerror(errno));
+        }
+    }
+
+    /* write mol to a temporary file in the cache directory, then move it
+     * into place so that readers never see a partial entry. */
+    void write_entry(SystemPtr mol, std::string const& dir,
+                     std::string const& entry, std::string const& key) {
+        std::string tmp = dir + "/." + key + ".XXXXXX";
+        int fd = mkstemp(&tmp[0]);
+        if (fd<0) {
+            MSYS_FAIL("Could not create file in " << dir << ": "
+                    << strerror(errno));
+        }
+        fchmod(fd, 0644);
+        close(fd);
+        try {
+            ExportMsysb(mol, tmp, Provenance());
+            if (rename(tmp.data(), entry.data())) {
+                MSYS_FAIL("Could not rename " << tmp << " to " << entry
+                        << ": " << strerror(errno));
+            }
+        }
+        catch (std::exception&) {
+            unlink(tmp.data());
+            throw;
+        }
+    }
+
+    /* remove the least recently used entries until at most max_bytes
+     * remain.  Entries are touched when read, so their modification
+     * time is their last use. */
+    void evict(std::string const& dir, uint64_t max_bytes) {
+        DIR* d = opendir(dir.data());
+        if (!d) return;
+        struct entry_t {
+            time_t mtime;
+            uint64_t size;
+            std::string path;
+        };
+        std::vector<entry_t> entries;
+        uint64_t total = 0;
+        time_t now = time(NULL);
+        while (struct dirent* ent = readdir(d)) {
+            std::string name(ent->d_name);
+            std::string path = dir + "/" + name;
+            struct stat st;
+            if (is_tmp_entry(name)) {
+                if (!stat(path.data(), &st) &&
+                    now - st.st_mtime > STALE_TMP_SECONDS) {
+                    unlink(path.data());
+                }
+                continue;
+            }
+            if (!is_entry(name) || stat(path.data(), &st)) continue;
+            entries.push_back({st.st_mtime, uint64_t(st.st_size), path});
+            total += st.st_size;
+        }
+        closedir(d);
+        if (total<=max_bytes) return;
+
+        std::sort(entries.begin(), entries.end(),
+                [](entry_t const& a, entry_t const& b) {
+                    return a.mtime < b.mtime;
+                });
+        for (auto const& e : entries) {
+            if (total<=max_bytes) break;
+            /* another process may have removed it already */
+            unlink(e.path.data());
+            total -= e.size;
+        }
+    }
+}
+#endif
+
+namespace desres { namespace msys {
+
+    SystemPtr LoadCached(std::string const& path,
+                         std::string const& cache_dir,
+                         bool structure_only,
+                         bool without_tables,
+                         uint64_t max_bytes) {
+        FileFormat format = GuessFileFormat(path);
+#ifndef _MSC_VER
+        std::unique_ptr<char, void(*)(void*)> real(NULL, free);
+        struct stat st;
+        if (format!=UnrecognizedFileFormat && format!=MsysbFileFormat &&
+            format!=WebPdbFileFormat) {
+            real.reset(realpath(path.data(), NULL));
+        }
+        if (!real || stat(real.get(), &st) || !S_ISREG(st.st_mode)) {
+            return LoadWithFormat(path, format, structure_only,
+                                  without_tables);
+        }
+        std::string key = cache_key(real.get(), st, structure_only,
+                                    without_tables);
+        std::string entry = cache_dir + "/" + key + SUFFIX;
+
+        if (!access(entry.data(), R_OK)) {
+            try {
+                SystemPtr mol = ImportMsysb(entry);
+                utimes(entry.data(), NULL);
+                return mol;
+            }
+            catch (std::exception&) {
+                /* written by an incompatible build, or damaged; replace it */
+                unlink(entry.data());
+            }
+        }
+
+        SystemPtr mol = LoadWithFormat(path, format, structure_only,
+                                       without_tables);
+        if (mol) {
+            try {
+                make_dir(cache_dir);
+                write_entry(mol, cache_dir, entry, key);
+                evict(cache_dir, max_bytes);
+            }
+            catch (std::exception&) {
+                /* the cache is only an optimization */
+            }
+        }
+        return mol;
+#else
+        return LoadWithFormat(path, format, structure_only, without_tables);
+#endif
+    }
+
+}}
@@ -9,6 +9,14 @@ namespace desres { namespace msys {
     LoadIteratorPtr MaeIterator(std::string const& path,
                                 bool structure_only = false);
 
+    /* Iterator over mae contents held in memory */
+    LoadIteratorPtr MaeTextIterator(std::string const& data,
+                                    bool structure_only = false);
+
+    /* Offset in the (uncompressed) file of the end of each ct which
+     * would be returned by MaeIterator. */
+    std::vector<size_t> MaeEntryOffsets(std::string const& path);
+
     SystemPtr ImportMAE( std::string const& path,
                          bool ignore_unrecognized,
                          bool structure_only,
@@ -22,6 +30,17 @@ namespace desres { namespace msys {
                                 structure_only, structure_only);
     }
 
+    /* Like ImportMAE, but the ct blocks are located with a quick scan of
+     * the file, then tokenized and converted into separate systems using
+     * up to nthreads threads (0 for one per hardware thread), largest
+     * first, and finally merged in file order.  The result is the same
+     * as that of ImportMAE.  Alchemical files with fepio_stage 1 and 2
+     * cts are converted serially. */
+    SystemPtr ImportMAEParallel( std::string const& path,
+                                 unsigned nthreads = 0,
+                                 bool ignore_unrecognized = false,
+                                 bool structure_only = false);
+
     SystemPtr ImportMAEFromStream( std::istream& in,
                          bool ignore_unrecognized = false,
                          bool structure_only = false);
@@ -20,6 +20,30 @@ void Ffio::put( const std::string& name, const Ffio * f ) {
     registry()[name]=f;
 }
 
+namespace {
+    typedef std::map<std::string, AuxSchema> AuxSchemaMap;
+    AuxSchemaMap& aux_registry() {
+        static AuxSchemaMap r;
+        return r;
+    }
+}
+
+const AuxSchema * AuxSchema::get( const std::string& name ) {
+    AuxSchemaMap::const_iterator i=aux_registry().find(name);
+    if (i==aux_registry().end()) {
+        /* numbered tables, e.g. cmap1 */
+        size_t n = name.find_last_not_of("0123456789")+1;
+        if (n==0 || n==name.size()) return NULL;
+        i=aux_registry().find(name.substr(0,n));
+        if (i==aux_registry().end()) return NULL;
+    }
+    return &i->second;
+}
+
+void AuxSchema::put( const std::string& name, const AuxSchema& schema ) {
+    aux_registry()[name]=schema;
+}
+
 ParamMap::ParamMap( ParamTablePtr params, 
                     const Json& blk,
                     unsigned ncols,
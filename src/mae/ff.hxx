@@ -53,6 +53,34 @@ namespace desres { namespace msys { namespace mae {
         ~RegisterFfio() { delete plugin; }
     };
 
+    /* Schema of an aux table written by an Ffio plugin: the columns
+     * holding ids of params in a term table, which must be renumbered
+     * when cts read separately are merged.  Aux tables named by a
+     * registered name followed by a number (cmap1, cmap2, ...) share its
+     * schema. */
+    struct AuxSchema {
+        std::string table;              /* term table the ids refer to */
+        std::vector<std::string> param_columns;
+
+        /* register the schema of an aux table */
+        static void put( const std::string& name, const AuxSchema& schema );
+
+        /* get schema for aux table, or NULL if none registered */
+        static const AuxSchema* get( const std::string& name );
+    };
+
+    /* statically construct one of these next to the plugin which writes
+     * the aux table; e.g.,
+     * namespace { RegisterAuxSchema _("cmap"); }
+     */
+    struct RegisterAuxSchema {
+        explicit RegisterAuxSchema( const std::string& name,
+                                    const std::string& table = "",
+                                    std::vector<std::string> columns = {} ) {
+            AuxSchema::put( name, AuxSchema{table, std::move(columns)} );
+        }
+    };
+
     /* list of parameter values */
     typedef std::vector<double> ParamList;
 
@@ -121,5 +121,7 @@ namespace {
     RegisterFfio<Dummy> _4("ffio_cmap4");
     RegisterFfio<Dummy> _5("ffio_cmap5");
     RegisterFfio<Dummy> _6("ffio_cmap6");
+
+    RegisterAuxSchema _aux("cmap");
 }
 
@@ -57,11 +57,13 @@ namespace {
                 IdList group1 = parse_ids(g1.elem(i).as_string());
                 IdList group2 = parse_ids(g2.elem(i).as_string());
                 for (Id id : group1) {
-                    Id t = table->addTerm(IdList(1,id), p);
+                    IdList ids(1, sitemap.atoms().at(id));
+                    Id t = table->addTerm(ids, p);
                     table->termPropValue(t,"group") = max_group;
                 }
                 for (Id id : group2) {
-                    Id t = table->addTerm(IdList(1,id), p);
+                    IdList ids(1, sitemap.atoms().at(id));
+                    Id t = table->addTerm(ids, p);
                     table->termPropValue(t,"group") = max_group+1;
                 }
                 max_group += 2;
@@ -86,9 +88,9 @@ namespace {
             int i,n = blk.get("__size__").as_int();
             IdList ids(3);
             for (i=0; i<n; i++) {
-                ids[0]=ai.elem(i).as_int()-1;
-                ids[1]=aj.elem(i).as_int()-1;
-                ids[2]=ak.elem(i).as_int()-1;
+                ids[0]=sitemap.atoms().at(ai.elem(i).as_int()-1);
+                ids[1]=sitemap.atoms().at(aj.elem(i).as_int()-1);
+                ids[2]=sitemap.atoms().at(ak.elem(i).as_int()-1);
                 table->addTerm(ids, map.add(i));
             }
         }
@@ -111,10 +113,10 @@ namespace {
             int i,n = blk.get("__size__").as_int();
             IdList ids(4);
             for (i=0; i<n; i++) {
-                ids[0]=ai.elem(i).as_int()-1;
-                ids[1]=aj.elem(i).as_int()-1;
-                ids[2]=ak.elem(i).as_int()-1;
-                ids[3]=al.elem(i).as_int()-1;
+                ids[0]=sitemap.atoms().at(ai.elem(i).as_int()-1);
+                ids[1]=sitemap.atoms().at(aj.elem(i).as_int()-1);
+                ids[2]=sitemap.atoms().at(ak.elem(i).as_int()-1);
+                ids[3]=sitemap.atoms().at(al.elem(i).as_int()-1);
                 table->addTerm(ids, map.add(i));
             }
         }
@@ -153,5 +155,8 @@ namespace {
     RegisterFfio<Angle>     _2("ffio_angle_fbhw");
     RegisterFfio<Improper>  _3("ffio_improper_fbhw");
     RegisterFfio<Stretch>   _4("ffio_stretch_fbhw");
+
+    RegisterAuxSchema _aux("stretch_fbhw_interaction",
+                           "stretch_fbhw", {"param"});
 }
 
@@ -6,11 +6,16 @@
 #include "../mae.hxx"
 #include "../import.hxx"
 #include "../analyze.hxx"
+#include "../append.hxx"
+#include "../parallel.hxx"
 
 #include "destro/prep_alchemical_mae.hxx"
 
 #include <cstdio>
 #include <fstream>
+#include <map>
+#include <memory>
+#include <set>
 #ifdef DESMOND_USE_SCHRODINGER_MMSHARE
 #include <reassign_ff.hxx>
 #endif
@@ -280,6 +285,8 @@ namespace {
         }
     }
 
+    RegisterAuxSchema _ffinfo("forcefield");
+
     void write_ffinfo( const Json& ff, SystemPtr h ) {
         ParamTablePtr extra = h->auxTable("forcefield");
         if (!extra) {
@@ -461,6 +468,7 @@ namespace {
         const bool structure_only;
 
         std::ifstream in;
+        std::istringstream text;
         mae::import_iterator *it;
 
     public:
@@ -478,6 +486,11 @@ namespace {
             it = new mae::import_iterator(in);
         }
 
+        void init_text(std::string const& data) {
+            text.str(data);
+            it = new mae::import_iterator(text);
+        }
+
         ~iterator() {
             delete it;
         }
@@ -553,6 +566,263 @@ namespace {
         Analyze(h);
         return h;
     }
+
+    /* uncompressed contents of the stream */
+    std::string slurp(std::istream& file) {
+        std::unique_ptr<istream> in(istream::wrap(file));
+        std::string text;
+        char buf[65536];
+        while (std::streamsize n = in->read(buf, sizeof(buf))) {
+            text.append(buf, n);
+        }
+        return text;
+    }
+
+    /* Offsets of the start of each top-level block in the mae text,
+     * found by tracking braces outside of strings and comments.  This
+     * is only a guess: a split inside a block leaves the piece before it
+     * unterminated, so it is caught when the pieces are parsed. */
+    std::vector<size_t> block_starts(std::string const& text) {
+        std::vector<size_t> starts(1, 0);
+        int depth = 0;
+        bool token_start = true;
+        for (size_t i=0, n=text.size(); i<n; i++) {
+            char c = text[i];
+            if (c=='"') {
+                while (++i<n && text[i]!='"') {
+                    if (text[i]=='\\') ++i;
+                }
+                token_start = true;
+                continue;
+            }
+            if (c=='#' && token_start) {
+                while (++i<n && text[i]!='\n' && text[i]!='#') {}
+                continue;
+            }
+            if (c=='{') {
+                ++depth;
+            } else if (c=='}' && depth>0 && --depth==0 && i+1<n) {
+                starts.push_back(i+1);
+            }
+            token_start = isspace(c) || c=='{' || c=='}' || c=='[' || c==']';
+        }
+        return starts;
+    }
+
+    /* Append a ct which was converted into its own system by
+     * append_system to dst, with the same result as converting it into
+     * dst directly.  Unlike AppendSystem, parameter tables shared by
+     * term tables in src stay shared in dst, and aux tables, forcefield
+     * info and provenance are combined the way the ffio handlers,
+     * write_ffinfo and import_provenance would have. */
+    void merge_ct(SystemPtr dst, SystemPtr src) {
+        dst->name = src->name;
+        dst->global_cell = src->global_cell;
+        dst->nonbonded_info.merge(src->nonbonded_info);
+        if (dst->provenance().empty()) {
+            for (auto const& p : src->provenance()) dst->addProvenance(p);
+        }
+
+        IdList ctmap(src->maxCtId(), BadId);
+        IdList chnmap(src->maxChainId(), BadId);
+        IdList resmap(src->maxResidueId(), BadId);
+        IdList atmmap(src->maxAtomId(), BadId);
+        IdList propmap(src->atomPropCount());
+        for (Id i=0; i<propmap.size(); i++) {
+            propmap[i] = dst->addAtomProp(src->atomPropName(i),
+                                          src->atomPropType(i));
+        }
+        for (Id ct : src->cts()) {
+            Id id = ctmap[ct] = dst->addCt();
+            dst->ct(id) = src->ct(ct);
+        }
+        for (Id chn : src->chains()) {
+            Id ct = ctmap[src->chain(chn).ct];
+            Id id = chnmap[chn] = dst->addChain(ct);
+            dst->chain(id) = src->chain(chn);
+            dst->chain(id).ct = ct;
+        }
+        for (Id res : src->residues()) {
+            Id chn = chnmap[src->residue(res).chain];
+            Id id = resmap[res] = dst->addResidue(chn);
+            dst->residue(id) = src->residue(res);
+            dst->residue(id).chain = chn;
+        }
+        for (Id atm : src->atoms()) {
+            Id res = resmap[src->atom(atm).residue];
+            Id id = atmmap[atm] = dst->addAtom(res);
+            dst->atom(id) = src->atom(atm);
+            dst->atom(id).residue = res;
+            for (Id p=0; p<propmap.size(); p++) {
+                dst->atomPropValue(id, propmap[p]) = src->atomPropValue(atm, p);
+            }
+        }
+        for (Id bnd : src->bonds()) {
+            bond_t const& b = src->bond(bnd);
+            Id id = dst->addBond(atmmap[b.i], atmmap[b.j]);
+            dst->bond(id).order = b.order;
+            dst->bond(id).stereo = b.stereo;
+            dst->bond(id).aromatic = b.aromatic;
+        }
+
+        /* Visit tables already in dst first, so that a new table which
+         * shares params with one of them (e.g. alchemical_nonbonded and
+         * nonbonded) shares the same params in dst. */
+        std::vector<String> names = src->tableNames();
+        std::stable_partition(names.begin(), names.end(),
+                [&](String const& name) { return !!dst->table(name); });
+        std::map<ParamTablePtr, ParamTablePtr> shared;
+        std::map<std::pair<ParamTablePtr, ParamTablePtr>, IdList> pmaps;
+        for (auto const& name : names) {
+            TermTablePtr srctable = src->table(name);
+            TermTablePtr dsttable = dst->table(name);
+            ParamTablePtr params = srctable->params();
+            if (!dsttable) {
+                auto it = shared.find(params);
+                dsttable = dst->addTable(name, srctable->atomCount(),
+                        it==shared.end() ? ParamTablePtr() : it->second);
+                dsttable->category = srctable->category;
+            }
+            shared.emplace(params, dsttable->params());
+            auto key = std::make_pair(params, dsttable->params());
+            auto it = pmaps.find(key);
+            if (it==pmaps.end()) {
+                it = pmaps.emplace(key, AppendParams(dsttable->params(),
+                                params, params->params())).first;
+            }
+            AppendTerms(dsttable, srctable, atmmap, srctable->terms(),
+                        it->second);
+        }
+
+        for (auto const& name : src->auxTableNames()) {
+            ParamTablePtr aux = src->auxTable(name);
+            ParamTablePtr extra = dst->auxTable(name);
+            /* columns holding ids into the params of a term table, which
+             * AppendParams renumbered above. */
+            const AuxSchema* schema = AuxSchema::get(name);
+            if (!schema) {
+                MSYS_FAIL("Cannot merge aux table '" << name
+                        << "' across cts: no schema registered for it");
+            }
+            if (!schema->param_columns.empty()) {
+                TermTablePtr srctable = src->table(schema->table);
+                if (!srctable) {
+                    MSYS_FAIL("Aux table '" << name << "' refers to params of "
+                            << "missing table '" << schema->table << "'");
+                }
+                IdList const& pmap = pmaps.at(std::make_pair(
+                            srctable->params(),
+                            dst->table(schema->table)->params()));
+                ParamTablePtr copy = ParamTable::create();
+                AppendParams(copy, aux, aux->params());
+                for (auto const& colname : schema->param_columns) {
+                    Id col = copy->propIndex(colname);
+                    if (bad(col)) {
+                        MSYS_FAIL("Aux table '" << name << "' is missing "
+                                << "param column '" << colname << "'");
+                    }
+                    for (Id i=0; i<copy->paramCount(); i++) {
+                        copy->value(i,col) =
+                            pmap.at(copy->value(i,col).asInt());
+                    }
+                }
+                aux = copy;
+            }
+            if (name!="forcefield" || !extra) {
+                /* later cmap tables replace earlier ones */
+                dst->addAuxTable(name, aux);
+                continue;
+            }
+            std::set<std::string> paths;
+            for (Id i=0; i<extra->paramCount(); i++) {
+                paths.insert(extra->value(i,1).asString());
+            }
+            for (Id i=0; i<aux->paramCount(); i++) {
+                std::string path = aux->value(i,1).asString();
+                if (paths.count(path)) continue;
+                Id row = extra->addParam();
+                extra->value(row,0) = row;
+                extra->value(row,1) = path;
+                extra->value(row,2) = aux->value(i,2).asString();
+            }
+        }
+    }
+
+    SystemPtr read_all_parallel(std::istream& file,
+                                unsigned nthreads,
+                                bool ignore_unrecognized,
+                                bool structure_only,
+                                bool without_tables) {
+        std::string text = slurp(file);
+        std::vector<size_t> starts = block_starts(text);
+        starts.push_back(text.size());
+        const size_t npieces = starts.size()-1;
+
+        /* largest pieces first, so that they aren't left until the end */
+        std::vector<size_t> order(npieces);
+        for (size_t i=0; i<npieces; i++) order[i] = i;
+        std::stable_sort(order.begin(), order.end(), [&](size_t a, size_t b) {
+                return starts[a+1]-starts[a] > starts[b+1]-starts[b]; });
+
+        /* tokenize; on any error, let the serial reader report it */
+        std::vector<Json> pieces(npieces);
+        try {
+            parallel_for_each(npieces, nthreads, [&](size_t k) {
+                size_t i = order[k];
+                std::istringstream in(text.substr(starts[i],
+                                                  starts[i+1]-starts[i]));
+                mae::import_mae(in, pieces[i]);
+            });
+        }
+        catch (std::exception&) {
+            std::istringstream in(text);
+            return read_all(in, ignore_unrecognized, structure_only,
+                                                     without_tables);
+        }
+
+        std::vector<const Json*> cts;
+        bool stage1 = false, stage2 = false;
+        for (auto const& piece : pieces) {
+            for (int j=0; j<piece.size(); j++) {
+                const Json& ct = piece.elem(j);
+                int stage = ct.get("fepio_stage").as_int(0);
+                if (stage==1) stage1 = true;
+                if (stage==2) stage2 = true;
+                if (!is_full_system(ct)) cts.push_back(&ct);
+            }
+        }
+        if (stage1 && stage2) {
+            /* alchemical conversion needs the whole file */
+            std::istringstream in(text);
+            return read_all(in, ignore_unrecognized, structure_only,
+                                                     without_tables);
+        }
+        std::string().swap(text);
+
+        /* convert each ct into its own system, then merge in file order */
+        std::vector<SystemPtr> parts(cts.size());
+        order.resize(cts.size());
+        for (size_t i=0; i<cts.size(); i++) order[i] = i;
+        std::stable_sort(order.begin(), order.end(), [&](size_t a, size_t b) {
+                return cts[a]->get("m_atom").get("__size__").as_int(0) >
+                       cts[b]->get("m_atom").get("__size__").as_int(0); });
+        parallel_for_each(cts.size(), nthreads, [&](size_t k) {
+            size_t i = order[k];
+            parts[i] = System::create();
+            append_system(parts[i], *cts[i], ignore_unrecognized,
+                                             without_tables);
+        });
+        std::vector<Json>().swap(pieces);
+
+        SystemPtr h = System::create();
+        for (auto& part : parts) {
+            merge_ct(h, part);
+            part.reset();
+        }
+        if (structure_only) h = clone_structure_only(h);
+        Analyze(h);
+        return h;
+    }
 }
                            
 namespace desres { namespace msys {
@@ -573,6 +843,30 @@ namespace desres { namespace msys {
         return sys;
     }
 
+    SystemPtr ImportMAEParallel( std::string const& path,
+                                 unsigned nthreads,
+                                 bool ignore_unrecognized,
+                                 bool structure_only) {
+
+        std::ifstream file(path.c_str());
+        if (!file) {
+            MSYS_FAIL("Failed opening MAE file at '" << path << "'");
+        }
+#ifdef DESMOND_USE_SCHRODINGER_MMSHARE
+        /* forcefield reassignment works on the file as a whole */
+        SystemPtr sys = read_all(file, ignore_unrecognized,
+                                       structure_only,
+                                       structure_only);
+#else
+        SystemPtr sys = read_all_parallel(file, nthreads,
+                                          ignore_unrecognized,
+                                          structure_only,
+                                          structure_only);
+#endif
+        sys->name = path;
+        return sys;
+    }
+
     SystemPtr ImportMAEFromBytes( const char* bytes, int64_t len,
                          bool ignore_unrecognized, bool structure_only ) {
 
@@ -605,4 +899,33 @@ namespace desres { namespace msys {
         return ptr;
     }
 
+    LoadIteratorPtr MaeTextIterator(std::string const& data,
+                                    bool structure_only) {
+        const bool ignore_unrecognized = false;
+        iterator* it = new iterator(ignore_unrecognized, structure_only);
+        LoadIteratorPtr ptr(it);
+        it->init_text(data);
+        return ptr;
+    }
+
+    std::vector<size_t> MaeEntryOffsets(std::string const& path) {
+        std::ifstream in(path.c_str());
+        if (!in) {
+            MSYS_FAIL("Failed opening MAE file at '" << path << "'");
+        }
+        mae::import_iterator it(in);
+        std::vector<size_t> offsets;
+        Json block;
+        bool pending = false;
+        while (it.next(block)) {
+            /* The previous ct ends where this block begins.  The
+             * tokenizer has already read one character of the block. */
+            if (pending) offsets.push_back(it.offset()-1);
+            pending = !is_full_system(block);
+        }
+        /* at end of file, offset() is the size of the contents */
+        if (pending) offsets.push_back(it.offset());
+        return offsets;
+    }
+
 }}
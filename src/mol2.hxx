@@ -17,6 +17,9 @@ namespace desres { namespace msys {
     /* Iterator for mol2 files */
     LoadIteratorPtr Mol2Iterator(std::string const& path);
 
+    /* Iterator over mol2 records held in memory */
+    LoadIteratorPtr Mol2TextIterator(std::string const& data);
+
     /* Assign sybyl atom and bond types to the given system.  Be sure
      * bond order is valid; see AssignBondOrderAndFormalCharge.
      */
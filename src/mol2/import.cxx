@@ -8,6 +8,7 @@
 #include <stdio.h>
 #include <string.h>
 #include <errno.h>
+#include <algorithm>
 #include <unordered_map>
 
 using namespace desres::msys;
@@ -18,6 +19,25 @@ namespace {
         enum State { Skip, Molecule, Atom, Bond, Substructure, Crystal } state;
         char buf[256];
         long file_offset;
+        std::string data;   /* text of in-memory iterators */
+        size_t data_pos;    /* read position in data */
+
+        /* read the next line into buf, like fgets */
+        bool readline() {
+            if (fd) return fgets(buf, sizeof(buf), fd);
+            if (data_pos>=data.size()) return false;
+            size_t n = std::min(sizeof(buf)-1, data.size()-data_pos);
+            const char* p = &data[data_pos];
+            const char* nl = static_cast<const char*>(memchr(p, '\n', n));
+            if (nl) n = nl-p+1;
+            memcpy(buf, p, n);
+            buf[n] = 0;
+            data_pos += n;
+            return true;
+        }
+        long tell() const {
+            return fd ? ftell(fd) : long(data_pos);
+        }
 
         /* go to next molecule */
         void advance();
@@ -25,13 +45,18 @@ namespace {
         ~iterator() {
             if (fd) fclose(fd);
         }
-        explicit iterator(std::string const& path) : fd(), file_offset() {
+        explicit iterator(std::string const& path)
+        : fd(), state(Skip), file_offset(), data_pos() {
             fd = fopen(path.c_str(), "rb");
             if (!fd) {
                 MSYS_FAIL("Could not open mol2 file for reading at " << path);
             }
             advance();
         }
+        iterator(const char* text, size_t size)
+        : fd(), state(Skip), file_offset(), data(text, size), data_pos() {
+            advance();
+        }
         SystemPtr next();
     };
 }
@@ -59,10 +84,14 @@ LoadIteratorPtr desres::msys::Mol2Iterator(std::string const& path) {
     return LoadIteratorPtr(new iterator(path));
 }
 
+LoadIteratorPtr desres::msys::Mol2TextIterator(std::string const& data) {
+    return LoadIteratorPtr(new iterator(data.data(), data.size()));
+}
+
 void iterator::advance() {
-    while (fgets(buf, sizeof(buf), fd)) {
+    while (readline()) {
         if (!strncmp(buf, "@<TRIPOS>MOLECULE", 17)) {
-            file_offset = ftell(fd) - strlen(buf);
+            file_offset = tell() - strlen(buf);
             state = Molecule;
             break;
         }
@@ -85,12 +114,12 @@ SystemPtr iterator::next() {
     std::unordered_map<std::string, Id> chain_to_id;
 
     /* read mol_name */
-    if (!fgets(buf, sizeof(buf), fd)) MSYS_FAIL(strerror(errno));
+    if (!readline()) MSYS_FAIL(strerror(errno));
     mol->name = buf;
     trim(mol->name);
     mol->ct(0).setName(mol->name);
     /* read natoms, nbonds, optionally nsub */
-    if (!fgets(buf, sizeof(buf), fd)) MSYS_FAIL(strerror(errno));
+    if (!readline()) MSYS_FAIL(strerror(errno));
     if (sscanf(buf, "%d %d %d", &natoms, &nbonds, &nsub)<2) {
         MSYS_FAIL("Could not parse counts from line:\n" << buf);
     }
@@ -100,14 +129,14 @@ SystemPtr iterator::next() {
     }
 
     /* read mol_type and ignore */
-    if (!fgets(buf, sizeof(buf), fd)) MSYS_FAIL(strerror(errno));
+    if (!readline()) MSYS_FAIL(strerror(errno));
     /* read charge_type and ignore */
-    if (!fgets(buf, sizeof(buf), fd)) MSYS_FAIL(strerror(errno));
+    if (!readline()) MSYS_FAIL(strerror(errno));
 
-    while (fgets(buf, sizeof(buf), fd)) {
+    while (readline()) {
         if (buf[0]=='@') {
             if (!strncmp(buf, "@<TRIPOS>MOLECULE", 17)) {
-                file_offset = ftell(fd) - strlen(buf);
+                file_offset = tell() - strlen(buf);
                 state = Molecule;
                 break;
             } else if (!strncmp(buf, "@<TRIPOS>ATOM", 13)) {
@@ -132,7 +161,7 @@ SystemPtr iterator::next() {
                     Id residue = BadId, residue_id = BadId;
                     Float x,y,z,q=0;
                     char name[32], type[32], resname[32];
-                    if (!fgets(buf, sizeof(buf), fd)) {
+                    if (!readline()) {
                         MSYS_FAIL("Missing expected Atom record " << i+1);
                     }
                     int rc = sscanf(buf, "%d %s %lf %lf %lf %s %u %s %lf",
@@ -186,7 +215,7 @@ SystemPtr iterator::next() {
                 for (int i=0; i<nbonds; i++) {
                     int ai, aj;
                     char type[32];
-                    if (!fgets(buf, sizeof(buf), fd)) {
+                    if (!readline()) {
                         MSYS_FAIL("Missing expected Bond record " << i+1);
                     }
                     if (sscanf(buf, "%*d %d %d %s", &ai, &aj, type)!=3) {
@@ -215,7 +244,7 @@ SystemPtr iterator::next() {
 
             case Substructure:
                 for (int i=0; i<nsub; i++) {
-                    if (!fgets(buf, sizeof(buf), fd)) {
+                    if (!readline()) {
                         MSYS_FAIL("Missing expected Substructure record " << i+1);
                     }
                     // check that we read a consecutive id
@@ -264,7 +293,7 @@ SystemPtr iterator::next() {
                 state = Skip;
                 break;
             case Crystal: {
-                    if (!fgets(buf, sizeof(buf), fd)) {
+                    if (!readline()) {
                         MSYS_FAIL("Missing expected Crystal record");
                     }
                     double A, B, C, alpha, beta, gamma;
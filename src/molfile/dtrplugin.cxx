@@ -95,6 +95,7 @@ const char * desres::molfile::dtr_serialized_version() {
 static const char s_sep = '/';
 
 #include <netinet/in.h> /* for htonl */
+#include <sys/mman.h>
 #if defined(_AIX)
 #include <fcntl.h>
 #else
@@ -1748,32 +1749,47 @@ dtr::KeyMap DtrReader::frame(ssize_t iframe, molfile_timestep_t *ts, void ** buf
         }
         nread += rc;
     }
-    KeyMap map = frame_from_bytes(buffer, framesize, ts);
-
     if (!bufptr) {
-        map.clear();
+        /* decompress into local space so that concurrent reads of
+         * compressed frames don't share decompressed_data. */
+        void* allocated = nullptr;
+        try {
+            parse_frame(buffer, framesize, ts, &allocated);
+        } catch (std::exception&) {
+            free(allocated);
+            throw;
+        }
+        free(allocated);
+        return KeyMap();
     }
-
-    return map;
+    return frame_from_bytes(buffer, framesize, ts);
 }
 
-KeyMap DtrReader::frame_from_bytes(const void *buf, uint64_t len, 
-                                molfile_timestep_t *ts) const {
-
-    bool swap;
-    KeyMap blobs = ParseFrame(len, buf, &swap, &decompressed_data);
-
-    // We will dispatch to routines based on format, which can be
-    // defined in either the meta frame or the frame.
+// We will dispatch to routines based on format, which can be
+// defined in either the meta frame or the frame.
+static std::string frame_format(KeyMap const& meta, KeyMap& blobs) {
     std::string format;
-    auto p = metap->get_frame_map()->find("FORMAT");
-    if (p != metap->get_frame_map()->end()) {
+    auto p = meta.find("FORMAT");
+    if (p != meta.end()) {
         format += (char *) p->second.data;
     }
-    
     if (format == "") {
         format = blobs["FORMAT"].toString();
     }
+    return format;
+}
+
+KeyMap DtrReader::frame_from_bytes(const void *buf, uint64_t len, 
+                                molfile_timestep_t *ts) const {
+    return parse_frame(buf, len, ts, &decompressed_data);
+}
+
+KeyMap DtrReader::parse_frame(const void *buf, uint64_t len,
+                              molfile_timestep_t *ts, void** allocated) const {
+
+    bool swap;
+    KeyMap blobs = ParseFrame(len, buf, &swap, allocated);
+    std::string format = frame_format(*metap->get_frame_map(), blobs);
 
     // TS - handle ETR whether or not we got a frame, so that keyvals() from python works,
     // because we still want to unpack _D. For the others, do nothing.
@@ -1812,6 +1828,109 @@ KeyMap DtrReader::frame_from_bytes(const void *buf, uint64_t len,
     return blobs;
 }
 
+KeyMap DtrReader::mapped_frame(ssize_t iframe, FrameMappingCache const& cache,
+                               FrameFileMappingPtr* mapping,
+                               void** allocated) const {
+
+    if (iframe<0 || ((size_t)iframe)>=keys.full_size()) {
+        DTR_FAILURE("dtr " << dtr << " has no frame " << iframe << ": nframes=" << keys.full_size());
+    }
+    key_record_t key = keys[iframe];
+    uint64_t offset = key.offset();
+    uint64_t framesize = key.size();
+
+    FrameFileMappingPtr m = cache.get(framefile(iframe));
+    if (offset + framesize > m->size()) {
+        DTR_FAILURE("frame file " << m->path() << " of size " << m->size()
+                << " is too short for frame at offset " << offset
+                << " size " << framesize);
+    }
+    const char* buf = m->data() + offset;
+
+    bool swap;
+    KeyMap blobs = ParseFrame(framesize, buf, &swap, allocated);
+    if (frame_format(*metap->get_frame_map(), blobs) == "ETR_V1") {
+        handle_etr_v1(framesize, buf, *metap->get_frame_map(), &blobs, swap);
+    }
+    *mapping = m;
+    return blobs;
+}
+
+KeyMap FrameSetReader::mapped_frame(ssize_t n, FrameFileMappingPtr* mapping,
+                                    void** allocated) const {
+    const DtrReader* comp = component(n);
+    if (!comp) {
+        DTR_FAILURE("frameset " << dtr << " has no frame " << n);
+    }
+    return comp->mapped_frame(n, *_mapcache, mapping, allocated);
+}
+
+FrameFileMapping::FrameFileMapping(std::string const& path)
+: _path(path), _addr(nullptr), _size(0) {
+    int fd = open(path.c_str(), O_RDONLY|O_BINARY);
+    if (fd<0) {
+        DTR_FAILURE("Error opening " << path << ": " << strerror(errno));
+    }
+    FdCloser _(fd);
+    struct stat statbuf;
+    if (fstat(fd, &statbuf)!=0) {
+        DTR_FAILURE("Could not stat " << path << ": " << strerror(errno));
+    }
+    _size = statbuf.st_size;
+    if (_size==0) return;
+    _addr = mmap(NULL, _size, PROT_READ, MAP_SHARED, fd, 0);
+    if (_addr==MAP_FAILED) {
+        _addr = nullptr;
+        DTR_FAILURE("Error mapping " << path << ": " << strerror(errno));
+    }
+}
+
+FrameFileMapping::~FrameFileMapping() {
+    if (_addr) munmap(_addr, _size);
+}
+
+FrameFileMappingPtr FrameMappingCache::get(std::string const& path) const {
+    {
+        std::lock_guard<std::mutex> lock(_mtx);
+        for (auto it=_lru.begin(); it!=_lru.end(); ++it) {
+            if ((*it)->path()==path) {
+                _lru.splice(_lru.begin(), _lru, it);
+                return _lru.front();
+            }
+        }
+    }
+    // map without holding the lock; if another thread mapped the same
+    // file in the meantime, we end up with a harmless duplicate.
+    FrameFileMappingPtr m(new FrameFileMapping(path));
+    std::lock_guard<std::mutex> lock(_mtx);
+    if (_capacity>0) {
+        _lru.push_front(m);
+        while (_lru.size() > _capacity) _lru.pop_back();
+    }
+    return m;
+}
+
+size_t FrameMappingCache::capacity() const {
+    std::lock_guard<std::mutex> lock(_mtx);
+    return _capacity;
+}
+
+void FrameMappingCache::set_capacity(size_t capacity) {
+    std::lock_guard<std::mutex> lock(_mtx);
+    _capacity = capacity;
+    while (_lru.size() > _capacity) _lru.pop_back();
+}
+
+size_t FrameMappingCache::size() const {
+    std::lock_guard<std::mutex> lock(_mtx);
+    return _lru.size();
+}
+
+void FrameMappingCache::clear() {
+    std::lock_guard<std::mutex> lock(_mtx);
+    _lru.clear();
+}
+
 void write_all( int fd, const char * buf, ssize_t count ) {
     while (count) {
         ssize_t n = ::write(fd, buf, count);
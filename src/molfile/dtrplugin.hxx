@@ -85,6 +85,8 @@ typedef int mode_t;
 #include <stdexcept>
 #include <memory>
 #include <cmath>
+#include <list>
+#include <mutex>
 
 #include "dtrframe.hxx"
 
@@ -166,11 +168,56 @@ namespace desres { namespace molfile {
       void load( std::istream& in  );
   };
 
+  // A read-only memory mapping of an entire frame file.  The file
+  // descriptor is closed as soon as the mapping has been made.
+  class FrameFileMapping {
+      std::string _path;
+      void*       _addr;
+      size_t      _size;
+
+  public:
+      explicit FrameFileMapping(std::string const& path);
+      ~FrameFileMapping();
+      FrameFileMapping(FrameFileMapping const&) = delete;
+      FrameFileMapping& operator=(FrameFileMapping const&) = delete;
+
+      std::string const& path() const { return _path; }
+      const char* data() const { return static_cast<const char*>(_addr); }
+      size_t size() const { return _size; }
+  };
+
+  typedef std::shared_ptr<const FrameFileMapping> FrameFileMappingPtr;
+
+  // Small LRU of frame file mappings, so that random access across many
+  // frame files doesn't remap the same file over and over.  Mappings
+  // handed out stay valid after eviction for as long as the caller holds
+  // a reference to them.  Thread safe.
+  class FrameMappingCache {
+      mutable std::mutex _mtx;
+      mutable std::list<FrameFileMappingPtr> _lru;  // most recent first
+      size_t _capacity;
+
+  public:
+      explicit FrameMappingCache(size_t capacity=16) : _capacity(capacity) {}
+
+      // mapping of the file at path, creating it if necessary.
+      FrameFileMappingPtr get(std::string const& path) const;
+
+      size_t capacity() const;
+      void set_capacity(size_t capacity);
+
+      // number of mappings currently held
+      size_t size() const;
+      void clear();
+  };
+
   class DtrReader;
 
   class FrameSetReader {
   protected:
     std::string dtr;
+    std::shared_ptr<FrameMappingCache> _mapcache
+        = std::make_shared<FrameMappingCache>();
 
   public:
     virtual ~FrameSetReader() {}
@@ -217,6 +264,14 @@ namespace desres { namespace molfile {
     // read up to count times beginning at index start into the provided space;
     // return the number of times actually read.
     virtual ssize_t times(ssize_t start, ssize_t count, double * times) const = 0;
+
+    // mappings of frame files shared by all framesets in this reader.
+    FrameMappingCache& mapping_cache() const { return *_mapcache; }
+
+    // parse frame n in place from a memory mapped frame file; see
+    // DtrReader::mapped_frame.
+    dtr::KeyMap mapped_frame(ssize_t n, FrameFileMappingPtr* mapping,
+                             void** allocated) const;
   };
 
   class metadata {
@@ -272,6 +327,10 @@ namespace desres { namespace molfile {
     std::string jobstep_id;
     mutable void* decompressed_data = nullptr;
 
+    // parse frame bytes, decompressing compressed fields into *allocated.
+    dtr::KeyMap parse_frame(const void *buf, uint64_t len,
+                            molfile_timestep_t *ts, void** allocated) const;
+
   public:
     enum {
         RandomAccess
@@ -325,6 +384,8 @@ namespace desres { namespace molfile {
 
     uint32_t framesperfile() const { return keys.framesperfile(); }
 
+    unsigned access() const { return _access; }
+
     void initWithTimekeys(Timekeys const& tk);
 
     virtual void init(int * changed=NULL);
@@ -353,7 +414,8 @@ namespace desres { namespace molfile {
         return this;
     }
 
-    /* WARNING: this method is reentrant only when using RandomAccess */
+    /* WARNING: this method is reentrant only when using RandomAccess, and
+     * when no bufptr is supplied. */
     virtual dtr::KeyMap frame(ssize_t n, molfile_timestep_t *ts,
                               void ** bufptr = NULL) const;
 
@@ -364,6 +426,15 @@ namespace desres { namespace molfile {
     dtr::KeyMap frame_from_bytes( const void *buf, uint64_t len,
                              molfile_timestep_t *ts ) const;
 
+    // Parse frame n directly from a read-only mapping of its frame file,
+    // obtained from cache.  The mapping is returned in *mapping, and
+    // keys of uncompressed fields point into it; fields which had to be
+    // decompressed point into *allocated, which the caller must free.
+    // Reentrant regardless of access mode.
+    dtr::KeyMap mapped_frame(ssize_t n, FrameMappingCache const& cache,
+                             FrameFileMappingPtr* mapping,
+                             void** allocated) const;
+
     std::ostream& dump(std::ostream &out) const;
     std::istream& load_v8(std::istream &in);
     const std::string get_path() {
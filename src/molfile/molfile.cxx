@@ -8,7 +8,9 @@
 #include <cstring>
 #include <limits.h>
 
+#include <algorithm>
 #include <map>
+#include <memory>
 #include <stdexcept>
 #include <string>
 
@@ -259,6 +261,91 @@ namespace desres { namespace molfile {
         return plugin->read_timestep2(handle, index, ts);
     }
 
+    namespace {
+        template <typename S, typename T>
+        void gather(const S* src, std::vector<unsigned> const& atoms,
+                    size_t natoms, T* dst) {
+            if (atoms.empty()) {
+                std::copy(src, src+3*natoms, dst);
+            } else {
+                for (auto id : atoms) {
+                    const S* p = src+3*id;
+                    *dst++ = p[0];
+                    *dst++ = p[1];
+                    *dst++ = p[2];
+                }
+            }
+        }
+    }
+
+    template <typename T>
+    ssize_t Reader::read_frames(std::vector<ssize_t> const& indices,
+                                std::vector<unsigned> const& atoms,
+                                T* pos, T* vel, double* box, double* times) const {
+        for (auto id : atoms) {
+            if (id >= (size_t)natoms()) {
+                throw std::runtime_error("Reader::read_frames - atom index out of range");
+            }
+        }
+        const size_t nsel = atoms.empty() ? natoms() : atoms.size();
+
+        std::unique_ptr<Reader> seq;
+        if (!plugin->read_timestep2) {
+            if (!plugin->read_next_timestep) {
+                throw std::runtime_error("read_frames() not implemented for this plugin");
+            }
+            for (size_t i=0; i<indices.size(); i++) {
+                if (indices[i]<0 || (i>0 && indices[i]<=indices[i-1])) {
+                    throw std::runtime_error("Reader::read_frames - plugin supports only increasing frame indices");
+                }
+            }
+            seq.reset(reopen());
+        }
+
+        Frame frame(natoms(), vel && has_velocities(), double_precision());
+        const molfile_timestep_t* ts = frame;
+        ssize_t cur = 0;    /* index of the next frame in seq */
+        ssize_t nread = 0;
+        for (auto index : indices) {
+            if (seq) {
+                for (; cur<index; ++cur) {
+                    if (plugin->read_next_timestep(seq->handle, natoms(), NULL)
+                            !=MOLFILE_SUCCESS) return nread;
+                }
+                if (plugin->read_next_timestep(seq->handle, natoms(), frame)
+                        !=MOLFILE_SUCCESS) return nread;
+                ++cur;
+            } else if (read_frame(index, frame) != MOLFILE_SUCCESS) {
+                throw std::runtime_error("Reading frame failed");
+            }
+            if (pos) {
+                if (ts->dcoords) gather(ts->dcoords, atoms, natoms(), pos);
+                else             gather(ts->coords,  atoms, natoms(), pos);
+                pos += 3*nsel;
+            }
+            if (vel) {
+                if (ts->dvelocities) gather(ts->dvelocities, atoms, natoms(), vel);
+                else if (ts->velocities) gather(ts->velocities, atoms, natoms(), vel);
+                else std::fill(vel, vel+3*nsel, T(0));
+                vel += 3*nsel;
+            }
+            if (box) {
+                std::copy(ts->unit_cell, ts->unit_cell+9, box);
+                box += 9;
+            }
+            if (times) *times++ = ts->physical_time;
+            ++nread;
+        }
+        return nread;
+    }
+
+    template ssize_t Reader::read_frames<float>(
+            std::vector<ssize_t> const&, std::vector<unsigned> const&,
+            float*, float*, double*, double*) const;
+    template ssize_t Reader::read_frames<double>(
+            std::vector<ssize_t> const&, std::vector<unsigned> const&,
+            double*, double*, double*, double*) const;
+
     Frame *Reader::next() const {
         if (!plugin->read_next_timestep) return NULL;
         Frame *result = new Frame(natoms(), has_velocities(), double_precision());
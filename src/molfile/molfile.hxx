@@ -137,6 +137,19 @@ namespace desres { namespace molfile {
         Frame *frame(ssize_t index) const;
 
         int read_frame(ssize_t index, molfile_timestep_t* ts) const;
+
+        /* Read the frames at the given indices, gathering the given atoms
+         * (all atoms if atoms is empty) into contiguous storage: pos and
+         * vel receive 3 values per selected atom per frame, box 9 values
+         * per frame (box vectors in rows) and times 1 value per frame.
+         * Any of them may be NULL.  Plugins without random access are
+         * read from a fresh handle, which requires increasing indices.
+         * Returns the number of frames read, which is less than requested
+         * only if such a sequential read hit the end of the file. */
+        template <typename T>
+        ssize_t read_frames(std::vector<ssize_t> const& indices,
+                            std::vector<unsigned> const& atoms,
+                            T* pos, T* vel, double* box, double* times) const;
         Frame *next() const;
         void skip() const;
 
@@ -0,0 +1,111 @@
+#include "prefetch.hxx"
+#include "dtrutil.hxx"
+
+
+using namespace desres::molfile;
+
+FramePrefetcher::FramePrefetcher(const FrameSetReader& reader,
+                                 std::vector<ssize_t> const& indices,
+                                 unsigned depth, unsigned threads)
+: _reader(reader), _indices(indices), _depth(depth), _start(clock::now()),
+  _issued(0), _yielded(0), _stop(false), _bytes(0), _stall(0) {
+
+    if (depth<1) DTR_FAILURE("prefetch depth must be positive");
+    if (threads<1) DTR_FAILURE("number of prefetch threads must be positive");
+    for (ssize_t i=0, n=reader.nframesets(); i<n; i++) {
+        if (reader.frameset(i)->access() == DtrReader::SequentialAccess) {
+            DTR_FAILURE("cannot prefetch from reader opened for sequential access");
+        }
+    }
+    for (ssize_t index : _indices) {
+        if (index<0 || index>=reader.size()) {
+            DTR_FAILURE("frameset " << reader.path() << " has no frame " << index);
+        }
+    }
+    if (threads>depth) threads=depth;
+    for (unsigned i=0; i<threads; i++) {
+        _workers.emplace_back(&FramePrefetcher::work, this);
+    }
+}
+
+FramePrefetcher::~FramePrefetcher() {
+    {
+        std::lock_guard<std::mutex> lock(_mtx);
+        _stop = true;
+    }
+    _space.notify_all();
+    for (auto& t : _workers) t.join();
+}
+
+void FramePrefetcher::work() {
+    std::unique_lock<std::mutex> lock(_mtx);
+    for (;;) {
+        _space.wait(lock, [this] {
+                return _stop || _issued >= _indices.size()
+                             || _issued < _yielded + _depth; });
+        if (_stop || _issued >= _indices.size()) return;
+        size_t pos = _issued++;
+        lock.unlock();
+
+        ssize_t index = _indices[pos];
+        ssize_t local = index;
+        std::unique_ptr<Frame> frame;
+        std::exception_ptr error;
+        uint64_t bytes = 0;
+        try {
+            const DtrReader* comp = _reader.component(local);
+            frame.reset(new Frame(comp->natoms(), _reader.has_velocities(), false));
+            _reader.frame(index, *frame);
+            bytes = comp->keys[local].size();
+        } catch (...) {
+            error = std::current_exception();
+        }
+
+        lock.lock();
+        if (error) {
+            _errors[pos] = error;
+        } else {
+            _done[pos] = std::move(frame);
+            _bytes += bytes;
+        }
+        _ready.notify_all();
+    }
+}
+
+Frame* FramePrefetcher::next() {
+    std::unique_lock<std::mutex> lock(_mtx);
+    if (_yielded >= _indices.size()) return NULL;
+    const size_t pos = _yielded;
+    auto t0 = clock::now();
+    _ready.wait(lock, [this, pos] {
+            return _done.count(pos) || _errors.count(pos); });
+    _stall += std::chrono::duration<double>(clock::now()-t0).count();
+
+    ++_yielded;
+    _space.notify_all();
+    auto err = _errors.find(pos);
+    if (err != _errors.end()) {
+        std::exception_ptr e = err->second;
+        _errors.erase(err);
+        std::rethrow_exception(e);
+    }
+    auto it = _done.find(pos);
+    Frame* frame = it->second.release();
+    _done.erase(it);
+    return frame;
+}
+
+size_t FramePrefetcher::remaining() const {
+    std::lock_guard<std::mutex> lock(_mtx);
+    return _indices.size() - _yielded;
+}
+
+FramePrefetcher::Stats FramePrefetcher::stats() const {
+    std::lock_guard<std::mutex> lock(_mtx);
+    Stats s;
+    s.frames = _yielded;
+    s.bytes = _bytes;
+    s.elapsed = std::chrono::duration<double>(clock::now()-_start).count();
+    s.stall = _stall;
+    return s;
+}
@@ -0,0 +1,83 @@
+#ifndef desres_msys_molfile_prefetch_hxx
+#define desres_msys_molfile_prefetch_hxx
+
+#include "dtrplugin.hxx"
+#include "molfile.hxx"
+
+#include <chrono>
+#include <condition_variable>
+#include <exception>
+#include <map>
+#include <memory>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+namespace desres { namespace molfile {
+
+    /* Reads frames of a frameset ahead of the consumer on a pool of
+     * worker threads, so that reads of upcoming frames (and their
+     * decompression) overlap with processing of the current one.
+     * Frames are handed back in the order of the requested indices.
+     * The reader must outlive the prefetcher, and must not have been
+     * opened for SequentialAccess. */
+    class FramePrefetcher {
+    public:
+        struct Stats {
+            uint64_t frames;    /* frames handed to the consumer */
+            uint64_t bytes;     /* bytes of frame data read */
+            double   elapsed;   /* seconds since construction */
+            double   stall;     /* seconds the consumer spent waiting */
+        };
+
+        /* Start reading the given frames, with at most depth frames
+         * read or being read ahead of the consumer, using the given
+         * number of threads. */
+        FramePrefetcher(const FrameSetReader& reader,
+                        std::vector<ssize_t> const& indices,
+                        unsigned depth, unsigned threads);
+
+        /* stops and joins the workers */
+        ~FramePrefetcher();
+
+        FramePrefetcher(FramePrefetcher const&) = delete;
+        FramePrefetcher& operator=(FramePrefetcher const&) = delete;
+
+        /* Next frame in order, or NULL when all frames have been
+         * returned.  Blocks until the frame has been read, and rethrows
+         * any exception raised while reading it.  Caller owns the frame.
+         * Not reentrant: there should be only one consumer. */
+        Frame* next();
+
+        /* number of frames not yet returned by next() */
+        size_t remaining() const;
+
+        Stats stats() const;
+
+    private:
+        typedef std::chrono::steady_clock clock;
+
+        const FrameSetReader& _reader;
+        const std::vector<ssize_t> _indices;
+        const size_t _depth;
+        const clock::time_point _start;
+
+        mutable std::mutex _mtx;
+        std::condition_variable _ready; /* a frame was read */
+        std::condition_variable _space; /* the consumer took a frame */
+        size_t _issued;                 /* next position to read */
+        size_t _yielded;                /* next position to return */
+        bool _stop;
+        std::map<size_t, std::unique_ptr<Frame> > _done;
+        std::map<size_t, std::exception_ptr> _errors;
+        uint64_t _bytes;
+        double _stall;
+
+        std::vector<std::thread> _workers;
+
+        void work();
+    };
+
+}}
+
+#endif
@@ -0,0 +1,596 @@
+#include "msysb.hxx"
+#include "clone.hxx"
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <errno.h>
+#include <type_traits>
+#ifndef _MSC_VER
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
+using namespace desres::msys;
+
+namespace {
+
+    const char MAGIC[8] = {'M','S','Y','S','B','I','N',0};
+    const uint32_t FORMAT_VERSION = 1;
+    const uint32_t ENDIAN_MARK = 0x01020304;
+    const uint32_t NULL_STRING = 0xffffffff;
+
+    static_assert(std::is_trivially_copyable<atom_t>::value &&
+                  std::is_trivially_copyable<bond_t>::value &&
+                  std::is_trivially_copyable<residue_t>::value,
+                  "element structs are copied as raw bytes");
+
+    /* written after the magic; a file is readable only if every field
+     * matches the running build */
+    struct layout_t {
+        uint32_t version;
+        uint32_t byte_order;
+        uint32_t atom_size;
+        uint32_t bond_size;
+        uint32_t residue_size;
+        uint32_t value_size;
+
+        static layout_t current() {
+            return {FORMAT_VERSION, ENDIAN_MARK, sizeof(atom_t), sizeof(bond_t),
+                    sizeof(residue_t), sizeof(Value)};
+        }
+        bool operator==(layout_t const& o) const {
+            return !memcmp(this, &o, sizeof(o));
+        }
+    };
+
+    /* appends blocks to a buffer.  Every block starts on an 8-byte
+     * boundary, and arrays are preceded by their length. */
+    class writer {
+        std::string& _buf;
+
+    public:
+        explicit writer(std::string& buf) : _buf(buf) {}
+
+        void bytes(const void* p, size_t n) {
+            _buf.append(static_cast<const char*>(p), n);
+            _buf.resize((_buf.size()+7) & ~size_t(7));
+        }
+
+        void count(uint64_t n) { bytes(&n, sizeof(n)); }
+
+        template <typename T>
+        void array(const T* p, uint64_t n) {
+            count(n);
+            bytes(p, n*sizeof(T));
+        }
+
+        template <typename T>
+        void array(std::vector<T> const& v) { array(v.data(), v.size()); }
+
+        void string(String const& s) { array(s.data(), s.size()); }
+
+        /* lengths followed by the concatenated characters; NULL is
+         * distinct from the empty string */
+        void strings(std::vector<const char*> const& v) {
+            std::vector<uint32_t> lens;
+            std::string blob;
+            lens.reserve(v.size());
+            for (const char* s : v) {
+                if (!s) {
+                    lens.push_back(NULL_STRING);
+                } else {
+                    size_t len = strlen(s);
+                    lens.push_back(len);
+                    blob.append(s, len);
+                }
+            }
+            array(lens);
+            string(blob);
+        }
+
+        void ids(IdBitset const& s) { array(s.ids()); }
+
+        /* compressed rows: n+1 offsets followed by the flattened ids */
+        void lists(MultiIdList const& v) {
+            std::vector<uint64_t> offsets(1, 0);
+            IdList flat;
+            offsets.reserve(v.size()+1);
+            for (IdList const& ids : v) {
+                flat.insert(flat.end(), ids.begin(), ids.end());
+                offsets.push_back(flat.size());
+            }
+            array(offsets);
+            array(flat);
+        }
+    };
+
+    class reader {
+        const char* _p;
+        const char* const _end;
+
+    public:
+        reader(const char* p, size_t len) : _p(p), _end(p+len) {}
+
+        const char* bytes(size_t n) {
+            size_t padded = (n+7) & ~size_t(7);
+            if (padded < n || size_t(_end-_p) < padded) {
+                MSYS_FAIL("Unexpected end of data");
+            }
+            const char* p = _p;
+            _p += padded;
+            return p;
+        }
+
+        uint64_t count() {
+            uint64_t n;
+            memcpy(&n, bytes(sizeof(n)), sizeof(n));
+            return n;
+        }
+
+        template <typename T>
+        void array(std::vector<T>& v) {
+            uint64_t n = count();
+            if (n > size_t(_end-_p)/sizeof(T)) {
+                MSYS_FAIL("Unexpected end of data");
+            }
+            v.resize(n);
+            if (n) memcpy(v.data(), bytes(n*sizeof(T)), n*sizeof(T));
+            else bytes(0);
+        }
+
+        String string() {
+            uint64_t n = count();
+            return String(bytes(n), n);
+        }
+
+        /* call f(s, len) for each string, with s NULL for NULL strings */
+        template <typename F>
+        void strings(uint64_t expected, F f) {
+            std::vector<uint32_t> lens;
+            array(lens);
+            if (lens.size()!=expected) MSYS_FAIL("Corrupt string array");
+            uint64_t size = count();
+            const char* s = bytes(size);
+            const char* end = s + size;
+            for (uint32_t len : lens) {
+                if (len==NULL_STRING) {
+                    f(nullptr, 0);
+                    continue;
+                }
+                if (size_t(end-s) < len) MSYS_FAIL("Corrupt string array");
+                f(s, len);
+                s += len;
+            }
+        }
+
+        IdBitset ids(size_t n) {
+            IdList v;
+            array(v);
+            IdBitset s;
+            for (Id id : v) {
+                if (id>=n) MSYS_FAIL("Corrupt deleted ids");
+                s.insert(id);
+            }
+            return s;
+        }
+
+        void lists(MultiIdList& v, uint64_t expected) {
+            std::vector<uint64_t> offsets;
+            IdList flat;
+            array(offsets);
+            array(flat);
+            if (offsets.size()!=expected+1 || offsets[0]!=0 ||
+                offsets.back()!=flat.size()) {
+                MSYS_FAIL("Corrupt id lists");
+            }
+            v.resize(expected);
+            for (uint64_t i=0; i<expected; i++) {
+                if (offsets[i+1] < offsets[i]) MSYS_FAIL("Corrupt id lists");
+                v[i].assign(flat.begin()+offsets[i], flat.begin()+offsets[i+1]);
+            }
+        }
+    };
+
+    /* pointers to the bytes of a file, which is mapped if possible */
+    class file_contents {
+        std::string _buf;
+        void* _map = nullptr;
+        size_t _size = 0;
+
+    public:
+        explicit file_contents(std::string const& path) {
+#ifndef _MSC_VER
+            int fd = open(path.data(), O_RDONLY);
+            if (fd<0) {
+                MSYS_FAIL("Could not open " << path << ": " << strerror(errno));
+            }
+            struct stat st;
+            if (fstat(fd, &st)) {
+                close(fd);
+                MSYS_FAIL("Could not stat " << path << ": " << strerror(errno));
+            }
+            _size = st.st_size;
+            if (_size) {
+                _map = mmap(NULL, _size, PROT_READ, MAP_PRIVATE, fd, 0);
+                if (_map==MAP_FAILED) {
+                    _map = nullptr;
+                    close(fd);
+                    MSYS_FAIL("Could not map " << path << ": " << strerror(errno));
+                }
+            }
+            close(fd);
+#else
+            FILE* fp = fopen(path.data(), "rb");
+            if (!fp) {
+                MSYS_FAIL("Could not open " << path << ": " << strerror(errno));
+            }
+            char buf[65536];
+            size_t n;
+            while ((n=fread(buf, 1, sizeof(buf), fp))>0) _buf.append(buf, n);
+            fclose(fp);
+            _size = _buf.size();
+#endif
+        }
+        ~file_contents() {
+#ifndef _MSC_VER
+            if (_map) munmap(_map, _size);
+#endif
+        }
+        file_contents(file_contents const&) = delete;
+        file_contents& operator=(file_contents const&) = delete;
+
+        const char* data() const {
+            return _map ? static_cast<const char*>(_map) : _buf.data();
+        }
+        size_t size() const { return _size; }
+    };
+}
+
+namespace desres { namespace msys {
+
+    /* declared a friend by the classes whose storage is written */
+    struct MsysbIO {
+
+        static void write_params(writer& w, ParamTable const& p) {
+            w.count(p._nrows);
+            w.array(p._paramrefs);
+            w.count(p._props.size());
+            for (auto const& prop : p._props) {
+                w.string(prop.name);
+                w.count(prop.type);
+                if (prop.type==StringType) {
+                    std::vector<const char*> s;
+                    s.reserve(prop.vals.size());
+                    for (Value const& v : prop.vals) s.push_back(v.s);
+                    w.strings(s);
+                } else {
+                    w.array(std::vector<Value>(prop.vals.begin(),
+                                               prop.vals.end()));
+                }
+            }
+        }
+
+        static ParamTablePtr read_params(reader& r) {
+            ParamTablePtr p = ParamTable::create();
+            p->_nrows = r.count();
+            r.array(p->_paramrefs);
+            if (p->_paramrefs.size()!=p->_nrows) {
+                MSYS_FAIL("Corrupt param table");
+            }
+            for (uint64_t i=0, n=r.count(); i<n; i++) {
+                p->_props.emplace_back();
+                ParamTable::Property& prop = p->_props.back();
+                prop.name = r.string();
+                prop.type = ValueType(r.count());
+                if (prop.type==StringType) {
+                    r.strings(p->_nrows, [&](const char* s, uint32_t len) {
+                        Value v;
+                        v.s = nullptr;
+                        if (s) {
+                            v.s = static_cast<char*>(malloc(len+1));
+                            memcpy(v.s, s, len);
+                            v.s[len] = '\0';
+                        }
+                        prop.vals.push_back(v);
+                    });
+                } else if (prop.type==IntType || prop.type==FloatType) {
+                    std::vector<Value> vals;
+                    r.array(vals);
+                    if (vals.size()!=p->_nrows) {
+                        MSYS_FAIL("Corrupt param table");
+                    }
+                    prop.vals.assign(vals.begin(), vals.end());
+                } else {
+                    MSYS_FAIL("Corrupt param table");
+                }
+            }
+            return p;
+        }
+
+        static void write(writer& w, System& sys, Provenance const& provenance,
+                          unsigned flags) {
+            w.bytes(MAGIC, sizeof(MAGIC));
+            layout_t layout = layout_t::current();
+            w.bytes(&layout, sizeof(layout));
+
+            w.string(sys.name);
+            for (int i=0; i<3; i++) {
+                w.bytes(sys.global_cell[i], 3*sizeof(double));
+            }
+            w.string(sys.nonbonded_info.vdw_funct);
+            w.string(sys.nonbonded_info.vdw_rule);
+            w.string(sys.nonbonded_info.es_funct);
+
+            std::vector<Provenance> prov = sys.provenance();
+            if (!provenance.version.empty()) prov.push_back(provenance);
+            w.count(prov.size());
+            for (Provenance const& p : prov) {
+                w.string(p.version);
+                w.string(p.timestamp);
+                w.string(p.user);
+                w.string(p.workdir);
+                w.string(p.cmdline);
+                w.string(p.executable);
+            }
+
+            sys.syncCoordinates();
+            w.array(sys._atoms);
+            w.ids(sys._deadatoms);
+            write_params(w, *sys._atomprops);
+
+            w.array(sys._bonds);
+            w.ids(sys._deadbonds);
+            write_params(w, *sys._bondprops);
+            w.lists(sys._bondindex);
+
+            w.array(sys._residues);
+            w.ids(sys._deadresidues);
+            w.lists(sys._residueatoms);
+
+            IdList chainct;
+            std::vector<const char*> names, segids;
+            for (chain_t const& chn : sys._chains) {
+                chainct.push_back(chn.ct);
+                names.push_back(chn.name.c_str());
+                segids.push_back(chn.segid.c_str());
+            }
+            w.array(chainct);
+            w.strings(names);
+            w.strings(segids);
+            w.ids(sys._deadchains);
+            w.lists(sys._chainresidues);
+
+            w.count(sys._cts.size());
+            for (component_t const& ct : sys._cts) write_params(w, *ct._kv);
+            w.ids(sys._deadcts);
+            w.lists(sys._ctchains);
+
+            /* param tables may be shared between term tables, so they
+             * are written once each and referred to by position. */
+            std::vector<std::pair<String, TermTablePtr> > tables;
+            std::vector<std::pair<String, ParamTablePtr> > aux;
+            if (!(flags & MsysbExport::StructureOnly)) {
+                for (String const& name : sys.tableNames()) {
+                    tables.emplace_back(name, sys.table(name));
+                }
+                for (String const& name : sys.auxTableNames()) {
+                    aux.emplace_back(name, sys.auxTable(name));
+                }
+            }
+            std::vector<ParamTable const*> pool;
+            std::map<ParamTable const*, uint64_t> poolids;
+            auto poolid = [&](ParamTablePtr const& p) {
+                auto iter = poolids.find(p.get());
+                if (iter!=poolids.end()) return iter->second;
+                pool.push_back(p.get());
+                return poolids[p.get()] = pool.size()-1;
+            };
+            std::vector<uint64_t> tableparams, overrideparams, auxparams;
+            for (auto const& t : tables) {
+                tableparams.push_back(poolid(t.second->_params));
+                overrideparams.push_back(poolid(t.second->_overrides->_params));
+            }
+            for (auto const& a : aux) auxparams.push_back(poolid(a.second));
+
+            w.count(pool.size());
+            for (ParamTable const* p : pool) write_params(w, *p);
+
+            w.count(tables.size());
+            for (size_t i=0; i<tables.size(); i++) {
+                TermTable const& t = *tables[i].second;
+                w.string(tables[i].first);
+                w.count(t._natoms);
+                w.count(t.category);
+                w.count(tableparams[i]);
+                w.array(t._terms);
+                w.count(t._ndead);
+                write_params(w, *t._props);
+                w.count(overrideparams[i]);
+                IdList overrides;
+                for (auto const& o : t._overrides->_map) {
+                    overrides.push_back(o.first.first);
+                    overrides.push_back(o.first.second);
+                    overrides.push_back(o.second);
+                }
+                w.array(overrides);
+            }
+
+            w.count(aux.size());
+            for (size_t i=0; i<aux.size(); i++) {
+                w.string(aux[i].first);
+                w.count(auxparams[i]);
+            }
+        }
+
+        static SystemPtr read(reader& r, bool without_tables) {
+            if (memcmp(r.bytes(sizeof(MAGIC)), MAGIC, sizeof(MAGIC))) {
+                MSYS_FAIL("Not an msysb file");
+            }
+            layout_t layout;
+            memcpy(&layout, r.bytes(sizeof(layout)), sizeof(layout));
+            if (!(layout==layout_t::current())) {
+                MSYS_FAIL("msysb file has version " << layout.version
+                        << " and was written by an incompatible build of msys");
+            }
+
+            SystemPtr mol = System::create();
+            System& sys = *mol;
+            sys.name = r.string();
+            for (int i=0; i<3; i++) {
+                memcpy(sys.global_cell[i], r.bytes(3*sizeof(double)),
+                       3*sizeof(double));
+            }
+            sys.nonbonded_info.vdw_funct = r.string();
+            sys.nonbonded_info.vdw_rule = r.string();
+            sys.nonbonded_info.es_funct = r.string();
+
+            for (uint64_t i=0, n=r.count(); i<n; i++) {
+                Provenance p;
+                p.version = r.string();
+                p.timestamp = r.string();
+                p.user = r.string();
+                p.workdir = r.string();
+                p.cmdline = r.string();
+                p.executable = r.string();
+                sys._provenance.push_back(p);
+            }
+
+            r.array(sys._atoms);
+            sys._deadatoms = r.ids(sys._atoms.size());
+            sys._atomprops = read_params(r);
+            if (sys._atomprops->paramCount()!=sys._atoms.size()) {
+                MSYS_FAIL("Corrupt atom properties");
+            }
+
+            r.array(sys._bonds);
+            sys._deadbonds = r.ids(sys._bonds.size());
+            sys._bondprops = read_params(r);
+            if (sys._bondprops->paramCount()!=sys._bonds.size()) {
+                MSYS_FAIL("Corrupt bond properties");
+            }
+            r.lists(sys._bondindex, sys._atoms.size());
+
+            r.array(sys._residues);
+            sys._deadresidues = r.ids(sys._residues.size());
+            r.lists(sys._residueatoms, sys._residues.size());
+
+            IdList chainct;
+            r.array(chainct);
+            sys._chains.resize(chainct.size());
+            for (size_t i=0; i<chainct.size(); i++) {
+                sys._chains[i].ct = chainct[i];
+            }
+            auto chain = sys._chains.begin();
+            r.strings(chainct.size(), [&](const char* s, uint32_t len) {
+                (chain++)->name.assign(s ? s : "", len);
+            });
+            chain = sys._chains.begin();
+            r.strings(chainct.size(), [&](const char* s, uint32_t len) {
+                (chain++)->segid.assign(s ? s : "", len);
+            });
+            sys._deadchains = r.ids(sys._chains.size());
+            r.lists(sys._chainresidues, sys._chains.size());
+
+            sys._cts.resize(r.count());
+            for (component_t& ct : sys._cts) ct._kv = read_params(r);
+            sys._deadcts = r.ids(sys._cts.size());
+            r.lists(sys._ctchains, sys._cts.size());
+
+            if (without_tables) return mol;
+
+            std::vector<ParamTablePtr> pool(r.count());
+            for (auto& p : pool) p = read_params(r);
+            auto pooled = [&](uint64_t i) {
+                if (i>=pool.size()) MSYS_FAIL("Corrupt param table reference");
+                return pool[i];
+            };
+
+            for (uint64_t i=0, n=r.count(); i<n; i++) {
+                String name = r.string();
+                Id natoms = r.count();
+                Category category = Category(r.count());
+                TermTablePtr t = sys.addTable(name, natoms, pooled(r.count()));
+                t->category = category;
+                r.array(t->_terms);
+                t->_ndead = r.count();
+                if (t->_terms.size() % (natoms+1)) {
+                    MSYS_FAIL("Corrupt terms in table " << name);
+                }
+                t->_props = read_params(r);
+                t->_overrides->_params = pooled(r.count());
+                IdList overrides;
+                r.array(overrides);
+                if (overrides.size() % 3) {
+                    MSYS_FAIL("Corrupt overrides in table " << name);
+                }
+                auto& map = t->_overrides->_map;
+                for (size_t j=0; j<overrides.size(); j+=3) {
+                    map.emplace_hint(map.end(),
+                            IdPair(overrides[j], overrides[j+1]),
+                            overrides[j+2]);
+                }
+            }
+
+            for (uint64_t i=0, n=r.count(); i<n; i++) {
+                String name = r.string();
+                sys.addAuxTable(name, pooled(r.count()));
+            }
+            return mol;
+        }
+    };
+
+    SystemPtr ImportMsysbFromBytes(const char* bytes, size_t len,
+                                   bool structure_only,
+                                   bool without_tables) {
+        reader r(bytes, len);
+        SystemPtr mol = MsysbIO::read(r, structure_only || without_tables);
+        if (structure_only) {
+            IdList ids;
+            for (Id i : mol->atoms()) {
+                if (mol->atomFAST(i).atomic_number>0) ids.push_back(i);
+            }
+            if (ids.size() < mol->atomCount()) mol = Clone(mol, ids);
+        }
+        return mol;
+    }
+
+    SystemPtr ImportMsysb(std::string const& path, bool structure_only,
+                                                   bool without_tables) {
+        try {
+            file_contents contents(path);
+            return ImportMsysbFromBytes(contents.data(), contents.size(),
+                                        structure_only, without_tables);
+        }
+        catch (std::exception& e) {
+            MSYS_FAIL("Error reading msysb file at '" << path << "': "
+                    << e.what());
+        }
+    }
+
+    std::string FormatMsysb(SystemPtr mol, Provenance const& provenance,
+                            unsigned flags) {
+        std::string buf;
+        writer w(buf);
+        MsysbIO::write(w, *mol, provenance, flags);
+        return buf;
+    }
+
+    void ExportMsysb(SystemPtr mol, std::string const& path,
+                     Provenance const& provenance, unsigned flags) {
+        std::string buf = FormatMsysb(mol, provenance, flags);
+        FILE* fp = fopen(path.data(), "wb");
+        if (!fp) {
+            MSYS_FAIL("Could not open " << path << " for writing: "
+                    << strerror(errno));
+        }
+        bool ok = fwrite(buf.data(), buf.size(), 1, fp)==1 || buf.empty();
+        if (fclose(fp)) ok = false;
+        if (!ok) {
+            MSYS_FAIL("Error writing msysb file at '" << path << "': "
+                    << strerror(errno));
+        }
+    }
+
+}}
@@ -0,0 +1,41 @@
+#ifndef desres_msys_msysb_hxx
+#define desres_msys_msysb_hxx
+
+#include "io.hxx"
+
+namespace desres { namespace msys {
+
+    /* msysb is a binary snapshot of a System: the atom, bond and residue
+     * arrays, chains, cts, term tables, param tables, overrides, auxiliary
+     * tables and provenance, written as contiguous blocks which are copied
+     * back in bulk on load.  The layout of the element structs is written
+     * as-is, so msysb files are meant as a fast cache between runs of
+     * the same build of msys, not as an interchange format; loading a
+     * file written with a different layout fails. */
+
+    struct MsysbExport {
+        enum Flags {
+              Default       = 0
+            , StructureOnly = 1 << 1
+        };
+    };
+
+    /* structure_only omits tables and pseudo particles, as for dms;
+     * without_tables omits only the tables. */
+    SystemPtr ImportMsysb(std::string const& path,
+                          bool structure_only=false,
+                          bool without_tables=false);
+
+    SystemPtr ImportMsysbFromBytes(const char* bytes, size_t len,
+                                   bool structure_only=false,
+                                   bool without_tables=false);
+
+    void ExportMsysb(SystemPtr mol, std::string const& path,
+                     Provenance const& provenance, unsigned flags=0);
+
+    std::string FormatMsysb(SystemPtr mol, Provenance const& provenance,
+                            unsigned flags=0);
+
+}}
+
+#endif
@@ -0,0 +1,139 @@
+#ifndef desres_msys_neighbor_list_hxx
+#define desres_msys_neighbor_list_hxx
+
+#include "spatial_hash.hxx"
+
+namespace desres { namespace msys {
+
+    /* Verlet neighbor list: pairs of particles within cutoff+skin are
+     * cached using a SpatialHashT, and the cache is rebuilt only when some
+     * particle has moved more than skin/2 since the last build, or when
+     * the cell changes.  Pairs within cutoff are then found by checking
+     * only the cached pairs.  Exclusions are a set of (i<<32)|j keys as
+     * used by SpatialHashT::findPairlistReuseVoxels. */
+    template <typename Float, typename Exclusions>
+    class NeighborListT {
+        typedef SpatialHashT<Float> hash_t;
+
+        const unsigned _natoms;
+        const Float _cutoff;
+        const Float _skin;
+        Exclusions _excl;
+
+        /* positions and cell at the last build */
+        std::vector<Float> _ref;
+        std::vector<double> _cell;
+
+        /* unit cell vectors and lengths, for minimum image distances */
+        bool _periodic = false;
+        bool _rotated = false;
+        Float _rot[9];
+        Float _len[3];
+
+        /* cached pairs within cutoff+skin */
+        typename hash_t::contact_array_t _pairs;
+
+        /* number of times the pair list has been rebuilt */
+        unsigned _nbuilds = 0;
+
+        void set_cell(const double* cell) {
+            _cell.clear();
+            _periodic = cell!=nullptr;
+            _rotated = false;
+            if (!cell) return;
+            _cell.assign(cell, cell+9);
+            for (int i=0; i<3; i++) {
+                const double* v = cell+3*i;
+                _len[i] = std::sqrt(v[0]*v[0] + v[1]*v[1] + v[2]*v[2]);
+                if (_len[i]==0) MSYS_FAIL("cell has zero-length dimensions");
+                for (int j=0; j<3; j++) _rot[3*i+j] = v[j]/_len[i];
+            }
+            _rotated = _rot[1] || _rot[2] || _rot[3] ||
+                       _rot[5] || _rot[6] || _rot[7];
+        }
+
+        void build(const Float* pos) {
+            _ref.assign(pos, pos+3*_natoms);
+            _pairs.count = 0;
+            const Float r = _cutoff + _skin;
+            hash_t hash(pos, _natoms, nullptr, _cell.empty() ? nullptr : _cell.data());
+            hash.voxelize(r);
+            hash.findPairlistReuseVoxels(r, _excl, &_pairs);
+            ++_nbuilds;
+        }
+
+        bool needs_build(const Float* pos, const double* cell) const {
+            if (_ref.empty()) return true;
+            if ((cell==nullptr) != _cell.empty()) return true;
+            if (cell && !std::equal(cell, cell+9, _cell.begin())) return true;
+            const Float lim = 0.25*_skin*_skin;
+            for (unsigned i=0; i<3*_natoms; i+=3) {
+                Float dx = pos[i  ] - _ref[i  ];
+                Float dy = pos[i+1] - _ref[i+1];
+                Float dz = pos[i+2] - _ref[i+2];
+                if (dx*dx + dy*dy + dz*dz > lim) return true;
+            }
+            return false;
+        }
+
+    public:
+        typedef typename hash_t::contact_array_t contact_array_t;
+
+        NeighborListT(unsigned natoms, Float cutoff, Float skin,
+                      Exclusions const& excl = Exclusions())
+        : _natoms(natoms), _cutoff(cutoff), _skin(skin), _excl(excl) {
+            if (cutoff<=0) MSYS_FAIL("cutoff " << cutoff << " must be positive");
+            if (skin<0) MSYS_FAIL("skin " << skin << " must be non-negative");
+        }
+
+        unsigned natoms() const { return _natoms; }
+        Float cutoff() const { return _cutoff; }
+        Float skin() const { return _skin; }
+        unsigned nbuilds() const { return _nbuilds; }
+
+        /* number of cached pairs within cutoff+skin */
+        uint64_t ncached() const { return _pairs.count; }
+
+        /* Prepare for queries with natoms positions pos and cell, which
+         * may be NULL for non-periodic systems.  Return true if the
+         * cached pair list had to be rebuilt. */
+        bool update(const Float* pos, const double* cell) {
+            if (!needs_build(pos, cell)) return false;
+            set_cell(cell);
+            build(pos);
+            return true;
+        }
+
+        /* Append pairs i<j within cutoff, given the positions of the last
+         * call to update(), to result, with squared distances. */
+        void find(const Float* pos, contact_array_t* result) const {
+            const Float c2 = _cutoff*_cutoff;
+            result->reserve_additional(_pairs.count);
+            uint64_t count = result->count;
+            for (uint64_t k=0; k<_pairs.count; k++) {
+                const Id i = _pairs.i[k];
+                const Id j = _pairs.j[k];
+                Float d[3] = { pos[3*j  ] - pos[3*i  ],
+                               pos[3*j+1] - pos[3*i+1],
+                               pos[3*j+2] - pos[3*i+2] };
+                if (_periodic) {
+                    if (_rotated) pfx::apply_rotation(1, d, _rot);
+                    for (int m=0; m<3; m++) {
+                        d[m] -= _len[m]*std::round(d[m]/_len[m]);
+                    }
+                }
+                Float d2 = d[0]*d[0] + d[1]*d[1] + d[2]*d[2];
+                if (d2 <= c2) {
+                    result->i[count] = i;
+                    result->j[count] = j;
+                    result->d2[count] = d2;
+                    ++count;
+                }
+            }
+            result->count = count;
+        }
+    };
+
+}}
+
+#endif
@@ -23,6 +23,9 @@ namespace desres { namespace msys {
         /* constructor: the parameter table we override */
         explicit OverrideTable( ParamTablePtr target );
 
+        /* the .msysb reader and writer copy storage in bulk */
+        friend struct MsysbIO;
+
     public:
         /* create an override table */
         static OverrideTablePtr create(ParamTablePtr target);
@@ -0,0 +1,78 @@
+#ifndef desres_msys_parallel_hxx
+#define desres_msys_parallel_hxx
+
+#include <algorithm>
+#include <atomic>
+#include <exception>
+#include <thread>
+#include <vector>
+
+namespace desres { namespace msys {
+
+    /* Number of threads to use when nthreads workers were requested;
+     * 0 means one per hardware thread. */
+    inline unsigned resolve_threads(unsigned nthreads) {
+        if (nthreads==0) nthreads = std::thread::hardware_concurrency();
+        return std::max(nthreads, 1u);
+    }
+
+    /* Call fn(begin, end) on contiguous chunks covering [0,n), using up
+     * to nthreads threads (0 for one per hardware thread).  Chunk k
+     * covers a range preceding chunk k+1, and is passed as the third
+     * argument so that callers can keep per-chunk results in order.
+     * Runs inline when only one chunk is needed.  The first exception
+     * thrown by any chunk is rethrown after all threads have joined. */
+    template <typename F>
+    void parallel_for(size_t n, unsigned nthreads, F fn) {
+        nthreads = resolve_threads(nthreads);
+        size_t nchunks = std::min<size_t>(nthreads, n);
+        if (nchunks<=1) {
+            if (n>0) fn(size_t(0), n, 0u);
+            return;
+        }
+        std::vector<std::thread> threads;
+        std::vector<std::exception_ptr> errors(nchunks);
+        for (size_t k=0; k<nchunks; k++) {
+            size_t begin = (n*k)/nchunks;
+            size_t end = (n*(k+1))/nchunks;
+            threads.emplace_back([&fn, &errors, begin, end, k] {
+                try {
+                    fn(begin, end, unsigned(k));
+                } catch (...) {
+                    errors[k] = std::current_exception();
+                }
+            });
+        }
+        for (auto& t : threads) t.join();
+        for (auto& e : errors) {
+            if (e) std::rethrow_exception(e);
+        }
+    }
+
+    /* Call fn(i) for each i in [0,n) using up to nthreads threads, each
+     * of which takes the next unclaimed index when it finishes the last,
+     * so that items of very different cost still keep every thread busy.
+     * Once all items are done, the exception thrown by the lowest failing
+     * index, if any, is rethrown. */
+    template <typename F>
+    void parallel_for_each(size_t n, unsigned nthreads, F fn) {
+        std::vector<std::exception_ptr> errors(n);
+        std::atomic<size_t> next(0);
+        nthreads = std::min<size_t>(resolve_threads(nthreads), n);
+        parallel_for(nthreads, nthreads, [&](size_t, size_t, unsigned) {
+            for (size_t i; (i=next++) < n; ) {
+                try {
+                    fn(i);
+                } catch (...) {
+                    errors[i] = std::current_exception();
+                }
+            }
+        });
+        for (auto& e : errors) {
+            if (e) std::rethrow_exception(e);
+        }
+    }
+
+}}
+
+#endif
@@ -55,6 +55,9 @@ namespace desres { namespace msys {
 
         ParamTable();
 
+        /* the .msysb reader and writer copy storage in bulk */
+        friend struct MsysbIO;
+
     public:
         static std::shared_ptr<ParamTable> create();
         ~ParamTable();
@@ -10,6 +10,9 @@ namespace desres { namespace msys {
     std::string FetchPDB(std::string const& code);
     LoadIteratorPtr PDBIterator(std::string const& path);
 
+    /* Iterator over pdb contents held in memory */
+    LoadIteratorPtr PDBTextIterator(std::string const& data);
+
     void ImportPDBCoordinates( SystemPtr mol, std::string const& path );
 
     struct PDBExport {
@@ -46,12 +46,19 @@ static void Fclose(FILE* fp) { if (fp) fclose(fp); }
 
 namespace {
     class iterator : public LoadIterator {
+        std::string data;   /* backing store for in-memory iterators */
         std::shared_ptr<FILE> fd;
     public:
         explicit iterator(std::string const& path) {
             fd.reset(fopen(path.c_str(), "r"), Fclose);
             if (!fd) MSYS_FAIL("Failed opening pdb file at " << path << ": " << strerror(errno));
         }
+        iterator(const char* text, size_t size) : data(text, size) {
+            /* fmemopen rejects empty buffers */
+            if (data.empty()) data = "END\n";
+            fd.reset(fmemopen(&data[0], data.size(), "r"), Fclose);
+            if (!fd) MSYS_FAIL("Failed opening pdb text: " << strerror(errno));
+        }
         SystemPtr next();
     };
 }
@@ -230,6 +237,10 @@ LoadIteratorPtr desres::msys::PDBIterator(std::string const& path) {
     return LoadIteratorPtr(new iterator(path));
 }
 
+LoadIteratorPtr desres::msys::PDBTextIterator(std::string const& data) {
+    return LoadIteratorPtr(new iterator(data.data(), data.size()));
+}
+
 void desres::msys::ImportPDBCoordinates(SystemPtr mol, std::string const& path) {
     char pdbstr[PDB_BUFFER_LENGTH];
     FILE* fd = fopen(path.c_str(), "r");
@@ -8,10 +8,11 @@ Graph::Graph(SystemPtr mol)
     if (mol->maxAtomId() != mol->atomCount()) {
         MSYS_FAIL("System has deleted atoms, so graph would be incorrect.");
     }
+    AdjacencyPtr adj = mol->adjacency();
     for (Id i=0, n=mol->maxAtomId(); i<n; i++) {
-        IdList atoms = mol->bondedAtoms(i);
-        for (Id j=0, m=atoms.size(); j<m; j++) {
-            add_edge(i,atoms[j]);
+        for (Id const* j=adj->neighborsBegin(i), *e=adj->neighborsEnd(i);
+             j!=e; ++j) {
+            add_edge(i,*j);
         }
     }
 }
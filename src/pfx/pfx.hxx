@@ -7,6 +7,7 @@
 #include "rms.hxx"
 
 #include "../system.hxx"
+#include "../parallel.hxx"
 
 namespace desres { namespace msys { namespace pfx {
 
@@ -215,6 +216,25 @@ namespace desres { namespace msys { namespace pfx {
             }
         }
 
+        // Perform apply() on nframes frames stored contiguously: pos and
+        // vel, if non-NULL, of size nframes x N x 3, and cell, if non-NULL,
+        // of size nframes x 3 x 3.  Frames are processed in parallel using
+        // up to nthreads threads, or one per core if nthreads is 0.
+        template <typename scalar, typename cell_scalar>
+        void apply(unsigned nframes, scalar* pos, cell_scalar* cell,
+                   scalar* vel, unsigned nthreads) const {
+            if (!pos) return;
+            const size_t stride = 3*size_t(size());
+            parallel_for(nframes, nthreads,
+                    [&](size_t begin, size_t end, unsigned) {
+                for (size_t i=begin; i<end; i++) {
+                    apply(pos + i*stride,
+                          cell ? cell + 9*i : cell,
+                          vel ? vel + i*stride : vel);
+                }
+            });
+        }
+
         // Compute rmsd with reference coordinates.  If none have been given
         // with pfx_align, return -1.
         template <typename scalar>
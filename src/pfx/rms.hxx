@@ -2,7 +2,9 @@
 #define desres_pfx_rms_hxx
 
 #include "svd.hxx"
+#include "../parallel.hxx"
 #include <cmath>
+#include <vector>
 
 
 namespace desres { namespace msys { namespace pfx {
@@ -165,6 +167,108 @@ namespace desres { namespace msys { namespace pfx {
         return W ? std::sqrt(R/W) : 0;
     }
 
+    /* copy n positions from src to dst, shifted so that their (optionally
+     * weighted) centroid is at the origin.  Return the sum of weights. */
+    template <typename scalar>
+    double center_positions(unsigned n, const scalar* src, scalar* dst,
+                            const scalar* wts=nullptr) {
+        double cx=0, cy=0, cz=0, W=0;
+        for (unsigned i=0; i<n; i++) {
+            const double w = wts ? wts[i] : 1;
+            cx += w*src[3*i  ];
+            cy += w*src[3*i+1];
+            cz += w*src[3*i+2];
+            W += w;
+        }
+        if (W) { cx /= W; cy /= W; cz /= W; }
+        for (unsigned i=0; i<n; i++) {
+            dst[3*i  ] = src[3*i  ] - cx;
+            dst[3*i+1] = src[3*i+1] - cy;
+            dst[3*i+2] = src[3*i+2] - cz;
+        }
+        return W;
+    }
+
+    /* aligned rmsd of n centered positions with total weight W, computing
+     * the alignment matrix as in compute_alignment. */
+    template <typename scalar>
+    double centered_aligned_rmsd(unsigned n, const scalar* ref,
+                                 const scalar* pos, double* mat,
+                                 const scalar* wts, double W) {
+        double r = compute_alignment(n, nullptr, ref, pos, mat, wts);
+        return W ? std::sqrt(r*r*n/W) : 0;
+    }
+
+    /* Superpose each of nframes frames of n contiguous positions onto
+     * ref, after centering each on its (optionally weighted) centroid.
+     * rmsd[i] receives the aligned rmsd of frame i.  If mats is non-NULL,
+     * mats+9*i receives the alignment matrix of frame i, with the same
+     * semantics as in compute_alignment, applied to centered positions.
+     * Frames are processed using up to nthreads threads, or one per core
+     * if nthreads is 0. */
+    template <typename scalar>
+    void batch_aligned_rmsd(unsigned n, const scalar* ref,
+                            unsigned nframes, const scalar* frames,
+                            double* rmsd, double* mats,
+                            const scalar* wts=nullptr,
+                            unsigned nthreads=0) {
+        std::vector<scalar> cref(3*size_t(n));
+        const double W = center_positions(n, ref, cref.data(), wts);
+        parallel_for(nframes, nthreads,
+                [&](size_t begin, size_t end, unsigned) {
+            std::vector<scalar> pos(3*size_t(n));
+            double mat[9];
+            for (size_t i=begin; i<end; i++) {
+                center_positions(n, frames+3*size_t(n)*i, pos.data(), wts);
+                rmsd[i] = centered_aligned_rmsd(n, cref.data(), pos.data(),
+                                                mat, wts, W);
+                if (mats) std::copy(mat, mat+9, mats+9*i);
+            }
+        });
+    }
+
+    /* Compute the aligned rmsd between every pair of nframes frames of n
+     * contiguous positions, writing the symmetric nframes x nframes
+     * matrix to result.  Positions are centered as in batch_aligned_rmsd.
+     * Work is spread over up to nthreads threads, or one per core if
+     * nthreads is 0. */
+    template <typename scalar, typename out_scalar>
+    void pairwise_aligned_rmsd(unsigned n, unsigned nframes,
+                               const scalar* frames, out_scalar* result,
+                               const scalar* wts=nullptr,
+                               unsigned nthreads=0) {
+        const size_t stride = 3*size_t(n);
+        std::vector<scalar> centered(stride*nframes);
+        double W = wts ? 0 : n;
+        if (wts) for (unsigned i=0; i<n; i++) W += wts[i];
+        parallel_for(nframes, nthreads,
+                [&](size_t begin, size_t end, unsigned) {
+            for (size_t i=begin; i<end; i++) {
+                center_positions(n, frames+stride*i, &centered[stride*i], wts);
+            }
+        });
+
+        /* pair row i with row nframes-1-i so that each task does the
+         * same amount of work on the upper triangle. */
+        auto row = [&](size_t i) {
+            double mat[9];
+            result[i*nframes+i] = 0;
+            for (size_t j=i+1; j<nframes; j++) {
+                out_scalar r = centered_aligned_rmsd(n, &centered[stride*i],
+                        &centered[stride*j], mat, wts, W);
+                result[i*nframes+j] = r;
+                result[j*nframes+i] = r;
+            }
+        };
+        parallel_for((nframes+1)/2, nthreads,
+                [&](size_t begin, size_t end, unsigned) {
+            for (size_t i=begin; i<end; i++) {
+                row(i);
+                if (nframes-1-i != i) row(nframes-1-i);
+            }
+        });
+    }
+
 }}}
 
 #endif
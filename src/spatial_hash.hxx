@@ -54,7 +54,17 @@ namespace desres { namespace msys {
         Id* _ids;
         Id *_tmpids;
 
+        /* bookkeeping for update(): constructor index of the particle in
+         * each slot, slot of each constructor index, and voxel of each
+         * slot as of the last voxelization. */
+        std::vector<uint32_t> _order, _tmporder, _slots, _voxids;
+        void permute_order();
+
         void compute_full_shell();
+        void set_cell(const double* cell);
+
+        /* voxelize with a grid extending pad beyond the bounding box */
+        SpatialHashT& voxelize_grid(Float r, Float pad);
         bool test2(Float r2, int voxid, Float x, Float y, Float z) const;
 
         static
@@ -77,6 +87,20 @@ namespace desres { namespace msys {
 
         SpatialHashT& voxelize(Float r);
 
+        /* Replace the hashed coordinates with those of the same ids in
+         * pos, and the cell with the given one unless cell is NULL.  If
+         * the hash has been voxelized, only points which moved to a
+         * different voxel are rebinned; the voxel grid is rebuilt with
+         * the current radius if points left the grid or if too many of
+         * them moved. */
+        SpatialHashT& update(const Float* pos, const double* cell);
+
+        /* largest hashed id; pos passed to update() must hold at least
+         * max_id()+1 positions. */
+        Id max_id() const {
+            return ntarget ? *std::max_element(_ids, _ids+ntarget) : 0;
+        }
+
         /* Is the given point within r of any point in the region? */
         bool test(Float r, Float x, Float y, Float z) const {
             int xi = (x-ox) * ir;
@@ -165,7 +189,19 @@ namespace desres { namespace msys {
         /* find contacts in the original set of atoms, using the specified
          * set of exclusions in C-major order and assuming pre-voxelization */
         template <typename SpatialHashExclusions>
-        void findPairlistReuseVoxels(Float r, SpatialHashExclusions const& excl, contact_array_t *result) const;
+        void findPairlistReuseVoxels(Float r, SpatialHashExclusions const& excl, contact_array_t *result) const {
+            findPairlistReuseVoxels(r, excl, result, 0, ntarget);
+        }
+
+        /* find the pairlist contacts of hashed points [begin, end) in
+         * voxel order; concatenating the results over consecutive ranges
+         * gives the same output as the full search.  const and
+         * reentrant. */
+        template <typename SpatialHashExclusions>
+        void findPairlistReuseVoxels(Float r, SpatialHashExclusions const& excl, contact_array_t *result, int begin, int end) const;
+
+        /* number of hashed points */
+        int size() const { return ntarget; }
 
         /* For expert users only.  Finds points within r of the
          * hashed points assuming the hashed points have already
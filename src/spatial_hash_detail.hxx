@@ -50,6 +50,42 @@ SpatialHashT<Float>::~SpatialHashT() {
     free(_tmpids);
 }
 
+template <typename Float>
+void SpatialHashT<Float>::set_cell(const double* cell) {
+    free(rot);
+    rot = NULL;
+    cx = cy = cz = 0;
+    if (!cell) return;
+    cx = sqrt(cell[0]*cell[0] + cell[1]*cell[1] + cell[2]*cell[2]);
+    cy = sqrt(cell[3]*cell[3] + cell[4]*cell[4] + cell[5]*cell[5]);
+    cz = sqrt(cell[6]*cell[6] + cell[7]*cell[7] + cell[8]*cell[8]);
+    if (cx==0 || cy==0 || cz==0) {
+        MSYS_FAIL("cell has zero-length dimensions");
+    }
+#ifdef WIN32
+    rot = (Float*)_aligned_malloc(9*sizeof(*rot), 16);
+#else
+    assert(0==posix_memalign((void **)&rot, 16, 9*sizeof(*rot)));
+#endif
+    double d1=0, d2=0, d3=0; /* row dot-products */
+    for (int i=0; i<3; i++) {
+        rot[0+i] = cell[0+i]/cx;
+        rot[3+i] = cell[3+i]/cy;
+        rot[6+i] = cell[6+i]/cz;
+        d1 += rot[0+i]*rot[3+i];
+        d2 += rot[0+i]*rot[6+i];
+        d3 += rot[3+i]*rot[6+i];
+    }
+    static const Float eps = 1e-4;
+    if (fabs(d1)>eps || fabs(d2)>eps || fabs(d3)>eps) {
+        MSYS_FAIL("cell appears triclinic: dot products " << d1 << " " << d2 << " " << d3);
+    }
+    if (!(rot[1] || rot[2] || rot[3] || rot[5] || rot[6] || rot[7])) {
+        free(rot);
+        rot=NULL;
+    }
+}
+
 template <typename Float>
 SpatialHashT<Float>::SpatialHashT( const Float *pos, int n, const Id* ids, 
                           const double* cell)
@@ -66,36 +102,7 @@ SpatialHashT<Float>::SpatialHashT( const Float *pos, int n, const Id* ids,
     ox = oy = oz = 0;
     if (ntarget<1) return;
 
-    if (cell) {
-        cx = sqrt(cell[0]*cell[0] + cell[1]*cell[1] + cell[2]*cell[2]);
-        cy = sqrt(cell[3]*cell[3] + cell[4]*cell[4] + cell[5]*cell[5]);
-        cz = sqrt(cell[6]*cell[6] + cell[7]*cell[7] + cell[8]*cell[8]);
-        if (cx==0 || cy==0 || cz==0) {
-            MSYS_FAIL("cell has zero-length dimensions");
-        }
-#ifdef WIN32
-        rot = (Float*)_aligned_malloc(9*sizeof(*rot), 16);
-#else
-        assert(0==posix_memalign((void **)&rot, 16, 9*sizeof(*rot)));
-#endif
-        double d1=0, d2=0, d3=0; /* row dot-products */
-        for (int i=0; i<3; i++) {
-            rot[0+i] = cell[0+i]/cx;
-            rot[3+i] = cell[3+i]/cy;
-            rot[6+i] = cell[6+i]/cz;
-            d1 += rot[0+i]*rot[3+i];
-            d2 += rot[0+i]*rot[6+i];
-            d3 += rot[3+i]*rot[6+i];
-        }
-        static const Float eps = 1e-4;
-        if (fabs(d1)>eps || fabs(d2)>eps || fabs(d3)>eps) {
-            MSYS_FAIL("cell appears triclinic: dot products " << d1 << " " << d2 << " " << d3);
-        }
-        if (!(rot[1] || rot[2] || rot[3] || rot[5] || rot[6] || rot[7])) {
-            free(rot);
-            rot=NULL;
-        }
-    }
+    set_cell(cell);
 
     /* copy to transposed arrays */
 #ifdef WIN32
@@ -131,6 +138,10 @@ SpatialHashT<Float>::SpatialHashT( const Float *pos, int n, const Id* ids,
         }
         _ids[i] = id;
     }
+    _order.resize(ntarget);
+    _tmporder.resize(ntarget);
+    _slots.resize(ntarget);
+    for (int i=0; i<ntarget; i++) _order[i] = _slots[i] = i;
 
     /* compute bounds for positions */
     find_bbox(ntarget, _x, &xmin, &xmax);
@@ -141,24 +152,29 @@ SpatialHashT<Float>::SpatialHashT( const Float *pos, int n, const Id* ids,
 
 template <typename Float>
 SpatialHashT<Float>& SpatialHashT<Float>::voxelize(Float r) {
+    return voxelize_grid(r, 0);
+}
+
+template <typename Float>
+SpatialHashT<Float>& SpatialHashT<Float>::voxelize_grid(Float r, Float pad) {
     if (r<=0) MSYS_FAIL("radius " << r << " must be positive");
     rad = r;
     ir = Float(1)/rad;
-    ox = xmin - rad;
-    oy = ymin - rad;
-    oz = zmin - rad;
+    ox = xmin - rad - pad;
+    oy = ymin - rad - pad;
+    oz = zmin - rad - pad;
 
     /* construct voxel grid.  */
-    nx = (xmax-xmin)*ir + 3;
-    ny = (ymax-ymin)*ir + 3;
-    nz = (zmax-zmin)*ir + 3;
+    nx = (xmax-xmin+2*pad)*ir + 3;
+    ny = (ymax-ymin+2*pad)*ir + 3;
+    nz = (zmax-zmin+2*pad)*ir + 3;
     static const int maxdim = 500;
     if (nx > maxdim || ny > maxdim || nz > maxdim) {
         Float dbig = std::max(std::max(xmax-xmin, ymax-ymin), zmax-zmin);
-        ir = Float(maxdim) / dbig;
-        nx = (xmax-xmin)*ir + 3;
-        ny = (ymax-ymin)*ir + 3;
-        nz = (zmax-zmin)*ir + 3;
+        ir = Float(maxdim) / (dbig+2*pad);
+        nx = (xmax-xmin+2*pad)*ir + 3;
+        ny = (ymax-ymin+2*pad)*ir + 3;
+        nz = (zmax-zmin+2*pad)*ir + 3;
     }
     int nvoxels = nx*ny*nz;
 
@@ -204,12 +220,16 @@ SpatialHashT<Float>& SpatialHashT<Float>::voxelize(Float r) {
         _tmpy[j] = _y[i];
         _tmpz[j] = _z[i];
         _tmpids[j] = _ids[i];
+        _tmporder[j] = _order[i];
         ++j;
     }
     std::swap(_x,_tmpx);
     std::swap(_y,_tmpy);
     std::swap(_z,_tmpz);
     std::swap(_ids, _tmpids);
+    permute_order();
+    std::sort(voxids.begin(), voxids.end());
+    _voxids.swap(voxids);
 
     /* space for contacts */
     maxcount += 3;  // since we're writing in chunks of four
@@ -219,6 +239,103 @@ SpatialHashT<Float>& SpatialHashT<Float>::voxelize(Float r) {
     return *this;
 }
 
+template <typename Float>
+void SpatialHashT<Float>::permute_order() {
+    std::swap(_order, _tmporder);
+    for (int i=0; i<ntarget; i++) _slots[_order[i]] = i;
+}
+
+template <typename Float>
+SpatialHashT<Float>& SpatialHashT<Float>::update(const Float* pos,
+                                                 const double* cell) {
+    if (ntarget<1) return *this;
+    if (cell) set_cell(cell);
+
+    /* Read the new coordinates in constructor order, which is usually
+     * sequential in pos, and store them in the current slot order. */
+    for (int k=0; k<ntarget; k++) {
+        uint32_t i = _slots[k];
+        const Float *xyz = pos+3*_ids[i];
+        Float p[3]={xyz[0],xyz[1],xyz[2]};
+        if (rot) pfx::apply_rotation(1,p,rot);
+        _tmpx[i] = p[0];
+        _tmpy[i] = p[1];
+        _tmpz[i] = p[2];
+    }
+    std::swap(_x,_tmpx);
+    std::swap(_y,_tmpy);
+    std::swap(_z,_tmpz);
+    find_bbox(ntarget, _x, &xmin, &xmax);
+    find_bbox(ntarget, _y, &ymin, &ymax);
+    find_bbox(ntarget, _z, &zmin, &zmax);
+
+    /* not voxelized yet: nothing to rebin */
+    if (nx==0) return *this;
+
+    /* Find the new voxel of each point.  Points must stay out of the
+     * edge voxels, so that every query point within rad of a hashed
+     * point still lands in the grid.  If points leave the grid or too
+     * many change voxels, fall back to a full counting sort, leaving
+     * some room around the points so that later updates can stay on
+     * the same grid. */
+    std::vector<uint32_t> voxids(ntarget);
+    std::vector<std::pair<uint32_t, uint32_t> > movers; /* (voxel, slot) */
+    for (int i=0; i<ntarget; i++) {
+        int xi = (_x[i]-ox) * ir;
+        int yi = (_y[i]-oy) * ir;
+        int zi = (_z[i]-oz) * ir;
+        if (xi<1 || xi>nx-2 ||
+            yi<1 || yi>ny-2 ||
+            zi<1 || zi>nz-2) {
+            return voxelize_grid(rad, rad);
+        }
+        uint32_t voxid = zi + nz*(yi + ny*xi);
+        voxids[i] = voxid;
+        if (voxid!=_voxids[i]) {
+            if (movers.size()*8 >= size_t(ntarget)) {
+                return voxelize_grid(rad, rad);
+            }
+            movers.emplace_back(voxid, i);
+        }
+    }
+    if (movers.empty()) return *this;
+
+    /* merge the points which stayed put with the movers, voxel by voxel,
+     * preserving the relative order of each. */
+    std::sort(movers.begin(), movers.end());
+    auto m = movers.begin();
+    uint32_t cnt = 0;
+    auto place = [&](uint32_t i, uint32_t v) {
+        _tmpx[cnt] = _x[i];
+        _tmpy[cnt] = _y[i];
+        _tmpz[cnt] = _z[i];
+        _tmpids[cnt] = _ids[i];
+        _tmporder[cnt] = _order[i];
+        _voxids[cnt] = v;
+        ++cnt;
+    };
+    maxcount = 0;
+    const uint32_t nvoxels = nx*ny*nz;
+    for (uint32_t v=0; v<nvoxels; v++) {
+        uint32_t b = _counts[v], e = _counts[v+1];
+        _counts[v] = cnt;
+        for (uint32_t i=b; i<e; i++) {
+            if (voxids[i]==v) place(i, v);
+        }
+        for (; m!=movers.end() && m->first==v; ++m) {
+            place(m->second, v);
+        }
+        maxcount = std::max(maxcount, cnt - _counts[v]);
+    }
+    std::swap(_x,_tmpx);
+    std::swap(_y,_tmpy);
+    std::swap(_z,_tmpz);
+    std::swap(_ids, _tmpids);
+    permute_order();
+    maxcount += 3;  // since we're writing in chunks of four
+    return *this;
+}
+
 template <typename Float>
 Float SpatialHashT<Float>::mindist2(Float x, Float y, Float z) const {
     int xi = (x-ox) * ir;
@@ -358,24 +475,15 @@ void SpatialHashT<Float>::findContactsReuseVoxels(Float r, const Float* pos,
 }
 template <typename Float>
 template <typename SpatialHashExclusions>
-void SpatialHashT<Float>::findPairlistReuseVoxels(Float r, SpatialHashExclusions const& excl, contact_array_t *result) const {
+void SpatialHashT<Float>::findPairlistReuseVoxels(Float r, SpatialHashExclusions const& excl, contact_array_t *result, int begin, int end) const {
     bool periodic = cx!=0 || cy!=0 || cz!=0;
-    Float tmp[3];
 
-    for (int j=0; j<ntarget; j++) {
+    for (int j=begin; j<end; j++) {
+        /* hashed coordinates have already been rotated */
         unsigned id = _ids[j];
         Float x = _x[j];
         Float y = _y[j];
         Float z = _z[j];
-        if (rot) {
-            tmp[0] = x;
-            tmp[1] = y;
-            tmp[2] = z;
-            pfx::apply_rotation(1,tmp,rot);
-            x = tmp[0];
-            y = tmp[1];
-            z = tmp[2];
-        }
         int xi = (x-ox) * ir;
         int yi = (y-oy) * ir;
         int zi = (z-oz) * ir;
@@ -3,6 +3,7 @@
 #include <msys/version.hxx>
 #include <sstream>
 #include <stack>
+#include <algorithm>
 #include <stdexcept>
 #include <stdio.h>
 #include <ctype.h>
@@ -26,7 +27,69 @@ System::System()
 System::~System() {
 }
 
+bool System::attachBlock(CoordBlock& block, Float atom_t::*first,
+                         const Float* data,
+                         std::shared_ptr<const void> owner) {
+    if (_atom_holds) {
+        /* views of the atom records must see the new values */
+        syncCoordinates();
+        for (iterator i=atomBegin(), e=atomEnd(); i!=e; ++i) {
+            Float* dst = &(_atoms[*i].*first);
+            dst[0] = *data++;
+            dst[1] = *data++;
+            dst[2] = *data++;
+        }
+        return false;
+    }
+    std::lock_guard<std::mutex> lock(_blocks_mutex);
+    block.data = data;
+    block.owner = std::move(owner);
+    block.current = true;
+    _blocks_pending.store(true, std::memory_order_release);
+    return true;
+}
+
+bool System::attachPositions(const Float* data,
+                             std::shared_ptr<const void> owner) {
+    return attachBlock(_posblock, &atom_t::x, data, std::move(owner));
+}
+
+bool System::attachVelocities(const Float* data,
+                              std::shared_ptr<const void> owner) {
+    return attachBlock(_velblock, &atom_t::vx, data, std::move(owner));
+}
+
+void System::copyBlocks() const {
+    std::lock_guard<std::mutex> lock(_blocks_mutex);
+    if (!_blocks_pending.load(std::memory_order_relaxed)) return;
+    /* the values described by the system don't change, only where
+     * they are kept. */
+    AtomList& atoms = const_cast<AtomList&>(_atoms);
+    CoordBlock* blocks[] = {const_cast<CoordBlock*>(&_posblock),
+                            const_cast<CoordBlock*>(&_velblock)};
+    Float atom_t::*firsts[] = {&atom_t::x, &atom_t::vx};
+    for (int b=0; b<2; b++) {
+        CoordBlock& block = *blocks[b];
+        if (!block.current) continue;
+        const Float* src = block.data;
+        for (iterator i=atomBegin(), e=atomEnd(); i!=e; ++i) {
+            Float* dst = &(atoms[*i].*firsts[b]);
+            dst[0] = *src++;
+            dst[1] = *src++;
+            dst[2] = *src++;
+        }
+        block.current = false;
+    }
+    _blocks_pending.store(false, std::memory_order_release);
+}
+
 Id System::addAtom(Id residue) { 
+    syncCoordinates();
+    if (_atom_holds) {
+        MSYS_FAIL("Cannot add atoms while " << _atom_holds
+                << " views of the atom records are alive");
+    }
+    ++_topology_version;
     Id id = _atoms.size();
     atom_t atm;
     atm.residue = residue;
@@ -40,16 +103,15 @@ Id System::addAtom(Id residue) {
 }
 
 template <typename T>
-static IdList get_ids( const T& list, const IdSet& dead ) {
+static IdList get_ids( const T& list, const IdBitset& dead ) {
     IdList ids(list.size()-dead.size());
     if (!dead.size()) for (Id i=0; i<ids.size(); i++) {
         ids[i] = i;
     } else {
-        Id j=0;
-        for (Id i=0; i<list.size(); i++) {
-            if (!dead.count(i)) {
-                ids[j++]=i;
-            }
+        Id i=dead.nextAbsent(0);
+        for (Id j=0; j<ids.size(); j++) {
+            ids[j] = i;
+            i = dead.nextAbsent(i+1);
         }
     }
     return ids;
@@ -91,6 +153,7 @@ Id System::findBond( Id i, Id j) const {
 }
 
 Id System::addBond(Id i, Id j) { 
+    ++_topology_version;
     if (i>j) std::swap(i,j);
     Id id = findBond(i,j);
     if (!bad(id)) return id;
@@ -110,6 +173,7 @@ Id System::addBond(Id i, Id j) {
 }
 
 Id System::addResidue(Id chain) {
+    ++_topology_version;
     Id id = _residues.size();
     residue_t v;
     v.chain = chain;
@@ -120,6 +184,7 @@ Id System::addResidue(Id chain) {
 }
 
 Id System::addChain(Id ct) {
+    ++_topology_version;
     if (bad(ct)) {
         if (ctCount()) {
             ct = cts().at(0);
@@ -137,6 +202,7 @@ Id System::addChain(Id ct) {
 }
 
 Id System::addCt() {
+    ++_topology_version;
     Id id = _cts.size();
     _cts.push_back(component_t());
     _ctchains.push_back(IdList());
@@ -190,6 +256,7 @@ component_t& component_t::operator=(component_t const& c) {
 }
 
 void System::delBond(Id id) {
+    ++_topology_version;
     const bond_t& b = _bonds.at(id);
     _deadbonds.insert(id);
     find_and_remove(_bondindex[b.i], id);
@@ -197,11 +264,14 @@ void System::delBond(Id id) {
 }
 
 void System::delAtom(Id id) {
+    ++_topology_version;
     if (id>=_atoms.size()) return;
+    syncCoordinates();
     IdList del = bondsForAtom(id);
     for (IdList::const_iterator i=del.begin(); i!=del.end(); ++i) {
         delBond(*i);
     }
+    loadLazyTables();
     _deadatoms.insert(id);
     find_and_remove(_residueatoms.at(_atoms[id].residue), id);
     for (TableMap::iterator t=_tables.begin(); t!=_tables.end(); ++t) {
@@ -210,6 +280,7 @@ void System::delAtom(Id id) {
 }
 
 void System::setResidue(Id atm, Id res) {
+    ++_topology_version;
     Id oldres = _atoms.at(atm).residue;
     if (oldres == res) return;
     /* remove from previous residue */
@@ -219,6 +290,7 @@ void System::setResidue(Id atm, Id res) {
 }
 
 void System::setChain(Id res, Id chn) {
+    ++_topology_version;
     Id oldchn = _residues.at(res).chain;
     if (oldchn == chn) return;
     /* remove from previous chain */
@@ -228,6 +300,7 @@ void System::setChain(Id res, Id chn) {
 }
 
 void System::setCt(Id chn, Id ct) {
+    ++_topology_version;
     Id oldct = _chains.at(chn).ct;
     if (oldct == ct) return;
     /* remove from previous ct */
@@ -301,11 +374,12 @@ IdList System::residuesForCt(Id ct) const {
 }
 
 void System::delResidue(Id id) {
+    ++_topology_version;
     /* nothing to do if invalid residue */
     if (id>=_residues.size()) return;
 
     /* nothing to do if already deleted */
-    if (!_deadresidues.insert(id).second) return;
+    if (!_deadresidues.insert(id)) return;
 
     /* remove from parent chain */
     find_and_remove(_chainresidues.at(_residues[id].chain), id);
@@ -319,11 +393,12 @@ void System::delResidue(Id id) {
 }
 
 void System::delChain(Id id) {
+    ++_topology_version;
     /* nothing to do if invalid chain */
     if (id>=_chains.size()) return;
 
     /* nothing to do if already deleted */
-    if (!_deadchains.insert(id).second) return;
+    if (!_deadchains.insert(id)) return;
 
     /* remove from parent ct */
     find_and_remove(_ctchains.at(_chains[id].ct), id);
@@ -337,11 +412,12 @@ void System::delChain(Id id) {
 }
 
 void System::delCt(Id id) {
+    ++_topology_version;
     /* nothing to do if invalid ct */
     if (id>=_cts.size()) return;
 
     /* nothing to do if already deleted */
-    if (!_deadcts.insert(id).second) return;
+    if (!_deadcts.insert(id)) return;
 
     /* remove child chains .  Clear the index first to avoid O(N) lookups */
     IdList ids;
@@ -352,11 +428,13 @@ void System::delCt(Id id) {
 }
 
 Id System::updateFragids(MultiIdList* fragments) {
+    ++_topology_version;
 
     /* Create local storage for all atoms (even deleted)
      * this simplifies and speeds up the code below. */
     IdList assignments(_atoms.size(),BadId);
 
+    AdjacencyPtr adj = adjacency();
     std::stack<Id> S;
     Id fragid=0;
     for (Id idx=0, n=_atoms.size(); idx<n; idx++) {
@@ -367,13 +445,13 @@ Id System::updateFragids(MultiIdList* fragments) {
         do {
             Id aid=S.top();
             S.pop();
-            IdList& bonds = _bondindex[aid];
-            for (IdList::iterator j=bonds.begin(), e=bonds.end(); j!=e; ++j) {
-                Id other = _bonds[*j].other(aid);
+            for (Id const* j=adj->neighborsBegin(aid),
+                          *e=adj->neighborsEnd(aid); j!=e; ++j) {
+                Id other = *j;
                 if(bad(assignments[other])){
                    assignments[other]=fragid;
                    /* Only add this atom if its non-terminal */
-                   if(_bondindex[other].size() >1) S.push(other);
+                   if(adj->degree(other) >1) S.push(other);
                 }
             }
         } while (S.size());
@@ -484,10 +562,50 @@ std::vector<String> System::tableNames() const {
     for (TableMap::const_iterator i=_tables.begin(), e=_tables.end(); i!=e; ++i) {
         s.push_back(i->first);
     }
+    if (!_lazytables.empty()) {
+        for (auto const& it : _lazytables) s.push_back(it.first);
+        std::sort(s.begin(), s.end());
+    }
     return s;
 }
 
+void System::addLazyTables(std::vector<String> const& names,
+                           std::function<void(System&)> loader) {
+    auto ptr = std::make_shared<TableLoader>(std::move(loader));
+    for (auto const& name : names) {
+        if (name.empty()) {
+            MSYS_FAIL("Table names must have at least one character");
+        }
+        if (_tables.count(name) || _lazytables.count(name)) {
+            MSYS_FAIL("Could not add lazy table '" << name
+                    << "' because a table with the same name already exists.");
+        }
+    }
+    for (auto const& name : names) _lazytables[name] = ptr;
+}
+
+void System::loadLazyTable(String const& name) const {
+    LazyTableMap::iterator i=_lazytables.find(name);
+    if (i==_lazytables.end()) return;
+    std::shared_ptr<TableLoader> loader = i->second;
+    /* forget every name served by this loader before running it, so that
+     * its calls to addTable don't recurse. */
+    for (i=_lazytables.begin(); i!=_lazytables.end();) {
+        if (i->second==loader) i = _lazytables.erase(i);
+        else ++i;
+    }
+    (*loader)(const_cast<System&>(*this));
+}
+
+void System::loadLazyTables() const {
+    while (!_lazytables.empty()) {
+        loadLazyTable(_lazytables.begin()->first);
+    }
+}
+
 void System::renameTable(String const& oldname, String const& newname) {
+    loadLazyTable(oldname);
+    loadLazyTable(newname);
     TableMap::iterator i=_tables.find(oldname);
     if (i==_tables.end()) {
         std::stringstream ss;
@@ -513,12 +631,14 @@ String System::tableName(std::shared_ptr<TermTable const> table) const {
 }
 
 TermTablePtr System::table(const String& name) const {
+    loadLazyTable(name);
     TableMap::const_iterator i=_tables.find(name);
     if (i==_tables.end()) return TermTablePtr();
     return i->second;
 }
 
 void System::delTable(const String& name) {
+    loadLazyTable(name);
     TableMap::iterator it = _tables.find(name);
     if (it==_tables.end()) return;
     TermTablePtr t = it->second;
@@ -536,6 +656,7 @@ void System::removeTable(TermTablePtr terms) {
 }
 
 void System::coalesceTables() {
+    loadLazyTables();
     for (TableMap::iterator i=_tables.begin(), e=_tables.end(); i!=e; ++i) {
         i->second->coalesce();
     }
@@ -586,6 +707,26 @@ IdList System::bondedAtoms(Id id) const {
     return ids;
 }
 
+AdjacencyPtr System::adjacency() const {
+    std::shared_ptr<Adjacency> a(new Adjacency);
+    Id n = _bondindex.size();
+    a->offsets.resize(n+1);
+    for (Id i=0; i<n; i++) {
+        a->offsets[i+1] = a->offsets[i] + _bondindex[i].size();
+    }
+    a->neighbors.resize(a->offsets[n]);
+    a->bond_ids.resize(a->offsets[n]);
+    for (Id i=0; i<n; i++) {
+        Id k = a->offsets[i];
+        for (Id b : _bondindex[i]) {
+            a->bond_ids[k] = b;
+            a->neighbors[k] = _bonds[b].other(i);
+            ++k;
+        }
+    }
+    return a;
+}
+
 Id System::atomPropCount() const {
     return _atomprops->propCount();
 }
@@ -603,6 +744,7 @@ Id System::atomPropIndex(String const& name) const {
 }
 
 Id System::addAtomProp(String const& name, ValueType type) {
+    ++_topology_version;
     /* disallow properties that would conflict with existing columns */
     static const char* badprops[] = {
         "id", "anum", "name", "x", "y", "z", "vx", "vy", "vz",
@@ -621,6 +763,7 @@ Id System::addAtomProp(String const& name, ValueType type) {
     return _atomprops->addProp(name,type);
 }
 void System::delAtomProp(Id index) {
+    ++_topology_version;
     _atomprops->delProp(index);
 }
 
@@ -3,12 +3,17 @@
 
 #include <vector>
 #include <map>
+#include <atomic>
 #include <cstddef>
+#include <functional>
+#include <memory>
+#include <mutex>
 
 #include "term_table.hxx"
 #include "provenance.hxx"
 #include "value.hxx"
 #include "smallstring.hxx"
+#include "id_bitset.hxx"
 
 namespace desres { namespace msys {
 
@@ -113,6 +118,7 @@ namespace desres { namespace msys {
 
     class component_t {
         ParamTablePtr _kv;
+        friend struct MsysbIO;
 
     public:
         /* constructor: maintain a single row with msys_name as the first
@@ -140,16 +146,37 @@ namespace desres { namespace msys {
         inline ParamTablePtr kv() { return _kv; }
     };
 
+    /* A compressed-sparse-row snapshot of the bonds of a System.  The
+     * atoms bonded to atom i are neighbors[offsets[i]] up to but not
+     * including neighbors[offsets[i+1]], in the same order as
+     * bondsForAtom(i), and bond_ids holds the bond joining i to each
+     * of them.  offsets has maxAtomId()+1 entries; deleted atoms have
+     * no neighbors. */
+    struct Adjacency {
+        IdList offsets;
+        IdList neighbors;
+        IdList bond_ids;
+
+        Id degree(Id i) const { return offsets[i+1]-offsets[i]; }
+        Id const* neighborsBegin(Id i) const {
+            return neighbors.data()+offsets[i];
+        }
+        Id const* neighborsEnd(Id i) const {
+            return neighbors.data()+offsets[i+1];
+        }
+    };
+    typedef std::shared_ptr<const Adjacency> AdjacencyPtr;
+
     class System : public std::enable_shared_from_this<System> {
     
         static IdList _empty;
     
         /* _atoms maps an id to an atom.  We almost never delete atoms, so
-         * keep track of deleted atoms in a separate set.  This is needed only
-         * by an atom iterator */
+         * keep track of deleted atoms in a separate bitset, which the
+         * id iterators skip over a word at a time. */
         typedef std::vector<atom_t> AtomList;
         AtomList    _atoms;
-        IdSet       _deadatoms;
+        IdBitset    _deadatoms;
 
         /* additional properties for atoms */
         ParamTablePtr _atomprops;
@@ -157,7 +184,7 @@ namespace desres { namespace msys {
         /* same deal for bonds */
         typedef std::vector<bond_t> BondList;
         BondList    _bonds;
-        IdSet       _deadbonds;
+        IdBitset    _deadbonds;
         ParamTablePtr _bondprops;
     
         /* map from atom id to 0 or more bond ids.  We do keep this updated when
@@ -166,22 +193,30 @@ namespace desres { namespace msys {
     
         typedef std::vector<residue_t> ResidueList;
         ResidueList _residues;
-        IdSet       _deadresidues;
+        IdBitset    _deadresidues;
         MultiIdList   _residueatoms;  /* residue id -> atom ids */
     
         typedef std::vector<chain_t> ChainList;
         ChainList   _chains;
-        IdSet       _deadchains;
+        IdBitset    _deadchains;
         MultiIdList   _chainresidues; /* chain id -> residue id */
     
         typedef std::vector<component_t> CtList;
         CtList      _cts;
-        IdSet       _deadcts;
+        IdBitset    _deadcts;
         MultiIdList _ctchains; /* ct id -> chain id */
     
         typedef std::map<String,TermTablePtr> TableMap;
         TableMap    _tables;
 
+        /* term tables which haven't been read yet.  Several names may
+         * share a loader when their tables must be read together. */
+        typedef std::function<void(System&)> TableLoader;
+        typedef std::map<String, std::shared_ptr<TableLoader> > LazyTableMap;
+        mutable LazyTableMap _lazytables;
+        void loadLazyTable(String const& name) const;
+        void loadLazyTables() const;
+
         /* auxiliary tables.  basically a hack for cmap */
         typedef std::map<String, ParamTablePtr> AuxTableMap;
         AuxTableMap _auxtables;
@@ -190,9 +225,34 @@ namespace desres { namespace msys {
          * serializing to disk. */
         std::vector<Provenance> _provenance;
 
+        /* incremented on every change to the structure of the system */
+        uint64_t _topology_version = 0;
+
+        /* number of outstanding holds on the atom records */
+        unsigned _atom_holds = 0;
+
+        /* contiguous positions or velocities attached in place of the
+         * values in the atom records; see attachPositions. */
+        struct CoordBlock {
+            const Float* data = nullptr;
+            std::shared_ptr<const void> owner;
+            bool current = false;   /* newer than the atom records */
+        };
+        CoordBlock _posblock;
+        CoordBlock _velblock;
+        mutable std::atomic<bool> _blocks_pending{false};
+        mutable std::mutex _blocks_mutex;
+
+        bool attachBlock(CoordBlock& block, Float atom_t::*first,
+                         const Float* data, std::shared_ptr<const void> owner);
+        void copyBlocks() const;
+
         /* create only as shared pointer. */
         System();
 
+        /* the .msysb reader and writer copy storage in bulk */
+        friend struct MsysbIO;
+
     public:
         static std::shared_ptr<System> create();
         ~System();
@@ -210,27 +270,82 @@ namespace desres { namespace msys {
             _provenance.push_back(p);
         }
 
+        /* A counter which changes whenever atoms, bonds, residues, chains
+         * or cts are added, removed or reassigned, atom properties are
+         * added or removed, or fragids are updated.  Attributes modified
+         * in place through the element accessors are not tracked; call
+         * touchTopology() after such changes to invalidate anything
+         * cached against the current version. */
+        uint64_t topologyVersion() const { return _topology_version; }
+        void touchTopology() { ++_topology_version; }
+
+        /* Hold the atom records in place, for views which refer to them
+         * by address, such as numpy arrays over the positions.  While any
+         * hold is outstanding, addAtom fails instead of possibly moving
+         * the records.  Each holdAtoms() must be matched by a call to
+         * releaseAtoms(). */
+        void holdAtoms() { syncCoordinates(); ++_atom_holds; }
+        void releaseAtoms() { --_atom_holds; }
+
+        /* Attach a contiguous (atomCount(),3) block of positions or
+         * velocities of the live atoms in id order, to be used in place of
+         * the values in the atom records without copying them.  owner
+         * keeps data alive, and data must not change while attached.
+         * The atom records are brought up to date from attached blocks
+         * the first time they are reached through the element accessors,
+         * or by syncCoordinates(); the block is then no longer current.
+         * While the atom records are held, the values are copied into
+         * them instead, and false is returned. */
+        bool attachPositions(const Float* data,
+                             std::shared_ptr<const void> owner);
+        bool attachVelocities(const Float* data,
+                              std::shared_ptr<const void> owner);
+
+        /* the attached block, if it is still newer than the atom
+         * records; otherwise NULL. */
+        const Float* positionBlock() const {
+            return _posblock.current ? _posblock.data : nullptr;
+        }
+        const Float* velocityBlock() const {
+            return _velblock.current ? _velblock.data : nullptr;
+        }
+
+        /* Copy current blocks into the atom records.  The element
+         * accessors do this, so it is needed only by code reading the
+         * records some other way.  Safe to call from several threads. */
+        void syncCoordinates() const {
+            if (_blocks_pending.load(std::memory_order_acquire)) {
+                copyBlocks();
+            }
+        }
+
         /* element accessors */
-        atom_t& atom(Id id) { return _atoms.at(id); }
+        atom_t& atom(Id id) { syncCoordinates(); return _atoms.at(id); }
         bond_t& bond(Id id) { return _bonds.at(id); }
         residue_t& residue(Id id) { return _residues.at(id); }
         chain_t& chain(Id id) { return _chains.at(id); }
         component_t& ct(Id id) { return _cts.at(id); }
     
-        const atom_t& atom(Id id) const { return _atoms.at(id); }
+        const atom_t& atom(Id id) const {
+            syncCoordinates();
+            return _atoms.at(id);
+        }
         const bond_t& bond(Id id) const { return _bonds.at(id); }
         const residue_t& residue(Id id) const { return _residues.at(id); }
         const chain_t& chain(Id id) const { return _chains.at(id); }
         const component_t& ct(Id id) const { return _cts.at(id); }
 
         /* unchecked element accessors */
-        atom_t& atomFAST(Id id) { return _atoms[id]; }
+        atom_t& atomFAST(Id id) { syncCoordinates(); return _atoms[id]; }
         bond_t& bondFAST(Id id) { return _bonds[id]; }
         residue_t& residueFAST(Id id) { return _residues[id]; }
         chain_t& chainFAST(Id id) { return _chains[id]; }
         component_t& ctFAST(Id id) { return _cts[id]; }
 
-        const atom_t& atomFAST(Id id) const { return _atoms[id]; }
+        const atom_t& atomFAST(Id id) const {
+            syncCoordinates();
+            return _atoms[id];
+        }
         const bond_t& bondFAST(Id id) const { return _bonds[id]; }
         const residue_t& residueFAST(Id id) const { return _residues[id]; }
         const chain_t& chainFAST(Id id) const { return _chains[id]; }
@@ -239,18 +354,18 @@ namespace desres { namespace msys {
         /* id iterator, skipping deleted ids */
         class iterator {
             friend class System;
-            Id            _i;
-            const IdSet*  _dead;
+            Id              _i;
+            const IdBitset* _dead;
 
-            iterator(Id i, const IdSet* dead) 
+            iterator(Id i, const IdBitset* dead) 
             : _i(i), _dead(dead) {
-                while (_dead && _dead->count(_i)) ++_i;
+                if (_dead) _i = _dead->nextAbsent(_i);
             }
 
 
             bool equal(iterator const& c) const { return _i==c._i; }
             const Id& dereference() const { return _i; }
-            void increment() { do ++_i; while (_dead && _dead->count(_i)); }
+            void increment() { ++_i; if (_dead) _i = _dead->nextAbsent(_i); }
 
         public:
             typedef std::forward_iterator_tag iterator_category;
@@ -458,6 +573,21 @@ namespace desres { namespace msys {
         /* invoke coalesce on each table */
         void coalesceTables();
 
+        /* Register term tables whose contents are read on demand.  The
+         * names are listed by tableNames() right away; the first time
+         * any of them is fetched with table(), or the system changes in
+         * a way which would affect their terms, loader is invoked once
+         * and must add all of them with addTable().  Loading isn't
+         * thread-safe, so fetch tables before sharing the system across
+         * threads. */
+        void addLazyTables(std::vector<String> const& names,
+                           std::function<void(System&)> loader);
+
+        /* true if name was registered by addLazyTables and not yet read */
+        bool isLazyTable(String const& name) const {
+            return _lazytables.count(name);
+        }
+
         /* operations on auxiliary tables */
         std::vector<String> auxTableNames() const;
         ParamTablePtr auxTable(String const& name) const;
@@ -501,6 +631,13 @@ namespace desres { namespace msys {
         /* ids of atoms bonded to given atom */
         IdList bondedAtoms(Id id) const;
 
+        /* snapshot of the bonds of every atom, built from the bond index
+         * on each call, so callers walking the bond graph should get it
+         * once and keep it for the walk.  The snapshot never changes, so
+         * it may be kept after the system is modified, but it then no
+         * longer describes the system.  */
+        AdjacencyPtr adjacency() const;
+
         /* bonded atoms satisfying a predicate.  predicate implements
          * bool operator()(atom_t const& atm) const; */
         template <typename T>
@@ -66,6 +66,9 @@ namespace desres { namespace msys {
 
         std::map<String, String> _unused_keep_for_binary_compatibility;
 
+        /* the .msysb reader and writer copy storage in bulk */
+        friend struct MsysbIO;
+
     public:
         TermTable( SystemPtr system, Id natoms, 
                    ParamTablePtr ptr = ParamTablePtr() );
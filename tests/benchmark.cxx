@@ -6,6 +6,9 @@
 #include "io.hxx"
 #include "clone.hxx"
 #include "dms/dms.hxx"
+#include "spatial_hash.hxx"
+#include "atomsel.hxx"
+#include "graph.hxx"
 #include "MsysThreeRoe.hpp"
 
 using namespace desres::msys;
@@ -117,6 +120,100 @@ static void BM_dms_water_name_ints(benchmark::State& state) {
 }
 
 
+// 1000 frames of small random motion around the jnk1 positions
+static std::vector<std::vector<float>> jnk1_frames(SystemPtr mol) {
+    std::vector<float> pos;
+    mol->getPositions(std::back_inserter(pos));
+    std::vector<std::vector<float>> frames(1000, pos);
+    srand48(1973);
+    for (unsigned i=1; i<frames.size(); i++) {
+        for (unsigned j=0; j<pos.size(); j++) {
+            frames[i][j] = frames[i-1][j] + 0.1*(drand48()-0.5);
+        }
+    }
+    return frames;
+}
+
+static void BM_SpatialHash_rebuild_jnk1(benchmark::State& state) {
+    auto mol = Load("tests/files/jnk1.dms");
+    auto frames = jnk1_frames(mol);
+    auto pro = Atomselect(mol, "protein");
+    auto wat = Atomselect(mol, "water");
+    for (auto _ : state) {
+        for (auto& pos : frames) {
+            SpatialHash::contact_array_t contacts;
+            SpatialHash hash(pos.data(), pro.size(), pro.data(),
+                             mol->global_cell[0]);
+            hash.findContacts(4.0, pos.data(), wat.size(), wat.data(),
+                              &contacts);
+        }
+    }
+}
+
+static void BM_SpatialHash_update_jnk1(benchmark::State& state) {
+    auto mol = Load("tests/files/jnk1.dms");
+    auto frames = jnk1_frames(mol);
+    auto pro = Atomselect(mol, "protein");
+    auto wat = Atomselect(mol, "water");
+    for (auto _ : state) {
+        SpatialHash hash(frames[0].data(), pro.size(), pro.data(),
+                         mol->global_cell[0]);
+        hash.voxelize(4.0);
+        for (auto& pos : frames) {
+            SpatialHash::contact_array_t contacts;
+            hash.update(pos.data(), mol->global_cell[0]);
+            hash.findContactsReuseVoxels(4.0, pos.data(), wat.size(),
+                                         wat.data(), &contacts);
+        }
+    }
+}
+
+// 1M atoms in residues of 10, with every tenth atom deleted if requested
+static SystemPtr million_atoms(bool deleted) {
+    auto mol = System::create();
+    Id chn = mol->addChain();
+    Id res = BadId;
+    for (Id i=0; i<1000000; i++) {
+        if (i%10==0) res = mol->addResidue(chn);
+        atom_t& atm = mol->atomFAST(mol->addAtom(res));
+        atm.x = i;
+        atm.y = 2*i;
+        atm.z = 3*i;
+    }
+    if (deleted) for (Id i=0; i<1000000; i+=10) mol->delAtom(i);
+    return mol;
+}
+
+static void BM_getPositions_1M(benchmark::State& state) {
+    auto mol = million_atoms(state.range(0));
+    std::vector<double> pos(3*mol->atomCount());
+    for (auto _ : state) {
+        mol->getPositions(pos.data());
+        benchmark::DoNotOptimize(pos.data());
+    }
+}
+
+static void BM_atoms_1M(benchmark::State& state) {
+    auto mol = million_atoms(state.range(0));
+    for (auto _ : state) {
+        benchmark::DoNotOptimize(mol->atoms());
+    }
+}
+
+static void BM_updateFragids_ww(benchmark::State& state) {
+    auto mol = Load("tests/files/ww.dms", true);
+    for (auto _ : state) {
+        mol->updateFragids();
+    }
+}
+
+static void BM_GraphCreate_ww(benchmark::State& state) {
+    auto mol = Load("tests/files/ww.dms", true);
+    auto atoms = mol->atoms();
+    for (auto _ : state) {
+        Graph::create(mol, atoms);
+    }
+}
 
 BENCHMARK(BM_SystemCreation);
 BENCHMARK(BM_dms_jnk1_all)->Unit(benchmark::kMillisecond);
@@ -130,6 +227,12 @@ BENCHMARK(BM_Load_jnk1_structure)->Unit(benchmark::kMillisecond);
 BENCHMARK(BM_Clone_jnk1_structure)->Unit(benchmark::kMillisecond);
 BENCHMARK(BM_dms_water_name_text)->Unit(benchmark::kMillisecond);
 BENCHMARK(BM_dms_water_name_ints)->Unit(benchmark::kMillisecond);
+BENCHMARK(BM_SpatialHash_rebuild_jnk1)->Unit(benchmark::kMillisecond);
+BENCHMARK(BM_SpatialHash_update_jnk1)->Unit(benchmark::kMillisecond);
+BENCHMARK(BM_getPositions_1M)->Arg(0)->Arg(1)->Unit(benchmark::kMillisecond);
+BENCHMARK(BM_atoms_1M)->Arg(0)->Arg(1)->Unit(benchmark::kMillisecond);
+BENCHMARK(BM_updateFragids_ww)->Unit(benchmark::kMillisecond);
+BENCHMARK(BM_GraphCreate_ww)->Unit(benchmark::kMillisecond);
 
 int main(int argc, char** argv) {
   benchmark::Initialize(&argc, argv);
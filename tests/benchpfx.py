@@ -26,7 +26,7 @@ def bench(path, fixbonds=False, glue=[], center=None, fit=None):
     dpos2 = dpos + [1, 2, 3]
     fpos2 = dpos2.astype("f")
     for pos in fpos, dpos:
-        print "%s data from %s" % ("single" if pos is fpos else "double", path)
+        print("%s data from %s" % ("single" if pos is fpos else "double", path))
         pos2 = fpos2 if pos is fpos else dpos2
         kls = pfx.Pfx
         t0 = time() * 1000
@@ -40,16 +40,51 @@ def bench(path, fixbonds=False, glue=[], center=None, fit=None):
         t2 = time() * 1000
         p.apply(pos, box)
         t3 = time() * 1000
-        print "%s\tconstruct %8.3fms center %8.3fms apply %8.3fms" % (
-            "single" if kls is pfx.Pfx else "double",
-            t1 - t0,
-            t2 - t1,
-            t3 - t2,
+        print(
+            "%s\tconstruct %8.3fms center %8.3fms apply %8.3fms"
+            % (
+                "single" if pos is fpos else "double",
+                t1 - t0,
+                t2 - t1,
+                t3 - t2,
+            )
         )
 
 
+def bench_frames(path, nframes=50, threads=0, fixbonds=False, center=None):
+    fullpath = "%s/%s" % (os.environ["DMS_INPUTS_PATH"].split(":")[0], path)
+    mol = msys.Load(fullpath)
+    p = pfx.Pfx(mol.topology, fixbonds=fixbonds)
+    if center:
+        p.align(mol.selectIds(center))
+    rng = NP.random.RandomState(42)
+    pos = mol.positions.astype("f")
+    stack = NP.array([pos + rng.uniform(-5, 5, 3) for _ in range(nframes)], "f")
+    boxes = NP.array([mol.cell] * nframes)
+
+    frames = stack.copy()
+    cells = boxes.copy()
+    t0 = time()
+    for i in range(nframes):
+        p.apply(frames[i], cells[i])
+    t1 = time()
+
+    batch = stack.copy()
+    bcells = boxes.copy()
+    t2 = time()
+    p.apply(batch, bcells, threads=threads)
+    t3 = time()
+    assert NP.allclose(frames, batch)
+
+    print(
+        "%s\t%d frames: loop %8.1f frames/s batched %8.1f frames/s"
+        % (path, nframes, nframes / (t1 - t0), nframes / (t3 - t2))
+    )
+
+
 bench("apoa1.dms", fixbonds=True, glue="backbone", center="protein")
 bench("small_vancomycin_complex.dms", glue="backbone")
 bench("small_vancomycin_complex.dms", glue="backbone", center="residue 0")
 bench("1vcc.dms", fit="backbone")
 bench("1vcc.dms", center="backbone")
+bench_frames("apoa1.dms", fixbonds=True, center="protein")
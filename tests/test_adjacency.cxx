@@ -0,0 +1,34 @@
+#include "io.hxx"
+#include <cassert>
+
+using namespace desres::msys;
+
+/* the adjacency snapshot must agree with bondedAtoms and bondsForAtom */
+static void check(SystemPtr mol) {
+    AdjacencyPtr adj = mol->adjacency();
+    assert(adj->offsets.size()==mol->maxAtomId()+1);
+    for (Id i=0; i<mol->maxAtomId(); i++) {
+        IdList bonded = mol->hasAtom(i) ? mol->bondedAtoms(i) : IdList();
+        assert(IdList(adj->neighborsBegin(i), adj->neighborsEnd(i))==bonded);
+        IdList const& bonds = mol->bondsForAtom(i);
+        assert(IdList(adj->bond_ids.begin()+adj->offsets[i],
+                      adj->bond_ids.begin()+adj->offsets[i+1])==bonds);
+    }
+}
+
+int main(int argc, char *argv[]) {
+    SystemPtr mol = Load(argc>1 ? argv[1] : "tests/files/ww.dms", true);
+    check(mol);
+
+    /* snapshots are not cached, and are unchanged by later edits */
+    AdjacencyPtr adj = mol->adjacency();
+    assert(mol->adjacency()!=adj);
+    mol->delBond(mol->bonds().at(3));
+    assert(adj->neighbors.size()==2*(mol->bondCount()+1));
+    check(mol);
+    mol->delAtom(5);
+    check(mol);
+    mol->addBond(0, mol->addAtom(mol->atom(0).residue));
+    check(mol);
+    return 0;
+}
@@ -16,6 +16,19 @@ int main(int argc, char *argv[]) {
         t+=now();
         printf("%s -> %d atoms (%.3fms) \n", argv[i], (int)atoms.size(),
                 t*1000);
+
+        /* repeated evaluation of a compiled selection */
+        CompiledSelection csel(sys, argv[i]);
+        csel.select();
+        t=-now();
+        IdList catoms = csel.select();
+        t+=now();
+        if (catoms!=atoms) {
+            fprintf(stderr, "compiled selection '%s' selected %d atoms\n",
+                    argv[i], (int)catoms.size());
+            return 1;
+        }
+        printf("%s -> compiled (%.3fms)\n", argv[i], t*1000);
     }
     return 0;
 }
@@ -0,0 +1,88 @@
+#include "io.hxx"
+#include "parallel.hxx"
+#include <cassert>
+
+using namespace desres::msys;
+
+/* a block of n rows holding (i, 10*i, 100*i) plus offset */
+static std::shared_ptr<std::vector<Float>> make_block(Id n, Float offset) {
+    std::shared_ptr<std::vector<Float>> v(new std::vector<Float>(3*n));
+    for (Id i=0; i<n; i++) {
+        (*v)[3*i  ] = i + offset;
+        (*v)[3*i+1] = 10*i + offset;
+        (*v)[3*i+2] = 100*i + offset;
+    }
+    return v;
+}
+
+int main(int argc, char *argv[]) {
+    SystemPtr mol = Load(argc>1 ? argv[1] : "tests/files/ww.dms", true);
+    mol->delAtom(3);
+    const Id n = mol->atomCount();
+    IdList ids = mol->atoms();
+
+    /* attaching refers to the block; reading atoms syncs it */
+    auto pos = make_block(n, 0.5);
+    bool attached = mol->attachPositions(pos->data(), pos);
+    assert(attached);
+    assert(mol->positionBlock()==pos->data());
+    assert(!mol->velocityBlock());
+    std::weak_ptr<std::vector<Float>> weak(pos);
+    pos.reset();
+    assert(!weak.expired());
+    assert(mol->atom(ids[7]).y == 70.5);
+    assert(!mol->positionBlock());
+    for (Id i=0; i<n; i++) {
+        assert(mol->atomFAST(ids[i]).x == i+0.5);
+        assert(mol->atomFAST(ids[i]).z == 100*i+0.5);
+    }
+
+    /* writes to the atom records win over a synced block */
+    mol->atom(ids[0]).x = -1;
+    std::vector<Float> got;
+    mol->getPositions(std::back_inserter(got));
+    assert(got[0]==-1 && got[3]==1.5);
+
+    /* concurrent readers each see the block */
+    auto vel = make_block(n, 2);
+    mol->attachVelocities(vel->data(), vel);
+    assert(mol->velocityBlock()==vel->data());
+    std::vector<int> ok(n);
+    parallel_for(n, 8, [&](size_t b, size_t e, unsigned) {
+        for (size_t i=b; i<e; i++) {
+            ok[i] = mol->atomFAST(ids[i]).vy == 10*i+2;
+        }
+    });
+    assert(std::count(ok.begin(), ok.end(), 1)==int(n));
+    assert(!mol->velocityBlock());
+
+    /* structural changes sync first */
+    pos = make_block(n, 3);
+    mol->attachPositions(pos->data(), pos);
+    mol->delAtom(ids[1]);
+    assert(!mol->positionBlock());
+    assert(mol->atomFAST(ids[2]).x == 5);
+    pos = make_block(n-1, 4);
+    mol->attachPositions(pos->data(), pos);
+    Id id = mol->addAtom(mol->atom(ids[0]).residue);
+    assert(mol->atom(ids[2]).x == 5);
+    assert(mol->atom(id).x == 0);
+
+    /* replacing a block releases the old one */
+    weak = pos;
+    pos = make_block(n, 5);
+    mol->attachPositions(pos->data(), pos);
+    assert(weak.expired());
+
+    /* held atom records get the values at once */
+    mol->holdAtoms();
+    assert(!mol->positionBlock());
+    auto held = make_block(n, 6);
+    attached = mol->attachPositions(held->data(), held);
+    assert(!attached);
+    assert(!mol->positionBlock());
+    assert(held.use_count()==1);
+    assert(mol->atom(ids[2]).x == 7);
+    mol->releaseAtoms();
+    return 0;
+}
@@ -0,0 +1,66 @@
+#include "gzindex.hxx"
+#include <zlib.h>
+#include <unistd.h>
+#include <stdlib.h>
+#include <stdio.h>
+#include <cassert>
+
+using namespace desres::msys;
+
+/* write contents as a gzip file with the given number of members */
+static void write_gzip(std::string const& path, std::string const& contents,
+                       int nmembers) {
+    FILE* fp = fopen(path.data(), "wb");
+    assert(fp);
+    fclose(fp);
+    size_t n = contents.size()/nmembers;
+    for (int i=0; i<nmembers; i++) {
+        gzFile gz = gzopen(path.data(), "ab");
+        assert(gz);
+        size_t begin = i*n;
+        size_t len = i==nmembers-1 ? contents.size()-begin : n;
+        assert(gzwrite(gz, contents.data()+begin, len)==(int)len);
+        gzclose(gz);
+    }
+}
+
+int main() {
+    srand48(1999);
+    std::string contents;
+    while (contents.size() < 8000000) {
+        char line[80];
+        snprintf(line, sizeof(line), "%8.4f %8.4f %8.4f %d\n",
+                 100*drand48(), 100*drand48(), 100*drand48(),
+                 int(10*drand48()));
+        contents += line;
+    }
+
+    char tmp[] = "/tmp/msys_gzindex_XXXXXX";
+    int fd = mkstemp(tmp);
+    assert(fd>=0);
+    close(fd);
+    std::string path(tmp), gzi = path + ".gzi";
+
+    for (int nmembers : {1, 3}) {
+        write_gzip(path, contents, nmembers);
+        assert(IsGzipFile(path));
+        GzipIndex::build(path, 1<<18)->save(gzi);
+        auto index = GzipIndex::load(gzi);
+        assert(index->size()==contents.size());
+        assert(index->npoints()>1);
+
+        for (int k=0; k<200; k++) {
+            uint64_t offset = drand48()*contents.size();
+            size_t len = 50000*drand48();
+            std::string buf(len, '\0');
+            size_t n = index->read(path, offset, &buf[0], len);
+            assert(n==std::min<uint64_t>(len, contents.size()-offset));
+            assert(!buf.compare(0, n, contents, offset, n));
+        }
+        assert(index->read(path, contents.size(), &contents[0], 1)==0);
+        printf("%d members: %lu checkpoints\n", nmembers, index->npoints());
+    }
+    unlink(path.data());
+    unlink(gzi.data());
+    return 0;
+}
@@ -0,0 +1,89 @@
+#include "hbond.hxx"
+#include <stdlib.h>
+#include <stdio.h>
+#include <cassert>
+#include <cmath>
+
+using namespace desres::msys;
+
+struct no_exclusions {
+    bool operator()(Id i, Id j) const { return false; }
+};
+
+static float dist2(const float* a, const float* b) {
+    float dx = a[0]-b[0];
+    float dy = a[1]-b[1];
+    float dz = a[2]-b[2];
+    return dx*dx + dy*dy + dz*dz;
+}
+
+int main() {
+    srand48(2001);
+    const Id N = 600;
+    const Id F = 7;
+    const float L = 20;
+    const float cutoff = 3.5;
+
+    /* atoms 3k are donors with hydrogens 3k+1 and 3k+2; the rest of the
+     * donors double as acceptors */
+    IdList donors, hoff(1, 0), hyds, acceptors;
+    for (Id i=0; i<N; i+=3) {
+        donors.push_back(i);
+        hyds.push_back(i+1);
+        hyds.push_back(i+2);
+        hoff.push_back(hyds.size());
+        acceptors.push_back(i);
+    }
+    std::vector<float> pos(3*N*F);
+    for (auto& x : pos) x = L*drand48();
+
+    auto all = FindHydrogenBonds(cutoff, F, N, pos.data(), donors, hoff,
+                                 hyds, acceptors, no_exclusions(), 4);
+
+    /* multi-frame results match frame-by-frame results */
+    size_t k = 0;
+    for (Id f=0; f<F; f++) {
+        const float* fpos = pos.data() + 3*N*f;
+        auto one = FindHydrogenBonds(cutoff, 1, N, fpos, donors, hoff,
+                                     hyds, acceptors, no_exclusions());
+        size_t npairs = 0;
+        for (Id d : donors) {
+            for (Id a : acceptors) {
+                if (d==a) continue;
+                if (dist2(fpos+3*d, fpos+3*a) <= cutoff*cutoff) ++npairs;
+            }
+        }
+        assert(one.size()==npairs);
+        for (auto const& hb : one) {
+            assert(k<all.size());
+            auto const& other = all[k++];
+            assert(other.frame==f);
+            assert(hb.frame==0);
+            assert(other.donor==hb.donor);
+            assert(other.acceptor==hb.acceptor);
+            assert(other.hydrogen==hb.hydrogen);
+            assert(other.energy==hb.energy);
+
+            /* the closer hydrogen is chosen */
+            const float* ap = fpos+3*hb.acceptor;
+            Id h1 = hb.donor+1, h2 = hb.donor+2;
+            float d1 = dist2(fpos+3*h1, ap);
+            float d2 = dist2(fpos+3*h2, ap);
+            assert(hb.hydrogen == (d2<d1 ? h2 : h1));
+
+            double dpos[3], apos[3], hpos[3];
+            for (int m=0; m<3; m++) {
+                dpos[m] = fpos[3*hb.donor+m];
+                apos[m] = ap[m];
+                hpos[m] = fpos[3*hb.hydrogen+m];
+            }
+            HydrogenBond ref(dpos, apos, hpos);
+            assert(std::fabs(ref.r - hb.r) < 1e-12);
+            assert(std::fabs(ref.p - hb.p) < 1e-12);
+            assert(std::fabs(ref.energy() - hb.energy) < 1e-12);
+        }
+    }
+    assert(k==all.size());
+    printf("%lu hbonds over %u frames\n", all.size(), F);
+    return 0;
+}
@@ -0,0 +1,72 @@
+#include "io.hxx"
+#include "json.hxx"
+#include "append.hxx"
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/resource.h>
+#include <fstream>
+#include <sstream>
+
+#if defined __has_include
+#  if __has_include (<rapidjson/document.h>)
+#    include <rapidjson/document.h>
+#    define MSYS_WITH_RAPID_JSON
+#  endif
+#endif
+
+using namespace desres::msys;
+
+/* Compare the streaming json importer with parsing the same file into a
+ * rapidjson DOM, which is how files were read before any System was
+ * built.  Run each mode in its own process so that peak RSS is that of
+ * the mode alone:
+ *
+ *   test_json_import_bench make input.dms 1000000 big.json
+ *   test_json_import_bench dom big.json
+ *   test_json_import_bench sax big.json
+ */
+
+static void report(const char* mode, double t) {
+    struct rusage usage;
+    getrusage(RUSAGE_SELF, &usage);
+    printf("%s: %.3fs, peak RSS %.1fMB\n", mode, t,
+            usage.ru_maxrss/1024.0);
+}
+
+int main(int argc, char *argv[]) {
+    if (argc==5 && !strcmp(argv[1], "make")) {
+        /* replicate the input until it has at least the requested atoms */
+        SystemPtr unit = Load(argv[2]);
+        SystemPtr mol = System::create();
+        Id natoms = atoi(argv[3]);
+        while (mol->atomCount() < natoms) AppendSystem(mol, unit);
+        ExportJson(mol, argv[4], Provenance());
+        printf("wrote %u atoms to %s\n", mol->atomCount(), argv[4]);
+
+    } else if (argc==3 && !strcmp(argv[1], "sax")) {
+        double t=now();
+        SystemPtr mol = ImportJson(argv[2]);
+        report("streaming import", now()-t);
+
+    } else if (argc==3 && !strcmp(argv[1], "dom")) {
+#if defined MSYS_WITH_RAPID_JSON
+        double t=now();
+        std::ifstream in(argv[2]);
+        std::stringstream ss;
+        ss << in.rdbuf();
+        std::string text = ss.str();
+        rapidjson::Document d;
+        d.Parse<rapidjson::kParseFullPrecisionFlag>(text.data());
+        if (d.HasParseError()) MSYS_FAIL("Failed to parse " << argv[2]);
+        report("DOM parse only", now()-t);
+#else
+        MSYS_FAIL("rapidjson not available");
+#endif
+    } else {
+        fprintf(stderr, "usage: %s make <structure> <natoms> <out.json>\n"
+                        "       %s dom|sax <file.json>\n", argv[0], argv[0]);
+        return 1;
+    }
+    return 0;
+}
@@ -0,0 +1,64 @@
+#include "io.hxx"
+#include "hash.hxx"
+#include <stdio.h>
+#include <stdlib.h>
+#include <dirent.h>
+#include <unistd.h>
+
+using namespace desres::msys;
+
+static std::vector<std::string> entries(std::string const& dir) {
+    std::vector<std::string> names;
+    DIR* d = opendir(dir.data());
+    if (!d) return names;
+    while (struct dirent* ent = readdir(d)) {
+        if (ent->d_name[0]!='.') names.push_back(ent->d_name);
+    }
+    closedir(d);
+    return names;
+}
+
+static void clear(std::string const& dir) {
+    for (auto const& name : entries(dir)) unlink((dir + "/" + name).data());
+}
+
+/* Load each file twice through a cache, checking that the cached copy
+ * matches, then check that a small cache keeps only the newest entry. */
+int main(int argc, char *argv[]) {
+    char tmp[] = "/tmp/msys_load_cache_XXXXXX";
+    if (!mkdtemp(tmp)) MSYS_FAIL("mkdtemp failed");
+    std::string dir(tmp);
+
+    for (int i=1; i<argc; i++) {
+        double t0=now();
+        SystemPtr mol = LoadCached(argv[i], dir);
+        double t1=now();
+        SystemPtr cached = LoadCached(argv[i], dir);
+        double t2=now();
+        if (HashSystem(mol)!=HashSystem(Load(argv[i]))) {
+            MSYS_FAIL("Cache miss for " << argv[i] << " changed the system");
+        }
+        if (HashSystem(mol)!=HashSystem(cached)) {
+            MSYS_FAIL("Cache hit for " << argv[i] << " changed the system");
+        }
+        SystemPtr structure = LoadCached(argv[i], dir, true, true);
+        if (!structure->tableNames().empty()) {
+            MSYS_FAIL("Cache ignored structure_only for " << argv[i]);
+        }
+        printf("%s miss %.3fms hit %.3fms\n", argv[i],
+                (t1-t0)*1000, (t2-t1)*1000);
+    }
+    if (entries(dir).size() != size_t(2*(argc-1))) {
+        MSYS_FAIL("Expected two entries per file, got " << entries(dir).size());
+    }
+
+    clear(dir);
+    for (int i=1; i<argc; i++) LoadCached(argv[i], dir, false, false, 1);
+    if (argc>1 && entries(dir).size()!=0) {
+        MSYS_FAIL("Cache larger than its bound: " << entries(dir).size());
+    }
+
+    clear(dir);
+    rmdir(dir.data());
+    return 0;
+}
@@ -0,0 +1,59 @@
+#include "io.hxx"
+#include <iostream>
+#include <cassert>
+#include <set>
+
+using namespace desres::msys;
+
+/* compare ParallelLoadIterator against LoadIterator for each file */
+int main(int argc, char *argv[]) {
+    unsigned nthreads = 4;
+    for (int i=1; i<argc; i++) {
+        std::vector<std::string> names;
+        std::vector<Id> natoms;
+        double t=-now();
+        auto iter = LoadIterator::create(argv[i]);
+        for (;;) {
+            SystemPtr mol;
+            try {
+                mol = iter->next();
+            } catch (std::exception& e) {
+                names.push_back("");
+                natoms.push_back(BadId);
+                continue;
+            }
+            if (!mol) break;
+            names.push_back(mol->name);
+            natoms.push_back(mol->atomCount());
+        }
+        t+=now();
+
+        for (bool ordered : {true, false}) {
+            double tp=-now();
+            auto piter = ParallelLoadIterator::create(argv[i], nthreads, ordered);
+            LoadResult r;
+            std::set<size_t> seen;
+            size_t n=0;
+            while (piter->next(r)) {
+                if (ordered) assert(r.index==n);
+                assert(r.index<names.size());
+                assert(seen.insert(r.index).second);
+                if (r.mol) {
+                    assert(r.error.empty());
+                    assert(r.mol->name==names[r.index]);
+                    assert(r.mol->atomCount()==natoms[r.index]);
+                } else {
+                    assert(!r.error.empty());
+                    assert(natoms[r.index]==BadId);
+                }
+                ++n;
+            }
+            tp+=now();
+            assert(n==names.size());
+            printf("%s: %lu structures, sequential %.3fms, %s parallel %.3fms\n",
+                    argv[i], n, t*1000, ordered ? "ordered" : "unordered",
+                    tp*1000);
+        }
+    }
+    return 0;
+}
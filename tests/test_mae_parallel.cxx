@@ -0,0 +1,102 @@
+#include "mae.hxx"
+#include "hash.hxx"
+#include "mae/ff.hxx"
+#include <stdio.h>
+#include <stdlib.h>
+#include <unistd.h>
+#include <fstream>
+
+using namespace desres::msys;
+
+/* write the concatenation of the given files to a temporary file */
+static std::string concatenate(std::vector<std::string> const& paths) {
+    char tmpl[] = "/tmp/test_mae_parallel_XXXXXX";
+    int fd = mkstemp(tmpl);
+    if (fd<0) MSYS_FAIL("Could not create temporary file");
+    close(fd);
+    std::ofstream out(tmpl, std::ios::binary);
+    for (auto const& path : paths) {
+        std::ifstream in(path, std::ios::binary);
+        if (!in) MSYS_FAIL("Could not read " << path);
+        out << in.rdbuf();
+    }
+    return tmpl;
+}
+
+/* Check that the parallel mae importer gives the same system as the
+ * serial one for each file, and compare their load times:
+ *
+ *   test_mae_parallel [-j nthreads] file.mae ...
+ *
+ * With no files, check files with several cts made from the test files,
+ * including ones whose fbhw aux tables refer to renumbered params, and
+ * the aux table schemas used to merge cts.
+ */
+int main(int argc, char *argv[]) {
+    unsigned nthreads = 4;
+    int first = 1;
+    if (argc>2 && std::string(argv[1])=="-j") {
+        nthreads = atoi(argv[2]);
+        first = 3;
+    }
+    std::vector<std::string> files(argv+first, argv+argc);
+    std::vector<std::string> temps;
+    if (files.empty()) {
+        const AuxSchema* fbhw = AuxSchema::get("stretch_fbhw_interaction");
+        if (!fbhw || fbhw->table!="stretch_fbhw" ||
+            fbhw->param_columns!=std::vector<std::string>{"param"}) {
+            MSYS_FAIL("Wrong schema for stretch_fbhw_interaction");
+        }
+        const AuxSchema* cmap = AuxSchema::get("cmap12");
+        if (!cmap || !cmap->param_columns.empty()) {
+            MSYS_FAIL("Wrong schema for cmap12");
+        }
+        if (AuxSchema::get("cmap") != cmap || AuxSchema::get("unknown") ||
+            AuxSchema::get("12")) {
+            MSYS_FAIL("Wrong schema lookup");
+        }
+
+        std::string dir = "tests/files/";
+        temps.push_back(concatenate({dir+"noe.mae", dir+"noe.mae"}));
+        temps.push_back(concatenate({dir+"fbhw.mae", dir+"noe.mae"}));
+        temps.push_back(concatenate({dir+"noe.mae", dir+"fbhw.mae"}));
+        temps.push_back(concatenate({dir+"fbhw.mae", dir+"fbhw.mae"}));
+        temps.push_back(concatenate({dir+"small.mae", dir+"two.mae"}));
+        files = temps;
+    }
+    for (auto const& file : files) {
+        const char* path = file.data();
+        for (bool structure_only : {false, true}) {
+            double t0=now();
+            SystemPtr mol = ImportMAE(path, false, structure_only);
+            double t1=now();
+            SystemPtr par = ImportMAEParallel(path, nthreads, false,
+                                              structure_only);
+            double t2=now();
+            if (HashSystem(mol)!=HashSystem(par)) {
+                MSYS_FAIL("Parallel import of " << path << " differs");
+            }
+            for (auto name : mol->tableNames()) {
+                for (auto other : mol->tableNames()) {
+                    bool shared = mol->table(name)->params() ==
+                                  mol->table(other)->params();
+                    if (shared != (par->table(name)->params() ==
+                                   par->table(other)->params())) {
+                        MSYS_FAIL("Parallel import of " << path
+                                << " changed sharing of params in " << name);
+                    }
+                }
+            }
+            if (mol->provenance().size()!=par->provenance().size() ||
+                mol->auxTableNames()!=par->auxTableNames()) {
+                MSYS_FAIL("Parallel import of " << path
+                        << " changed provenance or aux tables");
+            }
+            printf("%s%s serial %.3fms parallel %.3fms\n", path,
+                    structure_only ? " (structure only)" : "",
+                    (t1-t0)*1000, (t2-t1)*1000);
+        }
+    }
+    for (auto const& tmp : temps) unlink(tmp.data());
+    return 0;
+}
@@ -61,6 +61,29 @@ class TestDcd(unittest.TestCase):
         for fid in fids:
             self.assertTrue((self.r.frame(fid).pos == frames[fid].pos).all())
 
+    def testReadFrames(self):
+        ids = [3, 1, 65]
+        d = self.r.read_frames(slice(10, 50, 4), atoms=ids)
+        self.assertEqual(d["pos"].shape, (10, 3, 3))
+        self.assertEqual(d["box"].shape, (10, 3, 3))
+        self.assertEqual(d["time"].shape, (10,))
+        for i, fid in enumerate(range(10, 50, 4)):
+            f = self.r.frame(fid)
+            self.assertTrue((d["pos"][i] == f.pos[ids]).all())
+            self.assertTrue((d["box"][i] == f.box).all())
+
+        d = self.r.read_frames([-1, 0], fields=["pos"])
+        self.assertEqual(list(d.keys()), ["pos"])
+        self.assertTrue((d["pos"][0] == self.r.frame(99).pos).all())
+        self.assertTrue((d["pos"][1] == self.r.frame(0).pos).all())
+
+        with self.assertRaises(IndexError):
+            self.r.read_frames([100])
+        with self.assertRaises(ValueError):
+            self.r.read_frames([0], atoms=[66])
+        with self.assertRaises(ValueError):
+            self.r.read_frames([0], fields=["foo"])
+
 
 class GuessFiletypeTestCase(unittest.TestCase):
     def testDtr(self):
@@ -870,6 +893,41 @@ class TestFrameCornerCases(unittest.TestCase):
                     v2 = v2.tolist()
                 self.assertEqual(v1, v2)
 
+    def testMappedFrame(self):
+        dtr = molfile.DtrReader("tests/files/ch4.dtr")
+        dtr.mmap_cache_size = 1
+        self.assertEqual(dtr.mmap_cache_size, 1)
+        for i in reversed(range(dtr.nframes)):
+            f = dtr.frame(i)
+            m = dtr.mapped_frame(i)
+            self.assertEqual(m["time"], f.time)
+            self.assertEqual(m["pos"].shape, (dtr.natoms, 3))
+            self.assertFalse(m["pos"].flags.writeable)
+            self.assertTrue((m["pos"] == f.pos).all())
+            self.assertTrue((m["box"] == f.box).all())
+        with self.assertRaises(IndexError):
+            dtr.mapped_frame(dtr.nframes)
+
+    def testPrefetchIterator(self):
+        dtr = molfile.DtrReader("tests/files/ch4.dtr")
+        it = molfile.PrefetchIterator(dtr, depth=3, threads=2)
+        self.assertEqual(len(it), dtr.nframes)
+        for i, f in enumerate(it):
+            self.assertEqual(f.time, dtr.frame(i).time)
+            self.assertTrue((f.pos == dtr.frame(i).pos).all())
+        self.assertEqual(i + 1, dtr.nframes)
+        stats = it.stats
+        self.assertEqual(stats["frames"], dtr.nframes)
+        self.assertGreater(stats["bytes"], 0)
+
+        frames = [dtr.nframes - 1, 0, 0]
+        times = [f.time for f in molfile.PrefetchIterator(dtr, frames)]
+        self.assertEqual(times, [dtr.frame(i).time for i in frames])
+        with self.assertRaises(IndexError):
+            molfile.PrefetchIterator(dtr, [dtr.nframes])
+        with self.assertRaises(ValueError):
+            molfile.PrefetchIterator(dtr, depth=0)
+
 
 class TestFrame2(unittest.TestCase):
     def testFrames(self):
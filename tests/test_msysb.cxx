@@ -0,0 +1,59 @@
+#include "io.hxx"
+#include "msysb.hxx"
+#include "hash.hxx"
+#include <stdio.h>
+#include <unistd.h>
+
+using namespace desres::msys;
+
+/* Round trip each file through msysb, checking that the hash is unchanged,
+ * and compare load times. */
+int main(int argc, char *argv[]) {
+    char tmp[] = "/tmp/msys_msysb_XXXXXX";
+    int fd = mkstemp(tmp);
+    if (fd<0) MSYS_FAIL("mkstemp failed");
+    close(fd);
+    std::string path = std::string(tmp) + ".msysb";
+
+    for (int i=1; i<argc; i++) {
+        double t0=now();
+        SystemPtr mol = Load(argv[i]);
+        double t1=now();
+        Save(mol, path, Provenance(), 0);
+        double t2=now();
+        SystemPtr copy = Load(path);
+        double t3=now();
+        if (HashSystem(mol)!=HashSystem(copy)) {
+            MSYS_FAIL("msysb round trip of " << argv[i] << " changed the system");
+        }
+        if (copy->provenance().size()!=mol->provenance().size()) {
+            MSYS_FAIL("msysb round trip of " << argv[i] << " changed provenance");
+        }
+        for (auto name : mol->tableNames()) {
+            for (auto other : mol->tableNames()) {
+                bool shared = mol->table(name)->params() ==
+                              mol->table(other)->params();
+                if (shared != (copy->table(name)->params() ==
+                               copy->table(other)->params())) {
+                    MSYS_FAIL("msysb round trip of " << argv[i]
+                            << " changed sharing of params in " << name);
+                }
+            }
+        }
+        std::string bytes = FormatMsysb(mol, Provenance());
+        if (HashSystem(ImportMsysbFromBytes(bytes.data(), bytes.size())) !=
+            HashSystem(mol)) {
+            MSYS_FAIL("msysb bytes round trip of " << argv[i] << " failed");
+        }
+        SystemPtr structure = Load(path, true);
+        if (structure->tableNames().size() ||
+            structure->atomCount() > mol->atomCount()) {
+            MSYS_FAIL("structure_only load of " << argv[i] << " has tables");
+        }
+        printf("%s load %.3fms save msysb %.3fms load msysb %.3fms\n",
+               argv[i], (t1-t0)*1000, (t2-t1)*1000, (t3-t2)*1000);
+    }
+    unlink(path.data());
+    unlink(tmp);
+    return 0;
+}
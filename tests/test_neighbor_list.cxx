@@ -0,0 +1,73 @@
+#include "neighbor_list.hxx"
+#include <unordered_set>
+#include <stdlib.h>
+#include <stdio.h>
+#include <cassert>
+#include <set>
+
+using namespace desres::msys;
+
+typedef std::unordered_set<uint64_t> Exclusions;
+typedef std::set<std::pair<Id,Id> > PairSet;
+
+static PairSet brute_force(int n, const float* pos, float L, float cutoff,
+                           Exclusions const& excl) {
+    PairSet pairs;
+    for (int i=0; i<n; i++) {
+        for (int j=i+1; j<n; j++) {
+            float d2 = 0;
+            for (int m=0; m<3; m++) {
+                float d = pos[3*j+m] - pos[3*i+m];
+                d -= L*std::round(d/L);
+                d2 += d*d;
+            }
+            uint64_t key = (uint64_t(i)<<32) | j;
+            if (d2 <= cutoff*cutoff && !excl.count(key)) {
+                pairs.insert(std::make_pair(i,j));
+            }
+        }
+    }
+    return pairs;
+}
+
+int main() {
+    srand48(1973);
+    const int N = 2000;
+    const float L = 30;
+    const float cutoff = 3.0;
+    std::vector<float> pos(3*N);
+    for (auto& x : pos) x = L*drand48();
+    double cell[9] = {L,0,0, 0,L,0, 0,0,L};
+
+    Exclusions excl;
+    for (int i=0; i<N; i+=2) {
+        excl.insert((uint64_t(i)<<32) | (i+1));
+        excl.insert((uint64_t(i+1)<<32) | i);
+    }
+
+    NeighborListT<float, Exclusions> nlist(N, cutoff, 1.0, excl);
+    for (int frame=0; frame<20; frame++) {
+        NeighborListT<float, Exclusions>::contact_array_t result;
+        nlist.update(pos.data(), cell);
+        nlist.find(pos.data(), &result);
+        PairSet got;
+        for (uint64_t k=0; k<result.count; k++) {
+            assert(result.i[k] < result.j[k]);
+            got.insert(std::make_pair(result.i[k], result.j[k]));
+        }
+        assert(got.size()==result.count);
+        assert(got == brute_force(N, pos.data(), L, cutoff, excl));
+
+        for (auto& x : pos) x += 0.05*(drand48()-0.5);
+    }
+    assert(nlist.nbuilds() < 20);
+    printf("%u builds over 20 frames\n", nlist.nbuilds());
+
+    // a large move forces a rebuild
+    unsigned nbuilds = nlist.nbuilds();
+    pos[0] += 2.0;
+    assert(nlist.update(pos.data(), cell));
+    assert(nlist.nbuilds()==nbuilds+1);
+
+    return 0;
+}
@@ -1,6 +1,7 @@
 #include "pfx/pfx.hxx"
 #include <assert.h>
 #include <stdio.h>
+#include <string.h>
 
 using namespace desres::msys::pfx;
 
@@ -64,6 +65,57 @@ int main() {
 
     Pfx pfx(g, true);
     pfx.glue(nglue, glue);
+
+    // multi-frame apply matches frame-by-frame apply
+    const unsigned nframes = 5;
+    std::vector<float> fpos(nframes*natoms*3), fbox(nframes*9);
+    for (unsigned i=0; i<nframes; i++) {
+        memcpy(&fpos[i*natoms*3], pos, sizeof(pos));
+        memcpy(&fbox[i*9], box, sizeof(box));
+        fpos[i*natoms*3] += i;
+    }
+    std::vector<float> want(fpos), wantbox(fbox);
+    for (unsigned i=0; i<nframes; i++) {
+        pfx.apply(&want[i*natoms*3], &wantbox[i*9], (float *)NULL);
+    }
+    pfx.apply(nframes, &fpos[0], &fbox[0], (float *)NULL, 3);
+    assert(fpos==want);
+    assert(fbox==wantbox);
+
+    // rigidly moved copies of a frame superpose with zero rmsd
+    std::vector<float> rframes(nframes*natoms*3);
+    for (unsigned i=0; i<nframes; i++) {
+        const float c = cos(0.3*i), s = sin(0.3*i);
+        for (unsigned j=0; j<natoms; j++) {
+            float* r = &rframes[3*(i*natoms+j)];
+            r[0] = c*pos[j][0] - s*pos[j][1] + i;
+            r[1] = s*pos[j][0] + c*pos[j][1] - 2*i;
+            r[2] = pos[j][2] + 0.5*i;
+        }
+    }
+    std::vector<double> rmsd(nframes), mats(9*nframes);
+    batch_aligned_rmsd(natoms, &pos[0][0], nframes, &rframes[0],
+                       &rmsd[0], &mats[0], (float *)NULL, 2);
+    for (unsigned i=0; i<nframes; i++) {
+        assert(rmsd[i] < 1e-3);
+        assert(fabs(mats[9*i] - cos(0.3*i)) < 1e-4);
+    }
+    rframes[0] += 1;
+    batch_aligned_rmsd(natoms, &pos[0][0], nframes, &rframes[0],
+                       &rmsd[0], (double *)NULL, (float *)NULL, 2);
+    assert(rmsd[0] > 0.1);
+    std::vector<float> matrix(nframes*nframes);
+    pairwise_aligned_rmsd(natoms, nframes, &rframes[0], &matrix[0],
+                          (float *)NULL, 3);
+    for (unsigned i=0; i<nframes; i++) {
+        assert(matrix[i*nframes+i]==0);
+        for (unsigned j=0; j<nframes; j++) {
+            assert(matrix[i*nframes+j]==matrix[j*nframes+i]);
+            if (i>0 && j>0) assert(matrix[i*nframes+j] < 1e-3);
+        }
+    }
+    assert(fabs(matrix[1]-rmsd[0]) < 1e-4);
+
     pfx.apply(&pos[0][0], box, (float *)NULL);
     //for (unsigned i=0; i<natoms; i++) {
         //printf("%2u: %8.5f %8.5f %8.5f\n", i,
@@ -58,6 +58,50 @@ int main() {
     }
     printf("findContacts: single %.3fms double %.3fms ratio %.3f\n",tf,td,td/tf);
 
+    // updating a voxelized hash gives the same contacts as a new one,
+    // for both small displacements and ones that force a rebuild.
+    sf.voxelize(0.125);
+    for (float scale : {0.002f, 0.002f, 0.002f, 0.05f, 0.002f, 0.5f}) {
+        std::vector<float> newpos(fpos);
+        for (auto& x : newpos) x += scale*(drand48()-0.5);
+        double newcell[9] = {1.01,0,0, 0,1.01,0, 0,0,1.01};
+        SpatialHashT<float>::contact_array_t arr;
+        sf.update(newpos.data(), newcell);
+        sf.findContactsReuseVoxels(0.125, newpos.data(), B.size(), B.data(),
+                                   &arr);
+        SpatialHashT<float>::ContactList f;
+        for (uint64_t i=0; i<arr.count; i++) {
+            f.emplace_back(arr.i[i], arr.j[i], arr.d2[i]);
+        }
+        SpatialHashT<float> fresh(newpos.data(), A.size(), A.data(), newcell);
+        auto g = fresh.findContacts(0.125, newpos.data(), B.size(), B.data());
+        std::sort(f.begin(), f.end());
+        std::sort(g.begin(), g.end());
+        assert(f.size()>0);
+        assert(f == g);
+        fpos = newpos;
+    }
+
+    // pairlist over consecutive ranges concatenates to the full pairlist
+    {
+        std::unordered_set<uint64_t> excl;
+        SpatialHashT<float>::contact_array_t full, part;
+        sf.voxelize(0.125);
+        sf.findPairlistReuseVoxels(0.125f, excl, &full);
+        int n = sf.size();
+        int bounds[] = {0, n/3, n/2, n};
+        for (int k=0; k<3; k++) {
+            sf.findPairlistReuseVoxels(0.125f, excl, &part,
+                                       bounds[k], bounds[k+1]);
+        }
+        assert(full.count>0);
+        assert(full.count==part.count);
+        for (uint64_t i=0; i<full.count; i++) {
+            assert(full.i[i]==part.i[i]);
+            assert(full.j[i]==part.j[i]);
+        }
+    }
+
     return 0;
 }
 
@@ -45,6 +45,27 @@ int main(int argc, char *argv[]) {
         assert(ids.size()==2);
     }
 
+    /* deletions spanning whole words of the dead bitset, and at the end */
+    mol = System::create();
+    res=mol->addResidue(mol->addChain());
+    for (Id i=0; i<300; i++) mol->addAtom(res);
+    IdSet dead;
+    for (Id i=5; i<140; i++) dead.insert(i);
+    for (Id i=191; i<300; i++) dead.insert(i);
+    dead.insert(63);
+    dead.insert(150);
+    for (auto id : dead) mol->delAtom(id);
+    mol->delAtom(150);
+    {
+        IdList ids, expected;
+        std::copy(mol->atomBegin(), mol->atomEnd(), std::back_inserter(ids));
+        for (Id i=0; i<300; i++) if (!dead.count(i)) expected.push_back(i);
+        assert(ids==expected);
+        assert(mol->atoms()==expected);
+        assert(mol->atomCount()==expected.size());
+        for (Id i=0; i<310; i++) assert(mol->hasAtom(i)==(i<300 && !dead.count(i)));
+    }
+
     mol = System::create();
     res=mol->addResidue(mol->addChain());
     for (Id i=0; i<100000; i++) mol->addAtom(res);
@@ -8,6 +8,7 @@ import gzip
 import shutil
 import subprocess
 import tempfile
+from io import StringIO
 import sqlite3
 import random
 
@@ -114,6 +115,35 @@ class TestJson(unittest.TestCase):
         js = msys.FormatJson(mol)
         assert msys.ParseJson(js) is not None
 
+    def testJsonMalformedArrays(self):
+        d = json.loads(msys.FormatJson(msys.Load("tests/files/ch4.dms")))
+        for arr, msg in (
+            ([1, "C"], "arrays may not mix strings with other values"),
+            (["C", 1], "arrays may not mix numbers with other values"),
+            ([{}, 1], "arrays may not mix numbers with other values"),
+            ([{}, "C"], "arrays may not mix strings with other values"),
+            ([1, [2]], "may not contain arrays or objects"),
+            (["C", {}], "may not contain arrays or objects"),
+            ([1, None], "arrays may not contain null"),
+            ([None], "arrays may not contain null"),
+        ):
+            d["i"]["position"] = arr
+            with self.assertRaises(RuntimeError) as ctx:
+                msys.ParseJson(json.dumps(d))
+            self.assertIn(msg, str(ctx.exception), arr)
+
+    def testJsonRoundTrip(self):
+        for path in ("2f4k.dms", "ch4.dms", "ww.dms", "lig.json"):
+            mol = msys.Load(os.path.join("tests/files", path))
+            js = msys.FormatJson(mol)
+            with tmpfile(suffix=".json") as tmp:
+                tmp.write(js.encode())
+                tmp.flush()
+                loaded = msys.Load(tmp.name)
+            for new in msys.ParseJson(js), loaded:
+                self.assertEqual(new.hash(), mol.hash(), path)
+                self.assertEqual(msys.FormatJson(new), js, path)
+
     def testJsonSizes(self):
         import gzip
         import zlib
@@ -327,6 +357,61 @@ class TestIndexedFile(unittest.TestCase):
             self.assertEqual(L[10].ct(0)["Name"], "FAD-CH2+")
             self.assertEqual(L[0].ct(0)["Name"], "dUMP anion")
 
+    def checkIndexed(self, src, suffix, n):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "entries" + suffix)
+            shutil.copy(src, path)
+            L = msys.IndexedFileLoader(path)
+            self.assertTrue(os.path.exists(path + ".idx"))
+            ref = list(msys.LoadMany(path))
+            self.assertEqual(len(L), n)
+            self.assertEqual(len(ref), n)
+            for i in reversed(range(n)):
+                mol = L[i]
+                self.assertEqual(mol.natoms, ref[i].natoms)
+                self.assertEqual(mol.nbonds, ref[i].nbonds)
+                self.assertEqual(mol.ct(0).name, ref[i].ct(0).name)
+                self.assertTrue((mol.positions == ref[i].positions).all())
+                if "msys_file_offset" in ref[i].ct(0).keys():
+                    self.assertEqual(
+                        mol.ct(0)["msys_file_offset"], ref[i].ct(0)["msys_file_offset"]
+                    )
+            with self.assertRaises(RuntimeError):
+                L[n]
+
+    def testMae(self):
+        self.checkIndexed("tests/files/two.mae", ".mae", 4)
+
+    def testMaeGz(self):
+        with tempfile.NamedTemporaryFile(suffix=".mae.gz") as tmp:
+            with open("tests/files/two.mae", "rb") as fp:
+                with gzip.open(tmp.name, "wb") as gz:
+                    gz.write(fp.read())
+            self.checkIndexed(tmp.name, ".mae.gz", 4)
+
+    def testSdfGz(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "cofactors.sdf.gz")
+            with open("tests/files/cofactors.sdf", "rb") as fp:
+                with gzip.open(path, "wb") as gz:
+                    gz.write(fp.read())
+            L = msys.IndexedFileLoader(path)
+            self.assertTrue(os.path.exists(path + ".gzi"))
+            self.assertEqual(len(L), 15)
+            self.assertEqual(L[10].ct(0)["Name"], "FAD-CH2+")
+            self.assertEqual(L[5].ct(0)["Name"], "NADP+")
+            self.assertEqual(L[0].ct(0)["Name"], "dUMP anion")
+            # reopening uses the saved checkpoints
+            last = L[14].ct(0)["Name"]
+            L = msys.IndexedFileLoader(path)
+            self.assertEqual(L[14].ct(0)["Name"], last)
+
+    def testMol2(self):
+        self.checkIndexed("tests/files/order.mol2", ".mol2", 3)
+
+    def testPdb(self):
+        self.checkIndexed("tests/files/1DUF.pdb", ".pdb", 5)
+
 
 class TestHash(unittest.TestCase):
     def testAtom(self):
@@ -447,6 +532,38 @@ class TestHbond(unittest.TestCase):
         hbonds2 = finder.find(mol.positions)
         self.assertEqual(len(hbonds), 168)
 
+    def testArray(self):
+        mol = msys.Load("tests/files/1vcc.mae", structure_only=True)
+        finder = msys.HydrogenBondFinder(
+            mol, "protein and name N", "protein and name O"
+        )
+        pos = mol.positions
+        hbonds = finder.find(pos)
+        arr = finder.findArray()
+        self.assertEqual(len(arr), len(hbonds))
+        for rec, hb in zip(arr, hbonds):
+            self.assertEqual(rec["frame"], 0)
+            self.assertEqual(rec["donor"], hb.donor_id)
+            self.assertEqual(rec["acceptor"], hb.acceptor_id)
+            self.assertEqual(rec["hydrogen"], hb.hydrogen_id)
+            self.assertAlmostEqual(rec["r"], hb.r)
+            self.assertAlmostEqual(rec["p"], hb.p)
+            self.assertAlmostEqual(rec["energy"], hb.energy)
+
+        # stacks of frames, in either precision, over several threads
+        frames = NP.array([pos, pos + 0.1, pos[::-1]])
+        for dtype in "f", "d":
+            stack = finder.findArray(frames.astype(dtype), threads=3)
+            for i, frame in enumerate(frames):
+                one = finder.findArray(frame.astype(dtype))
+                sub = stack[stack["frame"] == i]
+                self.assertEqual(len(sub), len(one))
+                for field in "donor", "acceptor", "hydrogen", "energy":
+                    self.assertTrue((sub[field] == one[field]).all())
+        self.assertEqual(len(finder.findArray(frames[:0])), 0)
+        with self.assertRaises(ValueError):
+            finder.findArray(pos[1:])
+
 
 class Contacts(unittest.TestCase):
     def compare(self, p1, p2):
@@ -685,6 +802,101 @@ class TestSpatialHash(unittest.TestCase):
         self.assertTrue((old2 == new2).all())
         self.assertFalse(old1.tolist() == old2.tolist())
 
+    def testUpdate(self):
+        mol = msys.Load("tests/files/small.mae")
+        pos = mol.positions.astype("f")
+        box = mol.cell
+        pro = mol.selectArr("fragid 0")
+        wat = mol.selectArr("water")
+
+        sph = msys.SpatialHash(pos, pro, box=box)
+        sph.voxelize(4.0)
+        rng = NP.random.RandomState(3)
+        for scale in 0.05, 0.05, 1.0, 0.05, 20.0:
+            pos = pos + rng.uniform(-scale, scale, pos.shape).astype("f")
+            box = box * 1.001
+            sph.update(pos, box)
+            i1, j1, d1 = sph.findContacts(4.0, pos, wat, reuse_voxels=True)
+            new = msys.SpatialHash(pos, pro, box=box)
+            i2, j2, d2 = new.findContacts(4.0, pos, wat)
+            self.assertTrue(len(i1) > 0)
+            self.assertEqual(
+                sorted(zip(i1.tolist(), j1.tolist())),
+                sorted(zip(i2.tolist(), j2.tolist())),
+            )
+
+        with self.assertRaises(ValueError):
+            sph.update(pos[:10])
+
+    def testThreads(self):
+        mol = msys.Load("tests/files/small.mae")
+        pos = mol.positions.astype("f")
+        pro = mol.selectArr("fragid 0")
+        wat = mol.selectArr("water")
+        excl = msys.SpatialHash.Exclusions()
+        for b in mol.bonds:
+            excl.add(b.first.id, b.second.id)
+
+        for box in None, mol.cell:
+            sph = msys.SpatialHash(pos, pro, box=box)
+            want = sph.findContacts(4.0, pos, wat)
+            pwant = sph.findPairlist(4.0, excl)
+            self.assertTrue(len(want[0]) > 0)
+            self.assertTrue(len(pwant[0]) > 0)
+            for threads in 2, 3, 0:
+                got = sph.findContacts(4.0, pos, wat, threads=threads)
+                for a, b in zip(want, got):
+                    NP.testing.assert_array_equal(a, b)
+                got = sph.findPairlist(4.0, excl, reuse_voxels=True, threads=threads)
+                for a, b in zip(pwant, got):
+                    NP.testing.assert_array_equal(a, b)
+
+        sph = msys.SpatialHash(pos[pro])
+        want = sph.findContacts(4.0, pos[pro])
+        got = sph.findContacts(4.0, pos[pro], threads=4)
+        for a, b in zip(want, got):
+            NP.testing.assert_array_equal(a, b)
+
+    def testNeighborList(self):
+        mol = msys.Load("tests/files/small.mae")
+        pos = mol.getPositions()
+        bonds = [(b.first.id, b.second.id) for b in mol.bonds]
+        nlist = msys.NeighborList(pos, cutoff=3.5, skin=1.0, exclusions=bonds)
+        rng = NP.random.RandomState(11)
+        for _ in range(5):
+            i, j, d = nlist.find(pos)
+            want = mol.findContactIds(3.5, pos=pos)
+            self.assertEqual(
+                sorted(zip(i.tolist(), j.tolist())),
+                sorted((min(a, b), max(a, b)) for a, b, _ in want),
+            )
+            self.assertTrue((i < j).all())
+            self.assertTrue((d <= 3.5).all())
+            pos = pos + rng.uniform(-0.05, 0.05, pos.shape)
+        self.assertEqual(nlist.nbuilds, 1)
+
+        # a System defaults to its cell and bonded exclusions
+        i, j, _ = nlist.find(mol.positions)
+        pi, pj, _ = msys.NeighborList(mol, cutoff=3.5).find()
+        nonperiodic = set(zip(i.tolist(), j.tolist()))
+        periodic = set(zip(pi.tolist(), pj.tolist()))
+        self.assertTrue(nonperiodic <= periodic)
+
+        pos[0] += 5
+        nlist.find(pos)
+        self.assertEqual(nlist.nbuilds, 2)
+        with self.assertRaises(ValueError):
+            nlist.find(pos[:10])
+
+        pts = NP.array([[0, 0, 0], [1, 0, 0], [9.5, 0, 0]], "f")
+        nlist = msys.NeighborList(pts, cutoff=1.2, skin=0.5, exclusions=[(0, 1)])
+        i, j, d = nlist.find()
+        self.assertEqual(i.tolist(), [])
+        box = NP.diag([10.0, 10.0, 10.0])
+        i, j, d = nlist.find(pts, box)
+        self.assertEqual(list(zip(i.tolist(), j.tolist())), [(0, 2)])
+        NP.testing.assert_almost_equal(d, [0.5])
+
     def testEmptyWithin(self):
         mol = msys.CreateSystem()
         mol.addAtom()
@@ -1065,6 +1277,49 @@ class TestAtomsel(unittest.TestCase):
             self.assertEqual(id1, id3)
             self.assertEqual(id2, id4)
 
+    def testCompiledTrajectory(self):
+        mol = msys.Load("tests/files/alanin.pdb")
+        trj = molfile.dcd.read("tests/files/alanin.dcd")
+        sel = mol.compileSelection("protein and within 5 of residue 3")
+        pbsel = mol.compileSelection("pbwithin 7 of residue 3 and x > 0")
+        static = mol.compileSelection("residue 3 or name CA")
+        self.assertEqual(sel.selection, "protein and within 5 of residue 3")
+        self.assertTrue(sel.dynamic)
+        self.assertTrue(pbsel.dynamic)
+        self.assertFalse(static.dynamic)
+        for f in trj.frames():
+            box = NP.diag(NP.max(f.pos, 0) - NP.min(f.pos, 0))
+            self.assertEqual(
+                sel.selectIds(pos=f.pos, box=box),
+                mol.selectIds(sel.selection, pos=f.pos, box=box),
+            )
+            self.assertEqual(
+                list(pbsel.selectArr(pos=f.pos, box=box)),
+                mol.selectIds(pbsel.selection, pos=f.pos, box=box),
+            )
+        self.assertEqual(static.selectIds(), mol.selectIds(static.selection))
+        with self.assertRaises(ValueError):
+            sel.selectIds(pos=f.pos[1:])
+
+    def testCompiledInvalidation(self):
+        mol = msys.Load("tests/files/alanin.pdb")
+        sel = mol.compileSelection("name CA and within 4 of resname ALA")
+        old = sel.selectIds()
+        self.assertEqual(old, mol.selectIds(sel.selection))
+
+        # attribute changes invalidate the cache
+        mol.atom(old[0]).name = "XX"
+        self.assertEqual(sel.selectIds(), old[1:])
+
+        # so do topology changes
+        mol.atom(old[1]).remove()
+        self.assertEqual(sel.selectIds(), old[2:])
+        res = mol.addResidue()
+        res.name = "ALA"
+        atm = res.addAtom()
+        atm.name = "CA"
+        self.assertEqual(sel.selectIds(), old[2:] + [atm.id])
+
     def testSmartsQuotes(self):
         """smarts can be single or double quoted"""
         mol = msys.Load("tests/files/jandor.sdf")
@@ -1087,6 +1342,11 @@ class TestAtomsel(unittest.TestCase):
                     new,
                     "failed on '%s': oldlen %d newlen %d" % (sel, len(old), len(new)),
                 )
+                self.assertEqual(
+                    old,
+                    mol.compileSelection(sel).selectIds(),
+                    "compiled selection failed on '%s'" % sel,
+                )
 
 
 class TestSdf(unittest.TestCase):
@@ -1148,6 +1408,42 @@ class TestSdf(unittest.TestCase):
         for x in msys.LoadMany(path):
             self.assertFalse(x is None)
 
+    def testLoadManyParallel(self):
+        tmp = tempfile.NamedTemporaryFile(suffix=".sdf")
+        with open(tmp.name, "w") as fp:
+            for i in range(20):
+                for name in ("cofactors.sdf", "jandor-bad.sdf", "stereo.sdf"):
+                    with open("tests/files/" + name) as src:
+                        fp.write(src.read())
+        for path in (tmp.name, "tests/files/order.mol2"):
+            ref = list(msys.LoadMany(path, error_writer=None))
+            err = StringIO()
+            mols = list(msys.LoadManyParallel(path, workers=3, error_writer=err))
+            self.assertEqual(len(mols), len(ref))
+            nbad = 0
+            for m, r in zip(mols, ref):
+                self.assertEqual(m is None, r is None)
+                if m is None:
+                    nbad += 1
+                    continue
+                self.assertEqual(m.name, r.name)
+                self.assertEqual(m.natoms, r.natoms)
+                self.assertEqual(m.nbonds, r.nbonds)
+                ct, rct = m.ct(0), r.ct(0)
+                self.assertEqual(ct.keys(), rct.keys())
+                for k in ct.keys():
+                    self.assertEqual(ct[k], rct[k])
+            self.assertEqual(err.getvalue().count("Error reading structure"), nbad)
+
+            unordered = list(
+                msys.LoadManyParallel(
+                    path, workers=3, ordered=False, error_writer=None, with_index=True
+                )
+            )
+            self.assertEqual(sorted(i for i, m in unordered), list(range(len(ref))))
+            for i, m in unordered:
+                self.assertEqual(m is None, ref[i] is None)
+
     def testFormalCharge(self):
         mol = msys.Load("tests/files/lig.sdf")
         self.assertEqual(mol.atom(12).formal_charge, 1)
@@ -2464,6 +2760,190 @@ class Main(unittest.TestCase):
             new = msys.Load(tmp.name)
         self.assertEqual([a.name for a in old.atoms], [a.name for a in new.atoms])
 
+    def testLoadDmsGzMembers(self):
+        with open("tests/files/2f4k.dms", "rb") as fp:
+            data = fp.read()
+        ref = msys.LoadDMS(buffer=data)
+        gz = gzip.compress(data[:5000]) + gzip.compress(data[5000:])
+        with tempfile.NamedTemporaryFile(suffix=".dms.gz") as tmp:
+            tmp.write(gz)
+            tmp.flush()
+            for mol in msys.Load(tmp.name), msys.LoadDMS(buffer=gz):
+                self.assertEqual(mol.hash(), ref.hash())
+            tmp.truncate(len(gz) // 2)
+            with self.assertRaises(RuntimeError):
+                msys.Load(tmp.name)
+
+    def testLoadDmsLazyTables(self):
+        path = "tests/files/ww.dms"
+        ref = msys.Load(path)
+        mol = msys.Load(path, lazy_tables=True)
+        self.assertEqual(mol.table_names, ref.table_names)
+        self.assertTrue(all(mol._ptr.isLazyTable(n) for n in mol.table_names))
+        self.assertEqual([a.charge for a in mol.atoms], [a.charge for a in ref.atoms])
+        self.assertEqual(
+            mol.table("stretch_harm").nterms, ref.table("stretch_harm").nterms
+        )
+        self.assertFalse(mol._ptr.isLazyTable("stretch_harm"))
+        self.assertTrue(mol._ptr.isLazyTable("angle_harm"))
+        # deleting atoms reads the remaining tables first
+        mol.atom(0).remove()
+        self.assertFalse(any(mol._ptr.isLazyTable(n) for n in mol.table_names))
+        ref.atom(0).remove()
+        self.assertEqual(mol.hash(), ref.hash())
+
+    def testLoadDmsSelectTables(self):
+        path = "tests/files/ww.dms"
+        ref = msys.Load(path)
+        mol = msys.Load(path, tables=["stretch_harm", "nonbonded"])
+        self.assertEqual(mol.table_names, ["nonbonded", "stretch_harm"])
+        self.assertEqual(mol.table("nonbonded").nterms, ref.natoms)
+        self.assertEqual(mol.auxtable_names, ref.auxtable_names)
+        mol = msys.Load(path, tables=["stretch_harm"], lazy_tables=True)
+        self.assertEqual(mol.table_names, ref.table_names)
+        self.assertFalse(mol._ptr.isLazyTable("stretch_harm"))
+        self.assertTrue(mol._ptr.isLazyTable("nonbonded"))
+        self.assertEqual(mol.hash(), ref.hash())
+        with self.assertRaises(ValueError):
+            msys.Load("tests/files/1DUF.pdb", lazy_tables=True)
+
+    def testLoadDmsAtomProps(self):
+        path = "tests/files/ww.dms"
+        ref = msys.Load(path)
+        self.assertIn("grp_energy", ref.atom_props)
+        mol = msys.Load(path, atom_props=["grp_energy"], without_tables=True)
+        self.assertEqual(mol.atom_props, ["grp_energy"])
+        self.assertEqual(
+            [a["grp_energy"] for a in mol.atoms], [a["grp_energy"] for a in ref.atoms]
+        )
+        self.assertEqual(mol.table_names, [])
+        mol = msys.LoadDMS(path, atom_props=[])
+        self.assertEqual(mol.atom_props, [])
+        self.assertEqual(mol.positions.tolist(), ref.positions.tolist())
+
+    def testUpdateDMSCoordinates(self):
+        mol = msys.Load("tests/files/ww.dms")
+        with tempfile.NamedTemporaryFile(suffix=".dms") as tmp:
+            msys.SaveDMS(mol, tmp.name)
+            pos, vel, cell = msys.ReadDMSCoordinates(tmp.name)
+            self.assertTrue((pos == mol.positions).all())
+            self.assertTrue((vel == mol.getVelocities()).all())
+            self.assertTrue((cell == mol.cell).all())
+
+            newpos = pos + 1.5
+            newvel = NP.full(vel.shape, 0.25)
+            newcell = NP.diag([30.0, 40.0, 50.0])
+            msys.UpdateDMSCoordinates(tmp.name, newpos, newvel, newcell)
+            new = msys.Load(tmp.name)
+            self.assertTrue((new.positions == newpos).all())
+            self.assertTrue((new.getVelocities() == newvel).all())
+            self.assertTrue((new.cell == newcell).all())
+            self.assertEqual(new.table_names, mol.table_names)
+            self.assertEqual(
+                new.table("stretch_harm").nterms, mol.table("stretch_harm").nterms
+            )
+
+            # velocities and cell are left alone when not given
+            msys.UpdateDMSCoordinates(tmp.name, pos)
+            pos2, vel2, cell2 = msys.ReadDMSCoordinates(tmp.name)
+            self.assertTrue((pos2 == pos).all())
+            self.assertTrue((vel2 == newvel).all())
+            self.assertTrue((cell2 == newcell).all())
+
+            with self.assertRaises(RuntimeError):
+                msys.UpdateDMSCoordinates(tmp.name, pos[:-1])
+            with self.assertRaises(ValueError):
+                msys.UpdateDMSCoordinates(tmp.name, pos, velocities=vel[:-1])
+
+    def testUpdateDMSCoordinatesIndexed(self):
+        mol = msys.Load("tests/files/ww.dms")
+        with tempfile.NamedTemporaryFile(suffix=".dms") as tmp:
+            msys.SaveDMS(mol, tmp.name)
+            # an index lets sqlite return rowids in index order unless asked
+            with sqlite3.connect(tmp.name) as conn:
+                conn.execute("create index particle_name on particle(name)")
+            conn.close()
+            newpos = NP.arange(3 * mol.natoms, dtype=float).reshape(-1, 3)
+            msys.UpdateDMSCoordinates(tmp.name, newpos)
+            new = msys.Load(tmp.name)
+            self.assertTrue((new.positions == newpos).all())
+            self.assertEqual([a.name for a in new.atoms], [a.name for a in mol.atoms])
+
+    def testMsysbRoundTrip(self):
+        for path in "ww.dms", "noe.mae", "cofactors.sdf", "alchemical_restraint.mae":
+            mol = msys.Load("tests/files/" + path)
+            mol.atom(0).name = "renamed"
+            mol.delAtoms(mol.select("index 3"))
+            with tempfile.NamedTemporaryFile(suffix=".msysb") as tmp:
+                msys.Save(mol, tmp.name)
+                new = msys.Load(tmp.name)
+            self.assertEqual(new.hash(), mol.hash(), path)
+            self.assertEqual(new.atom(0).name, "renamed")
+            self.assertEqual(new.table_names, mol.table_names)
+            self.assertEqual(len(new.provenance), len(mol.provenance) + 1)
+
+        mol = msys.Load("tests/files/ww.dms")
+        with tempfile.NamedTemporaryFile(suffix=".msysb") as tmp:
+            msys.Save(mol, tmp.name)
+            new = msys.Load(tmp.name, structure_only=True)
+            self.assertEqual(new.table_names, [])
+            self.assertEqual(new.natoms, len(mol.select("atomicnumber > 0")))
+            with self.assertRaises(RuntimeError):
+                msys.Save(mol, tmp.name, append=True)
+
+    def testLoadCache(self):
+        tmpdir = tempfile.TemporaryDirectory
+        with tmpdir() as cache, tmpdir() as tmp:
+            path = os.path.join(tmp, "ww.dms")
+            shutil.copy("tests/files/ww.dms", path)
+            mol = msys.Load(path, cache_dir=cache)
+            self.assertEqual(len(os.listdir(cache)), 1)
+            self.assertEqual(msys.Load(path, cache_dir=cache).hash(), mol.hash())
+            self.assertEqual(len(os.listdir(cache)), 1)
+
+            # load options and file changes make new entries
+            self.assertEqual(
+                msys.Load(path, structure_only=True, cache_dir=cache).table_names, []
+            )
+            self.assertEqual(len(os.listdir(cache)), 2)
+            mol.atom(0).name = "changed"
+            msys.SaveDMS(mol, path)
+            self.assertEqual(msys.Load(path, cache_dir=cache).atom(0).name, "changed")
+            self.assertEqual(len(os.listdir(cache)), 3)
+
+            # adding to a full cache drops the least recently used entries,
+            # but leaves files it did not create alone
+            msys.Save(mol, os.path.join(cache, "mine.msysb"))
+            msys.Load(path, without_tables=True, cache_dir=cache, cache_size=1)
+            self.assertEqual(os.listdir(cache), ["mine.msysb"])
+
+    def testMsysbBadFile(self):
+        with tempfile.NamedTemporaryFile(suffix=".msysb") as tmp:
+            tmp.write(b"not an msysb file")
+            tmp.flush()
+            with self.assertRaises(RuntimeError):
+                msys.Load(tmp.name)
+
+    def testLoadMaeThreads(self):
+        for paths in (
+            ("small.mae", "fbhw.mae", "two.mae"),
+            ("noe.mae", "noe.mae"),
+            ("fbhw.mae", "noe.mae"),
+            ("noe.mae", "fbhw.mae"),
+            ("fbhw.mae", "fbhw.mae"),
+        ):
+            with tempfile.NamedTemporaryFile(suffix=".mae") as tmp:
+                for path in paths:
+                    with open(os.path.join("tests/files", path), "rb") as fp:
+                        tmp.write(fp.read())
+                tmp.flush()
+                mol = msys.LoadMAE(tmp.name)
+                par = msys.LoadMAE(tmp.name, threads=4)
+                self.assertEqual(par.ncts, mol.ncts)
+                self.assertEqual(par.hash(), mol.hash(), paths)
+                par = msys.LoadMAE(tmp.name, structure_only=True, threads=0)
+                self.assertEqual(par.table_names, [])
+
     def testExportMaeGz(self):
         m = msys.Load("tests/files/noFused1.mae")
         tmp = tempfile.NamedTemporaryFile(suffix=".maegz")
@@ -3434,6 +3914,27 @@ class Main(unittest.TestCase):
         self.assertEqual(fragids(m), [0, 1, 0])
         self.assertEqual(frags, [[m.atom(0), m.atom(2)], [m.atom(1)]])
 
+    def testAdjacency(self):
+        m = msys.CreateSystem()
+        a = [m.addAtom() for i in range(4)]
+        b02 = a[0].addBond(a[2])
+        b23 = a[2].addBond(a[3])
+        offsets, nbrs, bonds = m.adjacency()
+        self.assertEqual(offsets.tolist(), [0, 1, 1, 3, 4])
+        self.assertEqual(nbrs.tolist(), [2, 0, 3, 2])
+        self.assertEqual(bonds.tolist(), [b02.id, b02.id, b23.id, b23.id])
+        with self.assertRaises(ValueError):
+            nbrs[0] = 1
+
+        # snapshots are unchanged by later edits, but new ones see them
+        b02.remove()
+        a[1].remove()
+        self.assertEqual(nbrs.tolist(), [2, 0, 3, 2])
+        offsets, nbrs, bonds = m.adjacency()
+        self.assertEqual(offsets.tolist(), [0, 0, 0, 1, 2])
+        self.assertEqual(nbrs.tolist(), [3, 2])
+        self.assertEqual(bonds.tolist(), [b23.id, b23.id])
+
     def testBadDMS(self):
         tmp = tempfile.NamedTemporaryFile(suffix=".dms")
         path = tmp.name
@@ -3506,6 +4007,118 @@ class Main(unittest.TestCase):
         self.assertEqual(list(m.positions[1]), [8, 9, 10])
         self.assertEqual(list(m._ptr.getPositions(ids)[0]), [8, 9, 10])
 
+    def testPositionsView(self):
+        m = msys.CreateSystem()
+        self.assertEqual(m.getPositions(copy=False).shape, (0, 3))
+        a0 = m.addAtom()
+        a1 = m.addAtom()
+        a1.pos = (1, 2, 3)
+        a1.vel = (4, 5, 6)
+        pos = m.getPositions(copy=False)
+        vel = m.getVelocities(copy=False)
+        self.assertEqual(pos.tolist(), [[0, 0, 0], [1, 2, 3]])
+        self.assertEqual(vel.tolist(), [[0, 0, 0], [4, 5, 6]])
+
+        # writes go straight to the atoms, and vice versa
+        pos[0] = (7, 8, 9)
+        vel[:] = 1
+        self.assertEqual(list(a0.pos), [7, 8, 9])
+        self.assertEqual(list(a1.vel), [1, 1, 1])
+        a1.x = 10
+        self.assertEqual(pos[1][0], 10)
+
+        # atoms can't move while a view is alive
+        with self.assertRaises(RuntimeError):
+            m.addAtom()
+        del pos, vel
+        m.addAtom().remove()
+        with self.assertRaises(ValueError):
+            m.getPositions(copy=False)
+
+    def testPositionsBlock(self):
+        m = msys.CreateSystem()
+        a = [m.addAtom() for i in range(3)]
+        a[1].remove()
+
+        # contiguous arrays are taken over, and frozen
+        pos = NP.arange(6.0).reshape(2, 3).copy()
+        m.positions = pos
+        self.assertFalse(pos.flags.writeable)
+        self.assertTrue(m.positions.flags.writeable)
+        self.assertEqual(m.positions.tolist(), pos.tolist())
+        self.assertEqual(list(a[2].pos), [3, 4, 5])
+        a[2].x = -1
+        self.assertEqual(m.positions.tolist(), [[0, 1, 2], [-1, 4, 5]])
+
+        vel = NP.ones((2, 3), "f")
+        m.setVelocities(vel)
+        self.assertTrue(vel.flags.writeable)
+        self.assertEqual(list(a[0].vel), [1, 1, 1])
+
+        # other arrays are copied
+        both = NP.arange(12.0).reshape(2, 6)
+        m.positions = both[:, :3]
+        self.assertTrue(both.flags.writeable)
+        both[:] = 0
+        self.assertEqual(m.positions.tolist(), [[0, 1, 2], [6, 7, 8]])
+
+        # with a view of the atoms alive, arrays are copied into them
+        view = m.getPositions(copy=False)
+        pos = NP.zeros((2, 3))
+        m.positions = pos
+        self.assertTrue(pos.flags.writeable)
+        self.assertEqual(view.tolist(), pos.tolist())
+
+        # saved systems get the values of the block
+        del view
+        m.positions = NP.full((2, 3), 2.0)
+        with tempfile.NamedTemporaryFile(suffix=".msysb") as tmp:
+            msys.Save(m, tmp.name)
+            self.assertEqual(msys.Load(tmp.name).positions.tolist(), [[2.0] * 3] * 2)
+
+    def testFields(self):
+        m = msys.CreateSystem()
+        a = [m.addAtom() for i in range(3)]
+        a[0].name = "CA"
+        a[1].name = "N\u00e9"
+        a[2].charge = -0.5
+        a[2].residue.resid = 7
+        a[2].residue.name = "GLY"
+        a[0].addBond(a[2]).order = 2
+        m.addAtomProp("tag", str)
+        m.addAtomProp("count", int)
+        a[1]["tag"] = "xy"
+
+        self.assertEqual(m.getAtomField("name").tolist(), ["CA", "N\u00e9", ""])
+        self.assertEqual(m.getAtomField("charge").tolist(), [0, 0, -0.5])
+        self.assertEqual(m.getAtomField("charge", [2, 0]).tolist(), [-0.5, 0])
+        self.assertEqual(m.getAtomField("residue").tolist(), [x.residue.id for x in a])
+        self.assertEqual(m.getAtomField("tag").tolist(), ["", "xy", ""])
+        self.assertEqual(m.getResidueField("resid").tolist(), [0, 0, 7])
+        self.assertEqual(m.getResidueField("name").tolist(), ["", "", "GLY"])
+        self.assertEqual(m.getBondField("order").tolist(), [2])
+        self.assertEqual(m.getBondField("j").tolist(), [2])
+
+        m.setAtomField("mass", [1, 12, 14])
+        m.setAtomField("atomic_number", 6)
+        m.setAtomField("name", ["H1", "H2"], ids=[2, 1])
+        m.setAtomField("count", NP.arange(3))
+        m.setResidueField("resid", [4, 5, 6])
+        m.setBondField("aromatic", [1])
+        self.assertEqual([x.mass for x in a], [1, 12, 14])
+        self.assertEqual([x.atomic_number for x in a], [6, 6, 6])
+        self.assertEqual([x.name for x in a], ["CA", "H2", "H1"])
+        self.assertEqual([x["count"] for x in a], [0, 1, 2])
+        self.assertEqual([x.residue.resid for x in a], [4, 5, 6])
+        self.assertEqual(m.getBondField("aromatic").tolist(), [1])
+
+        with self.assertRaises(KeyError):
+            m.getAtomField("nosuch")
+        with self.assertRaises(ValueError):
+            m.setAtomField("mass", [1, 2])
+        with self.assertRaises(ValueError):
+            m.getAtomField("mass", [5])
+
     def testVelocities(self):
         m = msys.CreateSystem()
         a0 = m.addAtom()
@@ -4107,6 +4720,31 @@ class TestWrap(unittest.TestCase):
             ],
         )
 
+    def testWrapperFrames(self):
+        from msys import wrap
+
+        mol = msys.Load("tests/files/2f4k.dms")
+        rng = NP.random.default_rng(1)
+        nframes = 3
+        c, s = NP.cos(0.3), NP.sin(0.3)
+        rot = NP.array([[c, s, 0], [-s, c, 0], [0, 0, 1]])
+        pos = mol.getPositions() + rng.uniform(-20, 20, (nframes, 1, 3))
+        box = NP.array([NP.dot(NP.diag([30.0, 32.0, 34.0 + i]), rot) for i in range(3)])
+        for unrotate in (False, True):
+            wrapper = wrap.Wrapper(mol, center="protein", unrotate=unrotate)
+            expected_pos, expected_box = [], []
+            for p, b in zip(pos, box):
+                mol.setPositions(p)
+                mol.setCell(b)
+                wrapper.wrap()
+                expected_pos.append(mol.getPositions())
+                expected_box.append(mol.getCell())
+            fpos, fbox = pos.copy(), box.copy()
+            wrapper.wrap_frames(fpos, fbox, threads=2)
+            NP.testing.assert_almost_equal(fpos, expected_pos, decimal=5)
+            if unrotate:
+                NP.testing.assert_almost_equal(fbox, expected_box)
+
 
 class TestImporter(unittest.TestCase):
     def test_1vcc(self):
@@ -4126,6 +4764,47 @@ class TestImporter(unittest.TestCase):
         self.assertEqual(new.natoms, pro.natoms)
         self.assertEqual(new.nresidues, pro.nresidues)
 
+    def testFromArrays(self):
+        mol = msys.Load("tests/files/1vcc.mae", structure_only=True)
+        atoms = mol.atoms
+        new = msys.SystemFromArrays(
+            [a.atomic_number for a in atoms],
+            name=[a.name for a in atoms],
+            resname=NP.array([a.residue.name for a in atoms]),
+            resid=[a.residue.resid for a in atoms],
+            chain=[a.residue.chain.name for a in atoms],
+            segid=[a.residue.chain.segid for a in atoms],
+            insertion=[a.residue.insertion for a in atoms],
+            pos=mol.getPositions(),
+            mass=[a.mass for a in atoms],
+            charge=[a.charge for a in atoms],
+            formal_charge=[a.formal_charge for a in atoms],
+            bonds=(
+                [b.first.id for b in mol.bonds],
+                [b.second.id for b in mol.bonds],
+                [b.order for b in mol.bonds],
+            ),
+            atom_props={"grp_ligand": NP.arange(mol.natoms) % 2, "tag": "x"},
+        )
+        self.assertEqual(new.natoms, mol.natoms)
+        self.assertEqual(new.nresidues, mol.nresidues)
+        self.assertEqual(new.nchains, mol.nchains)
+        self.assertEqual(new.nbonds, mol.nbonds)
+        self.assertTrue((new.getPositions() == mol.getPositions()).all())
+        for a, b in zip(atoms, new.atoms):
+            self.assertEqual(a.name, b.name)
+            self.assertEqual(a.residue.resid, b.residue.resid)
+            self.assertEqual(a.residue.chain.name, b.residue.chain.name)
+            self.assertEqual(a.charge, b.charge)
+        self.assertEqual(new.atomPropType("grp_ligand"), int)
+        self.assertEqual([a["grp_ligand"] for a in new.atoms[:3]], [0, 1, 0])
+        self.assertEqual(new.atom(5)["tag"], "x")
+
+        with self.assertRaises(ValueError):
+            msys.SystemFromArrays([1, 1], pos=NP.zeros((3, 3)))
+        with self.assertRaises(ValueError):
+            msys.SystemFromArrays([1, 1], name=["H1"])
+
 
 class TestSvd(unittest.TestCase):
     def testNice(self):
@@ -4178,5 +4857,54 @@ class TestSvd(unittest.TestCase):
         NP.testing.assert_almost_equal(v, V)
 
 
+class TestBatchAlignedRmsd(unittest.TestCase):
+    def setUp(self):
+        rng = NP.random.RandomState(7)
+        self.ref = rng.normal(size=(20, 3))
+        self.frames = self.ref + rng.normal(scale=0.3, size=(6, 20, 3))
+        self.wts = rng.uniform(0.5, 2.0, 20)
+
+    def expected(self, X, Y, wts=None):
+        w = NP.ones(len(X)) if wts is None else wts
+        X = X - NP.average(X, axis=0, weights=w)
+        Y = Y - NP.average(Y, axis=0, weights=w)
+        mat, _ = pfx.aligned_rmsd(X, Y, w)
+        d = X - NP.dot(Y, mat.T)
+        return mat, NP.sqrt((w * (d * d).sum(1)).sum() / w.sum())
+
+    def testBatch(self):
+        for wts in None, self.wts:
+            rmsd, mats = pfx.batch_aligned_rmsd(
+                self.ref, self.frames, weights=wts, rotations=True, threads=2
+            )
+            self.assertEqual(rmsd.shape, (6,))
+            self.assertEqual(mats.shape, (6, 3, 3))
+            for i, frame in enumerate(self.frames):
+                mat, r = self.expected(self.ref, frame, wts)
+                self.assertAlmostEqual(rmsd[i], r)
+                NP.testing.assert_almost_equal(mats[i], mat)
+
+        frames = self.frames.astype("f")
+        rmsd = pfx.batch_aligned_rmsd(self.ref, frames)
+        want = [self.expected(self.ref, f)[1] for f in self.frames]
+        NP.testing.assert_almost_equal(rmsd, want, decimal=4)
+
+        with self.assertRaises(ValueError):
+            pfx.batch_aligned_rmsd(self.ref[:5], self.frames)
+        with self.assertRaises(ValueError):
+            pfx.batch_aligned_rmsd(self.ref, self.frames, weights=self.wts[:5])
+
+    def testPairwise(self):
+        mat = pfx.pairwise_aligned_rmsd(self.frames, threads=3)
+        self.assertEqual(mat.shape, (6, 6))
+        self.assertEqual(mat.dtype, NP.float32)
+        NP.testing.assert_equal(mat, mat.T)
+        for i in range(6):
+            self.assertEqual(mat[i, i], 0)
+            for j in range(i + 1, 6):
+                _, r = self.expected(self.frames[i], self.frames[j])
+                self.assertAlmostEqual(mat[i, j], r, places=5)
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
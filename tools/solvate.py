@@ -26,11 +26,11 @@ def remove_periodic_contacts(_mol, npro, dist):
                 if i == 0 and i == j and i == k:
                     continue
                 delta = i * a + j * b + k * c
-                pos[natoms:] += delta
-                mol.setPositions(pos)
+                shifted = pos.copy()
+                shifted[natoms:] += delta
+                mol.setPositions(shifted)
                 ids = mol.selectIds(sel)
                 bad.extend(ids)
-                pos[natoms:] -= delta
 
     if bad:
         _mol = _mol.clone("not same fragid as index " + " ".join(map(str, bad)))
@@ -45,3 +45,16 @@ class Wrapper(object):
             self.mol.setCell(box)
         self.pfx.apply(pos, box)
         self.mol.setPositions(pos)
+
+    def wrap_frames(self, pos, box, threads=0):
+        """perform periodic wrapping in place on a stack of frames.
+
+        pos has shape (nframes, natoms, 3) and box (nframes, 3, 3).
+        """
+        if self.unrotate:
+            rot = NP.transpose(
+                box / NP.linalg.norm(box, axis=2, keepdims=True), (0, 2, 1)
+            )
+            pos[:] = NP.matmul(pos, rot)
+            box[:] = NP.matmul(box, rot)
+        self.pfx.apply(pos, box, threads=threads)